@@ -1,32 +1,191 @@
 import sqlite3
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime, UTC
 
+def dict_factory(cursor, row):
+    """Return rows as dictionaries keyed by column name."""
+    d = {}
+    for idx, col in enumerate(cursor.description):
+        d[col[0]] = row[idx]
+    return d
+
+class _ConnectionSlot:
+    """Persistent connection owned by one thread plus its open handle count."""
+    def __init__(self, conn):
+        self.conn = conn
+        self.users = 0
+        self.thread = threading.current_thread()
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except sqlite3.Error as e:
+                print(f"Error closing database connection: {e}")
+            self.conn = None
+
+class PooledConnection:
+    """Handle on the calling thread's persistent connection.
+
+    Behaves like a sqlite3.Connection, but close() only releases the handle.
+    When the last handle of a thread is released, any transaction left open
+    is rolled back, which matches what closing a real connection used to do.
+    """
+    def __init__(self, slot):
+        self._slot = slot
+        self._released = False
+        slot.users += 1
+
+    def __getattr__(self, name):
+        return getattr(self._slot.conn, name)
+
+    def __enter__(self):
+        self._slot.conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._slot.conn.__exit__(exc_type, exc_value, traceback)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """Release the handle; the underlying connection stays open."""
+        if self._released:
+            return
+        self._released = True
+        slot = self._slot
+        slot.users -= 1
+        if slot.users <= 0:
+            slot.users = 0
+            if slot.conn is not None and slot.conn.in_transaction:
+                slot.conn.rollback()
+
 class DatabaseManager:
     # Get the absolute path to the marocpos directory
     MAROCPOS_DIR = os.path.dirname(os.path.abspath(__file__))
     DB_PATH = os.path.join(MAROCPOS_DIR, "pos7.db")
 
+    # Applied once to every new connection
+    PRAGMAS = (
+        ("journal_mode", "WAL"),
+        ("synchronous", "NORMAL"),
+        ("busy_timeout", 5000),
+        ("cache_size", -16000),       # ~16 MB page cache
+        ("mmap_size", 67108864),      # 64 MB memory-mapped I/O
+        ("temp_store", "MEMORY"),
+    )
+
+    _local = threading.local()
+    _slots = []
+    _slots_lock = threading.Lock()
+
+    @classmethod
+    def _open_connection(cls):
+        """Open a new connection to the database and apply the PRAGMAs."""
+        # Only the owning thread uses the connection, but close_all_connections()
+        # and the pruning of finished threads close it from another thread
+        conn = sqlite3.connect(cls.DB_PATH, timeout=5, check_same_thread=False)
+
+        # Use our dict_factory instead of sqlite3.Row
+        conn.row_factory = dict_factory
+
+        for name, value in cls.PRAGMAS:
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
     @classmethod
     def get_connection(cls):
-        """Create and return a connection to the SQLite database."""
+        """Return a handle on this thread's persistent database connection."""
         try:
-            conn = sqlite3.connect(cls.DB_PATH)
-            
-            # Configure row_factory to return dictionaries
-            def dict_factory(cursor, row):
-                d = {}
-                for idx, col in enumerate(cursor.description):
-                    d[col[0]] = row[idx]
-                return d
-                
-            # Use our dict_factory instead of sqlite3.Row
-            conn.row_factory = dict_factory
-            
-            return conn
+            slot = getattr(cls._local, "slot", None)
+            if slot is None or slot.conn is None:
+                slot = _ConnectionSlot(cls._open_connection())
+                cls._local.slot = slot
+                with cls._slots_lock:
+                    cls._prune_slots()
+                    cls._slots.append(slot)
+            return PooledConnection(slot)
         except sqlite3.Error as e:
             print(f"Error connecting to database: {e}")
             return None
+
+    @classmethod
+    @contextmanager
+    def connection(cls):
+        """Context manager yielding a pooled connection handle."""
+        conn = cls.get_connection()
+        if conn is None:
+            raise sqlite3.OperationalError("Unable to connect to the database")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @classmethod
+    @contextmanager
+    def transaction(cls, immediate=False):
+        """Context manager running its block in one transaction.
+
+        Commits when the block succeeds and rolls back when it raises. A block
+        opened while the thread already has a transaction joins it. immediate
+        takes the write lock up front (BEGIN IMMEDIATE).
+        """
+        with cls.connection() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield conn
+            except Exception:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+
+    @classmethod
+    def _prune_slots(cls):
+        """Close the connections of threads that have exited (caller holds _slots_lock).
+
+        Threads started outside Python (QThreadPool workers) always look
+        alive: they call release_thread_connection() when their work is done.
+        """
+        alive = []
+        for slot in cls._slots:
+            if slot.conn is None:
+                continue
+            if slot.thread.is_alive():
+                alive.append(slot)
+            else:
+                slot.close()
+        cls._slots = alive
+
+    @classmethod
+    def release_thread_connection(cls):
+        """Close the calling thread's connection; call it when a worker is done."""
+        slot = getattr(cls._local, "slot", None)
+        if slot is None:
+            return
+        cls._local.slot = None
+        with cls._slots_lock:
+            if slot in cls._slots:
+                cls._slots.remove(slot)
+        slot.close()
+
+    @classmethod
+    def close_all_connections(cls):
+        """Close every pooled connection (used on shutdown or DB reset)."""
+        with cls._slots_lock:
+            slots, cls._slots = cls._slots, []
+        for slot in slots:
+            slot.close()
+        cls._local = threading.local()
 
     @classmethod
     def get_current_datetime(cls):
@@ -38,302 +197,25 @@ def get_connection():
     return DatabaseManager.get_connection()
 
 def initialize_database():
-    """Initialize the database by creating required tables if they don't exist."""
+    """Bring the database schema up to date.
+
+    When PRAGMA user_version already matches the latest migration this is a
+    single integer read; otherwise every pending migration is applied in one
+    transaction (see migrations.py).
+    """
+    from migrations import migrate
+
     connection = get_connection()
     if not connection:
         print("Failed to connect to the database. Initialization aborted.")
         return False
 
-    cursor = connection.cursor()
-
-    schema = """
-    CREATE TABLE IF NOT EXISTS Stores (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        address TEXT,
-        phone TEXT,
-        email TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-
-    CREATE TABLE IF NOT EXISTS Categories (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL UNIQUE,
-        description TEXT,
-        parent_id INTEGER,
-        image_path TEXT,
-        tax_rate REAL DEFAULT 0,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (parent_id) REFERENCES Categories(id) ON DELETE SET NULL
-    );
-
-    CREATE TABLE IF NOT EXISTS Products (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL UNIQUE,
-        description TEXT,
-        barcode TEXT UNIQUE,
-        unit_price REAL NOT NULL,
-        purchase_price REAL DEFAULT 0,
-        profit_margin REAL,
-        stock INTEGER NOT NULL DEFAULT 0,
-        min_stock INTEGER DEFAULT 0,
-        reorder_point INTEGER DEFAULT 0,
-        category_id INTEGER,
-        image_path TEXT,
-        unit TEXT DEFAULT 'piece',
-        weight REAL,
-        volume REAL,
-        status TEXT DEFAULT 'available',
-        product_type TEXT DEFAULT 'stockable',
-        valuation_method TEXT DEFAULT 'FIFO',
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (category_id) REFERENCES Categories(id) ON DELETE SET NULL
-    );
-
-    CREATE TABLE IF NOT EXISTS ProductAttributes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL UNIQUE,
-        description TEXT,
-        display_type TEXT DEFAULT 'radio' CHECK(display_type IN ('radio', 'select', 'color', 'pills')),
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-    
-    CREATE TABLE IF NOT EXISTS ProductAttributeValues (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        attribute_id INTEGER NOT NULL,
-        value TEXT NOT NULL,
-        sequence INTEGER DEFAULT 0,
-        html_color TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (attribute_id) REFERENCES ProductAttributes(id) ON DELETE CASCADE,
-        UNIQUE(attribute_id, value)
-    );
-    
-    CREATE TABLE IF NOT EXISTS ProductTemplateAttributeLine (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        product_id INTEGER NOT NULL,
-        attribute_id INTEGER NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (product_id) REFERENCES Products(id) ON DELETE CASCADE,
-        FOREIGN KEY (attribute_id) REFERENCES ProductAttributes(id) ON DELETE CASCADE,
-        UNIQUE(product_id, attribute_id)
-    );
-    
-    CREATE TABLE IF NOT EXISTS ProductTemplateAttributeValue (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        line_id INTEGER NOT NULL,
-        value_id INTEGER NOT NULL,
-        price_extra REAL DEFAULT 0,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (line_id) REFERENCES ProductTemplateAttributeLine(id) ON DELETE CASCADE,
-        FOREIGN KEY (value_id) REFERENCES ProductAttributeValues(id) ON DELETE CASCADE,
-        UNIQUE(line_id, value_id)
-    );
-    
-    CREATE TABLE IF NOT EXISTS ProductVariantCombination (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        product_id INTEGER NOT NULL,
-        product_variant_id INTEGER NOT NULL,
-        template_attribute_value_id INTEGER NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (product_id) REFERENCES Products(id) ON DELETE CASCADE,
-        FOREIGN KEY (product_variant_id) REFERENCES ProductVariants(id) ON DELETE CASCADE,
-        FOREIGN KEY (template_attribute_value_id) REFERENCES ProductTemplateAttributeValue(id) ON DELETE CASCADE,
-        UNIQUE(product_variant_id, template_attribute_value_id)
-    );
-    
-    CREATE TABLE IF NOT EXISTS ProductVariants (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        product_id INTEGER NOT NULL,
-        name TEXT NOT NULL,
-        barcode TEXT UNIQUE,
-        unit_price REAL,
-        purchase_price REAL,
-        stock INTEGER DEFAULT 0,
-        attributes TEXT,
-        sku TEXT,
-        image_path TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (product_id) REFERENCES Products(id) ON DELETE CASCADE
-    );
-
-    CREATE TABLE IF NOT EXISTS StockMovements (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        product_id INTEGER,
-        variant_id INTEGER,
-        movement_type TEXT CHECK(movement_type IN ('purchase', 'sale', 'adjustment_in', 'adjustment_out', 'loss', 'damage', 'return', 'transfer_in', 'transfer_out')),
-        quantity INTEGER NOT NULL,
-        unit_price REAL,
-        reference TEXT,
-        notes TEXT,
-        user_id INTEGER,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (product_id) REFERENCES Products(id) ON DELETE CASCADE,
-        FOREIGN KEY (variant_id) REFERENCES ProductVariants(id) ON DELETE CASCADE,
-        FOREIGN KEY (user_id) REFERENCES Users(id)
-    );
-
-    CREATE TABLE IF NOT EXISTS Users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT NOT NULL UNIQUE,
-        password TEXT NOT NULL,
-        role TEXT NOT NULL CHECK(role IN ('admin', 'cashier', 'manager')),
-        full_name TEXT,
-        email TEXT,
-        phone TEXT,
-        active INTEGER DEFAULT 1,
-        last_login TIMESTAMP,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-
-    CREATE TABLE IF NOT EXISTS Sales (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        total_amount REAL NOT NULL,
-        discount REAL DEFAULT 0,
-        tax_amount REAL DEFAULT 0,
-        final_total REAL NOT NULL,
-        payment_method TEXT DEFAULT 'CASH',
-        payment_status TEXT DEFAULT 'COMPLETED',
-        notes TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES Users(id)
-    );
-
-    CREATE TABLE IF NOT EXISTS SaleItems (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        sale_id INTEGER NOT NULL,
-        product_id INTEGER NOT NULL,
-        variant_id INTEGER,
-        quantity INTEGER NOT NULL,
-        unit_price REAL NOT NULL,
-        subtotal REAL NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (sale_id) REFERENCES Sales(id),
-        FOREIGN KEY (product_id) REFERENCES Products(id),
-        FOREIGN KEY (variant_id) REFERENCES ProductVariants(id)
-    );
-
-    CREATE TABLE IF NOT EXISTS Cart (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        product_id INTEGER NOT NULL,
-        variant_id INTEGER,
-        quantity INTEGER NOT NULL DEFAULT 1,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES Users(id),
-        FOREIGN KEY (product_id) REFERENCES Products(id),
-        FOREIGN KEY (variant_id) REFERENCES ProductVariants(id)
-    );
-
-    CREATE TABLE IF NOT EXISTS Settings (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        key TEXT NOT NULL UNIQUE,
-        value TEXT,
-        description TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-
-    CREATE TABLE IF NOT EXISTS Expenses (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        description TEXT NOT NULL,
-        amount REAL NOT NULL,
-        date DATE NOT NULL,
-        category TEXT,
-        user_id INTEGER,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES Users(id)
-    );
-
-    CREATE TABLE IF NOT EXISTS Suppliers (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        contact_person TEXT,
-        phone TEXT,
-        email TEXT,
-        address TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-
-    CREATE TABLE IF NOT EXISTS ProductSuppliers (
-        product_id INTEGER,
-        supplier_id INTEGER,
-        price REAL,
-        lead_time INTEGER,
-        minimum_order INTEGER,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        PRIMARY KEY (product_id, supplier_id),
-        FOREIGN KEY (product_id) REFERENCES Products(id),
-        FOREIGN KEY (supplier_id) REFERENCES Suppliers(id)
-    );
-    """
-
     try:
-        # Create tables
-        cursor.executescript(schema)
-
-        # Check if admin user exists, if not create it
-        cursor.execute("SELECT COUNT(*) as count FROM Users WHERE username = ?", ('MAFPOS',))
-        result = cursor.fetchone()
-        if result['count'] == 0:
-            current_time = DatabaseManager.get_current_datetime()
-            cursor.execute("""
-                INSERT INTO Users (
-                    username, password, role, full_name, active, created_at
-                ) VALUES (?, ?, ?, ?, ?, ?)
-            """, ('MAFPOS', 'admin123', 'admin', 'Administrator', 1, current_time))
-
-        # Initialize default settings
-        default_settings = [
-            ('store_name', 'My Store', 'Store name'),
-            ('store_address', '', 'Store address'),
-            ('store_phone', '', 'Store phone number'),
-            ('store_email', '', 'Store email'),
-            ('tax_rate', '0', 'Default tax rate'),
-            ('currency', 'MAD', 'Store currency'),
-            ('receipt_footer', 'Thank you for your purchase!', 'Receipt footer message'),
-            ('default_product_type', 'stockable', 'Default product type'),
-            ('default_valuation_method', 'FIFO', 'Default stock valuation method'),
-            ('low_stock_alert', 'true', 'Enable low stock alerts'),
-            ('auto_reorder', 'false', 'Enable automatic reordering'),
-            ('default_unit', 'piece', 'Default unit of measure'),
-            ('receipt_printer_type', 'thermal', 'Receipt printer type (thermal/A4)'),
-            ('receipt_logo_path', '', 'Path to receipt logo image')
-        ]
-
-        for key, value, description in default_settings:
-            cursor.execute("""
-                INSERT OR IGNORE INTO Settings (key, value, description)
-                VALUES (?, ?, ?)
-            """, (key, value, description))
-
-        connection.commit()
-        print("✅ Base de données initialisée avec succès.\n")
-
-        # Print database info
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = cursor.fetchall()
-        print("📦 Tables existantes:")
-        for table in tables:
-            print(f"- {table['name']}")
-
-        cursor.execute("SELECT name FROM Categories")
-        categories = cursor.fetchall()
-        print("\n📁 Catégories existantes:")
-        for category in categories:
-            print(f"- {category['name']}")
-
-        print("\n✅ Tables créées ou vérifiées.")
-        print("✅ Utilisateur admin par défaut existant.")
+        applied = migrate(connection)
+        if applied:
+            for version, description in applied:
+                print(f"📦 Migration {version} appliquée : {description}")
+            print("✅ Base de données initialisée avec succès.")
         return True
 
     except sqlite3.Error as e:
@@ -341,14 +223,41 @@ def initialize_database():
         return False
 
     finally:
-        if connection:
-            connection.close()
+        connection.close()
+
+def backup_database(path, progress=None, pages=1024):
+    """Copy the live database to `path` with SQLite's online backup API.
+
+    The copy runs `pages` pages at a time, so the other connections keep
+    reading and writing meanwhile. progress(done_pages, total_pages) is
+    called after each step; an exception raised from it aborts the backup.
+    The copy is written to a temporary file renamed once complete.
+    """
+    temp_path = f"{path}.tmp"
+    target = sqlite3.connect(temp_path)
+    try:
+        with DatabaseManager.connection() as conn:
+            conn.backup(
+                target, pages=pages,
+                progress=(lambda status, remaining, total: progress(total - remaining, total)) if progress else None
+            )
+        target.close()
+        os.replace(temp_path, path)
+    except BaseException:
+        target.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
 
 def reset_database():
     """Reset the database by deleting and recreating it."""
     try:
+        DatabaseManager.close_all_connections()
         if os.path.exists(DatabaseManager.DB_PATH):
             os.remove(DatabaseManager.DB_PATH)
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(DatabaseManager.DB_PATH + suffix):
+                    os.remove(DatabaseManager.DB_PATH + suffix)
             print("🗑️ Ancienne base de données supprimée.")
         return initialize_database()
     except Exception as e:
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Change Export Script for MarocPOS
+
+Writes the catalog, stock and sales rows changed since a change log
+sequence number to a JSON Lines file, for the head office to pull
+several times a day instead of a full export. The header line of the
+file holds the sequence to pass to the next run ("until").
+
+Usage:
+    python export_changes.py SINCE FILE [--prune]
+
+SINCE is 0 for a first, complete export. --prune then deletes the log
+entries already exported.
+"""
+
+import sys
+
+from database import initialize_database
+from models.change_log import ChangeLog, DeltaExporter
+
+def show_progress(done, total, table):
+    if table:
+        print(f"   [{done + 1}/{total}] {table}")
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if len(args) != 2 or not args[0].isdigit():
+        print(__doc__)
+        return 2
+    since, path = int(args[0]), args[1]
+
+    print("\n=== MarocPOS Change Export ===\n")
+    initialize_database()
+
+    print(f"🔧 Exportation des modifications depuis {since}...")
+    try:
+        header = DeltaExporter(path, since).run(progress=show_progress)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"✅ Modifications {header['since']} à {header['until']} exportées dans {path}")
+
+    if "--prune" in sys.argv:
+        deleted = ChangeLog.prune(header['until'])
+        print(f"🧹 {deleted} entrées supprimées du journal.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,62 +3,16 @@ import sys
 import os
 from ui.login_window import LoginWindow
 from controllers.auth_controller import AuthController
-from models.user import User
-from models.product import Product
-from models.category import Category
-from database import initialize_database
+from database import DatabaseManager, initialize_database
 from datetime import datetime
 
-def init_admin_user():
-    """Initialize the default admin user if it doesn't exist."""
-    admin_user = User.get_user_by_username("MAFPOS")
-    if not admin_user:
-        # Create default admin user
-        default_admin = User(
-            username="MAFPOS",
-            password="admin123",
-            role="admin",  # Use lowercase to match database constraint
-            active=1
-        )
-        if User.add_user(default_admin):
-            print("Default admin user created successfully.")
-        else:
-            print("Failed to create default admin user.")
-    else:
-        print("Default admin user already exists.")
-
 def main():
     print("Starting application...")
 
-    # Initialize database
-    initialize_database()
+    # Apply pending schema migrations (no-op when the database is current)
+    if not initialize_database():
+        print("⚠️ Database initialization failed")
 
-    # Create tables
-    User.create_table()
-    Product.create_tables()
-    Category.initialize_database()
-    
-    # Initialize product attribute tables for variants
-    try:
-        from models.product_attribute import ProductAttribute
-        ProductAttribute.create_tables()
-        print("✅ Product tables updated successfully")
-    except Exception as e:
-        print(f"⚠️ Error initializing product attribute tables: {e}")
-    
-    # Initialize payment tables for multiple payment methods
-    try:
-        from models.payment import Payment
-        Payment.create_tables()
-        print("✅ Payment tables created successfully")
-    except Exception as e:
-        print(f"⚠️ Error initializing payment tables: {e}")
-        
-    print("Database tables created or verified.")
-
-    # Initialize admin user
-    init_admin_user()
-    
     # Patch missing window classes to fix module issues
     try:
         from ui.missing_class_patcher import patch_all_modules
@@ -86,7 +40,9 @@ def main():
     login_window = LoginWindow(auth_controller=AuthController())
     login_window.show()
     
-    sys.exit(app.exec_())
+    exit_code = app.exec_()
+    DatabaseManager.close_all_connections()
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,868 @@
+"""Versioned schema migrations.
+
+The schema version is stored in ``PRAGMA user_version``. Each migration is a
+function receiving a cursor; pending migrations are applied in order inside a
+single transaction, and the version is bumped in that same transaction.
+New schema changes must be appended to ``MIGRATIONS`` - never edit a migration
+that has already shipped. Migrations carry their own SQL instead of calling
+the models, whose code keeps changing after the migration has shipped.
+"""
+import json
+import sqlite3
+
+from database import DatabaseManager
+
+
+def table_columns(cursor, table_name):
+    """Return the set of column names of a table"""
+    cursor.execute(f"PRAGMA table_info({table_name})")
+    return {row['name'] for row in cursor.fetchall()}
+
+
+def add_missing_columns(cursor, statements):
+    """Add to existing tables the columns declared in statements but missing.
+
+    Databases created before versioning (by the old per-model create_tables
+    helpers or database_repair.py) have the tables but not every column.
+    ALTER TABLE cannot add constraints, so missing columns are added as
+    nullable with their constant default, if any.
+    """
+    reference = sqlite3.connect(":memory:")
+    try:
+        for statement in statements:
+            reference.execute(statement)
+        tables = reference.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        ).fetchall()
+        for (table_name,) in tables:
+            existing = table_columns(cursor, table_name)
+            for _, name, column_type, _, default, pk in reference.execute(f"PRAGMA table_info({table_name})"):
+                if name in existing or pk:
+                    continue
+                declaration = column_type
+                if default is not None and not default.upper().startswith("CURRENT_"):
+                    declaration += f" DEFAULT {default}"
+                cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {name} {declaration}")
+    finally:
+        reference.close()
+
+
+BASE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS Stores (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        address TEXT,
+        phone TEXT,
+        email TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Categories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE,
+        description TEXT,
+        parent_id INTEGER,
+        image_path TEXT,
+        tax_rate REAL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (parent_id) REFERENCES Categories(id) ON DELETE SET NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE,
+        description TEXT,
+        barcode TEXT UNIQUE,
+        unit_price REAL NOT NULL,
+        purchase_price REAL DEFAULT 0,
+        profit_margin REAL,
+        stock INTEGER NOT NULL DEFAULT 0,
+        min_stock INTEGER DEFAULT 0,
+        reorder_point INTEGER DEFAULT 0,
+        category_id INTEGER,
+        image_path TEXT,
+        unit TEXT DEFAULT 'piece',
+        weight REAL,
+        volume REAL,
+        status TEXT DEFAULT 'available',
+        product_type TEXT DEFAULT 'stockable',
+        valuation_method TEXT DEFAULT 'FIFO',
+        has_variants BOOLEAN DEFAULT 0,
+        variant_attributes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (category_id) REFERENCES Categories(id) ON DELETE SET NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ProductAttributes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE,
+        description TEXT,
+        display_type TEXT DEFAULT 'radio' CHECK(display_type IN ('radio', 'select', 'color', 'pills')),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ProductAttributeValues (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        attribute_id INTEGER NOT NULL,
+        value TEXT NOT NULL,
+        sequence INTEGER DEFAULT 0,
+        html_color TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (attribute_id) REFERENCES ProductAttributes(id) ON DELETE CASCADE,
+        UNIQUE(attribute_id, value)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ProductTemplateAttributeLine (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        attribute_id INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (product_id) REFERENCES Products(id) ON DELETE CASCADE,
+        FOREIGN KEY (attribute_id) REFERENCES ProductAttributes(id) ON DELETE CASCADE,
+        UNIQUE(product_id, attribute_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ProductTemplateAttributeValue (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        line_id INTEGER NOT NULL,
+        value_id INTEGER NOT NULL,
+        price_extra REAL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (line_id) REFERENCES ProductTemplateAttributeLine(id) ON DELETE CASCADE,
+        FOREIGN KEY (value_id) REFERENCES ProductAttributeValues(id) ON DELETE CASCADE,
+        UNIQUE(line_id, value_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ProductVariantCombination (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        product_variant_id INTEGER NOT NULL,
+        template_attribute_value_id INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (product_id) REFERENCES Products(id) ON DELETE CASCADE,
+        FOREIGN KEY (product_variant_id) REFERENCES ProductVariants(id) ON DELETE CASCADE,
+        FOREIGN KEY (template_attribute_value_id) REFERENCES ProductTemplateAttributeValue(id) ON DELETE CASCADE,
+        UNIQUE(product_variant_id, template_attribute_value_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ProductVariants (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        name TEXT NOT NULL DEFAULT '',
+        barcode TEXT UNIQUE,
+        unit_price REAL,
+        purchase_price REAL,
+        price_adjustment REAL DEFAULT 0,
+        stock INTEGER DEFAULT 0,
+        attributes TEXT,
+        attribute_values TEXT,
+        sku TEXT,
+        image_path TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (product_id) REFERENCES Products(id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS StockMovements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER,
+        variant_id INTEGER,
+        movement_type TEXT CHECK(movement_type IN ('purchase', 'sale', 'adjustment_in', 'adjustment_out', 'loss', 'damage', 'return', 'transfer_in', 'transfer_out')),
+        quantity INTEGER NOT NULL,
+        unit_price REAL,
+        reference TEXT,
+        notes TEXT,
+        user_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (product_id) REFERENCES Products(id) ON DELETE CASCADE,
+        FOREIGN KEY (variant_id) REFERENCES ProductVariants(id) ON DELETE CASCADE,
+        FOREIGN KEY (user_id) REFERENCES Users(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL UNIQUE,
+        password TEXT NOT NULL,
+        role TEXT NOT NULL CHECK(role IN ('admin', 'cashier', 'manager')),
+        full_name TEXT,
+        email TEXT,
+        phone TEXT,
+        active INTEGER DEFAULT 1,
+        last_login TIMESTAMP,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Customers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        email TEXT,
+        phone TEXT,
+        address TEXT,
+        notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Sales (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        customer_id INTEGER,
+        total_amount REAL NOT NULL,
+        discount REAL DEFAULT 0,
+        tax_amount REAL DEFAULT 0,
+        final_total REAL NOT NULL,
+        payment_method TEXT DEFAULT 'CASH',
+        payment_status TEXT DEFAULT 'COMPLETED',
+        notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES Users(id),
+        FOREIGN KEY (customer_id) REFERENCES Customers(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS SaleItems (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sale_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        variant_id INTEGER,
+        quantity INTEGER NOT NULL,
+        unit_price REAL NOT NULL,
+        unit_cost REAL DEFAULT 0,
+        subtotal REAL NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (sale_id) REFERENCES Sales(id),
+        FOREIGN KEY (product_id) REFERENCES Products(id),
+        FOREIGN KEY (variant_id) REFERENCES ProductVariants(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS PaymentMethods (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE,
+        code TEXT,
+        is_active INTEGER DEFAULT 1,
+        requires_reference INTEGER DEFAULT 0,
+        reference_label TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS SalePayments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sale_id INTEGER NOT NULL,
+        payment_method_id INTEGER,
+        amount REAL NOT NULL,
+        reference TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (sale_id) REFERENCES Sales(id) ON DELETE CASCADE,
+        FOREIGN KEY (payment_method_id) REFERENCES PaymentMethods(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Cart (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        variant_id INTEGER,
+        quantity INTEGER NOT NULL DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES Users(id),
+        FOREIGN KEY (product_id) REFERENCES Products(id),
+        FOREIGN KEY (variant_id) REFERENCES ProductVariants(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Settings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        key TEXT NOT NULL UNIQUE,
+        value TEXT,
+        description TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Expenses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        description TEXT NOT NULL,
+        amount REAL NOT NULL,
+        date DATE NOT NULL,
+        category TEXT,
+        user_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES Users(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Suppliers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        contact_person TEXT,
+        phone TEXT,
+        email TEXT,
+        address TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ProductSuppliers (
+        product_id INTEGER,
+        supplier_id INTEGER,
+        price REAL,
+        lead_time INTEGER,
+        minimum_order INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (product_id, supplier_id),
+        FOREIGN KEY (product_id) REFERENCES Products(id),
+        FOREIGN KEY (supplier_id) REFERENCES Suppliers(id)
+    )
+    """,
+)
+
+DEFAULT_SETTINGS = [
+    ('store_name', 'My Store', 'Store name'),
+    ('store_address', '', 'Store address'),
+    ('store_phone', '', 'Store phone number'),
+    ('store_email', '', 'Store email'),
+    ('tax_rate', '0', 'Default tax rate'),
+    ('currency', 'MAD', 'Store currency'),
+    ('receipt_footer', 'Thank you for your purchase!', 'Receipt footer message'),
+    ('default_product_type', 'stockable', 'Default product type'),
+    ('default_valuation_method', 'FIFO', 'Default stock valuation method'),
+    ('low_stock_alert', 'true', 'Enable low stock alerts'),
+    ('auto_reorder', 'false', 'Enable automatic reordering'),
+    ('default_unit', 'piece', 'Default unit of measure'),
+    ('receipt_printer_type', 'thermal', 'Receipt printer type (thermal/A4)'),
+    ('receipt_logo_path', '', 'Path to receipt logo image')
+]
+
+DEFAULT_PAYMENT_METHODS = [
+    ("Espèces", "CASH", 1, 0, ""),
+    ("Carte", "CARD", 1, 1, "N° Transaction"),
+    ("Chèque", "CHECK", 1, 1, "N° Chèque"),
+    ("Virement", "TRANSFER", 1, 1, "Référence"),
+    ("Crédit", "CREDIT", 1, 0, "")
+]
+
+
+def migration_001_base_schema(cursor):
+    """Create the base schema, upgrade pre-versioning databases and seed defaults"""
+    for statement in BASE_SCHEMA:
+        cursor.execute(statement)
+
+    add_missing_columns(cursor, BASE_SCHEMA)
+
+    # Default admin user (the plaintext password is upgraded to bcrypt on first login)
+    cursor.execute("SELECT COUNT(*) as count FROM Users WHERE username = ?", ('MAFPOS',))
+    if cursor.fetchone()['count'] == 0:
+        cursor.execute("""
+            INSERT INTO Users (
+                username, password, role, full_name, active, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?)
+        """, ('MAFPOS', 'admin123', 'admin', 'Administrator', 1,
+              DatabaseManager.get_current_datetime()))
+
+    cursor.executemany("""
+        INSERT OR IGNORE INTO Settings (key, value, description)
+        VALUES (?, ?, ?)
+    """, DEFAULT_SETTINGS)
+
+    cursor.execute("SELECT COUNT(*) as count FROM PaymentMethods")
+    if cursor.fetchone()['count'] == 0:
+        cursor.executemany("""
+            INSERT INTO PaymentMethods (name, code, is_active, requires_reference, reference_label)
+            VALUES (?, ?, ?, ?, ?)
+        """, DEFAULT_PAYMENT_METHODS)
+
+
+# Secondary indexes for report, checkout and stock history queries.
+# Check new queries against them with: python query_advisor.py
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_sales_created_at ON Sales(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_sales_user_id ON Sales(user_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_sales_customer_id ON Sales(customer_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_sale_items_sale_id ON SaleItems(sale_id)",
+    "CREATE INDEX IF NOT EXISTS idx_sale_items_product_id ON SaleItems(product_id, variant_id)",
+    "CREATE INDEX IF NOT EXISTS idx_sale_items_variant_id ON SaleItems(variant_id)",
+    "CREATE INDEX IF NOT EXISTS idx_sale_payments_sale_id ON SalePayments(sale_id)",
+    "CREATE INDEX IF NOT EXISTS idx_stock_movements_product_id ON StockMovements(product_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_stock_movements_variant_id ON StockMovements(variant_id)",
+    "CREATE INDEX IF NOT EXISTS idx_stock_movements_created_at ON StockMovements(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_product_variants_product_id ON ProductVariants(product_id)",
+    "CREATE INDEX IF NOT EXISTS idx_products_category_id ON Products(category_id)",
+    # Cart and combination rows of a product or variant (foreign keys are not
+    # enforced: Product.delete_product removes the child rows it knows of)
+    "CREATE INDEX IF NOT EXISTS idx_cart_product_id ON Cart(product_id)",
+    "CREATE INDEX IF NOT EXISTS idx_cart_variant_id ON Cart(variant_id)",
+    "CREATE INDEX IF NOT EXISTS idx_variant_combination_product_id ON ProductVariantCombination(product_id)",
+)
+
+
+def migration_002_indexes(cursor):
+    """Create the managed secondary indexes"""
+    for statement in INDEXES:
+        cursor.execute(statement)
+
+
+ROLLUP_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS SalesHourlyRollup (
+        day TEXT NOT NULL,
+        hour INTEGER NOT NULL,
+        sale_count INTEGER NOT NULL DEFAULT 0,
+        total_sales REAL NOT NULL DEFAULT 0,
+        total_discount REAL NOT NULL DEFAULT 0,
+        total_tax REAL NOT NULL DEFAULT 0,
+        min_sale REAL,
+        max_sale REAL,
+        PRIMARY KEY (day, hour)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ProductDailyRollup (
+        day TEXT NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity_sold REAL NOT NULL DEFAULT 0,
+        total_sales REAL NOT NULL DEFAULT 0,
+        total_cost REAL NOT NULL DEFAULT 0,
+        sale_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, product_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS CategoryDailyRollup (
+        day TEXT NOT NULL,
+        category_id INTEGER NOT NULL,
+        items_sold INTEGER NOT NULL DEFAULT 0,
+        quantity_sold REAL NOT NULL DEFAULT 0,
+        total_sales REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, category_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS PaymentMethodDailyRollup (
+        day TEXT NOT NULL,
+        payment_method TEXT NOT NULL,
+        transaction_count INTEGER NOT NULL DEFAULT 0,
+        total_amount REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, payment_method)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS CashierDailyRollup (
+        day TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        sale_count INTEGER NOT NULL DEFAULT 0,
+        total_sales REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, user_id)
+    )
+    """,
+)
+
+
+ROLLUP_BACKFILL = (
+    """
+    INSERT INTO SalesHourlyRollup (
+        day, hour, sale_count, total_sales, total_discount,
+        total_tax, min_sale, max_sale
+    )
+    SELECT date(s.created_at), CAST(strftime('%H', s.created_at) AS INTEGER),
+           COUNT(*), SUM(s.final_total), SUM(COALESCE(s.discount, 0)),
+           SUM(COALESCE(s.tax_amount, 0)), MIN(s.final_total), MAX(s.final_total)
+    FROM Sales s
+    WHERE COALESCE(s.payment_status, '') != 'VOIDED'
+    GROUP BY 1, 2
+    """,
+    """
+    INSERT INTO ProductDailyRollup (
+        day, product_id, quantity_sold, total_sales, total_cost, sale_count
+    )
+    SELECT date(s.created_at), si.product_id,
+           SUM(si.quantity), SUM(si.subtotal),
+           SUM(si.quantity * COALESCE(si.unit_cost, 0)), COUNT(DISTINCT s.id)
+    FROM SaleItems si
+    JOIN Sales s ON si.sale_id = s.id
+    WHERE COALESCE(s.payment_status, '') != 'VOIDED'
+    GROUP BY 1, 2
+    """,
+    """
+    INSERT INTO CategoryDailyRollup (
+        day, category_id, items_sold, quantity_sold, total_sales
+    )
+    SELECT date(s.created_at), COALESCE(p.category_id, 0),
+           COUNT(si.id), SUM(si.quantity), SUM(si.subtotal)
+    FROM SaleItems si
+    JOIN Sales s ON si.sale_id = s.id
+    JOIN Products p ON si.product_id = p.id
+    WHERE COALESCE(s.payment_status, '') != 'VOIDED'
+    GROUP BY 1, 2
+    """,
+    """
+    INSERT INTO PaymentMethodDailyRollup (
+        day, payment_method, transaction_count, total_amount
+    )
+    SELECT date(s.created_at), COALESCE(pm.name, s.payment_method, 'Autre'),
+           COUNT(DISTINCT s.id), SUM(COALESCE(sp.amount, s.final_total))
+    FROM Sales s
+    LEFT JOIN SalePayments sp ON s.id = sp.sale_id
+    LEFT JOIN PaymentMethods pm ON sp.payment_method_id = pm.id
+    WHERE COALESCE(s.payment_status, '') != 'VOIDED'
+    GROUP BY 1, 2
+    """,
+    """
+    INSERT INTO CashierDailyRollup (day, user_id, sale_count, total_sales)
+    SELECT date(s.created_at), s.user_id, COUNT(*), SUM(s.final_total)
+    FROM Sales s
+    WHERE COALESCE(s.payment_status, '') != 'VOIDED'
+    GROUP BY 1, 2
+    """,
+)
+
+
+def migration_003_sales_rollups(cursor):
+    """Create the sales rollup tables and backfill them from existing sales"""
+    for statement in ROLLUP_SCHEMA + ROLLUP_BACKFILL:
+        cursor.execute(statement)
+
+
+# Arabic marks stripped and alef forms folded by the search index: harakat,
+# superscript alef, tatweel; alef with madda, hamza above, hamza below
+SEARCH_FOLDS = (
+    [(code, None) for code in range(0x064B, 0x0653)] + [(0x0670, None), (0x0640, None)]
+    + [(0x0622, 0x0627), (0x0623, 0x0627), (0x0625, 0x0627)]
+)
+
+
+def search_fold_sql(expr):
+    """Wrap a SQL text expression in the REPLACE() calls of SEARCH_FOLDS"""
+    for code, folded in SEARCH_FOLDS:
+        expr = f"REPLACE({expr}, char({code}), {f'char({folded})' if folded else repr('')})"
+    return expr
+
+
+def search_variant_text_sql(product_id):
+    """Folded variant names, SKUs and attribute values of a product"""
+    return search_fold_sql(f"""(
+        SELECT group_concat(
+            COALESCE(pv.name, '') || ' ' || COALESCE(pv.sku, '') || ' ' || COALESCE((
+                SELECT group_concat(j.value, ' ')
+                FROM json_each(CASE WHEN json_valid(pv.attribute_values) THEN pv.attribute_values ELSE '{{}}' END) j
+            ), ''),
+            ' ')
+        FROM ProductVariants pv
+        WHERE pv.product_id = {product_id}
+    )""")
+
+
+def search_document_sql(alias):
+    """SELECT producing the search document of the product row `alias`"""
+    return f"""
+        SELECT {alias}.id,
+               {search_fold_sql(f"{alias}.name")},
+               {search_fold_sql(f"{alias}.description")},
+               {alias}.barcode,
+               {search_fold_sql(f"(SELECT name FROM Categories WHERE id = {alias}.category_id)")},
+               {search_variant_text_sql(f"{alias}.id")}
+    """
+
+
+SEARCH_INSERT_NEW = f"""
+            INSERT INTO ProductSearch (rowid, name, description, barcode, category_name, variant_names)
+            {search_document_sql('new')} ;
+        """
+
+PRODUCT_SEARCH_SCHEMA = (
+    """
+            CREATE VIRTUAL TABLE IF NOT EXISTS ProductSearch USING fts5(
+                name, description, barcode, category_name, variant_names,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+            """,
+    f"""
+            CREATE TRIGGER IF NOT EXISTS trg_products_search_insert
+            AFTER INSERT ON Products
+            BEGIN
+                {SEARCH_INSERT_NEW}
+            END
+            """,
+    f"""
+            CREATE TRIGGER IF NOT EXISTS trg_products_search_update
+            AFTER UPDATE OF name, description, barcode, category_id ON Products
+            BEGIN
+                DELETE FROM ProductSearch WHERE rowid = old.id;
+                {SEARCH_INSERT_NEW}
+            END
+            """,
+    """
+            CREATE TRIGGER IF NOT EXISTS trg_products_search_delete
+            AFTER DELETE ON Products
+            BEGIN
+                DELETE FROM ProductSearch WHERE rowid = old.id;
+            END
+            """,
+    f"""
+            CREATE TRIGGER IF NOT EXISTS trg_variants_search_insert
+            AFTER INSERT ON ProductVariants
+            BEGIN
+                UPDATE ProductSearch SET variant_names = {search_variant_text_sql('new.product_id')}
+                WHERE rowid = new.product_id;
+            END
+            """,
+    f"""
+            CREATE TRIGGER IF NOT EXISTS trg_variants_search_update
+            AFTER UPDATE OF name, sku, attribute_values, product_id ON ProductVariants
+            BEGIN
+                UPDATE ProductSearch SET variant_names = {search_variant_text_sql('old.product_id')}
+                WHERE rowid = old.product_id;
+                UPDATE ProductSearch SET variant_names = {search_variant_text_sql('new.product_id')}
+                WHERE rowid = new.product_id;
+            END
+            """,
+    f"""
+            CREATE TRIGGER IF NOT EXISTS trg_variants_search_delete
+            AFTER DELETE ON ProductVariants
+            BEGIN
+                UPDATE ProductSearch SET variant_names = {search_variant_text_sql('old.product_id')}
+                WHERE rowid = old.product_id;
+            END
+            """,
+    f"""
+            CREATE TRIGGER IF NOT EXISTS trg_categories_search_update
+            AFTER UPDATE OF name ON Categories
+            BEGIN
+                UPDATE ProductSearch SET category_name = {search_fold_sql('new.name')}
+                WHERE rowid IN (SELECT id FROM Products WHERE category_id = new.id);
+            END
+            """,
+    """
+            CREATE TRIGGER IF NOT EXISTS trg_categories_search_delete
+            AFTER DELETE ON Categories
+            BEGIN
+                UPDATE ProductSearch SET category_name = NULL
+                WHERE rowid IN (SELECT id FROM Products WHERE category_id = old.id);
+            END
+            """,
+)
+
+
+def migration_004_product_search(cursor):
+    """Create the full-text product index, its triggers, and index existing products"""
+    for statement in PRODUCT_SEARCH_SCHEMA:
+        cursor.execute(statement)
+    cursor.execute(f"""
+        INSERT INTO ProductSearch (rowid, name, description, barcode, category_name, variant_names)
+        {search_document_sql('p')}
+        FROM Products p
+    """)
+
+
+PRINT_QUEUE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS PrintJobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sale_id INTEGER NOT NULL,
+        kind TEXT NOT NULL CHECK(kind IN ('thermal', 'a4', 'pdf')),
+        status TEXT NOT NULL DEFAULT 'pending' CHECK(status IN ('pending', 'printing', 'done', 'failed')),
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL NOT NULL DEFAULT 0,
+        output_path TEXT,
+        last_error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (sale_id) REFERENCES Sales(id) ON DELETE CASCADE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_print_jobs_status ON PrintJobs(status, next_attempt_at)",
+    "CREATE INDEX IF NOT EXISTS idx_print_jobs_sale_id ON PrintJobs(sale_id)",
+)
+
+
+def migration_005_print_queue(cursor):
+    """Create the persistent receipt print queue"""
+    for statement in PRINT_QUEUE_SCHEMA:
+        cursor.execute(statement)
+
+
+VARIANT_INDEX_SCHEMA = (
+    "ALTER TABLE ProductVariants ADD COLUMN display_name TEXT",
+    "ALTER TABLE ProductVariants ADD COLUMN attribute_key TEXT",
+    "CREATE INDEX IF NOT EXISTS idx_product_variants_attribute_key ON ProductVariants(product_id, attribute_key)",
+)
+
+
+def variant_index_values(variant, combination, value_ids):
+    """(display_name, attribute_key) of a variant row at the time of migration 6"""
+    attributes = {}
+    for column in ('attribute_values', 'attributes'):
+        value = variant[column]
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except (ValueError, TypeError):
+                continue
+        if isinstance(value, dict) and value:
+            attributes = value
+            break
+
+    if combination:
+        key = sorted(set(row['value_id'] for row in combination))
+        if not attributes:
+            attributes = [row['value'] for row in combination]
+    else:
+        matched = [
+            value_ids.get((str(name).strip().lower(), str(value).strip().lower()))
+            for name, value in attributes.items()
+        ]
+        key = sorted(set(matched)) if matched and None not in matched else None
+
+    if variant['name']:
+        name = variant['name']
+    else:
+        values = attributes.values() if isinstance(attributes, dict) else attributes
+        parts = [str(value) for value in values if value not in (None, '')]
+        name = " / ".join(parts) if parts else f"Variante #{variant['id']}"
+    return name, (",".join(str(value_id) for value_id in key) if key is not None else None)
+
+
+def migration_006_variant_index(cursor):
+    """Add the materialized variant display name and attribute key, and backfill them"""
+    for statement in VARIANT_INDEX_SCHEMA:
+        cursor.execute(statement)
+
+    cursor.execute("SELECT id, name, attribute_values, attributes FROM ProductVariants")
+    variants = cursor.fetchall()
+    cursor.execute("""
+        SELECT pvc.product_variant_id, ptav.value_id, pav.value
+        FROM ProductVariantCombination pvc
+        JOIN ProductTemplateAttributeValue ptav ON pvc.template_attribute_value_id = ptav.id
+        JOIN ProductAttributeValues pav ON ptav.value_id = pav.id
+        ORDER BY pvc.product_variant_id, ptav.line_id
+    """)
+    combinations = {}
+    for row in cursor.fetchall():
+        combinations.setdefault(row['product_variant_id'], []).append(row)
+    cursor.execute("""
+        SELECT pav.id, pa.name as attribute_name, pav.value
+        FROM ProductAttributeValues pav
+        JOIN ProductAttributes pa ON pav.attribute_id = pa.id
+    """)
+    value_ids = {
+        (row['attribute_name'].strip().lower(), row['value'].strip().lower()): row['id']
+        for row in cursor.fetchall()
+    }
+
+    cursor.executemany("""
+        UPDATE ProductVariants
+        SET display_name = ?, attribute_key = ?
+        WHERE id = ?
+    """, [
+        variant_index_values(variant, combinations.get(variant['id']), value_ids) + (variant['id'],)
+        for variant in variants
+    ])
+
+
+# Tables whose inserts, updates and deletes are logged by migration 7
+CHANGE_LOG_TABLES = (
+    'Categories', 'Products', 'ProductVariants', 'StockMovements',
+    'Sales', 'SaleItems', 'SalePayments',
+)
+
+CHANGE_LOG_SCHEMA = (
+    """
+            CREATE TABLE IF NOT EXISTS ChangeLog (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                operation TEXT NOT NULL CHECK(operation IN ('I', 'U', 'D')),
+                changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+    "CREATE INDEX IF NOT EXISTS idx_change_log_table ON ChangeLog(table_name, seq)",
+) + tuple(
+    f"""
+                    CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_change_{event.lower()}
+                    AFTER {event} ON {table}
+                    BEGIN
+                        INSERT INTO ChangeLog (table_name, row_id, operation)
+                        VALUES ('{table}', {'old' if event == 'DELETE' else 'new'}.id, '{event[0]}');
+                    END
+                """
+    for table in CHANGE_LOG_TABLES
+    for event in ('INSERT', 'UPDATE', 'DELETE')
+)
+
+
+def migration_007_change_log(cursor):
+    """Create the change log and its triggers, and log the existing rows"""
+    for statement in CHANGE_LOG_SCHEMA:
+        cursor.execute(statement)
+    for table in CHANGE_LOG_TABLES:
+        cursor.execute(f"""
+            INSERT INTO ChangeLog (table_name, row_id, operation)
+            SELECT '{table}', id, 'I' FROM {table} ORDER BY id
+        """)
+
+
+# Ordered registry: (version, description, function)
+MIGRATIONS = [
+    (1, "Schéma de base", migration_001_base_schema),
+    (2, "Index des rapports et du stock", migration_002_indexes),
+    (3, "Tables d'agrégats des ventes", migration_003_sales_rollups),
+    (4, "Recherche plein texte des produits", migration_004_product_search),
+    (5, "File d'impression des reçus", migration_005_print_queue),
+    (6, "Index des combinaisons de variantes", migration_006_variant_index),
+    (7, "Journal des modifications", migration_007_change_log),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """Read the schema version stored in the database header"""
+    return conn.execute("PRAGMA user_version").fetchone()['user_version']
+
+
+def migrate(conn):
+    """Apply all pending migrations in a single transaction.
+
+    Returns the list of (version, description) applied; empty when the
+    database was already current.
+    """
+    current_version = get_schema_version(conn)
+    if current_version >= LATEST_VERSION:
+        return []
+
+    pending = [m for m in MIGRATIONS if m[0] > current_version]
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        for version, description, apply in pending:
+            apply(cursor)
+        cursor.execute(f"PRAGMA user_version = {pending[-1][0]}")
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    return [(version, description) for version, description, _ in pending]
@@ -0,0 +1,111 @@
+class CartLine:
+    """One line of a basket: a product, or one of its variants, at a unit price"""
+
+    __slots__ = ('product_id', 'variant_id', 'name', 'quantity', 'unit_price')
+
+    def __init__(self, product_id, variant_id=None, name='', quantity=1, unit_price=0.0):
+        self.product_id = product_id
+        self.variant_id = variant_id
+        self.name = name
+        self.quantity = quantity
+        self.unit_price = unit_price
+
+    @property
+    def key(self):
+        return (self.product_id, self.variant_id)
+
+    @property
+    def subtotal(self):
+        return self.quantity * self.unit_price
+
+    def __repr__(self):
+        return f"CartLine({self.product_id}, {self.variant_id}, {self.name!r}, {self.quantity}, {self.unit_price})"
+
+
+class Cart:
+    """Basket of CartLine objects keyed by (product_id, variant_id).
+
+    Adding a product already in the basket merges into its line with a dict
+    lookup, and the subtotal and item count are kept as running totals
+    updated by each change, so no operation walks the lines. tax_rate is a
+    percentage of the subtotal; discount an amount taken off the total.
+    """
+
+    def __init__(self, tax_rate=0.0, discount=0.0):
+        self._lines = {}     # key -> CartLine
+        self._keys = []      # display order
+        self._rows = {}      # key -> index in _keys
+        self.tax_rate = tax_rate
+        self.discount = discount
+        self.subtotal = 0.0
+        self.item_count = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __iter__(self):
+        return (self._lines[key] for key in self._keys)
+
+    def line_at(self, row):
+        return self._lines[self._keys[row]]
+
+    def row_of(self, key):
+        """Row of a line, or None if it is not in the basket"""
+        return self._rows.get(key)
+
+    def lines(self):
+        return list(self)
+
+    @property
+    def tax(self):
+        return self.subtotal * self.tax_rate / 100
+
+    @property
+    def total(self):
+        return self.subtotal + self.tax - self.discount
+
+    def add(self, line):
+        """Add a line, merging its quantity into an existing line with the same key.
+
+        Returns the row of the line and whether it was merged.
+        """
+        existing = self._lines.get(line.key)
+        if existing is not None:
+            self._change_quantity(existing, existing.quantity + line.quantity)
+            return self._rows[line.key], True
+
+        self._lines[line.key] = line
+        self._rows[line.key] = len(self._keys)
+        self._keys.append(line.key)
+        self.subtotal += line.subtotal
+        self.item_count += line.quantity
+        return self._rows[line.key], False
+
+    def set_quantity(self, row, quantity):
+        self._change_quantity(self.line_at(row), quantity)
+
+    def _change_quantity(self, line, quantity):
+        self.subtotal += (quantity - line.quantity) * line.unit_price
+        self.item_count += quantity - line.quantity
+        line.quantity = quantity
+
+    def remove(self, row):
+        key = self._keys.pop(row)
+        line = self._lines.pop(key)
+        del self._rows[key]
+        for i in range(row, len(self._keys)):
+            self._rows[self._keys[i]] = i
+        self.subtotal -= line.subtotal
+        self.item_count -= line.quantity
+        if not self._keys:
+            # Drop the rounding drift of the running totals
+            self.subtotal = 0.0
+            self.item_count = 0
+        return line
+
+    def clear(self):
+        self._lines.clear()
+        self._keys.clear()
+        self._rows.clear()
+        self.subtotal = 0.0
+        self.item_count = 0
@@ -0,0 +1,294 @@
+from database import DatabaseManager
+from models.variant_index import attribute_key
+import json
+import threading
+
+# Columns of a cached product row (same shape as Product.get_all_products)
+PRODUCT_COLUMNS = """
+    p.id,
+    p.name,
+    p.barcode,
+    p.description,
+    COALESCE(p.unit_price, 0) as unit_price,
+    COALESCE(p.purchase_price, 0) as purchase_price,
+    p.profit_margin,
+    COALESCE(p.stock, 0) as stock,
+    p.min_stock,
+    p.reorder_point,
+    p.image_path,
+    p.category_id,
+    p.unit,
+    p.weight,
+    p.volume,
+    COALESCE(p.status, 'available') as status,
+    COALESCE(p.product_type, 'stockable') as product_type,
+    COALESCE(p.valuation_method, 'FIFO') as valuation_method,
+    p.has_variants,
+    p.variant_attributes,
+    COALESCE(c.name, 'Non catégorisé') as category_name,
+    p.created_at,
+    p.updated_at
+"""
+
+# Variant rows carry the sum of their attribute price extras, like Product.get_variants
+VARIANT_QUERY = """
+    SELECT pv.*, COALESCE(x.price_extras, 0) as price_extras
+    FROM ProductVariants pv
+    LEFT JOIN (
+        SELECT pvc.product_variant_id, SUM(COALESCE(ptav.price_extra, 0)) as price_extras
+        FROM ProductVariantCombination pvc
+        JOIN ProductTemplateAttributeValue ptav ON pvc.template_attribute_value_id = ptav.id
+        {where}
+        GROUP BY pvc.product_variant_id
+    ) x ON x.product_variant_id = pv.id
+    {where_variants}
+    ORDER BY pv.id
+"""
+
+
+class CatalogCache:
+    """Process-wide in-memory copy of Products, ProductVariants and Categories.
+
+    The catalog is loaded on first use and indexed by id and category, plus
+    one hash index from barcode (and variant SKU) to the product or variant
+    it identifies, used by the sales scanner. Write methods call
+    invalidate() with the products they touched after their commit; only
+    those rows are re-read on the next lookup.
+    Callers always receive copies, so they may modify the returned dicts.
+    """
+
+    _lock = threading.RLock()
+    _loaded = False
+    _dirty_products = set()
+    # Bumped on every invalidation so views can tell when to reload
+    version = 0
+
+    _products = {}
+    _products_by_category = {}
+    _variants = {}
+    _variants_by_product = {}
+    _categories = {}
+    # code -> (product_id, variant_id); barcodes take precedence over SKUs
+    _barcodes = {}
+    _skus = {}
+    # (product_id, attribute_key) -> variant_id, see VariantIndex
+    _combinations = {}
+
+    @staticmethod
+    def invalidate(product_ids=None):
+        """Mark products as changed; without ids the whole catalog is reloaded"""
+        with CatalogCache._lock:
+            CatalogCache.version += 1
+            if product_ids is None:
+                CatalogCache._loaded = False
+                CatalogCache._dirty_products.clear()
+            else:
+                CatalogCache._dirty_products.update(pid for pid in product_ids if pid is not None)
+
+    @staticmethod
+    def _ensure_loaded():
+        if not CatalogCache._loaded:
+            CatalogCache._load()
+        elif CatalogCache._dirty_products:
+            CatalogCache._refresh_products(CatalogCache._dirty_products)
+
+    @staticmethod
+    def _load():
+        # One snapshot for the three reads; joins the caller's transaction if
+        # one is open instead of discarding it
+        try:
+            with DatabaseManager.transaction() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute("SELECT id, name, description FROM Categories ORDER BY name")
+                categories = {row['id']: row for row in cursor.fetchall()}
+
+                cursor.execute(f"""
+                    SELECT {PRODUCT_COLUMNS}
+                    FROM Products p
+                    LEFT JOIN Categories c ON p.category_id = c.id
+                """)
+                products = cursor.fetchall()
+
+                cursor.execute(VARIANT_QUERY.format(where="", where_variants=""))
+                variants = cursor.fetchall()
+        except Exception as e:
+            print(f"Error loading product catalog: {e}")
+            return
+
+        CatalogCache._categories = categories
+        CatalogCache._products = {}
+        CatalogCache._products_by_category = {}
+        CatalogCache._variants = {}
+        CatalogCache._variants_by_product = {}
+        CatalogCache._barcodes = {}
+        CatalogCache._skus = {}
+        CatalogCache._combinations = {}
+        for product in products:
+            CatalogCache._index_product(product)
+        for variant in variants:
+            CatalogCache._index_variant(variant)
+        CatalogCache._dirty_products.clear()
+        CatalogCache._loaded = True
+
+    @staticmethod
+    def _refresh_products(product_ids):
+        """Re-read a few products and their variants"""
+        ids = list(product_ids)
+        placeholders = ", ".join("?" for _ in ids)
+        try:
+            with DatabaseManager.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                    SELECT {PRODUCT_COLUMNS}
+                    FROM Products p
+                    LEFT JOIN Categories c ON p.category_id = c.id
+                    WHERE p.id IN ({placeholders})
+                """, ids)
+                products = cursor.fetchall()
+                cursor.execute(VARIANT_QUERY.format(
+                    where=f"WHERE pvc.product_id IN ({placeholders})",
+                    where_variants=f"WHERE pv.product_id IN ({placeholders})"
+                ), ids + ids)
+                variants = cursor.fetchall()
+        except Exception as e:
+            print(f"Error refreshing product catalog: {e}")
+            # Fall back to a full reload on the next lookup
+            CatalogCache._loaded = False
+            return
+
+        for product_id in ids:
+            CatalogCache._unindex_product(product_id)
+        for product in products:
+            CatalogCache._index_product(product)
+        for variant in variants:
+            CatalogCache._index_variant(variant)
+        CatalogCache._dirty_products.difference_update(ids)
+
+    @staticmethod
+    def _index_product(product):
+        CatalogCache._products[product['id']] = product
+        CatalogCache._products_by_category.setdefault(product['category_id'], set()).add(product['id'])
+        if product['barcode']:
+            CatalogCache._barcodes[product['barcode']] = (product['id'], None)
+
+    @staticmethod
+    def _unindex_product(product_id):
+        product = CatalogCache._products.pop(product_id, None)
+        if product:
+            CatalogCache._products_by_category.get(product['category_id'], set()).discard(product_id)
+            CatalogCache._unindex_code(CatalogCache._barcodes, product['barcode'], (product_id, None))
+        for variant_id in CatalogCache._variants_by_product.pop(product_id, []):
+            variant = CatalogCache._variants.pop(variant_id, None)
+            if variant:
+                CatalogCache._unindex_code(CatalogCache._barcodes, variant.get('barcode'), (product_id, variant_id))
+                CatalogCache._unindex_code(CatalogCache._skus, variant.get('sku'), (product_id, variant_id))
+                CatalogCache._combinations.pop((product_id, variant.get('attribute_key')), None)
+
+    @staticmethod
+    def _unindex_code(index, code, target):
+        if code and index.get(code) == target:
+            del index[code]
+
+    @staticmethod
+    def _index_variant(variant):
+        variant['total_price_adjustment'] = (variant['price_extras'] or 0) + float(variant.get('price_adjustment') or 0)
+        CatalogCache._variants[variant['id']] = variant
+        CatalogCache._variants_by_product.setdefault(variant['product_id'], []).append(variant['id'])
+        target = (variant['product_id'], variant['id'])
+        if variant.get('barcode'):
+            CatalogCache._barcodes[variant['barcode']] = target
+        if variant.get('sku'):
+            CatalogCache._skus[variant['sku']] = target
+        if variant.get('attribute_key'):
+            CatalogCache._combinations[(variant['product_id'], variant['attribute_key'])] = variant['id']
+
+    @staticmethod
+    def get_all_products():
+        """All products, newest first"""
+        with CatalogCache._lock:
+            CatalogCache._ensure_loaded()
+            return [dict(CatalogCache._products[pid]) for pid in sorted(CatalogCache._products, reverse=True)]
+
+    @staticmethod
+    def get_products_by_category(category_id=None):
+        """Products of a category (all products if None), sorted by name"""
+        with CatalogCache._lock:
+            CatalogCache._ensure_loaded()
+            if category_id is None:
+                ids = CatalogCache._products.keys()
+            else:
+                ids = CatalogCache._products_by_category.get(category_id, ())
+            products = [dict(CatalogCache._products[pid]) for pid in ids]
+        products.sort(key=lambda p: p['name'] or '')
+        return products
+
+    @staticmethod
+    def get_product(product_id):
+        with CatalogCache._lock:
+            CatalogCache._ensure_loaded()
+            product = CatalogCache._products.get(product_id)
+            return dict(product) if product else None
+
+    @staticmethod
+    def lookup_code(code):
+        """Resolve a scanned barcode or SKU to (product, variant).
+
+        variant is None for a product barcode; (None, None) if unknown.
+        """
+        with CatalogCache._lock:
+            CatalogCache._ensure_loaded()
+            target = CatalogCache._barcodes.get(code) or CatalogCache._skus.get(code)
+            if not target:
+                return None, None
+            product = CatalogCache._products.get(target[0])
+            variant = CatalogCache._variants.get(target[1]) if target[1] is not None else None
+            if not product:
+                return None, None
+            return dict(product), dict(variant) if variant else None
+
+    @staticmethod
+    def find_variant(product_id, value_ids):
+        """Variant of a product made of exactly these ProductAttributeValues ids, or None"""
+        with CatalogCache._lock:
+            CatalogCache._ensure_loaded()
+            variant_id = CatalogCache._combinations.get((product_id, attribute_key(value_ids)))
+            variant = CatalogCache._variants.get(variant_id)
+            return dict(variant) if variant else None
+
+    @staticmethod
+    def get_product_count():
+        with CatalogCache._lock:
+            CatalogCache._ensure_loaded()
+            return len(CatalogCache._products)
+
+    @staticmethod
+    def get_variant(variant_id):
+        with CatalogCache._lock:
+            CatalogCache._ensure_loaded()
+            variant = CatalogCache._variants.get(variant_id)
+            return dict(variant) if variant else None
+
+    @staticmethod
+    def get_variants(product_id):
+        """Raw variant rows of a product (attribute_values still JSON text)"""
+        with CatalogCache._lock:
+            CatalogCache._ensure_loaded()
+            return [dict(CatalogCache._variants[vid]) for vid in CatalogCache._variants_by_product.get(product_id, [])]
+
+    @staticmethod
+    def get_all_categories():
+        """All categories sorted by name"""
+        with CatalogCache._lock:
+            CatalogCache._ensure_loaded()
+            return [dict(category) for category in CatalogCache._categories.values()]
+
+    @staticmethod
+    def decode_variant_attributes(product):
+        """Decode the JSON variant_attributes of a product dict in place"""
+        if product.get('variant_attributes') and isinstance(product['variant_attributes'], str):
+            try:
+                product['variant_attributes'] = json.loads(product['variant_attributes'])
+            except (ValueError, TypeError):
+                product['variant_attributes'] = None
+        return product
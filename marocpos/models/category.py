@@ -1,4 +1,5 @@
 from database import get_connection
+from models.catalog_cache import CatalogCache
 
 class Category:
     def __init__(self, id=None, name=None, description=None):
@@ -8,22 +9,8 @@ class Category:
 
     @staticmethod
     def get_all_categories():
-        conn = get_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT id, name, description 
-                    FROM Categories 
-                    ORDER BY name
-                """)
-                return cursor.fetchall()
-            except Exception as e:
-                print(f"Error getting categories: {e}")
-                return []
-            finally:
-                conn.close()
-        return []
+        """All categories sorted by name, served from the in-memory catalog"""
+        return CatalogCache.get_all_categories()
 
     @staticmethod
     def add_category(name, description=None):
@@ -36,6 +23,7 @@ class Category:
                     VALUES (?, ?)
                 """, (name, description))
                 conn.commit()
+                CatalogCache.invalidate()
                 return cursor.lastrowid
             except Exception as e:
                 print(f"Error adding category: {e}")
@@ -56,6 +44,7 @@ class Category:
                     WHERE id = ?
                 """, (name, description, category_id))
                 conn.commit()
+                CatalogCache.invalidate()
                 return True
             except Exception as e:
                 print(f"Error updating category: {e}")
@@ -87,6 +76,7 @@ class Category:
                     """, (category_id,))
                     
                     cursor.execute("COMMIT")
+                    CatalogCache.invalidate()
                     return True
                 except Exception as e:
                     cursor.execute("ROLLBACK")
@@ -115,6 +105,7 @@ class Category:
                     cursor.execute("DELETE FROM sqlite_sequence WHERE name='Categories'")
                     
                     cursor.execute("COMMIT")
+                    CatalogCache.invalidate()
                     return True
                 except Exception as e:
                     cursor.execute("ROLLBACK")
@@ -144,27 +135,4 @@ class Category:
                 return None
             finally:
                 conn.close()
-        return None
-
-    @staticmethod
-    def initialize_database():
-        conn = get_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                # Create Categories table if it doesn't exist
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS Categories (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        name TEXT NOT NULL UNIQUE,
-                        description TEXT
-                    )
-                """)
-                conn.commit()
-                return True
-            except Exception as e:
-                print(f"Error initializing Categories table: {e}")
-                return False
-            finally:
-                conn.close()
-        return False
\ No newline at end of file
+        return None
\ No newline at end of file
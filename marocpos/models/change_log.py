@@ -0,0 +1,132 @@
+from database import DatabaseManager, get_connection
+from migrations import CHANGE_LOG_TABLES as TRACKED_TABLES, get_schema_version
+import json
+import os
+
+
+class ChangeLog:
+    """Change data capture for the catalog, stock and sales tables.
+
+    Triggers created by migration 7 append one ChangeLog row (table, row
+    id, operation) per changed row, in the transaction that changed it.
+    Writes are serialized by SQLite, so sequence numbers grow in commit
+    order: a reader that saw sequence N will find every later change above
+    N. AUTOINCREMENT keeps numbers from being reused after prune().
+    """
+
+    @staticmethod
+    def current_sequence_with_cursor(cursor):
+        """Last sequence number handed out (0 when nothing was ever logged)"""
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'ChangeLog'")
+        row = cursor.fetchone()
+        return row['seq'] if row else 0
+
+    @staticmethod
+    def oldest_sequence_with_cursor(cursor):
+        """Smallest sequence still in the log, None when it is empty"""
+        cursor.execute("SELECT MIN(seq) as seq FROM ChangeLog")
+        return cursor.fetchone()['seq']
+
+    @staticmethod
+    def changed_rows_with_cursor(cursor, table, since, until):
+        """Rows of a tracked table changed in (since, until], in change order.
+
+        Each row is (row_id, row): several changes of one row are
+        collapsed into the last one, and row is None when the row no longer
+        exists (deleted).
+        """
+        if table not in TRACKED_TABLES:
+            raise ValueError(f"Table non suivie: {table}")
+        cursor.execute(f"""
+            SELECT c.seq, c.row_id, t.*
+            FROM (
+                SELECT row_id, MAX(seq) as seq
+                FROM ChangeLog
+                WHERE table_name = ? AND seq > ? AND seq <= ?
+                GROUP BY row_id
+            ) c
+            LEFT JOIN {table} t ON t.id = c.row_id
+            ORDER BY c.seq
+        """, (table, since, until))
+        while True:
+            rows = cursor.fetchmany(2000)
+            if not rows:
+                break
+            for row in rows:
+                del row['seq']
+                row_id = row.pop('row_id')
+                yield row_id, (row if row['id'] is not None else None)
+
+    @staticmethod
+    def prune(up_to):
+        """Delete the entries up to sequence up_to, once every consumer has them"""
+        conn = get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM ChangeLog WHERE seq <= ?", (up_to,))
+                conn.commit()
+                return cursor.rowcount
+            except Exception as e:
+                print(f"Error pruning change log: {e}")
+                conn.rollback()
+            finally:
+                conn.close()
+        return None
+
+
+class DeltaExporter:
+    """Export of the rows changed since a sequence number, as JSON Lines.
+
+    The first line is a header {"since", "until", "schema_version"}; each
+    following line is {"table", "id", "op", "row"} with op "upsert" (row is
+    the current row) or "delete" (row is null). Pass "until" as `since` of
+    the next export. The whole export reads one snapshot of the database.
+    """
+
+    def __init__(self, path, since=0, tables=TRACKED_TABLES):
+        self.path = path
+        self.since = since
+        self.tables = tables
+
+    def run(self, progress=None):
+        """Write the delta and return the header.
+
+        progress(done, total, table) is called before each table, and
+        once more with table None when the export is written.
+
+        Raises ValueError when changes after `since` were already pruned:
+        the consumer needs a full export first.
+        """
+        temp_path = f"{self.path}.tmp"
+        success = False
+        try:
+            # One transaction: every read below sees the same snapshot
+            with DatabaseManager.transaction() as conn, open(temp_path, 'w', encoding='utf-8') as output:
+                cursor = conn.cursor()
+                until = ChangeLog.current_sequence_with_cursor(cursor)
+                oldest = ChangeLog.oldest_sequence_with_cursor(cursor)
+                if self.since < until and (oldest is None or oldest > self.since + 1):
+                    raise ValueError(
+                        f"Les modifications après {self.since} ne sont plus disponibles, "
+                        "une exportation complète est nécessaire"
+                    )
+
+                header = {'since': self.since, 'until': until, 'schema_version': get_schema_version(conn)}
+                output.write(json.dumps(header) + '\n')
+                for done_tables, table in enumerate(self.tables):
+                    if progress:
+                        progress(done_tables, len(self.tables), table)
+                    changes = ChangeLog.changed_rows_with_cursor(cursor, table, self.since, until)
+                    for row_id, row in changes:
+                        line = {'table': table, 'id': row_id, 'op': 'upsert' if row else 'delete', 'row': row}
+                        output.write(json.dumps(line, ensure_ascii=False, separators=(',', ':'), default=str))
+                        output.write('\n')
+            os.replace(temp_path, self.path)
+            success = True
+        finally:
+            if not success and os.path.exists(temp_path):
+                os.remove(temp_path)
+        if progress:
+            progress(len(self.tables), len(self.tables), None)
+        return header
@@ -0,0 +1,133 @@
+from database import DatabaseManager
+from models.sales_rollup import SalesRollup
+from models.catalog_cache import CatalogCache
+from datetime import datetime
+import time
+
+
+class CheckoutService:
+    """Writes a sale in a single transaction on a single connection.
+
+    Header, lines, payments, stock decrements, stock movements and rollups
+    are committed together or not at all. Lines, payments, stock updates
+    and movements are each sent as one executemany() batch, so the number
+    of statements does not grow with the basket.
+    """
+
+    @staticmethod
+    def checkout(user_id, lines, payments, discount=0.0, tax_amount=0.0, customer_id=None, created_at=None):
+        """Record a sale and return (sale_id, timings).
+
+        lines: CartLine objects; payments: dicts with method_id, method_name,
+        amount and reference (as returned by MultiPaymentDialog).
+        timings maps each step to its duration in milliseconds.
+        Raises on error, after rolling back.
+        """
+        lines = [line for line in lines if line.quantity]
+        if not lines:
+            raise ValueError("Le panier est vide")
+
+        total_amount = sum(line.subtotal for line in lines)
+        final_total = total_amount + tax_amount - discount
+        if len(payments) > 1:
+            payment_method = "MULTIPLE"
+        elif payments:
+            payment_method = payments[0]['method_name']
+        else:
+            payment_method = "CASH"
+        created_at = created_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        timings = {}
+        started = time.perf_counter()
+        step_started = started
+
+        def step(name):
+            nonlocal step_started
+            now = time.perf_counter()
+            timings[name] = (now - step_started) * 1000
+            step_started = now
+
+        with DatabaseManager.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                # Take the write lock up front instead of on the first INSERT
+                cursor.execute("BEGIN IMMEDIATE")
+                step('begin')
+
+                cursor.execute("""
+                    INSERT INTO Sales (
+                        created_at, user_id, customer_id, total_amount,
+                        discount, tax_amount, final_total,
+                        payment_method, payment_status
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'COMPLETED')
+                """, (
+                    created_at, user_id, customer_id, total_amount,
+                    discount, tax_amount, final_total, payment_method
+                ))
+                sale_id = cursor.lastrowid
+                step('header')
+
+                # unit_cost is the purchase price at the time of sale (margin
+                # reports): the variant's own, else the product's
+                cursor.executemany("""
+                    INSERT INTO SaleItems (
+                        sale_id, product_id, variant_id, quantity,
+                        unit_price, unit_cost, subtotal, created_at
+                    ) VALUES (?, ?, ?, ?, ?, COALESCE(
+                        (SELECT purchase_price FROM ProductVariants WHERE id = ?),
+                        (SELECT purchase_price FROM Products WHERE id = ?),
+                        0
+                    ), ?, ?)
+                """, [
+                    (sale_id, line.product_id, line.variant_id, line.quantity,
+                     line.unit_price, line.variant_id, line.product_id, line.subtotal, created_at)
+                    for line in lines
+                ])
+                step('lines')
+
+                cursor.executemany("""
+                    INSERT INTO SalePayments (
+                        sale_id, payment_method_id, amount, reference, created_at
+                    ) VALUES (?, ?, ?, ?, ?)
+                """, [
+                    (sale_id, payment['method_id'], payment['amount'], payment.get('reference', ''), created_at)
+                    for payment in payments if payment['amount'] > 0
+                ])
+                step('payments')
+
+                # Variants carry their own stock; plain products use Products.stock
+                cursor.executemany("""
+                    UPDATE ProductVariants
+                    SET stock = stock - ?
+                    WHERE id = ?
+                """, [(line.quantity, line.variant_id) for line in lines if line.variant_id])
+                cursor.executemany("""
+                    UPDATE Products
+                    SET stock = stock - ?
+                    WHERE id = ?
+                """, [(line.quantity, line.product_id) for line in lines if not line.variant_id])
+                cursor.executemany("""
+                    INSERT INTO StockMovements (
+                        product_id, variant_id, movement_type, quantity,
+                        unit_price, reference, user_id, created_at
+                    ) VALUES (?, ?, 'sale', ?, ?, ?, ?, ?)
+                """, [
+                    (line.product_id, line.variant_id, line.quantity, line.unit_price,
+                     f"Vente #{sale_id}", user_id, created_at)
+                    for line in lines
+                ])
+                step('stock')
+
+                SalesRollup.record_sale(cursor, sale_id)
+                step('rollups')
+
+                cursor.execute("COMMIT")
+                step('commit')
+            except Exception:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+
+        timings['total'] = (time.perf_counter() - started) * 1000
+        CatalogCache.invalidate({line.product_id for line in lines})
+        return sale_id, timings
@@ -0,0 +1,120 @@
+from database import DatabaseManager
+from models.sales_report import NOT_VOIDED
+from datetime import datetime, timedelta
+import threading
+
+class DashboardMetrics:
+    """Every KPI shown on the dashboards, computed together from one read snapshot.
+
+    get() memoizes the result so all the cards of a refresh share the same
+    numbers; get(refresh=True) starts a new refresh cycle.
+    """
+
+    _cache = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get(refresh=False):
+        """Return the metrics of the current refresh cycle (None on error)"""
+        with DashboardMetrics._lock:
+            if refresh or DashboardMetrics._cache is None:
+                DashboardMetrics._cache = DashboardMetrics.compute()
+            return DashboardMetrics._cache
+
+    @staticmethod
+    def invalidate():
+        """Forget the memoized metrics; the next get() recomputes them"""
+        with DashboardMetrics._lock:
+            DashboardMetrics._cache = None
+
+    @staticmethod
+    def compute():
+        """Run the small batch of dashboard queries inside one read transaction"""
+        now = datetime.now()
+        today = now.strftime("%Y-%m-%d")
+        month_start = now.replace(day=1).strftime("%Y-%m-%d")
+        last_30_start = (now - timedelta(days=30)).strftime("%Y-%m-%d")
+        first_day = min(month_start, last_30_start)
+
+        try:
+            # All reads below see the same database snapshot
+            with DatabaseManager.transaction() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute("""
+                    SELECT
+                        COALESCE(SUM(CASE WHEN day = ? THEN total_sales END), 0) as today_sales,
+                        COALESCE(SUM(CASE WHEN day = ? THEN sale_count END), 0) as today_transactions,
+                        COALESCE(SUM(CASE WHEN day >= ? THEN total_sales END), 0) as month_sales,
+                        COALESCE(SUM(CASE WHEN day >= ? THEN sale_count END), 0) as month_transactions,
+                        COALESCE(SUM(CASE WHEN day >= ? THEN total_sales END), 0) as last_30_sales,
+                        COALESCE(SUM(CASE WHEN day >= ? THEN sale_count END), 0) as last_30_transactions
+                    FROM SalesHourlyRollup
+                    WHERE day BETWEEN ? AND ?
+                """, (today, today, month_start, month_start, last_30_start, last_30_start,
+                      first_day, today))
+                metrics = dict(cursor.fetchone())
+
+                cursor.execute("""
+                    SELECT
+                        COALESCE(SUM(CASE WHEN day = ? THEN quantity_sold END), 0) as today_items_sold,
+                        COALESCE(SUM(total_sales), 0) as last_30_revenue,
+                        COALESCE(SUM(total_cost), 0) as last_30_cost
+                    FROM ProductDailyRollup
+                    WHERE day BETWEEN ? AND ?
+                """, (today, last_30_start, today))
+                metrics.update(cursor.fetchone())
+
+                cursor.execute("""
+                    SELECT
+                        COUNT(*) as product_count,
+                        COALESCE(SUM(CASE WHEN stock <= min_stock THEN 1 ELSE 0 END), 0) as low_stock_count,
+                        COALESCE(SUM(purchase_price * stock), 0) + (
+                            SELECT COALESCE(SUM(
+                                (COALESCE(p.unit_price, 0) + COALESCE(pv.price_adjustment, 0)) * pv.stock
+                            ), 0)
+                            FROM ProductVariants pv
+                            JOIN Products p ON pv.product_id = p.id
+                            WHERE p.has_variants = 1
+                        ) as inventory_value
+                    FROM Products
+                """)
+                metrics.update(cursor.fetchone())
+
+                cursor.execute(f"""
+                    SELECT
+                        COUNT(*) as customer_count,
+                        COALESCE(SUM(total_spent), 0) as customer_revenue,
+                        COALESCE(MAX(total_spent), 0) as top_customer_value
+                    FROM (
+                        SELECT SUM(s.final_total) as total_spent
+                        FROM Sales s
+                        JOIN Customers c ON s.customer_id = c.id
+                        WHERE s.customer_id IS NOT NULL AND {NOT_VOIDED}
+                        GROUP BY c.id
+                    )
+                """)
+                metrics.update(cursor.fetchone())
+        except Exception as e:
+            print(f"Error computing dashboard metrics: {e}")
+            return None
+
+        # Derived values
+        metrics['today_avg_sale'] = (
+            metrics['today_sales'] / metrics['today_transactions']
+            if metrics['today_transactions'] else 0
+        )
+        metrics['last_30_avg_sale'] = (
+            metrics['last_30_sales'] / metrics['last_30_transactions']
+            if metrics['last_30_transactions'] else 0
+        )
+        metrics['last_30_margin_percentage'] = (
+            (metrics['last_30_revenue'] - metrics['last_30_cost']) / metrics['last_30_revenue'] * 100
+            if metrics['last_30_revenue'] else 0
+        )
+        metrics['average_per_customer'] = (
+            metrics['customer_revenue'] / metrics['customer_count']
+            if metrics['customer_count'] else 0
+        )
+        metrics['computed_at'] = now.strftime("%Y-%m-%d %H:%M:%S")
+        return metrics
@@ -1,74 +1,12 @@
 import sqlite3
 from datetime import datetime
 from database import get_connection
+from models.sales_report import NOT_VOIDED
 import json
 
 class Payment:
     """Class to manage payment methods and payment transactions"""
     
-    @staticmethod
-    def create_tables():
-        """Create the payment-related tables if they don't exist"""
-        conn = get_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                
-                # Create PaymentMethods table
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS PaymentMethods (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        name TEXT NOT NULL UNIQUE,
-                        code TEXT,
-                        is_active INTEGER DEFAULT 1,
-                        requires_reference INTEGER DEFAULT 0,
-                        reference_label TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                # Create SalePayments table to track payment details for sales
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS SalePayments (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        sale_id INTEGER NOT NULL,
-                        payment_method_id INTEGER,
-                        amount REAL NOT NULL,
-                        reference TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (sale_id) REFERENCES Sales(id) ON DELETE CASCADE,
-                        FOREIGN KEY (payment_method_id) REFERENCES PaymentMethods(id)
-                    )
-                """)
-                
-                # Check if default payment methods exist
-                cursor.execute("SELECT COUNT(*) as count FROM PaymentMethods")
-                result = cursor.fetchone()
-                
-                if result['count'] == 0:
-                    # Insert default payment methods
-                    default_methods = [
-                        ("Espèces", "CASH", 1, 0, ""),
-                        ("Carte", "CARD", 1, 1, "N° Transaction"),
-                        ("Chèque", "CHECK", 1, 1, "N° Chèque"),
-                        ("Virement", "TRANSFER", 1, 1, "Référence"),
-                        ("Crédit", "CREDIT", 1, 0, "")
-                    ]
-                    
-                    for method in default_methods:
-                        cursor.execute("""
-                            INSERT INTO PaymentMethods (name, code, is_active, requires_reference, reference_label)
-                            VALUES (?, ?, ?, ?, ?)
-                        """, method)
-                
-                conn.commit()
-                print("Payment tables created successfully")
-                
-            except Exception as e:
-                print(f"Error creating payment tables: {e}")
-            finally:
-                conn.close()
-    
     @staticmethod
     def get_all_payment_methods():
         """Get all payment methods"""
@@ -276,7 +214,7 @@ class Payment:
                 """
                 
                 params = []
-                where_clauses = []
+                where_clauses = [NOT_VOIDED]
                 
                 if start_date:
                     where_clauses.append("s.created_at >= ?")
@@ -0,0 +1,186 @@
+from database import get_connection
+import time
+
+# Job status values of the PrintJobs table
+PENDING = 'pending'
+PRINTING = 'printing'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class PrintQueue:
+    """Persistent queue of receipts to print (PrintJobs table).
+
+    Jobs survive a restart: a job left 'printing' by a crash goes back to
+    'pending' when the spooler starts. next_attempt_at is a Unix timestamp
+    used to delay retries.
+    """
+
+    @staticmethod
+    def enqueue(sale_id, kind, output_path=None):
+        """Add a receipt job ('thermal', 'a4' or 'pdf'); returns its id"""
+        conn = get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO PrintJobs (sale_id, kind, output_path, next_attempt_at)
+                    VALUES (?, ?, ?, ?)
+                """, (sale_id, kind, output_path, time.time()))
+                conn.commit()
+                return cursor.lastrowid
+            except Exception as e:
+                print(f"Error queueing print job: {e}")
+                return None
+            finally:
+                conn.close()
+        return None
+
+    @staticmethod
+    def claim_next():
+        """Mark the oldest due job as 'printing' and return it (None if nothing is due)"""
+        conn = get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.execute("""
+                    SELECT * FROM PrintJobs
+                    WHERE status = ? AND next_attempt_at <= ?
+                    ORDER BY next_attempt_at, id
+                    LIMIT 1
+                """, (PENDING, time.time()))
+                job = cursor.fetchone()
+                if job:
+                    cursor.execute("""
+                        UPDATE PrintJobs
+                        SET status = ?, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                    """, (PRINTING, job['id']))
+                    job['status'] = PRINTING
+                cursor.execute("COMMIT")
+                return job
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                print(f"Error claiming print job: {e}")
+                return None
+            finally:
+                conn.close()
+        return None
+
+    @staticmethod
+    def seconds_until_next():
+        """Delay before the next pending job is due (0 if one is due, None if none)"""
+        conn = get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT MIN(next_attempt_at) as next_attempt_at
+                    FROM PrintJobs
+                    WHERE status = ?
+                """, (PENDING,))
+                next_attempt_at = cursor.fetchone()['next_attempt_at']
+                if next_attempt_at is None:
+                    return None
+                return max(0.0, next_attempt_at - time.time())
+            except Exception as e:
+                print(f"Error reading print queue: {e}")
+                return None
+            finally:
+                conn.close()
+        return None
+
+    @staticmethod
+    def mark_done(job_id, output_path=None):
+        PrintQueue._update(job_id, """
+            UPDATE PrintJobs
+            SET status = ?, output_path = COALESCE(?, output_path),
+                last_error = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (DONE, output_path, job_id))
+
+    @staticmethod
+    def mark_retry(job_id, error, delay):
+        """Count a failed attempt and put the job back in the queue in `delay` seconds"""
+        PrintQueue._update(job_id, """
+            UPDATE PrintJobs
+            SET status = ?, attempts = attempts + 1, last_error = ?,
+                next_attempt_at = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (PENDING, error, time.time() + delay, job_id))
+
+    @staticmethod
+    def mark_failed(job_id, error):
+        PrintQueue._update(job_id, """
+            UPDATE PrintJobs
+            SET status = ?, attempts = attempts + 1, last_error = ?,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (FAILED, error, job_id))
+
+    @staticmethod
+    def retry(job_id):
+        """Queue a failed job again, now"""
+        PrintQueue._update(job_id, """
+            UPDATE PrintJobs
+            SET status = ?, attempts = 0, next_attempt_at = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = ?
+        """, (PENDING, time.time(), job_id, FAILED))
+
+    @staticmethod
+    def requeue_interrupted():
+        """Put back in the queue the jobs left 'printing' by a previous run"""
+        conn = get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    UPDATE PrintJobs
+                    SET status = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE status = ?
+                """, (PENDING, PRINTING))
+                conn.commit()
+                return cursor.rowcount
+            except Exception as e:
+                print(f"Error requeueing print jobs: {e}")
+                return 0
+            finally:
+                conn.close()
+        return 0
+
+    @staticmethod
+    def get_failed_jobs():
+        conn = get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT * FROM PrintJobs
+                    WHERE status = ?
+                    ORDER BY id DESC
+                """, (FAILED,))
+                return cursor.fetchall()
+            except Exception as e:
+                print(f"Error getting failed print jobs: {e}")
+                return []
+            finally:
+                conn.close()
+        return []
+
+    @staticmethod
+    def _update(job_id, query, params):
+        conn = get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                conn.commit()
+                return cursor.rowcount > 0
+            except Exception as e:
+                print(f"Error updating print job {job_id}: {e}")
+                return False
+            finally:
+                conn.close()
+        return False
@@ -1,8 +1,35 @@
-from database import get_connection
+from database import DatabaseManager, get_connection
+from models.catalog_cache import CatalogCache, VARIANT_QUERY
+from models.variant_index import VariantIndex, display_name
+from models.variant_codes import VariantCodeGenerator
+from models.product_search import ProductSearch
 from datetime import datetime, UTC
 import json
 import sqlite3
 
+# Products per variant query; each id is bound twice, under SQLite's 999 variable limit
+VARIANT_BATCH_SIZE = 400
+
+
+def decode_variant(variant):
+    """Decode the JSON attribute_values of a variant row in place and add
+    'attributes' and 'total_price_adjustment'; display_name falls back to one
+    built from the attributes for rows not yet indexed"""
+    attribute_values = variant.get('attribute_values')
+    if isinstance(attribute_values, str):
+        try:
+            attribute_values = json.loads(attribute_values)
+        except (ValueError, TypeError):
+            attribute_values = {}
+    variant['attribute_values'] = attribute_values or {}
+    variant['attributes'] = dict(attribute_values) if isinstance(attribute_values, dict) else {}
+    variant['price_extras'] = float(variant.get('price_extras') or 0)
+    variant['total_price_adjustment'] = variant['price_extras'] + float(variant.get('price_adjustment') or 0)
+    if not variant.get('display_name'):
+        variant['display_name'] = display_name(variant, attribute_values)
+    return variant
+
+
 class Product:
     def __init__(self, name, unit_price=0, purchase_price=0, stock=0, category_id=None):
         self.name = name
@@ -11,224 +38,22 @@ class Product:
         self.stock = stock or 0  # Convert None to 0
         self.category_id = category_id
 
-    @staticmethod
-    def create_tables():
-        conn = get_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                
-                # Update Products table with variant support
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS Products (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        barcode TEXT,
-                        name TEXT NOT NULL,
-                        description TEXT,
-                        unit_price REAL DEFAULT 0,
-                        purchase_price REAL DEFAULT 0,
-                        profit_margin REAL,
-                        stock INTEGER DEFAULT 0,
-                        min_stock INTEGER DEFAULT 0,
-                        reorder_point INTEGER,
-                        image_path TEXT,
-                        category_id INTEGER,
-                        unit TEXT DEFAULT 'pièce',
-                        weight REAL,
-                        volume REAL,
-                        status TEXT DEFAULT 'available',
-                        product_type TEXT DEFAULT 'stockable',
-                        valuation_method TEXT DEFAULT 'FIFO',
-                        has_variants BOOLEAN DEFAULT 0,
-                        variant_attributes TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (category_id) REFERENCES Categories(id)
-                    )
-                """)
-                
-                # Create ProductVariants table
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS ProductVariants (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        product_id INTEGER,
-                        attribute_values TEXT,
-                        price_adjustment REAL DEFAULT 0,
-                        stock INTEGER DEFAULT 0,
-                        barcode TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (product_id) REFERENCES Products(id)
-                    )
-                """)
-                
-                # Check if columns exist, add them if they don't
-                cursor.execute("PRAGMA table_info(Products)")
-                columns = {row['name'] for row in cursor.fetchall()}
-                
-                # Add has_variants column if it doesn't exist
-                if 'has_variants' not in columns:
-                    print("Adding 'has_variants' column to Products table...")
-                    cursor.execute("ALTER TABLE Products ADD COLUMN has_variants BOOLEAN DEFAULT 0")
-                
-                # Add variant_attributes column if it doesn't exist
-                if 'variant_attributes' not in columns:
-                    print("Adding 'variant_attributes' column to Products table...")
-                    cursor.execute("ALTER TABLE Products ADD COLUMN variant_attributes TEXT")
-                
-                conn.commit()
-            finally:
-                conn.close()
-
     @staticmethod
     def get_all_products():
-        conn = get_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                
-                # First check if the variant columns exist
-                cursor.execute("PRAGMA table_info(Products)")
-                columns = {row[1] for row in cursor.fetchall()}
-                
-                # Build query based on available columns
-                query = """
-                    SELECT 
-                        p.id, 
-                        p.name, 
-                        p.barcode,
-                        p.description,
-                        COALESCE(p.unit_price, 0) as unit_price, 
-                        COALESCE(p.purchase_price, 0) as purchase_price,
-                        p.profit_margin,
-                        COALESCE(p.stock, 0) as stock,
-                        p.min_stock,
-                        p.reorder_point,
-                        p.image_path,
-                        p.category_id,
-                        p.unit,
-                        p.weight,
-                        p.volume,
-                        COALESCE(p.status, 'available') as status,
-                        COALESCE(p.product_type, 'stockable') as product_type,
-                        COALESCE(p.valuation_method, 'FIFO') as valuation_method,
-                """
-                
-                # Add variant columns if they exist
-                if 'has_variants' in columns:
-                    query += "p.has_variants,"
-                else:
-                    query += "0 as has_variants,"
-                    
-                if 'variant_attributes' in columns:
-                    query += "p.variant_attributes,"
-                else:
-                    query += "NULL as variant_attributes,"
-                
-                query += """
-                        COALESCE(c.name, 'Non catégorisé') as category_name,
-                        p.created_at,
-                        p.updated_at
-                    FROM Products p
-                    LEFT JOIN Categories c ON p.category_id = c.id
-                    ORDER BY p.id DESC
-                """
-                
-                cursor.execute(query)
-                rows = cursor.fetchall()
-                # Convert the sqlite3.Row objects to dictionaries with .get() method
-                return [dict(row) for row in rows]
-            except Exception as e:
-                print(f"Error in get_all_products: {e}")
-                return []
-            finally:
-                conn.close()
-        return []
+        """All products, served from the in-memory catalog"""
+        return CatalogCache.get_all_products()
 
     @staticmethod
     def get_products_by_category(category_id=None):
-        conn = get_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                
-                # Check if variant columns exist
-                cursor.execute("PRAGMA table_info(Products)")
-                columns = {row[1] for row in cursor.fetchall()}
-                
-                # Build the base query
-                query = """
-                    SELECT 
-                        p.id, 
-                        p.name, 
-                        p.barcode,
-                        COALESCE(p.unit_price, 0) as unit_price, 
-                        COALESCE(p.stock, 0) as stock,
-                        p.image_path,
-                        p.category_id,
-                """
-                
-                # Add variant columns if they exist
-                if 'has_variants' in columns:
-                    query += "p.has_variants,"
-                else:
-                    query += "0 as has_variants,"
-                    
-                if 'variant_attributes' in columns:
-                    query += "p.variant_attributes,"
-                else:
-                    query += "NULL as variant_attributes,"
-                
-                query += """
-                        COALESCE(c.name, 'Non catégorisé') as category_name,
-                        p.description,
-                        COALESCE(p.purchase_price, 0) as purchase_price,
-                        COALESCE(p.min_stock, 0) as min_stock,
-                        p.unit,
-                        p.weight,
-                        p.volume,
-                        COALESCE(p.status, 'available') as status,
-                        COALESCE(p.product_type, 'stockable') as product_type,
-                        COALESCE(p.valuation_method, 'FIFO') as valuation_method
-                    FROM Products p
-                    LEFT JOIN Categories c ON p.category_id = c.id
-                """
-                
-                # Add category filter if provided
-                if category_id is not None:
-                    query += " WHERE p.category_id = ? "
-                    params = (category_id,)
-                else:
-                    params = ()
-                
-                query += " ORDER BY p.name"
-                
-                cursor.execute(query, params)
-
-                products = cursor.fetchall()
-                
-                # Process variant attributes if present
-                result = []
-                for product in products:
-                    # First convert Row to dict to ensure .get() method is available
-                    product_dict = dict(product)
-                    if product_dict.get('variant_attributes'):
-                        try:
-                            product_dict['variant_attributes'] = json.loads(product_dict['variant_attributes'])
-                        except:
-                            product_dict['variant_attributes'] = None
-                    result.append(product_dict)
-                
-                return result
-            except Exception as e:
-                print(f"Error getting products by category: {e}")
-                return []
-            finally:
-                conn.close()
-        return []
+        """Products of a category sorted by name, served from the in-memory catalog"""
+        result = []
+        for product_dict in CatalogCache.get_products_by_category(category_id):
+            product_dict['min_stock'] = product_dict.get('min_stock') or 0
+            result.append(CatalogCache.decode_variant_attributes(product_dict))
+        return result
 
     @staticmethod
-    def add_variant(product_id, attribute_values, price_adjustment=0, stock=0, barcode=None):
+    def add_variant(product_id, attribute_values, price_adjustment=0, stock=0, barcode=None, name='', sku=None):
         conn = get_connection()
         if conn:
             try:
@@ -240,13 +65,15 @@ class Product:
                 
                 cursor.execute("""
                     INSERT INTO ProductVariants (
-                        product_id, attribute_values, price_adjustment,
-                        stock, barcode
-                    ) VALUES (?, ?, ?, ?, ?)
-                """, (product_id, attribute_values, price_adjustment, stock, barcode))
+                        product_id, name, attribute_values, price_adjustment,
+                        stock, barcode, sku
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (product_id, name or '', attribute_values, price_adjustment, stock, barcode, sku))
                 
                 variant_id = cursor.lastrowid
+                VariantIndex.refresh(cursor, [variant_id])
                 conn.commit()
+                CatalogCache.invalidate([product_id])
                 return variant_id
             except Exception as e:
                 print(f"Error adding variant: {e}")
@@ -255,88 +82,181 @@ class Product:
                 conn.close()
         return None
 
+    @staticmethod
+    def add_variants_bulk(product_id, variants, user_id=None):
+        """Create many variants of a product in one transaction; returns their ids.
+
+        variants: dicts with name, sku, barcode, price, purchase_price, stock,
+        price_adjustment, attribute_values (dict or JSON) and optionally
+        attribute_value_ids (template value ids), as from the variant dialog.
+        Raises on error, after rolling back (unless joining the caller's transaction).
+        """
+        with DatabaseManager.transaction(immediate=True) as conn:
+            cursor = conn.cursor()
+            variant_ids = Product._insert_variants(cursor, product_id, variants, user_id)
+            cursor.execute("""
+                UPDATE Products
+                SET has_variants = 1, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (product_id,))
+        CatalogCache.invalidate([product_id])
+        return variant_ids
+
+    @staticmethod
+    def _insert_variants(cursor, product_id, variants, user_id=None, created_at=None, taken=None):
+        """Insert variants, their combination links and opening stock with the
+        caller's cursor (inside its transaction); returns the new variant ids.
+
+        taken: set of the SKUs and barcodes already in use, read from the
+        database when None; callers inserting for many products pass one set.
+        """
+        variants = list(variants)
+        if not variants:
+            return []
+        created_at = created_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        cursor.execute("SELECT name, unit_price, purchase_price FROM Products WHERE id = ?", (product_id,))
+        product = cursor.fetchone()
+        if not product:
+            raise ValueError(f"Produit #{product_id} introuvable")
+
+        # Codes already used, so generated SKUs and barcodes never collide
+        if taken is None:
+            taken = Product.taken_codes(cursor)
+        codes = VariantCodeGenerator(product_id, product['name'], taken)
+
+        # Template values of the product's attribute lines, to link combinations
+        cursor.execute("""
+            SELECT a.name as attribute_name, pav.value, ptav.id as template_value_id
+            FROM ProductTemplateAttributeLine pal
+            JOIN ProductAttributes a ON pal.attribute_id = a.id
+            JOIN ProductTemplateAttributeValue ptav ON ptav.line_id = pal.id
+            JOIN ProductAttributeValues pav ON ptav.value_id = pav.id
+            WHERE pal.product_id = ?
+        """, (product_id,))
+        template_values = {(row['attribute_name'], row['value']): row['template_value_id'] for row in cursor.fetchall()}
+
+        rows = []
+        for variant in variants:
+            attributes = variant.get('attribute_values') or variant.get('attributes') or {}
+            if isinstance(attributes, str):
+                try:
+                    attributes = json.loads(attributes)
+                except ValueError:
+                    attributes = {}
+            barcode = (variant.get('barcode') or '').strip()
+            if barcode and not codes.claim(barcode):
+                raise ValueError(f"Code-barres déjà utilisé: {barcode}")
+            rows.append((
+                product_id,
+                variant.get('name') or '',
+                barcode or codes.barcode(),
+                variant.get('price') or product['unit_price'],
+                variant.get('purchase_price') or product['purchase_price'],
+                variant.get('price_adjustment') or 0,
+                int(variant.get('stock') or 0),
+                json.dumps(attributes),
+                codes.sku(attributes, (variant.get('sku') or '').strip()),
+                created_at,
+                created_at
+            ))
+
+        # Rows inserted under the write lock get consecutive ids after the current maximum
+        cursor.execute("SELECT COALESCE(MAX(id), 0) as last_id FROM ProductVariants")
+        last_id = cursor.fetchone()['last_id']
+        with ProductSearch.bulk_variant_insert(cursor, [product_id]):
+            cursor.executemany("""
+                INSERT INTO ProductVariants (
+                    product_id, name, barcode, unit_price, purchase_price,
+                    price_adjustment, stock, attribute_values, sku,
+                    created_at, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+        cursor.execute("SELECT id FROM ProductVariants WHERE id > ? ORDER BY id", (last_id,))
+        variant_ids = [row['id'] for row in cursor.fetchall()]
+
+        links = []
+        for variant_id, variant, row in zip(variant_ids, variants, rows):
+            template_value_ids = variant.get('attribute_value_ids')
+            if template_value_ids is None:
+                attributes = json.loads(row[7])
+                template_value_ids = [
+                    template_values[(name, value)] for name, value in attributes.items()
+                    if (name, value) in template_values
+                ]
+            links.extend((product_id, variant_id, template_value_id) for template_value_id in template_value_ids)
+        cursor.executemany("""
+            INSERT OR IGNORE INTO ProductVariantCombination (
+                product_id, product_variant_id, template_attribute_value_id, created_at
+            ) VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        """, links)
+
+        cursor.executemany("""
+            INSERT INTO StockMovements (
+                product_id, variant_id, movement_type, quantity,
+                unit_price, reference, user_id, created_at
+            ) VALUES (?, ?, 'adjustment_in', ?, ?, 'Stock initial', ?, ?)
+        """, [
+            (product_id, variant_id, row[6], row[4], user_id, created_at)
+            for variant_id, row in zip(variant_ids, rows) if row[6] > 0
+        ])
+
+        VariantIndex.refresh(cursor, variant_ids)
+        return variant_ids
+
+    @staticmethod
+    def taken_codes(cursor):
+        """Set of the variant SKUs and barcodes and product barcodes in use"""
+        cursor.execute("""
+            SELECT sku as code FROM ProductVariants WHERE sku IS NOT NULL AND sku != ''
+            UNION SELECT barcode FROM ProductVariants WHERE barcode IS NOT NULL AND barcode != ''
+            UNION SELECT barcode FROM Products WHERE barcode IS NOT NULL AND barcode != ''
+        """)
+        return {row['code'] for row in cursor.fetchall()}
+
     @staticmethod
     def get_variants(product_id):
+        """Variants of one product (see get_variants_bulk)"""
+        return Product.get_variants_bulk([product_id]).get(product_id, [])
+
+    @staticmethod
+    def get_variants_bulk(product_ids=None):
+        """Variants of several products (all products if None), as {product_id: [variant]}.
+
+        Variants and the sum of their attribute price extras come from one
+        query per VARIANT_BATCH_SIZE products. Each variant has its
+        attribute_values decoded (also copied to 'attributes'), a
+        total_price_adjustment and a display_name.
+        """
+        if product_ids is None:
+            batches = [None]
+        else:
+            ids = list(dict.fromkeys(product_ids))
+            batches = [ids[i:i + VARIANT_BATCH_SIZE] for i in range(0, len(ids), VARIANT_BATCH_SIZE)]
+
+        result = {}
         conn = get_connection()
         if conn:
             try:
                 cursor = conn.cursor()
-                
-                # First get the variants basic data
-                cursor.execute("""
-                    SELECT *
-                    FROM ProductVariants
-                    WHERE product_id = ?
-                    ORDER BY id
-                """, (product_id,))
-                variants = cursor.fetchall()
-                
-                # Convert variants to a more robust format
-                result = []
-                for variant in variants:
-                    variant_dict = dict(variant)
-                    
-                    # Handle attribute_values with better error protection
-                    if variant_dict.get('attribute_values'):
-                        try:
-                            if isinstance(variant_dict['attribute_values'], str):
-                                parsed_values = json.loads(variant_dict['attribute_values'])
-                                # Store in both attribute_values and attributes for compatibility
-                                variant_dict['attribute_values'] = parsed_values
-                                variant_dict['attributes'] = parsed_values.copy() if isinstance(parsed_values, dict) else {}
-                            else:
-                                # If it's already a dict/object, make sure we have it in both places
-                                variant_dict['attributes'] = variant_dict['attribute_values'].copy() if isinstance(variant_dict['attribute_values'], dict) else {}
-                        except Exception as e:
-                            print(f"Error parsing variant attributes: {e}")
-                            # Provide empty dictionaries as fallback
-                            variant_dict['attribute_values'] = {}
-                            variant_dict['attributes'] = {}
+                for batch in batches:
+                    if batch is None:
+                        cursor.execute(VARIANT_QUERY.format(where="", where_variants=""))
                     else:
-                        # Ensure both attribute keys exist even if empty
-                        variant_dict['attribute_values'] = {}
-                        variant_dict['attributes'] = {}
-                    
-                    # Compute total price adjustment from attribute combinations
-                    try:
-                        # Get the template attribute values for this variant
-                        cursor.execute("""
-                            SELECT ptav.price_extra
-                            FROM ProductVariantCombination pvc
-                            JOIN ProductTemplateAttributeValue ptav ON pvc.template_attribute_value_id = ptav.id
-                            WHERE pvc.product_variant_id = ?
-                        """, (variant_dict['id'],))
-                        
-                        # Sum up all price extras
-                        price_extras = cursor.fetchall()
-                        total_price_extra = sum(float(extra['price_extra'] or 0) for extra in price_extras)
-                        
-                        # Add in any explicit price_adjustment for the variant 
-                        base_adj = float(variant_dict.get('price_adjustment') or 0)
-                        
-                        # Store both values
-                        variant_dict['price_extras'] = total_price_extra
-                        variant_dict['total_price_adjustment'] = total_price_extra + base_adj
-                        
-                        print(f"Variant {variant_dict['id']} - Total price adjustment: {variant_dict['total_price_adjustment']} ({base_adj} variant, {total_price_extra} attributes)")
-                        
-                    except Exception as e:
-                        print(f"Error calculating price adjustment for variant {variant_dict['id']}: {e}")
-                        # Use just the base adjustment as fallback
-                        variant_dict['total_price_adjustment'] = float(variant_dict.get('price_adjustment') or 0)
-                        
-                    # Add explicit debugging output
-                    print(f"Returning variant: {variant_dict['id']}, attributes: {variant_dict.get('attributes')}, price_adjustment: {variant_dict.get('total_price_adjustment')}")
-                    
-                    result.append(variant_dict)
-                
+                        placeholders = ", ".join("?" for _ in batch)
+                        cursor.execute(VARIANT_QUERY.format(
+                            where=f"WHERE pvc.product_id IN ({placeholders})",
+                            where_variants=f"WHERE pv.product_id IN ({placeholders})"
+                        ), batch + batch)
+                    for variant in cursor.fetchall():
+                        result.setdefault(variant['product_id'], []).append(decode_variant(variant))
                 return result
             except Exception as e:
                 print(f"Error getting variants: {e}")
-                return []
+                return {}
             finally:
                 conn.close()
-        return []
+        return {}
 
     @staticmethod
     def get_stock_movements(product_id, variant_id=None):
@@ -382,14 +302,10 @@ class Product:
     @staticmethod 
     def add_stock_movement(product_id, variant_id, movement_type, quantity, unit_price, reference, notes, user_id):
         """Add a stock movement record"""
-        conn = get_connection()
-        if conn:
-            try:
+        try:
+            with DatabaseManager.transaction() as conn:
                 cursor = conn.cursor()
                 
-                # Start a transaction
-                cursor.execute("BEGIN TRANSACTION")
-                
                 # Insert movement record
                 cursor.execute("""
                     INSERT INTO StockMovements (
@@ -420,28 +336,19 @@ class Product:
                             updated_at = CURRENT_TIMESTAMP
                         WHERE id = ?
                     """, (quantity, product_id))
-                
-                cursor.execute("COMMIT")
-                return movement_id
-            except Exception as e:
-                cursor.execute("ROLLBACK")
-                print(f"Error adding stock movement: {e}")
-                return None
-            finally:
-                conn.close()
-        return None
+        except Exception as e:
+            print(f"Error adding stock movement: {e}")
+            return None
+        CatalogCache.invalidate([product_id])
+        return movement_id
     
     @staticmethod
     def delete_stock_movement(movement_id):
         """Delete a stock movement and revert its effects"""
-        conn = get_connection()
-        if conn:
-            try:
+        try:
+            with DatabaseManager.transaction() as conn:
                 cursor = conn.cursor()
                 
-                # Start a transaction
-                cursor.execute("BEGIN TRANSACTION")
-                
                 # Get the movement details
                 cursor.execute("""
                     SELECT product_id, variant_id, quantity
@@ -451,7 +358,6 @@ class Product:
                 
                 movement = cursor.fetchone()
                 if not movement:
-                    cursor.execute("ROLLBACK")
                     return False
                 
                 product_id = movement['product_id']
@@ -476,16 +382,11 @@ class Product:
                 
                 # Delete the movement record
                 cursor.execute("DELETE FROM StockMovements WHERE id = ?", (movement_id,))
-                
-                cursor.execute("COMMIT")
-                return True
-            except Exception as e:
-                cursor.execute("ROLLBACK")
-                print(f"Error deleting stock movement: {e}")
-                return False
-            finally:
-                conn.close()
-        return False
+        except Exception as e:
+            print(f"Error deleting stock movement: {e}")
+            return False
+        CatalogCache.invalidate([product_id])
+        return True
         
     @staticmethod
     def update_variant(variant_id, **kwargs):
@@ -517,7 +418,13 @@ class Product:
                 """
                 
                 cursor.execute(query, values)
+                if {'name', 'attribute_values', 'attributes'} & kwargs.keys():
+                    VariantIndex.refresh(cursor, [variant_id])
                 conn.commit()
+                
+                cursor.execute("SELECT product_id FROM ProductVariants WHERE id = ?", (variant_id,))
+                variant = cursor.fetchone()
+                CatalogCache.invalidate([variant['product_id']] if variant else None)
                 return True
             except Exception as e:
                 print(f"Error updating variant: {e}")
@@ -528,11 +435,9 @@ class Product:
 
     @staticmethod
     def add_product(name, unit_price=0, purchase_price=0, stock=0, category_id=None, has_variants=False, variant_attributes=None, variants=None, **kwargs):
-        conn = get_connection()
-        if conn:
-            try:
+        try:
+            with DatabaseManager.transaction() as conn:
                 cursor = conn.cursor()
-                cursor.execute("BEGIN TRANSACTION")
                 
                 # Prepare fields and values
                 fields = ['name', 'unit_price', 'purchase_price', 'stock', 'category_id', 'has_variants']
@@ -600,41 +505,12 @@ class Product:
                 
                 # Add variants if provided
                 if has_variants and variants:
-                    for variant in variants:
-                        # Calculate variant price
-                        variant_price = variant.get('price', unit_price)
-                        
-                        # Prepare variant insert query
-                        cursor.execute("""
-                            INSERT INTO ProductVariants (
-                                product_id, name, barcode, unit_price, 
-                                purchase_price, stock, attributes, sku,
-                                created_at, updated_at
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (
-                            product_id,
-                            variant.get('name', ''),
-                            variant.get('barcode', ''),
-                            variant_price,
-                            variant.get('purchase_price', purchase_price),
-                            variant.get('stock', 0),
-                            variant.get('attribute_values', '{}'),
-                            variant.get('sku', ''),
-                            current_time,
-                            current_time
-                        ))
-                
-                # Commit transaction
-                cursor.execute("COMMIT")
-                return product_id
-                
-            except Exception as e:
-                cursor.execute("ROLLBACK")
-                print(f"Error adding product: {e}")
-                return None
-            finally:
-                conn.close()
-        return None
+                    Product._insert_variants(cursor, product_id, variants, created_at=current_time)
+        except Exception as e:
+            print(f"Error adding product: {e}")
+            return None
+        CatalogCache.invalidate([product_id])
+        return product_id
 
     @staticmethod
     def update_product(product_id, **kwargs):
@@ -687,6 +563,7 @@ class Product:
                 
                 cursor.execute(query, values)
                 conn.commit()
+                CatalogCache.invalidate([product_id])
                 return True
             except Exception as e:
                 print(f"Error updating product: {e}")
@@ -697,12 +574,9 @@ class Product:
 
     @staticmethod
     def delete_product(product_id):
-        conn = get_connection()
-        if conn:
-            try:
+        try:
+            with DatabaseManager.transaction() as conn:
                 cursor = conn.cursor()
-                # Begin transaction
-                cursor.execute("BEGIN TRANSACTION")
                 
                 # Delete related records first
                 cursor.execute("DELETE FROM ProductVariants WHERE product_id = ?", (product_id,))
@@ -721,24 +595,17 @@ class Product:
                 
                 # Delete the product
                 cursor.execute("DELETE FROM Products WHERE id = ?", (product_id,))
-                
-                cursor.execute("COMMIT")
-                return True
-            except Exception as e:
-                cursor.execute("ROLLBACK")
-                print(f"Error deleting product: {e}")
-                return False
-            finally:
-                conn.close()
-        return False
+        except Exception as e:
+            print(f"Error deleting product: {e}")
+            return False
+        CatalogCache.invalidate([product_id])
+        return True
 
     @staticmethod
     def update_stock(product_id, quantity, movement_type='adjustment', reference=None, user_id=None):
-        conn = get_connection()
-        if conn:
-            try:
+        try:
+            with DatabaseManager.transaction() as conn:
                 cursor = conn.cursor()
-                cursor.execute("BEGIN TRANSACTION")
 
                 # Get current stock and min_stock
                 cursor.execute("""
@@ -771,22 +638,17 @@ class Product:
                     """, (product_id, quantity, movement_type, reference, user_id))
                 except sqlite3.OperationalError:
                     pass  # StockMovements table might not exist
-
-                cursor.execute("COMMIT")
-                
-                # Check if stock is below minimum
-                if new_stock <= product['min_stock']:
-                    # Could trigger notifications or automatic reordering here
-                    print(f"Warning: Product {product_id} stock is below minimum!")
-                
-                return True
-            except Exception as e:
-                cursor.execute("ROLLBACK")
-                print(f"Error updating stock: {e}")
-                return False
-            finally:
-                conn.close()
-        return False
+        except Exception as e:
+            print(f"Error updating stock: {e}")
+            return False
+        CatalogCache.invalidate([product_id])
+        
+        # Check if stock is below minimum
+        if new_stock <= product['min_stock']:
+            # Could trigger notifications or automatic reordering here
+            print(f"Warning: Product {product_id} stock is below minimum!")
+        
+        return True
 
     @staticmethod
     def get_product(product_id):
@@ -808,30 +670,10 @@ class Product:
         return None
 
     @staticmethod
-    def search_products(query):
-        conn = get_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT 
-                        p.id, 
-                        p.name, 
-                        p.barcode,
-                        COALESCE(p.unit_price, 0) as unit_price, 
-                        COALESCE(p.stock, 0) as stock,
-                        p.image_path,
-                        p.category_id,
-                        COALESCE(c.name, 'Non catégorisé') as category_name
-                    FROM Products p
-                    LEFT JOIN Categories c ON p.category_id = c.id
-                    WHERE p.name LIKE ? OR p.barcode LIKE ?
-                    ORDER BY p.name
-                """, (f"%{query}%", f"%{query}%"))
-                return cursor.fetchall()
-            finally:
-                conn.close()
-        return []
+    def search_products(query, limit=50, offset=0):
+        """Ranked full-text search on name, description, barcode, category and variants"""
+        from models.product_search import ProductSearch
+        return ProductSearch.search(query, limit, offset)
 
     @staticmethod
     def get_product_suppliers(product_id):
@@ -880,6 +722,7 @@ class Product:
                         OR valuation_method IS NULL
                 """)
                 conn.commit()
+                CatalogCache.invalidate()
                 return True
             except Exception as e:
                 print(f"Error cleaning up database: {e}")
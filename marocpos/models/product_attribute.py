@@ -1,6 +1,10 @@
 from database import get_connection
+from models.variant_index import VariantIndex
+from models.catalog_cache import CatalogCache
 from datetime import datetime, UTC
+import itertools
 import json
+import math
 
 class ProductAttribute:
     def __init__(self, name, description=None, display_type='radio'):
@@ -8,122 +12,6 @@ class ProductAttribute:
         self.description = description
         self.display_type = display_type  # radio, select, color, pills
 
-    @staticmethod
-    def create_tables():
-        """Ensure the attribute and variant tables exist"""
-        conn = get_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                
-                # Create ProductAttributes table
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS ProductAttributes (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        name TEXT NOT NULL UNIQUE,
-                        description TEXT,
-                        display_type TEXT DEFAULT 'radio' CHECK(display_type IN ('radio', 'select', 'color', 'pills')),
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                # Create ProductAttributeValues table
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS ProductAttributeValues (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        attribute_id INTEGER NOT NULL,
-                        value TEXT NOT NULL,
-                        sequence INTEGER DEFAULT 0,
-                        html_color TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (attribute_id) REFERENCES ProductAttributes(id) ON DELETE CASCADE,
-                        UNIQUE(attribute_id, value)
-                    )
-                """)
-                
-                # Create ProductTemplateAttributeLine table
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS ProductTemplateAttributeLine (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        product_id INTEGER NOT NULL,
-                        attribute_id INTEGER NOT NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (product_id) REFERENCES Products(id) ON DELETE CASCADE,
-                        FOREIGN KEY (attribute_id) REFERENCES ProductAttributes(id) ON DELETE CASCADE,
-                        UNIQUE(product_id, attribute_id)
-                    )
-                """)
-                
-                # Create ProductTemplateAttributeValue table
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS ProductTemplateAttributeValue (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        line_id INTEGER NOT NULL,
-                        value_id INTEGER NOT NULL,
-                        price_extra REAL DEFAULT 0,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (line_id) REFERENCES ProductTemplateAttributeLine(id) ON DELETE CASCADE,
-                        FOREIGN KEY (value_id) REFERENCES ProductAttributeValues(id) ON DELETE CASCADE,
-                        UNIQUE(line_id, value_id)
-                    )
-                """)
-                
-                # Create ProductVariantCombination table
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS ProductVariantCombination (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        product_id INTEGER NOT NULL,
-                        product_variant_id INTEGER NOT NULL,
-                        template_attribute_value_id INTEGER NOT NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (product_id) REFERENCES Products(id) ON DELETE CASCADE,
-                        FOREIGN KEY (product_variant_id) REFERENCES ProductVariants(id) ON DELETE CASCADE,
-                        FOREIGN KEY (template_attribute_value_id) REFERENCES ProductTemplateAttributeValue(id) ON DELETE CASCADE,
-                        UNIQUE(product_variant_id, template_attribute_value_id)
-                    )
-                """)
-                
-                # Check if we need to add display_type to existing ProductAttributes table
-                cursor.execute("PRAGMA table_info(ProductAttributes)")
-                columns = [row['name'] for row in cursor.fetchall()]
-                
-                if 'display_type' not in columns:
-                    print("Adding display_type column to ProductAttributes table...")
-                    cursor.execute("ALTER TABLE ProductAttributes ADD COLUMN display_type TEXT DEFAULT 'radio'")
-                
-                if 'updated_at' not in columns:
-                    print("Adding updated_at column to ProductAttributes table...")
-                    cursor.execute("ALTER TABLE ProductAttributes ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
-                
-                # Check if we need to add sequence and html_color to existing ProductAttributeValues table
-                cursor.execute("PRAGMA table_info(ProductAttributeValues)")
-                columns = [row['name'] for row in cursor.fetchall()]
-                
-                if 'sequence' not in columns:
-                    print("Adding sequence column to ProductAttributeValues table...")
-                    cursor.execute("ALTER TABLE ProductAttributeValues ADD COLUMN sequence INTEGER DEFAULT 0")
-                
-                if 'html_color' not in columns:
-                    print("Adding html_color column to ProductAttributeValues table...")
-                    cursor.execute("ALTER TABLE ProductAttributeValues ADD COLUMN html_color TEXT")
-                
-                if 'updated_at' not in columns:
-                    print("Adding updated_at column to ProductAttributeValues table...")
-                    cursor.execute("ALTER TABLE ProductAttributeValues ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
-                
-                conn.commit()
-                return True
-            except Exception as e:
-                print(f"Error creating attribute tables: {e}")
-                return False
-            finally:
-                conn.close()
-        return False
-
     @staticmethod
     def get_all_attributes():
         """Get all product attributes"""
@@ -324,9 +212,20 @@ class ProductAttribute:
         if conn:
             try:
                 cursor = conn.cursor()
+                # Products whose variants may carry this value (and its price extra)
+                cursor.execute("""
+                    SELECT DISTINCT pal.product_id
+                    FROM ProductTemplateAttributeValue ptav
+                    JOIN ProductTemplateAttributeLine pal ON ptav.line_id = pal.id
+                    WHERE ptav.value_id = ?
+                """, (value_id,))
+                product_ids = [row['product_id'] for row in cursor.fetchall()]
                 cursor.execute("DELETE FROM ProductAttributeValues WHERE id = ?", (value_id,))
+                deleted = cursor.rowcount > 0
                 conn.commit()
-                return cursor.rowcount > 0
+                if product_ids:
+                    CatalogCache.invalidate(product_ids)
+                return deleted
             except Exception as e:
                 print(f"Error deleting attribute value: {e}")
                 return False
@@ -382,6 +281,10 @@ class ProductAttribute:
             try:
                 cursor = conn.cursor()
                 
+                cursor.execute("SELECT product_id FROM ProductTemplateAttributeLine WHERE id = ?", (line_id,))
+                line = cursor.fetchone()
+                product_ids = [line['product_id']] if line else []
+                
                 # Check if value is already associated
                 cursor.execute("""
                     SELECT id FROM ProductTemplateAttributeValue 
@@ -394,9 +297,10 @@ class ProductAttribute:
                         UPDATE ProductTemplateAttributeValue
                         SET price_extra = ?, updated_at = CURRENT_TIMESTAMP
                         WHERE id = ?
-                    """, (price_extra, existing[0]))
+                    """, (price_extra, existing['id']))
                     conn.commit()
-                    return existing[0]
+                    CatalogCache.invalidate(product_ids)
+                    return existing['id']
                 
                 # Get current timestamp
                 try:
@@ -413,6 +317,7 @@ class ProductAttribute:
                 
                 template_value_id = cursor.lastrowid
                 conn.commit()
+                CatalogCache.invalidate(product_ids)
                 return template_value_id
             except Exception as e:
                 print(f"Error adding attribute value to line: {e}")
@@ -423,47 +328,53 @@ class ProductAttribute:
     
     @staticmethod
     def get_product_attribute_lines(product_id):
-        """Get all attribute lines for a product with their values"""
+        """Get all attribute lines for a product with their values (one query)"""
         conn = get_connection()
         if conn:
             try:
                 cursor = conn.cursor()
-                
-                # Get attribute lines
                 cursor.execute("""
                     SELECT 
                         pal.id as line_id, 
                         pal.attribute_id,
                         a.name as attribute_name,
-                        a.display_type
+                        a.display_type,
+                        ptav.id as template_value_id,
+                        ptav.value_id,
+                        ptav.price_extra,
+                        pav.value,
+                        pav.sequence,
+                        pav.html_color
                     FROM ProductTemplateAttributeLine pal
                     JOIN ProductAttributes a ON pal.attribute_id = a.id
+                    LEFT JOIN ProductTemplateAttributeValue ptav ON ptav.line_id = pal.id
+                    LEFT JOIN ProductAttributeValues pav ON ptav.value_id = pav.id
                     WHERE pal.product_id = ?
+                    ORDER BY pal.id, pav.sequence, pav.value
                 """, (product_id,))
                 
-                lines = []
-                for line in cursor.fetchall():
-                    line_dict = dict(line)
-                    
-                    # Get values for this line
-                    cursor.execute("""
-                        SELECT 
-                            ptav.id as template_value_id,
-                            ptav.value_id,
-                            ptav.price_extra,
-                            pav.value,
-                            pav.sequence,
-                            pav.html_color
-                        FROM ProductTemplateAttributeValue ptav
-                        JOIN ProductAttributeValues pav ON ptav.value_id = pav.id
-                        WHERE ptav.line_id = ?
-                        ORDER BY pav.sequence, pav.value
-                    """, (line_dict['line_id'],))
-                    
-                    line_dict['values'] = [dict(value) for value in cursor.fetchall()]
-                    lines.append(line_dict)
-                
-                return lines
+                lines = {}
+                for row in cursor.fetchall():
+                    line = lines.get(row['line_id'])
+                    if line is None:
+                        line = lines[row['line_id']] = {
+                            'line_id': row['line_id'],
+                            'attribute_id': row['attribute_id'],
+                            'attribute_name': row['attribute_name'],
+                            'display_type': row['display_type'],
+                            'values': []
+                        }
+                    if row['template_value_id'] is not None:
+                        line['values'].append({
+                            'template_value_id': row['template_value_id'],
+                            'value_id': row['value_id'],
+                            'price_extra': row['price_extra'],
+                            'value': row['value'],
+                            'sequence': row['sequence'],
+                            'html_color': row['html_color']
+                        })
+                
+                return list(lines.values())
             except Exception as e:
                 print(f"Error getting product attribute lines: {e}")
                 return []
@@ -504,7 +415,9 @@ class ProductAttribute:
                             ) VALUES (?, ?, ?, CURRENT_TIMESTAMP)
                         """, (product_id, variant_id, template_value_id))
                 
+                VariantIndex.refresh(cursor, [variant_id])
                 cursor.execute("COMMIT")
+                CatalogCache.invalidate([product_id])
                 return True
             except Exception as e:
                 cursor.execute("ROLLBACK")
@@ -515,7 +428,74 @@ class ProductAttribute:
         return False
     
     @staticmethod
-    def generate_variant_combinations(product_id_or_attributes):
+    def count_combinations(attributes_values):
+        """Number of combinations of a {attribute: [values]} dict, before exclusions"""
+        return math.prod(len(values) for values in attributes_values.values()) if attributes_values else 0
+
+    @staticmethod
+    def iter_combinations(attributes_values, limit=None, exclude=None):
+        """
+        Lazily yield the combinations of attribute values, in order
+        
+        Args:
+            attributes_values: A dict where keys are attribute names and values are lists of values
+                e.g. {'Color': ['Red', 'Blue'], 'Size': ['S', 'M', 'L']}
+            limit: Stop after this many combinations (None for all)
+            exclude: Rules as {attribute: value} dicts; a combination matching
+                every pair of a rule is skipped, e.g. [{'Color': 'Red', 'Size': 'S'}]
+        
+        Yields:
+            {attribute: value} dicts
+        """
+        names = list(attributes_values.keys())
+        if not names:
+            return
+        positions = {name: index for index, name in enumerate(names)}
+        rules = [
+            tuple((positions[name], value) for name, value in rule.items())
+            for rule in (exclude or []) if all(name in positions for name in rule)
+        ]
+        
+        produced = 0
+        for values in itertools.product(*attributes_values.values()):
+            if rules and any(all(values[index] == value for index, value in rule) for rule in rules):
+                continue
+            yield dict(zip(names, values))
+            produced += 1
+            if limit is not None and produced >= limit:
+                return
+
+    @staticmethod
+    def iter_variant_combinations(product_id, limit=None, exclude=None):
+        """
+        Lazily yield the variant combinations of a product's attribute lines
+        
+        Same limit and exclude arguments as iter_combinations. Yields dicts
+        with attribute_value_ids (template value ids), price_extra and
+        attributes ({attribute: value}).
+        """
+        lines = [line for line in ProductAttribute.get_product_attribute_lines(product_id) if line['values']]
+        if not lines:
+            return
+        
+        by_value = {
+            line['attribute_name']: {value['value']: value for value in line['values']}
+            for line in lines
+        }
+        attributes_values = {
+            line['attribute_name']: [value['value'] for value in line['values']]
+            for line in lines
+        }
+        for attributes in ProductAttribute.iter_combinations(attributes_values, limit, exclude):
+            values = [by_value[name][value] for name, value in attributes.items()]
+            yield {
+                'attribute_value_ids': [value['template_value_id'] for value in values],
+                'price_extra': sum(value['price_extra'] or 0 for value in values),
+                'attributes': attributes
+            }
+
+    @staticmethod
+    def generate_variant_combinations(product_id_or_attributes, limit=None, exclude=None):
         """
         Generate all possible variant combinations for a product
         
@@ -523,95 +503,24 @@ class ProductAttribute:
             product_id_or_attributes: Either a product ID or a dictionary of attribute names to values
             
         Returns:
-            A list of variant definitions
+            A list of variant definitions (see iter_variant_combinations)
         """
         # Check if we received a dict of attributes instead of a product_id
         if isinstance(product_id_or_attributes, dict):
-            # We received attributes_values directly, use the legacy dictionary method
-            return ProductAttribute.generate_variant_combinations_dict(product_id_or_attributes)
-            
-        # Otherwise, we have a product_id, proceed with the new implementation    
-        product_id = product_id_or_attributes
-        conn = get_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                
-                # Get all attribute lines for this product
-                attribute_lines = ProductAttribute.get_product_attribute_lines(product_id)
-                
-                if not attribute_lines:
-                    return []
-                
-                # Prepare data structure for generating combinations
-                line_values = {}
-                for line in attribute_lines:
-                    attribute_name = line['attribute_name']
-                    line_values[attribute_name] = line['values']
-                
-                # Generate all combinations
-                combinations = []
-                
-                def generate_combinations(lines, current_combination=None, index=0):
-                    if current_combination is None:
-                        current_combination = {
-                            'attribute_value_ids': [],
-                            'price_extra': 0,
-                            'attributes': {}
-                        }
-                    
-                    if index >= len(lines):
-                        combinations.append(current_combination.copy())
-                        return
-                    
-                    current_line = lines[index]
-                    attribute_name = current_line['attribute_name']
-                    
-                    for value in current_line['values']:
-                        # Add this attribute value to the combination
-                        new_combination = {
-                            'attribute_value_ids': current_combination['attribute_value_ids'] + [value['template_value_id']],
-                            'price_extra': current_combination['price_extra'] + value['price_extra'],
-                            'attributes': {**current_combination['attributes'], attribute_name: value['value']}
-                        }
-                        
-                        generate_combinations(lines, new_combination, index + 1)
-                
-                generate_combinations(attribute_lines)
-                return combinations
-            except Exception as e:
-                print(f"Error generating variant combinations: {e}")
-                return []
-            finally:
-                conn.close()
-        return []
+            return ProductAttribute.generate_variant_combinations_dict(product_id_or_attributes, limit, exclude)
+        try:
+            return list(ProductAttribute.iter_variant_combinations(product_id_or_attributes, limit, exclude))
+        except Exception as e:
+            print(f"Error generating variant combinations: {e}")
+            return []
         
     @staticmethod
-    def generate_variant_combinations_dict(attributes_values):
+    def generate_variant_combinations_dict(attributes_values, limit=None, exclude=None):
         """
         Generate all possible combinations of attribute values
         
-        Args:
-            attributes_values: A dict where keys are attribute names and values are lists of values
-                e.g. {'Color': ['Red', 'Blue'], 'Size': ['S', 'M', 'L']}
-        
         Returns:
             A list of dictionaries, each representing a variant combination
+            (see iter_combinations for the arguments)
         """
-        def generate_combinations(attrs, current=None, index=0):
-            if current is None:
-                current = {}
-            
-            if index >= len(attrs):
-                return [current.copy()]
-            
-            attr_name = list(attrs.keys())[index]
-            combinations = []
-            
-            for value in attrs[attr_name]:
-                current[attr_name] = value
-                combinations.extend(generate_combinations(attrs, current, index + 1))
-            
-            return combinations
-        
-        return generate_combinations(attributes_values)
+        return list(ProductAttribute.iter_combinations(attributes_values, limit, exclude))
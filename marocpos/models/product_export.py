@@ -0,0 +1,312 @@
+from database import DatabaseManager
+from contextlib import ExitStack
+import csv
+import json
+import os
+import sqlite3
+
+# Rows fetched from the export cursor at a time
+EXPORT_FETCH_SIZE = 2000
+
+# Product filters: all, simple (no variants), with_variants, variants_only
+EXPORT_FILTERS = {
+    'all': "",
+    'simple': "WHERE NOT COALESCE(p.has_variants, 0)",
+    'with_variants': "WHERE p.has_variants",
+    'variants_only': "WHERE p.has_variants",
+}
+
+PRODUCT_FIELDS = (
+    'id', 'name', 'description', 'barcode', 'category_id', 'category_name',
+    'unit_price', 'purchase_price', 'stock', 'min_stock', 'has_variants', 'image_path'
+)
+VARIANT_FIELDS = (
+    'variant_id', 'variant_name', 'sku', 'barcode', 'price_adjustment',
+    'unit_price', 'purchase_price', 'stock', 'attribute_values'
+)
+
+# Products, their category and their variants in one ordered pass; the
+# price adjustment includes the price extras of the attribute values
+EXPORT_QUERY = """
+    SELECT p.id, p.name, p.description, p.barcode, p.category_id,
+           COALESCE(c.name, '') as category_name,
+           COALESCE(p.unit_price, 0), COALESCE(p.purchase_price, 0),
+           COALESCE(p.stock, 0), COALESCE(p.min_stock, 0),
+           CASE WHEN p.has_variants THEN 1 ELSE 0 END, p.image_path,
+           pv.id, COALESCE(pv.display_name, pv.name, ''), pv.sku, pv.barcode,
+           COALESCE(pv.price_adjustment, 0) + COALESCE(x.price_extras, 0),
+           pv.unit_price, pv.purchase_price, COALESCE(pv.stock, 0),
+           CASE WHEN json_valid(pv.attribute_values) THEN pv.attribute_values ELSE '{{}}' END
+    FROM Products p
+    LEFT JOIN Categories c ON c.id = p.category_id
+    LEFT JOIN ProductVariants pv ON pv.product_id = p.id AND p.has_variants
+    LEFT JOIN (
+        SELECT pvc.product_variant_id, SUM(COALESCE(ptav.price_extra, 0)) as price_extras
+        FROM ProductVariantCombination pvc
+        JOIN ProductTemplateAttributeValue ptav ON pvc.template_attribute_value_id = ptav.id
+        GROUP BY pvc.product_variant_id
+    ) x ON x.product_variant_id = pv.id
+    {where}
+    ORDER BY p.id, pv.id
+"""
+
+
+def iter_catalog(cursor, export_type='all', fetch_size=EXPORT_FETCH_SIZE):
+    """(product, variants) of every exported product, from one cursor.
+
+    Rows are fetched fetch_size at a time as tuples, so memory stays the
+    same whatever the size of the catalog: only the variants of the current
+    product are held.
+    """
+    cursor.row_factory = None
+    cursor.execute(EXPORT_QUERY.format(where=EXPORT_FILTERS[export_type]))
+    split = len(PRODUCT_FIELDS)
+    product, variants = None, []
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            break
+        for row in rows:
+            if product is None or row[0] != product['id']:
+                if product is not None:
+                    yield product, variants
+                product = dict(zip(PRODUCT_FIELDS, row[:split]))
+                variants = []
+            if row[split] is not None:
+                variants.append(dict(zip(VARIANT_FIELDS, row[split:])))
+    if product is not None:
+        yield product, variants
+
+
+class CatalogWriter:
+    """Base class of the export formats.
+
+    write(product, variants) is called once per product, in id order.
+    Files are written under a temporary name and renamed by close(True);
+    close(False) removes them. Subclasses list their files in `paths` and
+    open them in open().
+    """
+
+    extension = ''
+    label = ''
+
+    def __init__(self, path, products=True, variants=True, include_prices=True, include_stock=True,
+                 include_images=True, delimiter=',', quotechar='"'):
+        self.path = path
+        self.products = products
+        self.variants = variants
+        self.delimiter = delimiter
+        self.quotechar = quotechar
+
+        self.product_columns = ['id', 'name', 'description', 'barcode', 'category_id', 'category_name']
+        self.variant_columns = ['product_id', 'product_name', 'variant_name', 'sku', 'barcode']
+        if include_prices:
+            self.product_columns.extend(['unit_price', 'purchase_price'])
+            self.variant_columns.extend(['price_adjustment', 'unit_price', 'purchase_price'])
+        if include_stock:
+            self.product_columns.extend(['stock', 'min_stock'])
+            self.variant_columns.append('stock')
+        self.product_columns.append('has_variants')
+        self.variant_columns.append('attribute_values')
+        if include_images:
+            self.product_columns.append('image_path')
+
+        self.paths = [path]
+        self._files = ExitStack()
+
+    @staticmethod
+    def temp_path(path):
+        return f"{path}.tmp"
+
+    def variant_row(self, product, variant):
+        values = dict(variant, product_id=product['id'], product_name=product['name'])
+        return [values[column] for column in self.variant_columns]
+
+    def open(self):
+        pass
+
+    def write(self, product, variants):
+        raise NotImplementedError
+
+    def close(self, success):
+        self._files.close()
+        for path in self.paths:
+            temp_path = self.temp_path(path)
+            if not os.path.exists(temp_path):
+                continue
+            if success:
+                os.replace(temp_path, path)
+            else:
+                os.remove(temp_path)
+
+
+class CsvCatalogWriter(CatalogWriter):
+    """Products in <file>.csv and variants in <file>_variants.csv, as read
+    back by ProductImporter; a variants-only export writes the variants to
+    <file>.csv and a products-only one has no variants file"""
+
+    extension = '.csv'
+    label = "CSV"
+
+    def open(self):
+        base, extension = os.path.splitext(self.path)
+        variants_path = self.path if not self.products else f"{base}_variants{extension or '.csv'}"
+        self.paths = []
+        self.product_writer = self.variant_writer = None
+        if self.products:
+            self.product_writer = self._writer(self.path, self.product_columns)
+        if self.variants:
+            self.variant_writer = self._writer(variants_path, self.variant_columns)
+
+    def _writer(self, path, columns):
+        csvfile = self._files.enter_context(open(self.temp_path(path), 'w', newline='', encoding='utf-8'))
+        self.paths.append(path)
+        writer = csv.writer(csvfile, delimiter=self.delimiter, quotechar=self.quotechar, quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(columns)
+        return writer
+
+    def write(self, product, variants):
+        if self.product_writer:
+            self.product_writer.writerow([product[column] for column in self.product_columns])
+        if variants:
+            self.variant_writer.writerows(self.variant_row(product, variant) for variant in variants)
+
+
+class JsonLinesCatalogWriter(CatalogWriter):
+    """One JSON object per line: a product with its "variants" list, or one
+    variant per line for a variants-only export"""
+
+    extension = '.jsonl'
+    label = "JSON Lines"
+
+    def open(self):
+        self.file = self._files.enter_context(open(self.temp_path(self.path), 'w', encoding='utf-8'))
+
+    def _variant(self, product, variant):
+        values = dict(zip(self.variant_columns, self.variant_row(product, variant)))
+        values['attribute_values'] = json.loads(values['attribute_values'])
+        return values
+
+    def write(self, product, variants):
+        if self.products:
+            values = {column: product[column] for column in self.product_columns}
+            if self.variants:
+                values['variants'] = [self._variant(product, variant) for variant in variants]
+            lines = [values]
+        else:
+            lines = [self._variant(product, variant) for variant in variants]
+        for values in lines:
+            self.file.write(json.dumps(values, ensure_ascii=False, separators=(',', ':')))
+            self.file.write('\n')
+
+
+class SqliteCatalogWriter(CatalogWriter):
+    """Standalone SQLite file with a products and a variants table, without
+    indexes or journal, inserted in batches"""
+
+    extension = '.db'
+    label = "SQLite"
+
+    BATCH_SIZE = 5000
+
+    def open(self):
+        temp_path = self.temp_path(self.path)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        self.conn = sqlite3.connect(temp_path)
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        product_columns = ", ".join(
+            f"{column} INTEGER PRIMARY KEY" if column == 'id' else column for column in self.product_columns
+        )
+        self.conn.execute(f"CREATE TABLE products ({product_columns})")
+        self.conn.execute(f"CREATE TABLE variants ({', '.join(self.variant_columns)})")
+        self.product_insert = (
+            f"INSERT INTO products ({', '.join(self.product_columns)}) "
+            f"VALUES ({', '.join('?' for _ in self.product_columns)})"
+        )
+        self.variant_insert = (
+            f"INSERT INTO variants ({', '.join(self.variant_columns)}) "
+            f"VALUES ({', '.join('?' for _ in self.variant_columns)})"
+        )
+        self.product_rows, self.variant_rows = [], []
+        self.conn.execute("BEGIN")
+
+    def write(self, product, variants):
+        if self.products:
+            self.product_rows.append([product[column] for column in self.product_columns])
+        self.variant_rows.extend(self.variant_row(product, variant) for variant in variants)
+        if len(self.product_rows) >= self.BATCH_SIZE or len(self.variant_rows) >= self.BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        self.conn.executemany(self.product_insert, self.product_rows)
+        self.conn.executemany(self.variant_insert, self.variant_rows)
+        self.product_rows, self.variant_rows = [], []
+
+    def close(self, success):
+        conn = getattr(self, 'conn', None)
+        if conn is not None:
+            try:
+                if success:
+                    self._flush()
+                    conn.commit()
+            finally:
+                conn.close()
+                self.conn = None
+        super().close(success)
+
+
+EXPORT_FORMATS = {
+    'csv': CsvCatalogWriter,
+    'jsonl': JsonLinesCatalogWriter,
+    'sqlite': SqliteCatalogWriter,
+}
+
+
+class ProductExporter:
+    """Single-pass export of products and variants to one of EXPORT_FORMATS.
+
+    The catalog is read through iter_catalog() and each product goes
+    straight to the writer, so memory use does not depend on the number
+    of products. export_type is a key of EXPORT_FILTERS.
+    """
+
+    def __init__(self, path, file_format='csv', export_type='all', **options):
+        if file_format not in EXPORT_FORMATS:
+            raise ValueError(f"Format d'exportation inconnu: {file_format}")
+        self.path = path
+        self.export_type = export_type
+        self.writer = EXPORT_FORMATS[file_format](
+            path, products=export_type != 'variants_only', variants=export_type != 'simple', **options
+        )
+
+    def run(self, progress=None, cancelled=None):
+        """Write the export; returns the paths written, or None if cancelled.
+
+        progress(done, total) is called every EXPORT_FETCH_SIZE products;
+        cancelled() is checked as often and stops the export, removing the
+        partial files.
+        """
+        writer = self.writer
+        with DatabaseManager.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT COUNT(*) as total FROM Products p {EXPORT_FILTERS[self.export_type]}")
+            total = cursor.fetchone()['total']
+
+            success = False
+            writer.open()
+            try:
+                for done, (product, variants) in enumerate(iter_catalog(cursor, self.export_type)):
+                    if done % EXPORT_FETCH_SIZE == 0:
+                        if cancelled and cancelled():
+                            return None
+                        if progress:
+                            progress(done, total)
+                    writer.write(product, variants)
+                success = True
+            finally:
+                writer.close(success)
+        if progress:
+            progress(total, total)
+        return list(writer.paths)
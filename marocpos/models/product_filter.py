@@ -0,0 +1,113 @@
+from models.product_search import fold_text
+import unicodedata
+
+# Separates the fields of a document so a match cannot span two fields
+FIELD_SEPARATOR = '\x1f'
+
+
+def normalize(text):
+    """Lower-case text without accents or Arabic marks, for filtering"""
+    text = str(text or '')
+    if text.isascii():
+        return text.lower()
+    text = unicodedata.normalize('NFKD', fold_text(text)).casefold()
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def rows_to_bits(rows, size):
+    """Bitset (int) with the bit of every row set"""
+    bits = bytearray((size + 7) // 8)
+    for row in rows:
+        bits[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def bits_to_rows(mask):
+    """Rows whose bit is set, in ascending order"""
+    bits = bin(mask)[:1:-1]  # bit 0 first
+    rows = []
+    row = bits.find('1')
+    while row != -1:
+        rows.append(row)
+        row = bits.find('1', row + 1)
+    return rows
+
+
+class ProductFilterIndex:
+    """Precomputed index for the product management filter.
+
+    Name and barcode of every product are normalized once; a trigram index
+    narrows a search to a few candidates which are then checked with a
+    substring test (same results as a plain scan). Categories are matched
+    by name once and contribute the bitset of their rows, which is also
+    what the category filter uses. Results are row numbers in the product
+    list the index was built from.
+    """
+
+    NGRAM = 3
+
+    def __init__(self, products):
+        self.size = len(products)
+        self._documents = []
+        self._ngrams = {}
+        self._category_names = {}
+        category_rows = {}
+        ngrams = self._ngrams
+        size = self.NGRAM
+
+        for row, product in enumerate(products):
+            document = normalize(product.get('name')) + FIELD_SEPARATOR + normalize(product.get('barcode'))
+            self._documents.append(document)
+            for gram in {document[i:i + size] for i in range(len(document) - size + 1)}:
+                posting = ngrams.get(gram)
+                if posting is None:
+                    ngrams[gram] = {row}
+                else:
+                    posting.add(row)
+
+            category_id = product.get('category_id')
+            category_rows.setdefault(category_id, []).append(row)
+            if category_id not in self._category_names:
+                self._category_names[category_id] = normalize(product.get('category_name'))
+
+        self._categories = {
+            category_id: rows_to_bits(rows, self.size)
+            for category_id, rows in category_rows.items()
+        }
+
+    def _text_rows(self, query):
+        """Rows whose name or barcode contains the query"""
+        if len(query) < self.NGRAM:
+            # Too short for the trigram index: scan the normalized documents
+            return [row for row, document in enumerate(self._documents) if query in document]
+
+        postings = []
+        for i in range(len(query) - self.NGRAM + 1):
+            posting = self._ngrams.get(query[i:i + self.NGRAM])
+            if not posting:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        return [row for row in candidates if query in self._documents[row]]
+
+    def search(self, text='', category_id=None):
+        """Rows matching the search text and category; None when nothing filters"""
+        query = normalize(text).strip()
+        if not query:
+            if category_id is None:
+                return None
+            return bits_to_rows(self._categories.get(category_id, 0))
+
+        rows = self._text_rows(query)
+        matching_categories = [cid for cid, name in self._category_names.items() if query in name]
+        if not matching_categories and category_id is None:
+            rows.sort()
+            return rows
+
+        mask = rows_to_bits(rows, self.size)
+        for cid in matching_categories:
+            mask |= self._categories[cid]
+        if category_id is not None:
+            mask &= self._categories.get(category_id, 0)
+        return bits_to_rows(mask)
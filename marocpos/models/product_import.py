@@ -0,0 +1,634 @@
+from database import DatabaseManager
+from models.catalog_cache import CatalogCache
+from models.product import Product
+from models.product_search import ProductSearch
+from models.variant_index import VariantIndex
+from datetime import datetime
+from itertools import islice
+import csv
+import json
+
+# Product rows written per transaction
+IMPORT_CHUNK_SIZE = 2000
+
+# Product columns staged for each chunk, in the order of the staging table
+STAGED_COLUMNS = (
+    'line', 'product_id', 'name', 'description', 'barcode', 'category_id',
+    'unit_price', 'purchase_price', 'stock', 'min_stock', 'has_variants', 'image_path'
+)
+
+
+def parse_number(value, cast):
+    """Number of a CSV cell (decimal comma accepted); None for an empty cell.
+    Raises ValueError for anything else."""
+    value = (value or '').strip().replace(' ', '')
+    if not value:
+        return None
+    if ',' in value and '.' not in value:
+        value = value.replace(',', '.')
+    return cast(float(value)) if cast is int else cast(value)
+
+
+def cell(row, column):
+    """Stripped text of a CSV cell; None when the column is missing or empty"""
+    value = row.get(column)
+    if value is None:
+        return None
+    value = value.strip()
+    return value or None
+
+
+def attributes_key(attributes):
+    return json.dumps(attributes, sort_keys=True, ensure_ascii=False)
+
+
+class ImportReport:
+    """Outcome of an import: counters and the errors of the rejected rows"""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.variants_created = 0
+        self.variants_updated = 0
+        self.categories_created = 0
+        self.cancelled = False
+        self.errors = []
+
+    def add_error(self, line, name, message, file='produits'):
+        self.errors.append({'file': file, 'line': line, 'name': name or '', 'message': message})
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+    def summary(self):
+        if self.dry_run:
+            title = "Simulation (aucune modification enregistrée):"
+        elif self.cancelled:
+            title = "Importation interrompue (les lots déjà traités sont enregistrés):"
+        else:
+            title = "Importation terminée:"
+        lines = [
+            title,
+            "",
+            f"{self.created} produits créés",
+            f"{self.updated} produits mis à jour",
+            f"{self.skipped} produits ignorés",
+            f"{self.variants_created} variantes créées, {self.variants_updated} mises à jour",
+        ]
+        if self.categories_created:
+            lines.append(f"{self.categories_created} catégories créées")
+        lines.append(f"{self.failed} erreurs")
+        return "\n".join(lines)
+
+    def error_text(self, limit=None):
+        errors = self.errors if limit is None else self.errors[:limit]
+        text = "\n".join(
+            f"{error['file']}, ligne {error['line']} ({error['name']}): {error['message']}"
+            for error in errors
+        )
+        if limit is not None and len(self.errors) > limit:
+            text += f"\n... et {len(self.errors) - limit} autres erreurs"
+        return text
+
+    def write_errors(self, path):
+        """Save the errors as CSV (file, line, name, message)"""
+        with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=['file', 'line', 'name', 'message'])
+            writer.writeheader()
+            writer.writerows(self.errors)
+
+
+class ProductImporter:
+    """Streaming CSV import of products and their variants.
+
+    The product file is read IMPORT_CHUNK_SIZE rows at a time; each chunk is
+    validated against lookup maps loaded once (products by id, name and
+    barcode, categories, variants by SKU, barcode and attributes), copied
+    into a TEMP staging table and applied with a few set-based statements in
+    one transaction: an UPDATE ... FROM for the existing products and an
+    INSERT ... ON CONFLICT for the new ones. Empty or missing columns keep the
+    current values, so a price list with only name and unit_price columns
+    updates the prices alone.
+
+    The variants file (<file>_variants.csv, as written by the export) is
+    grouped by product id and name up front. Rows that fail validation are
+    reported with their line number in the ImportReport instead of stopping
+    the import, and a chunk whose write fails is retried one row per
+    transaction so only the failing rows are rejected; run(dry_run=True)
+    only validates.
+    """
+
+    def __init__(self, path, delimiter=',', quotechar='"', update_existing=True,
+                 create_categories=True, variants_path=None, chunk_size=IMPORT_CHUNK_SIZE, user_id=None):
+        self.path = path
+        self.delimiter = delimiter
+        self.quotechar = quotechar
+        self.update_existing = update_existing
+        self.create_categories = create_categories
+        self.variants_path = variants_path
+        self.chunk_size = chunk_size
+        self.user_id = user_id
+
+    def _reader(self, csvfile):
+        return csv.DictReader(csvfile, delimiter=self.delimiter, quotechar=self.quotechar)
+
+    def run(self, dry_run=False, progress=None, cancelled=None):
+        """Import the file and return an ImportReport.
+
+        progress(done, total) is called after every chunk with the number of
+        lines read and the number of lines of the product file. cancelled()
+        is checked before every chunk; when it returns True the import stops
+        there, keeping the chunks already committed.
+        """
+        report = ImportReport(dry_run)
+        with open(self.path, 'r', newline='', encoding='utf-8-sig') as csvfile:
+            total_lines = max(sum(1 for _ in csvfile) - 1, 0)
+
+        with DatabaseManager.connection() as conn:
+            cursor = conn.cursor()
+            self._load_maps(cursor)
+            variants_by_product = self._read_variants(report)
+            if not dry_run:
+                cursor.execute("""
+                    CREATE TEMP TABLE IF NOT EXISTS ImportProducts (
+                        line INTEGER, product_id INTEGER, name TEXT, description TEXT,
+                        barcode TEXT, category_id INTEGER, unit_price REAL,
+                        purchase_price REAL, stock INTEGER, min_stock INTEGER,
+                        has_variants INTEGER, image_path TEXT
+                    )
+                """)
+
+            with open(self.path, 'r', newline='', encoding='utf-8-sig') as csvfile:
+                reader = self._reader(csvfile)
+                while True:
+                    if cancelled and cancelled():
+                        report.cancelled = True
+                        break
+                    chunk = [(reader.line_num, row) for row in islice(reader, self.chunk_size)]
+                    if not chunk:
+                        break
+                    self._import_chunk(cursor, chunk, variants_by_product, report, dry_run)
+                    if progress:
+                        progress(min(reader.line_num - 1, total_lines), total_lines)
+
+        if not dry_run:
+            CatalogCache.invalidate()
+        return report
+
+    # Lookup maps
+    def _load_maps(self, cursor):
+        cursor.execute("SELECT id, name, barcode FROM Products")
+        self.product_ids = set()
+        self.products_by_name = {}
+        self.barcode_owners = {}
+        for row in cursor.fetchall():
+            self.product_ids.add(row['id'])
+            self.products_by_name[row['name']] = row['id']
+            if row['barcode']:
+                self.barcode_owners[row['barcode']] = row['id']
+
+        cursor.execute("SELECT id, name FROM Categories")
+        self.category_ids = set()
+        self.categories_by_name = {}
+        for row in cursor.fetchall():
+            self.category_ids.add(row['id'])
+            self.categories_by_name[row['name'].strip().lower()] = row['id']
+
+        cursor.execute("SELECT id, product_id, sku, barcode, attribute_values FROM ProductVariants")
+        self.variants_by_code = {}
+        self.variants_by_attributes = {}
+        self._map_variants(cursor.fetchall())
+
+        self.taken_codes = Product.taken_codes(cursor)
+
+    def _map_variants(self, rows):
+        """Add variant rows (id, product_id, sku, barcode, attribute_values) to the variant maps"""
+        for row in rows:
+            for code in (row['sku'], row['barcode']):
+                if code:
+                    self.variants_by_code[(row['product_id'], code)] = row['id']
+            try:
+                attributes = json.loads(row['attribute_values'] or '{}')
+            except ValueError:
+                attributes = {}
+            if isinstance(attributes, dict) and attributes:
+                self.variants_by_attributes[(row['product_id'], attributes_key(attributes))] = row['id']
+
+    def _read_variants(self, report):
+        """Variant rows of the variants file grouped as {('id'|'name', key): [(line, row)]}"""
+        grouped = {}
+        if not self.variants_path:
+            return grouped
+        with open(self.variants_path, 'r', newline='', encoding='utf-8-sig') as csvfile:
+            reader = self._reader(csvfile)
+            for row in reader:
+                product_id = cell(row, 'product_id')
+                product_name = cell(row, 'product_name')
+                if product_id:
+                    grouped.setdefault(('id', product_id), []).append((reader.line_num, row))
+                elif product_name:
+                    grouped.setdefault(('name', product_name), []).append((reader.line_num, row))
+                else:
+                    report.add_error(reader.line_num, cell(row, 'variant_name'), "Produit non indiqué", 'variantes')
+        return grouped
+
+    # Chunk processing
+    def _import_chunk(self, cursor, chunk, variants_by_product, report, dry_run):
+        staged = {}          # product key -> staged row (the last row wins)
+        claimed = {}         # barcode -> product key, for this chunk
+        claimed_names = {}   # name -> product key, for this chunk
+        new_categories = {}
+        chunk_variants = {}  # product key -> variant rows
+        counts = {'created': 0, 'updated': 0, 'skipped': 0}
+        errors = len(report.errors)
+
+        for line, row in chunk:
+            name = cell(row, 'name')
+            try:
+                values = self._parse_product(row)
+            except ValueError as e:
+                report.add_error(line, name, str(e))
+                continue
+
+            # Existing product: by id, then by name
+            csv_id = cell(row, 'id')
+            product_id = None
+            if csv_id and csv_id.isdigit() and int(csv_id) in self.product_ids:
+                product_id = int(csv_id)
+            elif name in self.products_by_name:
+                product_id = self.products_by_name[name]
+            key = product_id if product_id is not None else ('new', name)
+
+            if product_id is not None and not self.update_existing:
+                counts['skipped'] += 1
+                continue
+
+            # A product matched by id and renamed must not take another one's name
+            if claimed_names.get(name, self.products_by_name.get(name, key)) != key:
+                report.add_error(line, name, "Nom déjà utilisé par un autre produit")
+                continue
+
+            barcode = values['barcode']
+            if barcode and claimed.get(barcode, self.barcode_owners.get(barcode, key)) != key:
+                report.add_error(line, name, f"Code-barres déjà utilisé: {barcode}")
+                continue
+
+            category_id = values['category_id']
+            if category_id is not None and category_id not in self.category_ids:
+                category_id = None
+            category_name = cell(row, 'category_name')
+            if category_id is None and category_name:
+                category_id = self.categories_by_name.get(category_name.lower())
+                if category_id is None and self.create_categories:
+                    new_categories[category_name.lower()] = category_name
+                    category_id = ('new', category_name.lower())
+            values['category_id'] = category_id
+
+            if barcode:
+                claimed[barcode] = key
+            claimed_names[name] = key
+            counts['updated' if product_id is not None or key in staged else 'created'] += 1
+            staged[key] = dict(values, line=line, product_id=product_id)
+
+            variant_rows = variants_by_product.get(('id', csv_id), []) if csv_id else []
+            variant_rows = variant_rows or variants_by_product.get(('name', name), [])
+            if variant_rows:
+                chunk_variants[key] = variant_rows
+
+        if dry_run:
+            # Later chunks see the simulated products and categories as existing
+            for category_key in new_categories:
+                self.categories_by_name[category_key] = ('new', category_key)
+            for key in staged:
+                if isinstance(key, tuple):
+                    self.products_by_name[key[1]] = key
+            self.barcode_owners.update(claimed)
+            report.categories_created += len(new_categories)
+            for key, variant_rows in chunk_variants.items():
+                self._prepare_variants(key, variant_rows, report)
+            self._count(report, counts)
+            return
+
+        taken_codes = set(self.taken_codes)
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            category_ids = self._write_categories(cursor, new_categories)
+            for values in staged.values():
+                if isinstance(values['category_id'], tuple):
+                    values['category_id'] = category_ids.get(values['category_id'][1])
+            new_ids = self._write_products(cursor, staged)
+            new_variants, variants_updated = self._write_variants(
+                cursor, chunk_variants, new_ids, report
+            )
+            cursor.execute("COMMIT")
+        except Exception as e:
+            if cursor.connection.in_transaction:
+                cursor.connection.rollback()
+            self.taken_codes = taken_codes
+            if len(chunk) > 1:
+                # Retry the rows one per transaction, so only the failing rows are rejected
+                del report.errors[errors:]
+                for item in chunk:
+                    self._import_chunk(cursor, [item], variants_by_product, report, dry_run)
+                return
+            print(f"Error importing products: {e}")
+            line, row = chunk[0]
+            report.add_error(line, cell(row, 'name'), f"Ligne non importée: {e}")
+            return
+
+        # The maps follow the database only once the chunk is committed
+        for category_name, category_id in category_ids.items():
+            self.category_ids.add(category_id)
+            self.categories_by_name[category_name] = category_id
+        for name, product_id in new_ids.items():
+            self.product_ids.add(product_id)
+            self.products_by_name[name] = product_id
+        for barcode, key in claimed.items():
+            self.barcode_owners[barcode] = key if isinstance(key, int) else new_ids.get(key[1])
+        self._map_variants(new_variants)
+        report.categories_created += len(category_ids)
+        report.variants_created += len(new_variants)
+        report.variants_updated += variants_updated
+        self._count(report, counts)
+
+    @staticmethod
+    def _count(report, counts):
+        report.created += counts['created']
+        report.updated += counts['updated']
+        report.skipped += counts['skipped']
+
+    @staticmethod
+    def _parse_product(row):
+        """Typed values of a product row; raises ValueError with a message to report"""
+        if not cell(row, 'name'):
+            raise ValueError("Nom du produit manquant")
+        values = {'name': cell(row, 'name')}
+        for column, cast, label in (
+            ('unit_price', float, "Prix de vente"),
+            ('purchase_price', float, "Prix d'achat"),
+            ('stock', int, "Stock"),
+            ('min_stock', int, "Stock minimum"),
+            ('category_id', int, "Catégorie"),
+            ('has_variants', int, "Variantes"),
+        ):
+            try:
+                values[column] = parse_number(row.get(column), cast)
+            except ValueError:
+                raise ValueError(f"{label} invalide: {row.get(column)}")
+            if column in ('unit_price', 'purchase_price', 'stock', 'min_stock') and (values[column] or 0) < 0:
+                raise ValueError(f"{label} négatif: {row.get(column)}")
+        if values['has_variants'] is not None:
+            values['has_variants'] = 1 if values['has_variants'] else 0
+        for column in ('description', 'barcode', 'image_path'):
+            values[column] = cell(row, column)
+        return values
+
+    def _prepare_variants(self, key, variant_rows, report):
+        """Split the variant rows of a product into updates and new variants.
+
+        Returns ([(variant_id, values)], [variant dict]); invalid rows and
+        barcodes already used are reported and left out.
+        """
+        product_id = key if isinstance(key, int) else None
+        updates, new_variants = [], []
+        for line, row in variant_rows:
+            variant_name = cell(row, 'variant_name')
+            try:
+                price_adjustment = parse_number(row.get('price_adjustment'), float)
+                stock = parse_number(row.get('stock'), int)
+                attributes = json.loads(cell(row, 'attribute_values') or '{}')
+                if not isinstance(attributes, dict):
+                    raise ValueError
+            except ValueError:
+                report.add_error(line, variant_name, "Valeur invalide (prix, stock ou attributs)", 'variantes')
+                continue
+            if stock is not None and stock < 0:
+                report.add_error(line, variant_name, f"Stock négatif: {row.get('stock')}", 'variantes')
+                continue
+
+            sku, barcode = cell(row, 'sku'), cell(row, 'barcode')
+            variant_id = None
+            if product_id is not None:
+                for code in (sku, barcode):
+                    if code and (product_id, code) in self.variants_by_code:
+                        variant_id = self.variants_by_code[(product_id, code)]
+                        break
+                if variant_id is None and attributes:
+                    variant_id = self.variants_by_attributes.get((product_id, attributes_key(attributes)))
+
+            values = {
+                'name': variant_name,
+                'price_adjustment': price_adjustment,
+                'stock': stock,
+                'attribute_values': attributes,
+            }
+            if variant_id is not None:
+                updates.append((variant_id, values))
+                continue
+
+            if barcode and barcode in self.taken_codes:
+                report.add_error(line, variant_name, f"Code-barres déjà utilisé: {barcode}", 'variantes')
+                continue
+            if report.dry_run:
+                # Reserve the codes so later rows of the simulation see them
+                self.taken_codes.update(code for code in (sku, barcode) if code)
+            new_variants.append(dict(values, name=variant_name or '', sku=sku, barcode=barcode, stock=stock or 0))
+
+        if report.dry_run:
+            report.variants_updated += len(updates)
+            report.variants_created += len(new_variants)
+        return updates, new_variants
+
+    def _write_categories(self, cursor, new_categories):
+        """Create the missing categories; returns {lower-case name: id}"""
+        if not new_categories:
+            return {}
+        cursor.executemany("""
+            INSERT INTO Categories (name) VALUES (?)
+            ON CONFLICT(name) DO NOTHING
+        """, [(name,) for name in new_categories.values()])
+        placeholders = ", ".join("?" for _ in new_categories)
+        cursor.execute(
+            f"SELECT id, name FROM Categories WHERE name IN ({placeholders})",
+            list(new_categories.values())
+        )
+        return {row['name'].strip().lower(): row['id'] for row in cursor.fetchall()}
+
+    def _write_products(self, cursor, staged):
+        """Apply the staged rows; returns {name: id} of the created products"""
+        cursor.execute("DELETE FROM temp.ImportProducts")
+        cursor.executemany(f"""
+            INSERT INTO temp.ImportProducts ({', '.join(STAGED_COLUMNS)})
+            VALUES ({', '.join('?' for _ in STAGED_COLUMNS)})
+        """, [tuple(values[column] for column in STAGED_COLUMNS) for values in staged.values()])
+
+        # Stock changes are recorded as adjustments, like a manual correction
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cursor.execute("""
+            INSERT INTO StockMovements (
+                product_id, variant_id, movement_type, quantity,
+                unit_price, reference, user_id, created_at
+            )
+            SELECT p.id, NULL,
+                   CASE WHEN s.stock > COALESCE(p.stock, 0) THEN 'adjustment_in' ELSE 'adjustment_out' END,
+                   ABS(s.stock - COALESCE(p.stock, 0)), COALESCE(s.purchase_price, p.purchase_price),
+                   'Importation', ?, ?
+            FROM temp.ImportProducts s
+            JOIN Products p ON p.id = s.product_id
+            WHERE s.stock IS NOT NULL AND s.stock != COALESCE(p.stock, 0)
+        """, (self.user_id, now))
+
+        # Prices and stock: these columns are not indexed for search
+        cursor.execute("""
+            UPDATE Products
+            SET unit_price = COALESCE(s.unit_price, Products.unit_price),
+                purchase_price = COALESCE(s.purchase_price, Products.purchase_price),
+                profit_margin = CASE
+                    WHEN COALESCE(s.purchase_price, Products.purchase_price) > 0
+                    THEN (COALESCE(s.unit_price, Products.unit_price)
+                          - COALESCE(s.purchase_price, Products.purchase_price)) * 100.0
+                         / COALESCE(s.purchase_price, Products.purchase_price)
+                    ELSE Products.profit_margin
+                END,
+                stock = COALESCE(s.stock, Products.stock),
+                min_stock = COALESCE(s.min_stock, Products.min_stock),
+                has_variants = COALESCE(s.has_variants, Products.has_variants),
+                image_path = COALESCE(s.image_path, Products.image_path),
+                updated_at = CURRENT_TIMESTAMP
+            FROM temp.ImportProducts s
+            WHERE Products.id = s.product_id
+        """)
+        # Searchable columns, only where they change, so the search
+        # trigger does not rewrite the documents of unchanged products
+        cursor.execute("""
+            UPDATE Products
+            SET name = s.name,
+                description = COALESCE(s.description, Products.description),
+                barcode = COALESCE(s.barcode, Products.barcode),
+                category_id = COALESCE(s.category_id, Products.category_id)
+            FROM temp.ImportProducts s
+            WHERE Products.id = s.product_id
+              AND (Products.name IS NOT s.name
+                   OR Products.description IS NOT COALESCE(s.description, Products.description)
+                   OR Products.barcode IS NOT COALESCE(s.barcode, Products.barcode)
+                   OR Products.category_id IS NOT COALESCE(s.category_id, Products.category_id))
+        """)
+
+        cursor.execute("SELECT COALESCE(MAX(id), 0) as last_id FROM Products")
+        last_id = cursor.fetchone()['last_id']
+        with ProductSearch.bulk_product_insert(cursor):
+            cursor.execute("""
+                INSERT INTO Products (
+                    name, description, barcode, category_id, unit_price, purchase_price,
+                    profit_margin, stock, min_stock, has_variants, image_path,
+                    created_at, updated_at
+                )
+                SELECT name, description, barcode, category_id, COALESCE(unit_price, 0),
+                       COALESCE(purchase_price, 0),
+                       CASE WHEN purchase_price > 0
+                            THEN (COALESCE(unit_price, 0) - purchase_price) * 100.0 / purchase_price
+                       END,
+                       COALESCE(stock, 0), COALESCE(min_stock, 0), COALESCE(has_variants, 0),
+                       image_path, ?, ?
+                FROM temp.ImportProducts
+                WHERE product_id IS NULL
+                ORDER BY line
+                ON CONFLICT(name) DO NOTHING
+            """, (now, now))
+        cursor.execute("""
+            INSERT INTO StockMovements (
+                product_id, variant_id, movement_type, quantity,
+                unit_price, reference, user_id, created_at
+            )
+            SELECT id, NULL, 'adjustment_in', stock, purchase_price, 'Stock initial', ?, ?
+            FROM Products
+            WHERE id > ? AND stock > 0
+        """, (self.user_id, now, last_id))
+        cursor.execute("""
+            SELECT p.id, p.name
+            FROM Products p
+            JOIN temp.ImportProducts s ON p.name = s.name
+            WHERE s.product_id IS NULL
+        """)
+        return {row['name']: row['id'] for row in cursor.fetchall()}
+
+    def _write_variants(self, cursor, chunk_variants, new_ids, report):
+        """Update the matched variants and insert the new ones.
+
+        Returns the rows of the created variants, for the variant maps, and
+        the number of updated ones.
+        """
+        updates, inserts = [], {}
+        for key, variant_rows in chunk_variants.items():
+            product_id = key if isinstance(key, int) else new_ids.get(key[1])
+            if product_id is None:
+                continue
+            variant_updates, new_variants = self._prepare_variants(product_id, variant_rows, report)
+            updates.extend(variant_updates)
+            if new_variants:
+                inserts.setdefault(product_id, []).extend(new_variants)
+
+        if updates:
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            cursor.executemany("""
+                INSERT INTO StockMovements (
+                    product_id, variant_id, movement_type, quantity,
+                    unit_price, reference, user_id, created_at
+                )
+                SELECT product_id, id,
+                       CASE WHEN ?1 > COALESCE(stock, 0) THEN 'adjustment_in' ELSE 'adjustment_out' END,
+                       ABS(?1 - COALESCE(stock, 0)), purchase_price, 'Importation', ?2, ?3
+                FROM ProductVariants
+                WHERE id = ?4 AND ?1 != COALESCE(stock, 0)
+            """, [
+                (values['stock'], self.user_id, now, variant_id)
+                for variant_id, values in updates if values['stock'] is not None
+            ])
+            cursor.executemany("""
+                UPDATE ProductVariants
+                SET price_adjustment = COALESCE(?, price_adjustment),
+                    stock = COALESCE(?, stock),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, [(values['price_adjustment'], values['stock'], variant_id) for variant_id, values in updates])
+            # Name and attributes are indexed for search: only where they
+            # change. The export writes the display name, which is not a rename.
+            renamed = [
+                (values['name'], json.dumps(values['attribute_values']) if values['attribute_values'] else None, variant_id)
+                for variant_id, values in updates if values['name'] or values['attribute_values']
+            ]
+            cursor.executemany("""
+                UPDATE ProductVariants
+                SET name = CASE WHEN ?1 IS NULL OR ?1 IS display_name THEN name ELSE ?1 END,
+                    attribute_values = COALESCE(?2, attribute_values)
+                WHERE id = ?3
+                  AND ((?1 IS NOT NULL AND ?1 IS NOT name AND ?1 IS NOT display_name)
+                       OR (?2 IS NOT NULL AND ?2 IS NOT attribute_values))
+            """, renamed)
+            VariantIndex.refresh(cursor, [variant_id for _, _, variant_id in renamed])
+
+        created = []
+        if inserts:
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            variant_ids = []
+            with ProductSearch.bulk_variant_insert(cursor, list(inserts)):
+                for product_id, new_variants in inserts.items():
+                    variant_ids.extend(Product._insert_variants(
+                        cursor, product_id, new_variants, self.user_id, now, self.taken_codes
+                    ))
+            cursor.executemany(
+                "UPDATE Products SET has_variants = 1 WHERE id = ? AND NOT has_variants",
+                [(product_id,) for product_id in inserts]
+            )
+            # Read back the stored codes: empty SKUs and barcodes are generated
+            for i in range(0, len(variant_ids), 900):
+                batch = variant_ids[i:i + 900]
+                cursor.execute(f"""
+                    SELECT id, product_id, sku, barcode, attribute_values
+                    FROM ProductVariants WHERE id IN ({', '.join('?' for _ in batch)})
+                """, batch)
+                created.extend(cursor.fetchall())
+        return created, len(updates)
@@ -0,0 +1,284 @@
+from database import get_connection
+from contextlib import contextmanager
+import re
+
+# unicode61 folds Latin accents (remove_diacritics 2) but keeps the Arabic
+# marks: harakat, superscript alef and tatweel are stripped and the hamza
+# forms of alef folded to a bare alef, both when indexing and when querying.
+ARABIC_MARKS = [chr(code) for code in range(0x064B, 0x0653)] + ['ٰ', 'ـ']
+ARABIC_LETTER_FOLDS = {'آ': 'ا', 'أ': 'ا', 'إ': 'ا'}
+
+# Suspended by bulk_product_insert() and bulk_variant_insert()
+PRODUCT_INSERT_TRIGGER = 'trg_products_search_insert'
+VARIANT_INSERT_TRIGGER = 'trg_variants_search_insert'
+
+
+def fold_text(text):
+    """Python counterpart of fold_sql(), applied to search input"""
+    for mark in ARABIC_MARKS:
+        text = text.replace(mark, '')
+    for letter, folded in ARABIC_LETTER_FOLDS.items():
+        text = text.replace(letter, folded)
+    return text
+
+
+def fold_sql(expr):
+    """Wrap a SQL text expression in the REPLACE() calls that fold Arabic marks.
+
+    Plain SQL (no application function) so the triggers also work for
+    connections opened outside the application.
+    """
+    for mark in ARABIC_MARKS:
+        expr = f"REPLACE({expr}, char({ord(mark)}), '')"
+    for letter, folded in ARABIC_LETTER_FOLDS.items():
+        expr = f"REPLACE({expr}, char({ord(letter)}), char({ord(folded)}))"
+    return expr
+
+
+def variant_text_sql(product_id):
+    """SQL expression concatenating the variant names, SKUs and attribute values of a product"""
+    return fold_sql(f"""(
+        SELECT group_concat(
+            COALESCE(pv.name, '') || ' ' || COALESCE(pv.sku, '') || ' ' || COALESCE((
+                SELECT group_concat(j.value, ' ')
+                FROM json_each(CASE WHEN json_valid(pv.attribute_values) THEN pv.attribute_values ELSE '{{}}' END) j
+            ), ''),
+            ' ')
+        FROM ProductVariants pv
+        WHERE pv.product_id = {product_id}
+    )""")
+
+
+def document_select_sql(alias):
+    """SELECT producing the search document of the product row `alias`"""
+    return f"""
+        SELECT {alias}.id,
+               {fold_sql(f"{alias}.name")},
+               {fold_sql(f"{alias}.description")},
+               {alias}.barcode,
+               {fold_sql(f"(SELECT name FROM Categories WHERE id = {alias}.category_id)")},
+               {variant_text_sql(f"{alias}.id")}
+    """
+
+
+class ProductSearch:
+    """Full-text product search (FTS5) kept in sync with the catalog by triggers.
+
+    The rowid of the ProductSearch table is the product id.
+    """
+
+    @staticmethod
+    def schema_statements():
+        """DDL of the FTS table and of its synchronisation triggers"""
+        insert_new = f"""
+            INSERT INTO ProductSearch (rowid, name, description, barcode, category_name, variant_names)
+            {document_select_sql('new')} ;
+        """
+        return [
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS ProductSearch USING fts5(
+                name, description, barcode, category_name, variant_names,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_products_search_insert
+            AFTER INSERT ON Products
+            BEGIN
+                {insert_new}
+            END
+            """,
+            # Stock and price updates do not touch the index
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_products_search_update
+            AFTER UPDATE OF name, description, barcode, category_id ON Products
+            BEGIN
+                DELETE FROM ProductSearch WHERE rowid = old.id;
+                {insert_new}
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_products_search_delete
+            AFTER DELETE ON Products
+            BEGIN
+                DELETE FROM ProductSearch WHERE rowid = old.id;
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_variants_search_insert
+            AFTER INSERT ON ProductVariants
+            BEGIN
+                UPDATE ProductSearch SET variant_names = {variant_text_sql('new.product_id')}
+                WHERE rowid = new.product_id;
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_variants_search_update
+            AFTER UPDATE OF name, sku, attribute_values, product_id ON ProductVariants
+            BEGIN
+                UPDATE ProductSearch SET variant_names = {variant_text_sql('old.product_id')}
+                WHERE rowid = old.product_id;
+                UPDATE ProductSearch SET variant_names = {variant_text_sql('new.product_id')}
+                WHERE rowid = new.product_id;
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_variants_search_delete
+            AFTER DELETE ON ProductVariants
+            BEGIN
+                UPDATE ProductSearch SET variant_names = {variant_text_sql('old.product_id')}
+                WHERE rowid = old.product_id;
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_categories_search_update
+            AFTER UPDATE OF name ON Categories
+            BEGIN
+                UPDATE ProductSearch SET category_name = {fold_sql('new.name')}
+                WHERE rowid IN (SELECT id FROM Products WHERE category_id = new.id);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_categories_search_delete
+            AFTER DELETE ON Categories
+            BEGIN
+                UPDATE ProductSearch SET category_name = NULL
+                WHERE rowid IN (SELECT id FROM Products WHERE category_id = old.id);
+            END
+            """,
+        ]
+
+    @staticmethod
+    @contextmanager
+    def _suspended(cursor, trigger):
+        """Drop a synchronisation trigger for the block, then recreate it.
+
+        Yields False when the trigger does not exist, e.g. because an outer
+        block already suspended it. The trigger is recreated even when the
+        block raises, in case the caller catches the error and commits.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?", (trigger,))
+        if not cursor.fetchone():
+            yield False
+            return
+
+        cursor.execute(f"DROP TRIGGER {trigger}")
+        try:
+            yield True
+        finally:
+            for statement in ProductSearch.schema_statements():
+                if trigger in statement:
+                    cursor.execute(statement)
+
+    @staticmethod
+    @contextmanager
+    def bulk_product_insert(cursor):
+        """Insert many products without the per-row index trigger.
+
+        The products created inside the block (and the caller's transaction)
+        are indexed afterwards with one INSERT ... SELECT.
+        """
+        cursor.execute("SELECT COALESCE(MAX(id), 0) as last_id FROM Products")
+        last_id = cursor.fetchone()['last_id']
+        with ProductSearch._suspended(cursor, PRODUCT_INSERT_TRIGGER) as suspended:
+            yield
+        if suspended:
+            cursor.execute(f"""
+                INSERT INTO ProductSearch (rowid, name, description, barcode, category_name, variant_names)
+                {document_select_sql('p')}
+                FROM Products p
+                WHERE p.id > ?
+            """, (last_id,))
+
+    @staticmethod
+    @contextmanager
+    def bulk_variant_insert(cursor, product_ids):
+        """Insert many variants without the per-row index trigger.
+
+        trg_variants_search_insert re-reads every variant of the product for
+        each inserted row; inside this block it is suspended and the variant
+        text of the given products is indexed once at the end. A nested
+        block leaves the re-indexing to the outer one.
+        """
+        with ProductSearch._suspended(cursor, VARIANT_INSERT_TRIGGER) as suspended:
+            yield
+        if suspended:
+            cursor.executemany(f"""
+                UPDATE ProductSearch SET variant_names = {variant_text_sql('?1')}
+                WHERE rowid = ?1
+            """, [(product_id,) for product_id in dict.fromkeys(product_ids)])
+
+    @staticmethod
+    def rebuild_with_cursor(cursor):
+        """Repopulate the index from Products inside the caller's transaction"""
+        cursor.execute("DELETE FROM ProductSearch")
+        cursor.execute(f"""
+            INSERT INTO ProductSearch (rowid, name, description, barcode, category_name, variant_names)
+            {document_select_sql('p')}
+            FROM Products p
+        """)
+
+    @staticmethod
+    def rebuild():
+        """Repopulate the index from Products"""
+        conn = get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN TRANSACTION")
+                ProductSearch.rebuild_with_cursor(cursor)
+                cursor.execute("COMMIT")
+                return True
+            except Exception as e:
+                cursor.execute("ROLLBACK")
+                print(f"Error rebuilding product search index: {e}")
+                return False
+            finally:
+                conn.close()
+        return False
+
+    @staticmethod
+    def build_match(query):
+        """Turn user input into an FTS5 query: every word is a prefix, all must match"""
+        words = re.findall(r"\w+", fold_text(query or ""))
+        return " ".join(f'"{word}"*' for word in words)
+
+    @staticmethod
+    def search(query, limit=50, offset=0):
+        """Products matching `query`, best match first, one page at a time"""
+        match = ProductSearch.build_match(query)
+        if not match:
+            return []
+
+        conn = get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                # bm25() weights in column order: name, description, barcode, category, variants
+                cursor.execute("""
+                    SELECT
+                        p.id,
+                        p.name,
+                        p.barcode,
+                        COALESCE(p.unit_price, 0) as unit_price,
+                        COALESCE(p.stock, 0) as stock,
+                        p.image_path,
+                        p.category_id,
+                        p.has_variants,
+                        COALESCE(c.name, 'Non catégorisé') as category_name,
+                        bm25(ProductSearch, 10.0, 1.0, 8.0, 3.0, 4.0) as rank
+                    FROM ProductSearch
+                    JOIN Products p ON p.id = ProductSearch.rowid
+                    LEFT JOIN Categories c ON p.category_id = c.id
+                    WHERE ProductSearch MATCH ?
+                    ORDER BY rank
+                    LIMIT ? OFFSET ?
+                """, (match, limit, offset))
+                return cursor.fetchall()
+            except Exception as e:
+                print(f"Error searching products: {e}")
+                return []
+            finally:
+                conn.close()
+        return []
@@ -0,0 +1,370 @@
+from database import get_connection
+from models.settings import SettingsStore
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+import os
+import threading
+
+# ESC/POS commands
+ESC_INIT = b'\x1b@'
+ESC_CODE_PAGE_CP858 = b'\x1bt\x13'
+ESC_ALIGN_LEFT = b'\x1ba\x00'
+ESC_ALIGN_CENTER = b'\x1ba\x01'
+ESC_ALIGN_RIGHT = b'\x1ba\x02'
+ESC_BOLD_ON = b'\x1bE\x01'
+ESC_BOLD_OFF = b'\x1bE\x00'
+GS_SIZE_NORMAL = b'\x1d!\x00'
+GS_SIZE_DOUBLE = b'\x1d!\x11'
+GS_CUT = b'\x1dVB\x00'   # feed then partial cut
+GS_RASTER = b'\x1dv0\x00'  # + width in bytes, height in dots (little endian), bitmap
+
+THERMAL_ENCODING = 'cp858'
+
+# Characters and dots per line of the thermal formats
+LINE_WIDTHS = {'thermal_58': 32, 'thermal_80': 48}
+DOT_WIDTHS = {'thermal_58': 384, 'thermal_80': 576}
+# Rows per raster command, below the buffer limit of common printers
+RASTER_BAND_HEIGHT = 256
+PDF_LOGO_WIDTH = 150
+
+
+def load_receipt_settings():
+    """Settings used on receipts, as a {key: value} dict (from the settings store)"""
+    return SettingsStore.instance().all()
+
+
+def load_receipt(sale_id):
+    """(sale, items) of a sale for printing; (None, []) if it does not exist"""
+    conn = get_connection()
+    if conn:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT s.*, u.username
+                FROM Sales s
+                LEFT JOIN Users u ON s.user_id = u.id
+                WHERE s.id = ?
+            """, (sale_id,))
+            sale = cursor.fetchone()
+            cursor.execute("""
+                SELECT si.*, p.name as product_name
+                FROM SaleItems si
+                JOIN Products p ON si.product_id = p.id
+                WHERE si.sale_id = ?
+                ORDER BY si.id
+            """, (sale_id,))
+            return sale, cursor.fetchall()
+        except Exception as e:
+            print(f"Error loading receipt of sale {sale_id}: {e}")
+            return None, []
+        finally:
+            conn.close()
+    return None, []
+
+
+def encode_thermal(text):
+    return text.encode(THERMAL_ENCODING, errors='replace')
+
+
+def columns(left, right, width):
+    """One receipt line with `left` and `right` pushed to both edges"""
+    space = width - len(right) - 1
+    return f"{left[:space]:<{space}} {right}"
+
+
+def logo_path(settings):
+    """Receipt logo file from the settings, if it exists"""
+    path = settings.get('receipt_logo_path') or settings.get('receipt_logo')
+    return path if path and os.path.exists(path) else None
+
+
+def rasterize_logo(path, max_width):
+    """ESC/POS raster commands printing an image, scaled down to max_width dots"""
+    from PIL import Image as PILImage, ImageOps
+
+    with PILImage.open(path) as source:
+        image = source.convert('L')
+    if image.width > max_width:
+        image = image.resize((max_width, max(1, image.height * max_width // image.width)))
+    # Pad to whole bytes; in the inverted 1-bit image a set bit is a black dot
+    width = (image.width + 7) // 8 * 8
+    if width != image.width:
+        padded = PILImage.new('L', (width, image.height), 255)
+        padded.paste(image, (0, 0))
+        image = padded
+    bitmap = ImageOps.invert(image).convert('1').tobytes()
+
+    row_bytes = width // 8
+    out = bytearray()
+    for top in range(0, image.height, RASTER_BAND_HEIGHT):
+        rows = min(RASTER_BAND_HEIGHT, image.height - top)
+        out += GS_RASTER + row_bytes.to_bytes(2, 'little') + rows.to_bytes(2, 'little')
+        out += bitmap[top * row_bytes:(top + rows) * row_bytes]
+    return bytes(out)
+
+
+class ReceiptTemplate:
+    """The static parts of a receipt, compiled once from the receipt settings.
+
+    Holds the ESC/POS header (logo raster included) and footer as ready
+    byte blocks, the logo size and the ReportLab styles, so rendering a sale
+    only formats its own lines. get() recompiles only when one of the
+    receipt settings (or the logo file) changed.
+    """
+
+    SETTING_KEYS = (
+        'store_name', 'store_address', 'store_phone', 'store_email', 'currency',
+        'receipt_footer', 'receipt_printer_type', 'receipt_logo_path', 'receipt_logo'
+    )
+
+    _cache = None
+    _cache_key = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(settings):
+        path = logo_path(settings)
+        return tuple(settings.get(key) for key in ReceiptTemplate.SETTING_KEYS) + (
+            os.path.getmtime(path) if path else None,
+        )
+
+    @staticmethod
+    def get(settings=None):
+        """Compiled template of the current receipt settings"""
+        if settings is None:
+            settings = load_receipt_settings()
+        key = ReceiptTemplate.cache_key(settings)
+        with ReceiptTemplate._lock:
+            if ReceiptTemplate._cache is None or ReceiptTemplate._cache_key != key:
+                ReceiptTemplate._cache = ReceiptTemplate(settings)
+                ReceiptTemplate._cache_key = key
+            return ReceiptTemplate._cache
+
+    @staticmethod
+    def invalidate():
+        with ReceiptTemplate._lock:
+            ReceiptTemplate._cache = None
+
+    def __init__(self, settings):
+        printer_type = settings.get('receipt_printer_type')
+        self.width = LINE_WIDTHS.get(printer_type, LINE_WIDTHS['thermal_80'])
+        self.currency = settings.get('currency') or 'MAD'
+        self.separator = encode_thermal("-" * self.width + "\n")
+        self.store_name = settings.get('store_name') or 'My Store'
+        self.store_address = settings.get('store_address') or ''
+        self.store_phone = settings.get('store_phone') or ''
+        self.store_email = settings.get('store_email') or ''
+        self.footer_text = settings.get('receipt_footer') or 'Merci pour votre achat!'
+
+        self.logo_path = logo_path(settings)
+        self.logo_raster = b''
+        self.logo_size = None
+        if self.logo_path:
+            try:
+                from PIL import Image as PILImage
+                with PILImage.open(self.logo_path) as logo:
+                    self.logo_size = logo.size
+                self.logo_raster = rasterize_logo(
+                    self.logo_path, DOT_WIDTHS.get(printer_type, DOT_WIDTHS['thermal_80'])
+                )
+            except Exception as e:
+                print(f"Error loading receipt logo: {e}")
+                self.logo_path = None
+
+        self.thermal_header = self._compile_thermal_header()
+        self.thermal_footer = (
+            ESC_ALIGN_CENTER + encode_thermal(f"{self.footer_text}\n") + b"\n\n\n" + GS_CUT
+        )
+        self._compile_pdf_styles()
+
+    def _compile_thermal_header(self):
+        out = bytearray(ESC_INIT + ESC_CODE_PAGE_CP858 + ESC_ALIGN_CENTER)
+        if self.logo_raster:
+            out += self.logo_raster + b"\n"
+        out += GS_SIZE_DOUBLE + encode_thermal(f"{self.store_name}\n") + GS_SIZE_NORMAL
+        if self.store_address:
+            out += encode_thermal(f"{self.store_address}\n")
+        if self.store_phone:
+            out += encode_thermal(f"Tél: {self.store_phone}\n")
+        out += b"\n" + ESC_ALIGN_LEFT
+        return bytes(out)
+
+    def _compile_pdf_styles(self):
+        styles = getSampleStyleSheet()
+        self.store_name_style = ParagraphStyle(
+            'StoreNameStyle',
+            parent=styles['Title'],
+            alignment=1,  # Center alignment
+            fontSize=18
+        )
+        self.store_info_style = ParagraphStyle(
+            'StoreInfoStyle',
+            parent=styles['Normal'],
+            alignment=1,  # Center alignment
+            fontSize=10
+        )
+        self.receipt_style = ParagraphStyle(
+            'ReceiptStyle',
+            parent=styles['Normal'],
+            fontSize=10
+        )
+        self.footer_style = ParagraphStyle(
+            'FooterStyle',
+            parent=styles['Normal'],
+            alignment=1,  # Center alignment
+            fontSize=10
+        )
+        self.items_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('ALIGN', (1, 1), (1, -1), 'CENTER'),
+            ('ALIGN', (2, 1), (3, -1), 'RIGHT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ])
+        self.totals_table_style = TableStyle([
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+            ('LINEABOVE', (0, -1), (-1, -1), 1, colors.black),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ])
+        self.totals_wrapper_style = TableStyle([
+            ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
+        ])
+
+        contact_parts = []
+        if self.store_phone:
+            contact_parts.append(f"Tél: {self.store_phone}")
+        if self.store_email:
+            contact_parts.append(f"Email: {self.store_email}")
+        self.contact_text = " | ".join(contact_parts)
+
+    def render_thermal(self, sale, items):
+        """ESC/POS bytes of a thermal receipt, sent to the printer in one write"""
+        width = self.width
+        currency = self.currency
+        parts = [
+            self.thermal_header,
+            encode_thermal(
+                f"Reçu #: {sale['id']}\n"
+                f"Date: {sale['created_at']}\n"
+                f"Caissier: {sale.get('username') or ''}\n"
+            ),
+            self.separator,
+        ]
+
+        # Items
+        lines = []
+        for item in items:
+            lines.append(f"{item['product_name']}\n")
+            lines.append(columns(
+                f"  {item['quantity']} x {item['unit_price']:.2f}",
+                f"{item['subtotal']:.2f}",
+                width
+            ) + "\n")
+        parts.append(encode_thermal("".join(lines)))
+        parts.append(self.separator)
+
+        # Totals
+        totals = [columns("Sous-total:", f"{sale['total_amount']:.2f} {currency}", width)]
+        if (sale.get('discount') or 0) > 0:
+            totals.append(columns("Remise:", f"{sale['discount']:.2f} {currency}", width))
+        if (sale.get('tax_amount') or 0) > 0:
+            totals.append(columns("TVA:", f"{sale['tax_amount']:.2f} {currency}", width))
+        parts.append(encode_thermal("\n".join(totals) + "\n"))
+        parts.append(ESC_BOLD_ON)
+        parts.append(encode_thermal(columns("Total:", f"{sale['final_total']:.2f} {currency}", width) + "\n"))
+        parts.append(ESC_BOLD_OFF)
+        parts.append(encode_thermal(f"Mode de paiement: {sale.get('payment_method') or ''}\n\n"))
+
+        parts.append(self.thermal_footer)
+        return b"".join(parts)
+
+    def render_pdf(self, output_path, sale, items):
+        """Write the A4 PDF receipt of a sale and return its path"""
+        doc = SimpleDocTemplate(
+            output_path,
+            pagesize=A4,
+            rightMargin=20,
+            leftMargin=20,
+            topMargin=20,
+            bottomMargin=20
+        )
+        content = []
+
+        # Header
+        if self.logo_size:
+            logo_width, logo_height = self.logo_size
+            content.append(Image(self.logo_path, width=PDF_LOGO_WIDTH,
+                                 height=PDF_LOGO_WIDTH * logo_height / logo_width))
+            content.append(Spacer(1, 10))
+        content.append(Paragraph(self.store_name, self.store_name_style))
+        content.append(Spacer(1, 10))
+        if self.store_address:
+            content.append(Paragraph(self.store_address, self.store_info_style))
+            content.append(Spacer(1, 5))
+        if self.contact_text:
+            content.append(Paragraph(self.contact_text, self.store_info_style))
+            content.append(Spacer(1, 10))
+
+        # Receipt details
+        content.append(Paragraph(f"Reçu #: {sale['id']}", self.receipt_style))
+        content.append(Paragraph(f"Date: {sale['created_at']}", self.receipt_style))
+        content.append(Paragraph(f"Caissier: {sale['username']}", self.receipt_style))
+        content.append(Spacer(1, 15))
+
+        # Items table
+        data = [['Produit', 'Qté', 'Prix', 'Total']]
+        for item in items:
+            data.append([
+                item['product_name'],
+                str(item['quantity']),
+                f"{item['unit_price']:.2f}",
+                f"{item['subtotal']:.2f}"
+            ])
+        table = Table(data, colWidths=[250, 50, 70, 70])
+        table.setStyle(self.items_table_style)
+        content.append(table)
+        content.append(Spacer(1, 15))
+
+        # Totals
+        currency = self.currency
+        totals_data = [['Sous-total:', f"{sale['total_amount']:.2f} {currency}"]]
+        if sale['discount'] > 0:
+            totals_data.append(['Remise:', f"{sale['discount']:.2f} {currency}"])
+        if sale['tax_amount'] > 0:
+            totals_data.append(['TVA:', f"{sale['tax_amount']:.2f} {currency}"])
+        totals_data.append(['Total:', f"{sale['final_total']:.2f} {currency}"])
+
+        totals_table = Table(totals_data, colWidths=[100, 100])
+        totals_table.setStyle(self.totals_table_style)
+
+        # Right-align the totals table
+        totals_wrapper = Table([[totals_table]], colWidths=[440])
+        totals_wrapper.setStyle(self.totals_wrapper_style)
+        content.append(totals_wrapper)
+        content.append(Spacer(1, 20))
+
+        # Payment method
+        content.append(Paragraph(f"Mode de paiement: {sale['payment_method']}", self.receipt_style))
+        content.append(Spacer(1, 15))
+
+        # Footer
+        content.append(Paragraph(self.footer_text, self.footer_style))
+
+        doc.build(content)
+        return output_path
+
+
+def render_thermal(sale, items, settings=None):
+    """ESC/POS bytes of a thermal receipt"""
+    return ReceiptTemplate.get(settings).render_thermal(sale, items)
+
+
+def render_pdf(output_path, sale, items, settings=None):
+    """Write the A4 PDF receipt of a sale and return its path"""
+    return ReceiptTemplate.get(settings).render_pdf(output_path, sale, items)
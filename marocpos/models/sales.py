@@ -1,4 +1,6 @@
 from database import get_connection
+from models.sales_rollup import SalesRollup, VOIDED_STATUS
+from models.catalog_cache import CatalogCache
 from datetime import datetime, UTC
 from escpos.printer import Usb
 from reportlab.pdfgen import canvas
@@ -8,52 +10,6 @@ from PIL import Image
 import os
 
 class Sales:
-    @staticmethod
-    def create_tables():
-        conn = get_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                
-                # Create Sales table
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS Sales (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        created_at TIMESTAMP NOT NULL,
-                        user_id INTEGER NOT NULL,
-                        total_amount REAL NOT NULL,
-                        discount REAL DEFAULT 0,
-                        tax_amount REAL DEFAULT 0,
-                        final_total REAL NOT NULL,
-                        payment_method TEXT DEFAULT 'CASH',
-                        payment_status TEXT DEFAULT 'COMPLETED',
-                        notes TEXT,
-                        FOREIGN KEY (user_id) REFERENCES Users(id)
-                    )
-                """)
-
-                # Create SaleItems table
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS SaleItems (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        sale_id INTEGER NOT NULL,
-                        product_id INTEGER NOT NULL,
-                        quantity REAL NOT NULL,
-                        unit_price REAL NOT NULL,
-                        subtotal REAL NOT NULL,
-                        FOREIGN KEY (sale_id) REFERENCES Sales(id),
-                        FOREIGN KEY (product_id) REFERENCES Products(id)
-                    )
-                """)
-
-                conn.commit()
-                return True
-            except Exception as e:
-                print(f"Error creating sales tables: {e}")
-                return False
-            finally:
-                conn.close()
-
     @staticmethod
     def create_sale(user_id, items, payment_method='CASH', discount=0, tax_rate=0):
         conn = get_connection()
@@ -104,7 +60,10 @@ class Sales:
                         WHERE id = ?
                     """, (item['quantity'], item['product_id']))
 
+                SalesRollup.record_sale(cursor, sale_id)
+
                 cursor.execute("COMMIT")
+                CatalogCache.invalidate([item['product_id'] for item in items])
                 return sale_id
 
             except Exception as e:
@@ -115,19 +74,79 @@ class Sales:
                 conn.close()
         return None
 
-class ReceiptPrinter:
-    def __init__(self):
-        self.load_settings()
-
-    def load_settings(self):
+    @staticmethod
+    def void_sale(sale_id, user_id=None, reason=None):
+        """Void a sale: restore stock, log the returns and update the rollups"""
         conn = get_connection()
         if conn:
             try:
                 cursor = conn.cursor()
-                cursor.execute("SELECT key, value FROM Settings")
-                self.settings = dict(cursor.fetchall())
+                cursor.execute("BEGIN TRANSACTION")
+
+                cursor.execute("SELECT payment_status FROM Sales WHERE id = ?", (sale_id,))
+                sale = cursor.fetchone()
+                if not sale or sale['payment_status'] == VOIDED_STATUS:
+                    cursor.execute("ROLLBACK")
+                    return False
+
+                cursor.execute("""
+                    UPDATE Sales 
+                    SET payment_status = ?, 
+                        notes = COALESCE(notes || ' - ', '') || ?
+                    WHERE id = ?
+                """, (VOIDED_STATUS, reason or 'Vente annulée', sale_id))
+
+                cursor.execute("""
+                    SELECT product_id, variant_id, quantity, unit_price
+                    FROM SaleItems
+                    WHERE sale_id = ?
+                """, (sale_id,))
+                items = cursor.fetchall()
+                for item in items:
+                    if item['variant_id']:
+                        cursor.execute("""
+                            UPDATE ProductVariants 
+                            SET stock = stock + ? 
+                            WHERE id = ?
+                        """, (item['quantity'], item['variant_id']))
+                    else:
+                        cursor.execute("""
+                            UPDATE Products 
+                            SET stock = stock + ? 
+                            WHERE id = ?
+                        """, (item['quantity'], item['product_id']))
+
+                    cursor.execute("""
+                        INSERT INTO StockMovements (
+                            product_id, variant_id, movement_type, quantity,
+                            unit_price, reference, user_id
+                        ) VALUES (?, ?, 'return', ?, ?, ?, ?)
+                    """, (
+                        item['product_id'], item['variant_id'], item['quantity'],
+                        item['unit_price'], f"Vente #{sale_id}", user_id
+                    ))
+
+                SalesRollup.reverse_sale(cursor, sale_id)
+
+                cursor.execute("COMMIT")
+                CatalogCache.invalidate([item['product_id'] for item in items])
+                return True
+
+            except Exception as e:
+                cursor.execute("ROLLBACK")
+                print(f"Error voiding sale: {e}")
+                return False
             finally:
                 conn.close()
+        return False
+
+class ReceiptPrinter:
+    def __init__(self):
+        self.load_settings()
+
+    def load_settings(self):
+        from models.settings import SettingsStore
+        self.settings = SettingsStore.instance().all()
 
     def get_sale_data(self, sale_id):
         conn = get_connection()
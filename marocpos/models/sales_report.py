@@ -1,11 +1,88 @@
 from database import get_connection
+from models.sales_rollup import VOIDED_STATUS
 from datetime import datetime, timedelta
-import json
 import sqlite3
 
+# Raw-row queries skip voided sales, like the rollups they are shown with
+NOT_VOIDED = f"COALESCE(s.payment_status, '') != '{VOIDED_STATUS}'"
+
 class SalesReport:
     """Class to generate and manage sales reports"""
     
+    @staticmethod
+    def _rollup_summary(cursor, start_day, end_day):
+        """Sales totals for a day range, read from the hourly rollup"""
+        cursor.execute("""
+            SELECT 
+                COALESCE(SUM(sale_count), 0) as sale_count,
+                SUM(total_sales) as total_sales,
+                SUM(total_sales) / NULLIF(SUM(sale_count), 0) as average_sale,
+                MIN(min_sale) as min_sale,
+                MAX(max_sale) as max_sale,
+                SUM(total_discount) as total_discount
+            FROM SalesHourlyRollup
+            WHERE day BETWEEN ? AND ?
+        """, (start_day, end_day))
+        summary = dict(cursor.fetchone() or {})
+        
+        cursor.execute("""
+            SELECT COALESCE(SUM(quantity_sold), 0) as items_sold
+            FROM ProductDailyRollup
+            WHERE day BETWEEN ? AND ?
+        """, (start_day, end_day))
+        summary['items_sold'] = cursor.fetchone()['items_sold']
+        return summary
+    
+    @staticmethod
+    def _rollup_payment_methods(cursor, start_day, end_day):
+        """Sales by payment method for a day range"""
+        cursor.execute("""
+            SELECT 
+                payment_method,
+                SUM(transaction_count) as transaction_count,
+                SUM(total_amount) as total_amount
+            FROM PaymentMethodDailyRollup
+            WHERE day BETWEEN ? AND ?
+            GROUP BY payment_method
+            ORDER BY total_amount DESC
+        """, (start_day, end_day))
+        return [dict(row) for row in cursor.fetchall()]
+    
+    @staticmethod
+    def _rollup_top_products(cursor, start_day, end_day, limit):
+        """Best selling products for a day range"""
+        cursor.execute("""
+            SELECT 
+                r.product_id,
+                p.name as product_name,
+                SUM(r.quantity_sold) as quantity_sold,
+                SUM(r.total_sales) as total_sales,
+                SUM(r.sale_count) as number_of_sales
+            FROM ProductDailyRollup r
+            JOIN Products p ON r.product_id = p.id
+            WHERE r.day BETWEEN ? AND ?
+            GROUP BY r.product_id
+            ORDER BY quantity_sold DESC
+            LIMIT ?
+        """, (start_day, end_day, limit))
+        return [dict(row) for row in cursor.fetchall()]
+    
+    @staticmethod
+    def _rollup_top_categories(cursor, start_day, end_day):
+        """Sales by category for a day range"""
+        cursor.execute("""
+            SELECT 
+                COALESCE(c.name, 'Non catégorisé') as category_name,
+                SUM(r.items_sold) as items_sold,
+                SUM(r.total_sales) as total_sales
+            FROM CategoryDailyRollup r
+            LEFT JOIN Categories c ON r.category_id = c.id
+            WHERE r.day BETWEEN ? AND ?
+            GROUP BY COALESCE(c.name, 'Non catégorisé')
+            ORDER BY total_sales DESC
+        """, (start_day, end_day))
+        return [dict(row) for row in cursor.fetchall()]
+    
     @staticmethod
     def get_daily_sales(date=None):
         """Get sales data for a specific date, defaults to today"""
@@ -22,22 +99,10 @@ class SalesReport:
                 end_date = f"{date} 23:59:59"
                 
                 # Get total sales data
-                cursor.execute("""
-                    SELECT 
-                        COUNT(*) as sale_count,
-                        SUM(final_total) as total_sales,
-                        AVG(final_total) as average_sale,
-                        MIN(final_total) as min_sale,
-                        MAX(final_total) as max_sale,
-                        SUM(discount) as total_discount
-                    FROM Sales
-                    WHERE created_at BETWEEN ? AND ?
-                """, (start_date, end_date))
-                
-                summary = dict(cursor.fetchone() or {})
+                summary = SalesReport._rollup_summary(cursor, date, date)
                 
                 # Get all sales for the day with details
-                cursor.execute("""
+                cursor.execute(f"""
                     SELECT 
                         s.id, 
                         s.created_at, 
@@ -49,7 +114,7 @@ class SalesReport:
                     FROM Sales s
                     LEFT JOIN Users u ON s.user_id = u.id
                     LEFT JOIN SaleItems si ON s.id = si.sale_id
-                    WHERE s.created_at BETWEEN ? AND ?
+                    WHERE s.created_at BETWEEN ? AND ? AND {NOT_VOIDED}
                     GROUP BY s.id
                     ORDER BY s.created_at
                 """, (start_date, end_date))
@@ -59,68 +124,24 @@ class SalesReport:
                 # Get sales by hour
                 cursor.execute("""
                     SELECT 
-                        strftime('%H', created_at) as hour,
-                        COUNT(*) as sale_count,
-                        SUM(final_total) as total_sales
-                    FROM Sales
-                    WHERE created_at BETWEEN ? AND ?
-                    GROUP BY hour
+                        printf('%02d', hour) as hour,
+                        sale_count,
+                        total_sales
+                    FROM SalesHourlyRollup
+                    WHERE day = ?
                     ORDER BY hour
-                """, (start_date, end_date))
+                """, (date,))
                 
                 hourly_sales = [dict(row) for row in cursor.fetchall()]
                 
                 # Get sales by payment method
-                cursor.execute("""
-                    SELECT 
-                        COALESCE(pm.name, s.payment_method) as payment_method,
-                        COUNT(DISTINCT s.id) as transaction_count,
-                        SUM(COALESCE(sp.amount, s.final_total)) as total_amount
-                    FROM Sales s
-                    LEFT JOIN SalePayments sp ON s.id = sp.sale_id
-                    LEFT JOIN PaymentMethods pm ON sp.payment_method_id = pm.id
-                    WHERE s.created_at BETWEEN ? AND ?
-                    GROUP BY payment_method
-                    ORDER BY total_amount DESC
-                """, (start_date, end_date))
-                
-                payment_methods = [dict(row) for row in cursor.fetchall()]
+                payment_methods = SalesReport._rollup_payment_methods(cursor, date, date)
                 
                 # Top selling products
-                cursor.execute("""
-                    SELECT 
-                        p.id as product_id,
-                        p.name as product_name,
-                        SUM(si.quantity) as quantity_sold,
-                        SUM(si.subtotal) as total_sales,
-                        COUNT(DISTINCT s.id) as number_of_sales
-                    FROM SaleItems si
-                    JOIN Sales s ON si.sale_id = s.id
-                    JOIN Products p ON si.product_id = p.id
-                    WHERE s.created_at BETWEEN ? AND ?
-                    GROUP BY p.id
-                    ORDER BY quantity_sold DESC
-                    LIMIT 10
-                """, (start_date, end_date))
-                
-                top_products = [dict(row) for row in cursor.fetchall()]
+                top_products = SalesReport._rollup_top_products(cursor, date, date, 10)
                 
                 # Top selling categories
-                cursor.execute("""
-                    SELECT 
-                        COALESCE(c.name, 'Non catégorisé') as category_name,
-                        COUNT(DISTINCT si.id) as items_sold,
-                        SUM(si.subtotal) as total_sales
-                    FROM SaleItems si
-                    JOIN Sales s ON si.sale_id = s.id
-                    JOIN Products p ON si.product_id = p.id
-                    LEFT JOIN Categories c ON p.category_id = c.id
-                    WHERE s.created_at BETWEEN ? AND ?
-                    GROUP BY COALESCE(c.name, 'Non catégorisé')
-                    ORDER BY total_sales DESC
-                """, (start_date, end_date))
-                
-                top_categories = [dict(row) for row in cursor.fetchall()]
+                top_categories = SalesReport._rollup_top_categories(cursor, date, date)
                 
                 result = {
                     'date': date,
@@ -148,111 +169,54 @@ class SalesReport:
             try:
                 cursor = conn.cursor()
                 
-                # Format the date strings for comparison if they're not already formatted
-                if not start_date.endswith('00:00:00'):
-                    start_date = f"{start_date} 00:00:00"
-                if not end_date.endswith('23:59:59'):
-                    end_date = f"{end_date} 23:59:59"
+                # Rollups are kept per day: only the date part is used
+                start_day = start_date.split()[0]
+                end_day = end_date.split()[0]
                 
                 # Get total sales data
-                cursor.execute("""
-                    SELECT 
-                        COUNT(*) as sale_count,
-                        SUM(final_total) as total_sales,
-                        AVG(final_total) as average_sale,
-                        MIN(final_total) as min_sale,
-                        MAX(final_total) as max_sale,
-                        SUM(discount) as total_discount
-                    FROM Sales
-                    WHERE created_at BETWEEN ? AND ?
-                """, (start_date, end_date))
-                
-                summary = dict(cursor.fetchone() or {})
+                summary = SalesReport._rollup_summary(cursor, start_day, end_day)
                 
                 # Get sales by day
                 cursor.execute("""
                     SELECT 
-                        date(created_at) as day,
-                        COUNT(*) as sale_count,
-                        SUM(final_total) as total_sales
-                    FROM Sales
-                    WHERE created_at BETWEEN ? AND ?
+                        day,
+                        SUM(sale_count) as sale_count,
+                        SUM(total_sales) as total_sales
+                    FROM SalesHourlyRollup
+                    WHERE day BETWEEN ? AND ?
                     GROUP BY day
                     ORDER BY day
-                """, (start_date, end_date))
+                """, (start_day, end_day))
                 
                 daily_sales = [dict(row) for row in cursor.fetchall()]
                 
                 # Get sales by payment method
-                cursor.execute("""
-                    SELECT 
-                        COALESCE(pm.name, s.payment_method) as payment_method,
-                        COUNT(DISTINCT s.id) as transaction_count,
-                        SUM(COALESCE(sp.amount, s.final_total)) as total_amount
-                    FROM Sales s
-                    LEFT JOIN SalePayments sp ON s.id = sp.sale_id
-                    LEFT JOIN PaymentMethods pm ON sp.payment_method_id = pm.id
-                    WHERE s.created_at BETWEEN ? AND ?
-                    GROUP BY payment_method
-                    ORDER BY total_amount DESC
-                """, (start_date, end_date))
-                
-                payment_methods = [dict(row) for row in cursor.fetchall()]
+                payment_methods = SalesReport._rollup_payment_methods(cursor, start_day, end_day)
                 
                 # Top selling products
-                cursor.execute("""
-                    SELECT 
-                        p.id as product_id,
-                        p.name as product_name,
-                        SUM(si.quantity) as quantity_sold,
-                        SUM(si.subtotal) as total_sales,
-                        COUNT(DISTINCT s.id) as number_of_sales
-                    FROM SaleItems si
-                    JOIN Sales s ON si.sale_id = s.id
-                    JOIN Products p ON si.product_id = p.id
-                    WHERE s.created_at BETWEEN ? AND ?
-                    GROUP BY p.id
-                    ORDER BY quantity_sold DESC
-                    LIMIT 20
-                """, (start_date, end_date))
-                
-                top_products = [dict(row) for row in cursor.fetchall()]
+                top_products = SalesReport._rollup_top_products(cursor, start_day, end_day, 20)
                 
                 # Top selling categories
-                cursor.execute("""
-                    SELECT 
-                        COALESCE(c.name, 'Non catégorisé') as category_name,
-                        COUNT(DISTINCT si.id) as items_sold,
-                        SUM(si.subtotal) as total_sales
-                    FROM SaleItems si
-                    JOIN Sales s ON si.sale_id = s.id
-                    JOIN Products p ON si.product_id = p.id
-                    LEFT JOIN Categories c ON p.category_id = c.id
-                    WHERE s.created_at BETWEEN ? AND ?
-                    GROUP BY COALESCE(c.name, 'Non catégorisé')
-                    ORDER BY total_sales DESC
-                """, (start_date, end_date))
-                
-                top_categories = [dict(row) for row in cursor.fetchall()]
+                top_categories = SalesReport._rollup_top_categories(cursor, start_day, end_day)
                 
                 # Get sales by user
                 cursor.execute("""
                     SELECT 
                         u.username as user,
-                        COUNT(s.id) as sale_count,
-                        SUM(s.final_total) as total_sales
-                    FROM Sales s
-                    JOIN Users u ON s.user_id = u.id
-                    WHERE s.created_at BETWEEN ? AND ?
+                        SUM(r.sale_count) as sale_count,
+                        SUM(r.total_sales) as total_sales
+                    FROM CashierDailyRollup r
+                    JOIN Users u ON r.user_id = u.id
+                    WHERE r.day BETWEEN ? AND ?
                     GROUP BY u.username
                     ORDER BY total_sales DESC
-                """, (start_date, end_date))
+                """, (start_day, end_day))
                 
                 sales_by_user = [dict(row) for row in cursor.fetchall()]
                 
                 result = {
-                    'start_date': start_date.split()[0],
-                    'end_date': end_date.split()[0],
+                    'start_date': start_day,
+                    'end_date': end_day,
                     'summary': summary,
                     'daily_sales': daily_sales,
                     'payment_methods': payment_methods,
@@ -277,7 +241,7 @@ class SalesReport:
             try:
                 cursor = conn.cursor()
                 
-                query = """
+                query = f"""
                     SELECT 
                         p.id as product_id,
                         p.name as product_name,
@@ -292,7 +256,7 @@ class SalesReport:
                     FROM SaleItems si
                     JOIN Sales s ON si.sale_id = s.id
                     JOIN Products p ON si.product_id = p.id
-                    WHERE si.product_id = ?
+                    WHERE si.product_id = ? AND {NOT_VOIDED}
                 """
                 
                 params = [product_id]
@@ -311,7 +275,7 @@ class SalesReport:
                 product_summary = dict(cursor.fetchone() or {})
                 
                 # Get sales by month
-                query = """
+                query = f"""
                     SELECT 
                         strftime('%Y-%m', s.created_at) as month,
                         SUM(si.quantity) as quantity_sold,
@@ -319,7 +283,7 @@ class SalesReport:
                         COUNT(DISTINCT s.id) as number_of_sales
                     FROM SaleItems si
                     JOIN Sales s ON si.sale_id = s.id
-                    WHERE si.product_id = ?
+                    WHERE si.product_id = ? AND {NOT_VOIDED}
                 """
                 
                 params = [product_id]
@@ -346,17 +310,17 @@ class SalesReport:
                 variant_sales = []
                 
                 if has_variants and has_variants.get('has_variants', 0):
-                    query = """
+                    query = f"""
                         SELECT 
                             si.variant_id,
-                            pv.attribute_values,
+                            COALESCE(pv.display_name, 'Variante #' || pv.id) as variant_name,
                             SUM(si.quantity) as quantity_sold,
                             SUM(si.subtotal) as total_sales,
                             COUNT(DISTINCT s.id) as number_of_sales
                         FROM SaleItems si
                         JOIN Sales s ON si.sale_id = s.id
                         JOIN ProductVariants pv ON si.variant_id = pv.id
-                        WHERE si.product_id = ? AND si.variant_id IS NOT NULL
+                        WHERE si.product_id = ? AND si.variant_id IS NOT NULL AND {NOT_VOIDED}
                     """
                     
                     params = [product_id]
@@ -374,27 +338,7 @@ class SalesReport:
                     cursor.execute(query, params)
                     variant_rows = cursor.fetchall()
                     
-                    for row in variant_rows:
-                        variant_data = dict(row)
-                        
-                        # Parse attribute_values
-                        try:
-                            if variant_data.get('attribute_values'):
-                                if isinstance(variant_data['attribute_values'], str):
-                                    variant_data['attributes'] = json.loads(variant_data['attribute_values'])
-                                else:
-                                    variant_data['attributes'] = variant_data['attribute_values']
-                                    
-                                # Create a display name for the variant
-                                if isinstance(variant_data['attributes'], dict):
-                                    variant_data['variant_name'] = " / ".join(str(v) for v in variant_data['attributes'].values() if v)
-                                else:
-                                    variant_data['variant_name'] = f"Variant #{variant_data.get('variant_id', '')}"
-                        except:
-                            variant_data['attributes'] = {}
-                            variant_data['variant_name'] = f"Variant #{variant_data.get('variant_id', '')}"
-                            
-                        variant_sales.append(variant_data)
+                    variant_sales = [dict(row) for row in variant_rows]
                 
                 return {
                     'product': product_summary,
@@ -448,7 +392,7 @@ class SalesReport:
                         pv.id as variant_id,
                         p.id as product_id,
                         p.name as product_name,
-                        pv.attribute_values,
+                        COALESCE(pv.display_name, 'Variante #' || pv.id) as variant_name,
                         pv.stock as current_stock,
                         pv.price_adjustment,
                         COALESCE(p.purchase_price, 0) as base_cost,
@@ -471,23 +415,6 @@ class SalesReport:
                 for row in variants_rows:
                     variant_data = dict(row)
                     
-                    # Parse attribute_values
-                    try:
-                        if variant_data.get('attribute_values'):
-                            if isinstance(variant_data['attribute_values'], str):
-                                variant_data['attributes'] = json.loads(variant_data['attribute_values'])
-                            else:
-                                variant_data['attributes'] = variant_data['attribute_values']
-                                
-                            # Create a display name for the variant
-                            if isinstance(variant_data['attributes'], dict):
-                                variant_data['variant_name'] = " / ".join(str(v) for v in variant_data['attributes'].values() if v)
-                            else:
-                                variant_data['variant_name'] = f"Variant #{variant_data.get('variant_id', '')}"
-                    except:
-                        variant_data['attributes'] = {}
-                        variant_data['variant_name'] = f"Variant #{variant_data.get('variant_id', '')}"
-                        
                     # Calculate stock value
                     variant_price = variant_data.get('variant_price', 0)
                     variant_data['stock_value'] = variant_price * variant_data.get('current_stock', 0)
@@ -535,7 +462,7 @@ class SalesReport:
                 
                 # Format date strings if provided
                 params = []
-                date_filter = ""
+                date_filter = f" AND {NOT_VOIDED}"
                 if start_date:
                     start_date_str = f"{start_date} 00:00:00"
                     params.append(start_date_str)
@@ -685,6 +612,7 @@ class SalesReport:
                         sm.product_id,
                         p.name as product_name,
                         sm.variant_id,
+                        COALESCE(pv.display_name, '') as variant_name,
                         sm.movement_type,
                         sm.quantity,
                         sm.unit_price,
@@ -694,6 +622,7 @@ class SalesReport:
                         sm.created_at
                     FROM StockMovements sm
                     JOIN Products p ON sm.product_id = p.id
+                    LEFT JOIN ProductVariants pv ON sm.variant_id = pv.id
                     LEFT JOIN Users u ON sm.user_id = u.id
                     {where_clause}
                     ORDER BY sm.created_at DESC
@@ -702,42 +631,6 @@ class SalesReport:
                 
                 movements = [dict(row) for row in cursor.fetchall()]
                 
-                # Get variant information for movements with variants
-                variant_movements = [m for m in movements if m.get('variant_id')]
-                
-                if variant_movements:
-                    variant_ids = [m['variant_id'] for m in variant_movements]
-                    placeholders = ','.join(['?'] * len(variant_ids))
-                    
-                    cursor.execute(f"""
-                        SELECT 
-                            pv.id as variant_id,
-                            pv.attribute_values
-                        FROM ProductVariants pv
-                        WHERE pv.id IN ({placeholders})
-                    """, variant_ids)
-                    
-                    variant_data = {row['variant_id']: row for row in cursor.fetchall()}
-                    
-                    # Enhance movement data with variant names
-                    for movement in variant_movements:
-                        variant_id = movement['variant_id']
-                        if variant_id in variant_data:
-                            variant = variant_data[variant_id]
-                            # Parse attribute values
-                            try:
-                                attr_values = variant.get('attribute_values', '{}')
-                                if isinstance(attr_values, str):
-                                    attributes = json.loads(attr_values)
-                                else:
-                                    attributes = attr_values
-                                
-                                if isinstance(attributes, dict):
-                                    variant_name = " / ".join(str(v) for v in attributes.values() if v)
-                                    movement['variant_name'] = variant_name
-                            except:
-                                movement['variant_name'] = f"Variant #{variant_id}"
-                
                 # Calculate summary statistics
                 total_in = sum(m.get('total_quantity', 0) or 0 for m in movement_summary 
                               if m.get('movement_type') in ['purchase', 'adjustment_in', 'return'])
@@ -776,7 +669,7 @@ class SalesReport:
                 
                 # Build query parameters
                 params = []
-                where_conditions = ["s.customer_id IS NOT NULL"]
+                where_conditions = ["s.customer_id IS NOT NULL", NOT_VOIDED]
                 
                 if customer_id:
                     where_conditions.append("s.customer_id = ?")
@@ -827,7 +720,7 @@ class SalesReport:
                             COUNT(si.id) as item_count
                         FROM Sales s
                         LEFT JOIN SaleItems si ON s.id = si.sale_id
-                        WHERE s.customer_id = ?
+                        WHERE s.customer_id = ? AND {NOT_VOIDED}
                         GROUP BY s.id
                         ORDER BY s.created_at DESC
                     """, [customer_id])
@@ -845,7 +738,7 @@ class SalesReport:
                         FROM SaleItems si
                         JOIN Sales s ON si.sale_id = s.id
                         JOIN Products p ON si.product_id = p.id
-                        WHERE s.customer_id = ?
+                        WHERE s.customer_id = ? AND {NOT_VOIDED}
                         GROUP BY p.id
                         ORDER BY quantity_purchased DESC
                         LIMIT 10
@@ -0,0 +1,257 @@
+from database import get_connection
+
+# Sales with this status are excluded from the rollups
+VOIDED_STATUS = 'VOIDED'
+
+
+class SalesRollup:
+    """Pre-aggregated sales tables maintained alongside Sales/SaleItems/SalePayments.
+
+    record_sale() and reverse_sale() take the cursor of the caller's
+    transaction so the rollups change atomically with the sale itself.
+    rebuild() recomputes them from the raw rows (backfill or repair).
+    """
+
+    TABLES = (
+        'SalesHourlyRollup', 'ProductDailyRollup', 'CategoryDailyRollup',
+        'PaymentMethodDailyRollup', 'CashierDailyRollup'
+    )
+
+    @staticmethod
+    def record_sale(cursor, sale_id):
+        """Add a committed sale (header, lines and payments already inserted)"""
+        SalesRollup._apply(cursor, sale_id, 1)
+
+    @staticmethod
+    def reverse_sale(cursor, sale_id):
+        """Remove a voided/returned sale from the rollups"""
+        SalesRollup._apply(cursor, sale_id, -1)
+
+    @staticmethod
+    def _apply(cursor, sale_id, sign):
+        cursor.execute("""
+            SELECT date(created_at) as day,
+                   CAST(strftime('%H', created_at) AS INTEGER) as hour
+            FROM Sales
+            WHERE id = ?
+        """, (sale_id,))
+        sale = cursor.fetchone()
+        if not sale:
+            return
+
+        cursor.execute("""
+            INSERT INTO SalesHourlyRollup (
+                day, hour, sale_count, total_sales, total_discount,
+                total_tax, min_sale, max_sale
+            )
+            SELECT date(created_at), CAST(strftime('%H', created_at) AS INTEGER),
+                   ?, ? * final_total, ? * COALESCE(discount, 0),
+                   ? * COALESCE(tax_amount, 0), final_total, final_total
+            FROM Sales
+            WHERE id = ?
+            ON CONFLICT(day, hour) DO UPDATE SET
+                sale_count = sale_count + excluded.sale_count,
+                total_sales = total_sales + excluded.total_sales,
+                total_discount = total_discount + excluded.total_discount,
+                total_tax = total_tax + excluded.total_tax,
+                min_sale = MIN(min_sale, excluded.min_sale),
+                max_sale = MAX(max_sale, excluded.max_sale)
+        """, (sign, sign, sign, sign, sale_id))
+
+        if sign < 0:
+            # MIN/MAX cannot be decremented: recompute them for this hour only
+            start = f"{sale['day']} {sale['hour']:02d}:00:00"
+            end = f"{sale['day']} {sale['hour']:02d}:59:59"
+            cursor.execute("""
+                UPDATE SalesHourlyRollup
+                SET min_sale = (
+                        SELECT MIN(final_total) FROM Sales
+                        WHERE created_at BETWEEN ? AND ?
+                          AND COALESCE(payment_status, '') != ? AND id != ?
+                    ),
+                    max_sale = (
+                        SELECT MAX(final_total) FROM Sales
+                        WHERE created_at BETWEEN ? AND ?
+                          AND COALESCE(payment_status, '') != ? AND id != ?
+                    )
+                WHERE day = ? AND hour = ?
+            """, (start, end, VOIDED_STATUS, sale_id,
+                  start, end, VOIDED_STATUS, sale_id,
+                  sale['day'], sale['hour']))
+
+        cursor.execute("""
+            INSERT INTO ProductDailyRollup (
+                day, product_id, quantity_sold, total_sales, total_cost, sale_count
+            )
+            SELECT date(s.created_at), si.product_id,
+                   ? * SUM(si.quantity), ? * SUM(si.subtotal),
+                   ? * SUM(si.quantity * COALESCE(si.unit_cost, 0)), ?
+            FROM SaleItems si
+            JOIN Sales s ON si.sale_id = s.id
+            WHERE si.sale_id = ?
+            GROUP BY si.product_id
+            ON CONFLICT(day, product_id) DO UPDATE SET
+                quantity_sold = quantity_sold + excluded.quantity_sold,
+                total_sales = total_sales + excluded.total_sales,
+                total_cost = total_cost + excluded.total_cost,
+                sale_count = sale_count + excluded.sale_count
+        """, (sign, sign, sign, sign, sale_id))
+
+        cursor.execute("""
+            INSERT INTO CategoryDailyRollup (
+                day, category_id, items_sold, quantity_sold, total_sales
+            )
+            SELECT date(s.created_at), COALESCE(p.category_id, 0),
+                   ? * COUNT(si.id), ? * SUM(si.quantity), ? * SUM(si.subtotal)
+            FROM SaleItems si
+            JOIN Sales s ON si.sale_id = s.id
+            JOIN Products p ON si.product_id = p.id
+            WHERE si.sale_id = ?
+            GROUP BY COALESCE(p.category_id, 0)
+            ON CONFLICT(day, category_id) DO UPDATE SET
+                items_sold = items_sold + excluded.items_sold,
+                quantity_sold = quantity_sold + excluded.quantity_sold,
+                total_sales = total_sales + excluded.total_sales
+        """, (sign, sign, sign, sale_id))
+
+        cursor.execute("""
+            INSERT INTO PaymentMethodDailyRollup (
+                day, payment_method, transaction_count, total_amount
+            )
+            SELECT date(s.created_at), COALESCE(pm.name, s.payment_method, 'Autre'),
+                   ? * COUNT(DISTINCT s.id), ? * SUM(COALESCE(sp.amount, s.final_total))
+            FROM Sales s
+            LEFT JOIN SalePayments sp ON s.id = sp.sale_id
+            LEFT JOIN PaymentMethods pm ON sp.payment_method_id = pm.id
+            WHERE s.id = ?
+            GROUP BY COALESCE(pm.name, s.payment_method, 'Autre')
+            ON CONFLICT(day, payment_method) DO UPDATE SET
+                transaction_count = transaction_count + excluded.transaction_count,
+                total_amount = total_amount + excluded.total_amount
+        """, (sign, sign, sale_id))
+
+        cursor.execute("""
+            INSERT INTO CashierDailyRollup (day, user_id, sale_count, total_sales)
+            SELECT date(created_at), user_id, ?, ? * final_total
+            FROM Sales
+            WHERE id = ?
+            ON CONFLICT(day, user_id) DO UPDATE SET
+                sale_count = sale_count + excluded.sale_count,
+                total_sales = total_sales + excluded.total_sales
+        """, (sign, sign, sale_id))
+
+        if sign < 0:
+            SalesRollup._prune(cursor, sale['day'])
+
+    @staticmethod
+    def _prune(cursor, day):
+        """Drop the buckets of a day that no longer hold any sale"""
+        cursor.execute("DELETE FROM SalesHourlyRollup WHERE day = ? AND sale_count <= 0", (day,))
+        cursor.execute("DELETE FROM ProductDailyRollup WHERE day = ? AND sale_count <= 0", (day,))
+        cursor.execute("DELETE FROM CategoryDailyRollup WHERE day = ? AND items_sold <= 0", (day,))
+        cursor.execute("DELETE FROM PaymentMethodDailyRollup WHERE day = ? AND transaction_count <= 0", (day,))
+        cursor.execute("DELETE FROM CashierDailyRollup WHERE day = ? AND sale_count <= 0", (day,))
+
+    @staticmethod
+    def rebuild_with_cursor(cursor, start_day=None, end_day=None):
+        """Recompute the rollups from raw rows inside the caller's transaction"""
+        day_filter = ""
+        params = []
+        if start_day:
+            day_filter += " AND s.created_at >= ?"
+            params.append(f"{start_day} 00:00:00")
+        if end_day:
+            day_filter += " AND s.created_at <= ?"
+            params.append(f"{end_day} 23:59:59")
+
+        delete_filter = ""
+        delete_params = []
+        if start_day:
+            delete_filter += " AND day >= ?"
+            delete_params.append(start_day)
+        if end_day:
+            delete_filter += " AND day <= ?"
+            delete_params.append(end_day)
+        for table in SalesRollup.TABLES:
+            cursor.execute(f"DELETE FROM {table} WHERE 1=1 {delete_filter}", delete_params)
+
+        not_voided = "COALESCE(s.payment_status, '') != ?"
+
+        cursor.execute(f"""
+            INSERT INTO SalesHourlyRollup (
+                day, hour, sale_count, total_sales, total_discount,
+                total_tax, min_sale, max_sale
+            )
+            SELECT date(s.created_at), CAST(strftime('%H', s.created_at) AS INTEGER),
+                   COUNT(*), SUM(s.final_total), SUM(COALESCE(s.discount, 0)),
+                   SUM(COALESCE(s.tax_amount, 0)), MIN(s.final_total), MAX(s.final_total)
+            FROM Sales s
+            WHERE {not_voided} {day_filter}
+            GROUP BY 1, 2
+        """, [VOIDED_STATUS] + params)
+
+        cursor.execute(f"""
+            INSERT INTO ProductDailyRollup (
+                day, product_id, quantity_sold, total_sales, total_cost, sale_count
+            )
+            SELECT date(s.created_at), si.product_id,
+                   SUM(si.quantity), SUM(si.subtotal),
+                   SUM(si.quantity * COALESCE(si.unit_cost, 0)), COUNT(DISTINCT s.id)
+            FROM SaleItems si
+            JOIN Sales s ON si.sale_id = s.id
+            WHERE {not_voided} {day_filter}
+            GROUP BY 1, 2
+        """, [VOIDED_STATUS] + params)
+
+        cursor.execute(f"""
+            INSERT INTO CategoryDailyRollup (
+                day, category_id, items_sold, quantity_sold, total_sales
+            )
+            SELECT date(s.created_at), COALESCE(p.category_id, 0),
+                   COUNT(si.id), SUM(si.quantity), SUM(si.subtotal)
+            FROM SaleItems si
+            JOIN Sales s ON si.sale_id = s.id
+            JOIN Products p ON si.product_id = p.id
+            WHERE {not_voided} {day_filter}
+            GROUP BY 1, 2
+        """, [VOIDED_STATUS] + params)
+
+        cursor.execute(f"""
+            INSERT INTO PaymentMethodDailyRollup (
+                day, payment_method, transaction_count, total_amount
+            )
+            SELECT date(s.created_at), COALESCE(pm.name, s.payment_method, 'Autre'),
+                   COUNT(DISTINCT s.id), SUM(COALESCE(sp.amount, s.final_total))
+            FROM Sales s
+            LEFT JOIN SalePayments sp ON s.id = sp.sale_id
+            LEFT JOIN PaymentMethods pm ON sp.payment_method_id = pm.id
+            WHERE {not_voided} {day_filter}
+            GROUP BY 1, 2
+        """, [VOIDED_STATUS] + params)
+
+        cursor.execute(f"""
+            INSERT INTO CashierDailyRollup (day, user_id, sale_count, total_sales)
+            SELECT date(s.created_at), s.user_id, COUNT(*), SUM(s.final_total)
+            FROM Sales s
+            WHERE {not_voided} {day_filter}
+            GROUP BY 1, 2
+        """, [VOIDED_STATUS] + params)
+
+    @staticmethod
+    def rebuild(start_day=None, end_day=None):
+        """Recompute the rollups from Sales/SaleItems/SalePayments (all days by default)"""
+        conn = get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN TRANSACTION")
+                SalesRollup.rebuild_with_cursor(cursor, start_day, end_day)
+                cursor.execute("COMMIT")
+                return True
+            except Exception as e:
+                cursor.execute("ROLLBACK")
+                print(f"Error rebuilding sales rollups: {e}")
+                return False
+            finally:
+                conn.close()
+        return False
@@ -1,50 +1,168 @@
-from database import get_connection
+from database import DatabaseManager
+import threading
+
+# Keys used on receipts (see ReceiptTemplate.SETTING_KEYS for the full set)
+RECEIPT_SETTING_KEYS = (
+    'store_name', 'store_address', 'store_phone',
+    'store_email', 'receipt_footer', 'receipt_logo'
+)
+
+
+class SettingsStore:
+    """In-memory copy of the Settings table.
+
+    The table is read once; every read after that is a dict lookup. Writes
+    go to the database first and then to memory, bump `version` and call the
+    listeners registered with subscribe(callback), which receive the
+    {key: value} dict of the changed settings (ui.settings_notifier turns
+    this into a Qt signal). Use the shared instance().
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._values = None
+        self._descriptions = {}
+        self._listeners = []
+        self.version = 0
+
+    def _ensure_loaded(self):
+        if self._values is None:
+            self.reload()
+
+    def reload(self):
+        """Re-read the whole table, e.g. after an import or restore"""
+        values, descriptions = {}, {}
+        try:
+            with DatabaseManager.connection() as conn:
+                for row in conn.execute("SELECT key, value, description FROM Settings"):
+                    values[row['key']] = row['value']
+                    descriptions[row['key']] = row['description']
+        except Exception as e:
+            print(f"Error loading settings: {e}")
+            if self._values is not None:
+                return
+        with self._lock:
+            changed = {
+                key: value for key, value in values.items()
+                if self._values is None or self._values.get(key) != value
+            }
+            first_load = self._values is None
+            self._values = values
+            self._descriptions = descriptions
+            self.version += 1
+        if changed and not first_load:
+            self._notify(changed)
+
+    # Reads
+    def get(self, key, default=None):
+        self._ensure_loaded()
+        value = self._values.get(key)
+        return default if value is None else value
+
+    def get_float(self, key, default=0.0):
+        try:
+            return float(self.get(key, default))
+        except (TypeError, ValueError):
+            return default
+
+    def get_bool(self, key, default=False):
+        value = self.get(key)
+        if value is None:
+            return default
+        return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+    def all(self):
+        """Copy of every setting as {key: value}"""
+        self._ensure_loaded()
+        with self._lock:
+            return dict(self._values)
+
+    def description(self, key):
+        self._ensure_loaded()
+        return self._descriptions.get(key)
+
+    @property
+    def tax_rate(self):
+        """Default tax rate, in percent"""
+        return self.get_float('tax_rate', 0.0)
+
+    @property
+    def currency(self):
+        return self.get('currency') or 'MAD'
+
+    # Writes
+    def set(self, key, value):
+        return self.update({key: value})
+
+    def update(self, values):
+        """Save several settings in one transaction; returns False on error"""
+        self._ensure_loaded()
+        values = {key: None if value is None else str(value) for key, value in values.items()}
+        changed = {key: value for key, value in values.items() if self._values.get(key) != value}
+        if not changed:
+            return True
+        try:
+            with DatabaseManager.transaction() as conn:
+                conn.executemany("""
+                    INSERT INTO Settings (key, value) VALUES (?, ?)
+                    ON CONFLICT(key) DO UPDATE
+                    SET value = excluded.value, updated_at = CURRENT_TIMESTAMP
+                """, list(changed.items()))
+        except Exception as e:
+            print(f"Error updating settings: {e}")
+            return False
+        with self._lock:
+            self._values.update(changed)
+            self.version += 1
+        self._notify(changed)
+        return True
+
+    # Change notifications
+    def subscribe(self, callback):
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _notify(self, changed):
+        with self._lock:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(dict(changed))
+            except Exception as e:
+                print(f"Error in settings listener: {e}")
+
 
 class SettingsManager:
     @staticmethod
     def get_all_settings():
-        conn = get_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                cursor.execute("SELECT key, value, description FROM Settings")
-                return cursor.fetchall()
-            finally:
-                conn.close()
-        return []
+        store = SettingsStore.instance()
+        return [
+            {'key': key, 'value': value, 'description': store.description(key)}
+            for key, value in store.all().items()
+        ]
 
     @staticmethod
     def update_setting(key, value):
-        conn = get_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    UPDATE Settings 
-                    SET value = ?, updated_at = CURRENT_TIMESTAMP 
-                    WHERE key = ?
-                """, (value, key))
-                conn.commit()
-                return True
-            finally:
-                conn.close()
-        return False
+        return SettingsStore.instance().set(key, value)
 
     @staticmethod
     def get_receipt_settings():
-        conn = get_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT value 
-                    FROM Settings 
-                    WHERE key IN (
-                        'store_name', 'store_address', 'store_phone',
-                        'store_email', 'receipt_footer', 'receipt_logo'
-                    )
-                """)
-                return dict(cursor.fetchall())
-            finally:
-                conn.close()
-        return {}
\ No newline at end of file
+        store = SettingsStore.instance()
+        return {key: store.get(key) for key in RECEIPT_SETTING_KEYS}
@@ -1,6 +1,5 @@
 from database import get_connection
 import bcrypt
-from datetime import datetime, UTC
 
 class User:
     def __init__(self, username, password, role="cashier", active=1):
@@ -22,59 +21,6 @@ class User:
             hashed_password.encode('utf-8')
         )
 
-    @staticmethod
-    def create_table():
-        """Create or update the Users table."""
-        conn = get_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                
-                # First, get existing columns
-                cursor.execute("PRAGMA table_info(Users)")
-                existing_columns = {row['name'] for row in cursor.fetchall()}
-
-                # Create table if it doesn't exist
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS Users (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        username TEXT NOT NULL UNIQUE,
-                        password TEXT NOT NULL,
-                        role TEXT NOT NULL,
-                        active INTEGER DEFAULT 1
-                    )
-                """)
-
-                # Add new columns if they don't exist
-                if 'last_login' not in existing_columns:
-                    cursor.execute("ALTER TABLE Users ADD COLUMN last_login TIMESTAMP")
-                
-                # SQLite doesn't allow adding columns with DEFAULT CURRENT_TIMESTAMP
-                # Add columns without defaults, then update existing rows
-                try:
-                    # For Python 3.11+
-                    current_time = datetime.now(UTC).strftime("%Y-%m-%d %H:%M:%S")
-                except AttributeError:
-                    # For older Python versions
-                    current_time = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-                
-                if 'created_at' not in existing_columns:
-                    cursor.execute("ALTER TABLE Users ADD COLUMN created_at TIMESTAMP")
-                    cursor.execute("UPDATE Users SET created_at = ? WHERE created_at IS NULL", (current_time,))
-                    
-                if 'updated_at' not in existing_columns:
-                    cursor.execute("ALTER TABLE Users ADD COLUMN updated_at TIMESTAMP")
-                    cursor.execute("UPDATE Users SET updated_at = ? WHERE updated_at IS NULL", (current_time,))
-
-                conn.commit()
-                return True
-            except Exception as e:
-                print(f"Error creating/updating Users table: {e}")
-                return False
-            finally:
-                conn.close()
-        return False
-
     @staticmethod
     def add_user(user):
         """Add a new user to the database."""
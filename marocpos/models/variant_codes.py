@@ -0,0 +1,66 @@
+import unicodedata
+
+# In-store EAN-13 numbers start with 2 (GS1 restricted circulation range)
+INTERNAL_BARCODE_PREFIX = '2'
+
+
+def code_part(text, length):
+    """First `length` letters/digits of a text, without accents, upper case"""
+    text = unicodedata.normalize('NFKD', str(text))
+    return ''.join(c for c in text if c.isascii() and c.isalnum())[:length].upper()
+
+
+def ean13_check_digit(digits):
+    """Check digit of the first 12 digits of an EAN-13"""
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits))
+    return str((10 - total % 10) % 10)
+
+
+class VariantCodeGenerator:
+    """Deterministic SKUs and internal barcodes for the variants of a product.
+
+    The SKU of a combination is built from the product and its attribute
+    values ("TSH-CRO-TL" for a T-shirt, Couleur=Rouge, Taille=L); a code
+    already used gets "-2", "-3"... Blank barcodes get an internal EAN-13
+    from the product id and a sequence. Codes are checked against the
+    `taken` set (codes already in the database) and added to it, so one
+    generator never hands out the same code twice.
+    """
+
+    def __init__(self, product_id, product_name='', taken=None):
+        self.product_id = product_id
+        self.prefix = code_part(product_name, 3) or (f"P{product_id}" if product_id else "SKU")
+        self.taken = taken if taken is not None else set()
+        self._barcode_sequence = 0
+
+    def claim(self, code):
+        """Reserve a code chosen by the user; False if it is already used"""
+        if not code or code in self.taken:
+            return False
+        self.taken.add(code)
+        return True
+
+    def sku(self, attributes, requested=None):
+        """Unique SKU for a combination ({attribute: value}), or the requested one if free"""
+        if requested and self.claim(requested):
+            return requested
+        parts = [self.prefix] + [
+            f"{code_part(name, 1)}{code_part(value, 2)}" for name, value in attributes.items()
+        ]
+        base = requested or "-".join(part for part in parts if part)
+        code, suffix = base, 1
+        while code in self.taken:
+            suffix += 1
+            code = f"{base}-{suffix}"
+        self.taken.add(code)
+        return code
+
+    def barcode(self):
+        """Next free internal EAN-13: 2 + product id (6 digits) + sequence (5 digits) + check"""
+        while True:
+            self._barcode_sequence += 1
+            digits = f"{INTERNAL_BARCODE_PREFIX}{self.product_id % 10 ** 6:06d}{self._barcode_sequence % 10 ** 5:05d}"
+            code = digits + ean13_check_digit(digits)
+            if code not in self.taken:
+                self.taken.add(code)
+                return code
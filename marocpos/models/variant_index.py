@@ -0,0 +1,150 @@
+from database import get_connection
+import json
+
+
+def attribute_key(value_ids):
+    """Canonical key of a set of ProductAttributeValues ids: '3,17'"""
+    return ",".join(str(value_id) for value_id in sorted(set(int(v) for v in value_ids)))
+
+
+def decode_attributes(variant):
+    """{attribute: value} of a variant row, from attribute_values or attributes JSON"""
+    for column in ('attribute_values', 'attributes'):
+        value = variant.get(column)
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except (ValueError, TypeError):
+                continue
+        if isinstance(value, dict) and value:
+            return value
+    return {}
+
+
+def display_name(variant, attributes):
+    """'Rouge / L' from the attribute values, or the variant's own name"""
+    if variant.get('name'):
+        return variant['name']
+    if isinstance(attributes, dict):
+        values = attributes.values()
+    elif isinstance(attributes, list):
+        values = attributes
+    else:
+        values = []
+    parts = [str(value) for value in values if value not in (None, '')]
+    return " / ".join(parts) if parts else f"Variante #{variant.get('id', '')}"
+
+
+class VariantIndex:
+    """Materialized display_name and attribute_key columns of ProductVariants.
+
+    attribute_key is the sorted list of the ProductAttributeValues ids of a
+    variant (see attribute_key()), taken from its ProductVariantCombination
+    rows or, failing that, by matching its attribute JSON against the
+    attribute tables; it stays NULL when a value cannot be matched. With the
+    (product_id, attribute_key) index, picking a combination resolves to a
+    variant with one lookup.
+
+    refresh() takes the cursor of the caller's transaction so the columns
+    change together with the variant; rebuild_with_cursor() recomputes every
+    variant (backfill or repair).
+    """
+
+    @staticmethod
+    def refresh(cursor, variant_ids):
+        """Recompute display_name and attribute_key of some variants"""
+        ids = [variant_id for variant_id in dict.fromkeys(variant_ids) if variant_id]
+        for i in range(0, len(ids), 900):
+            batch = ids[i:i + 900]
+            placeholders = ", ".join("?" for _ in batch)
+            VariantIndex._refresh_where(cursor, f"pv.id IN ({placeholders})", batch)
+
+    @staticmethod
+    def refresh_products(cursor, product_ids):
+        """Recompute display_name and attribute_key of all variants of some products"""
+        ids = list(dict.fromkeys(product_ids))
+        for i in range(0, len(ids), 900):
+            batch = ids[i:i + 900]
+            placeholders = ", ".join("?" for _ in batch)
+            VariantIndex._refresh_where(cursor, f"pv.product_id IN ({placeholders})", batch)
+
+    @staticmethod
+    def rebuild_with_cursor(cursor):
+        VariantIndex._refresh_where(cursor, "1 = 1", [])
+
+    @staticmethod
+    def _refresh_where(cursor, where, params):
+        cursor.execute(f"""
+            SELECT pv.id, pv.name, pv.attribute_values, pv.attributes
+            FROM ProductVariants pv
+            WHERE {where}
+        """, params)
+        variants = cursor.fetchall()
+        if not variants:
+            return
+
+        # Values linked through the attribute lines, in line order
+        cursor.execute(f"""
+            SELECT pvc.product_variant_id, ptav.value_id, pav.value
+            FROM ProductVariantCombination pvc
+            JOIN ProductVariants pv ON pvc.product_variant_id = pv.id
+            JOIN ProductTemplateAttributeValue ptav ON pvc.template_attribute_value_id = ptav.id
+            JOIN ProductAttributeValues pav ON ptav.value_id = pav.id
+            WHERE {where}
+            ORDER BY pvc.product_variant_id, ptav.line_id
+        """, params)
+        combinations = {}
+        for row in cursor.fetchall():
+            combinations.setdefault(row['product_variant_id'], []).append(row)
+
+        cursor.execute("""
+            SELECT pav.id, pa.name as attribute_name, pav.value
+            FROM ProductAttributeValues pav
+            JOIN ProductAttributes pa ON pav.attribute_id = pa.id
+        """)
+        value_ids = {
+            (row['attribute_name'].strip().lower(), row['value'].strip().lower()): row['id']
+            for row in cursor.fetchall()
+        }
+
+        updates = []
+        for variant in variants:
+            attributes = decode_attributes(variant)
+            combination = combinations.get(variant['id'])
+            if combination:
+                key = attribute_key(row['value_id'] for row in combination)
+                if not attributes:
+                    attributes = [row['value'] for row in combination]
+            else:
+                matched = [
+                    value_ids.get((str(name).strip().lower(), str(value).strip().lower()))
+                    for name, value in attributes.items()
+                ]
+                key = attribute_key(matched) if matched and None not in matched else None
+            updates.append((display_name(variant, attributes), key, variant['id']))
+
+        cursor.executemany("""
+            UPDATE ProductVariants
+            SET display_name = ?, attribute_key = ?
+            WHERE id = ?
+        """, updates)
+
+    @staticmethod
+    def find_variant(product_id, value_ids):
+        """Id of the variant of a product made of exactly these attribute values, or None"""
+        conn = get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT id FROM ProductVariants
+                    WHERE product_id = ? AND attribute_key = ?
+                """, (product_id, attribute_key(value_ids)))
+                row = cursor.fetchone()
+                return row['id'] if row else None
+            except Exception as e:
+                print(f"Error finding variant: {e}")
+                return None
+            finally:
+                conn.close()
+        return None
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Query Plan Advisor for MarocPOS
+
+Developer tool that extracts the SQL executed by the model modules and runs
+EXPLAIN QUERY PLAN for each statement against a (populated) database. It flags:
+1. Full table scans (SCAN without an index)
+2. Temporary B-trees built for ORDER BY / GROUP BY / DISTINCT
+
+Usage:
+    python query_advisor.py [path/to/database.db] [--strict]
+
+With --strict the exit status is 1 when anything is flagged, so the check can
+be run after adding new queries to catch missing indexes.
+"""
+
+import ast
+import os
+import re
+import sys
+
+from database import DatabaseManager, get_connection, initialize_database
+
+MAROCPOS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules whose queries are checked
+MODULES = [
+    os.path.join("models", "sales_report.py"),
+    os.path.join("models", "product.py"),
+    os.path.join("models", "payment.py"),
+    os.path.join("models", "dashboard_metrics.py"),
+    os.path.join("models", "product_search.py"),
+]
+
+# Small lookup tables: scanning them is cheaper than an index lookup
+LOOKUP_TABLES = {
+    "Categories", "PaymentMethods", "Settings", "Users", "Stores",
+    "ProductAttributes", "ProductAttributeValues",
+}
+
+EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE")
+
+
+class QueryCollector(ast.NodeVisitor):
+    """Collect the SQL strings passed to execute() in every function.
+
+    Queries are often assembled from pieces (query += ..., f-strings with a
+    where clause, " AND ".join(conditions)); every piece assigned in the
+    function is concatenated so the optional filters are explained too.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.scope = []
+
+    def visit_ClassDef(self, node):
+        self.scope.append(node.name)
+        self.generic_visit(node)
+        self.scope.pop()
+
+    def visit_FunctionDef(self, node):
+        self.scope.append(node.name)
+        strings = {}
+        lists = {}
+        # ast.walk is breadth-first; replay the nodes in source order
+        children = sorted(
+            (child for child in ast.walk(node) if hasattr(child, "lineno")),
+            key=lambda child: (child.lineno, child.col_offset),
+        )
+        for child in children:
+            if isinstance(child, ast.Assign):
+                for target in child.targets:
+                    if isinstance(target, ast.Name):
+                        if isinstance(child.value, ast.List):
+                            lists[target.id] = [self.render(e, strings, lists) for e in child.value.elts]
+                        else:
+                            value = self.render(child.value, strings, lists)
+                            if value or target.id not in strings:
+                                strings[target.id] = value
+            elif isinstance(child, ast.AugAssign) and isinstance(child.target, ast.Name):
+                strings[child.target.id] = strings.get(child.target.id, "") + self.render(child.value, strings, lists)
+            elif isinstance(child, ast.Call) and isinstance(child.func, ast.Attribute):
+                func = child.func
+                if func.attr == "append" and isinstance(func.value, ast.Name) and child.args:
+                    lists.setdefault(func.value.id, []).append(self.render(child.args[0], strings, lists))
+                elif func.attr == "execute" and child.args:
+                    sql = self.render(child.args[0], strings, lists)
+                    if sql.strip():
+                        self.queries.append((".".join(self.scope), child.lineno, sql))
+        self.scope.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def render(self, node, strings, lists):
+        """Best-effort rendering of a string expression to SQL text"""
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        if isinstance(node, ast.Name):
+            return strings.get(node.id, "")
+        if isinstance(node, ast.JoinedStr):
+            return "".join(self.render(value, strings, lists) for value in node.values)
+        if isinstance(node, ast.FormattedValue):
+            return self.render(node.value, strings, lists)
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+            return self.render(node.left, strings, lists) + self.render(node.right, strings, lists)
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr == "join" and isinstance(node.func.value, ast.Constant)
+                and node.args and isinstance(node.args[0], ast.Name)):
+            return node.func.value.value.join(lists.get(node.args[0].id, []))
+        return ""
+
+
+def collect_queries(module_path):
+    """Return (function, line, sql) for the explainable queries of a module"""
+    with open(os.path.join(MAROCPOS_DIR, module_path), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    collector = QueryCollector()
+    collector.visit(tree)
+    queries = []
+    for function, lineno, sql in collector.queries:
+        sql = clean_sql(sql)
+        if sql.split(None, 1)[0].upper() in EXPLAINABLE:
+            queries.append((function, lineno, sql))
+    return queries
+
+
+def clean_sql(sql):
+    """Drop the dangling WHERE/AND left by filters that could not be rendered"""
+    sql = " ".join(sql.split())
+    sql = re.sub(r"\bWHERE\s+(AND\s+)?(?=GROUP\b|ORDER\b|LIMIT\b|$)", "", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bAND\s+(?=GROUP\b|ORDER\b|LIMIT\b|$)", "", sql, flags=re.IGNORECASE)
+    return sql.strip()
+
+
+def table_aliases(sql):
+    """Map aliases (and table names) used in FROM/JOIN clauses to table names"""
+    aliases = {}
+    for table, alias in re.findall(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", sql, flags=re.IGNORECASE):
+        aliases[table] = table
+        if alias and alias.upper() not in ("WHERE", "ON", "LEFT", "JOIN", "INNER", "GROUP", "ORDER", "LIMIT", "SET"):
+            aliases[alias] = table
+    return aliases
+
+
+def check_plan(plan, sql):
+    """Return the warnings for a query plan"""
+    aliases = table_aliases(sql)
+    warnings = []
+    for row in plan:
+        detail = row['detail']
+        if detail.startswith("SCAN ") and "USING" not in detail and "VIRTUAL TABLE" not in detail:
+            name = detail.split()[1]
+            if name in ("CONSTANT", "SUBQUERY"):
+                continue
+            if aliases.get(name, name) in LOOKUP_TABLES:
+                continue
+            warnings.append(f"full table scan: {detail}")
+        elif "TEMP B-TREE" in detail:
+            warnings.append(detail.lower())
+    return warnings
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    strict = "--strict" in sys.argv
+
+    print("\n=== MarocPOS Query Plan Advisor ===\n")
+
+    if args:
+        DatabaseManager.DB_PATH = os.path.abspath(args[0])
+    if not os.path.exists(DatabaseManager.DB_PATH):
+        print(f"❌ Database file not found at: {DatabaseManager.DB_PATH}")
+        return 1
+
+    print(f"📊 Database: {DatabaseManager.DB_PATH}")
+    # Plans are only meaningful against the current schema and indexes
+    initialize_database()
+
+    conn = get_connection()
+    if not conn:
+        return 1
+
+    checked = 0
+    flagged = 0
+    try:
+        for module_path in MODULES:
+            print(f"\n📄 {module_path}")
+            for function, lineno, sql in collect_queries(module_path):
+                location = f"{module_path}:{lineno} {function}"
+                params = [None] * sql.count("?")
+                try:
+                    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+                except Exception as e:
+                    print(f"  ⏭️  {location}: not analysed ({e})")
+                    continue
+
+                checked += 1
+                warnings = check_plan(plan, sql)
+                if warnings:
+                    flagged += 1
+                    print(f"  ⚠️  {location}")
+                    for warning in warnings:
+                        print(f"        - {warning}")
+                else:
+                    print(f"  ✅ {location}")
+    finally:
+        conn.close()
+
+    print(f"\n{checked} requêtes analysées, {flagged} à vérifier.")
+    return 1 if strict and flagged else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
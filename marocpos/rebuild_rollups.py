@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Sales Rollup Rebuild Script for MarocPOS
+
+Recomputes the pre-aggregated sales tables (SalesHourlyRollup,
+ProductDailyRollup, CategoryDailyRollup, PaymentMethodDailyRollup,
+CashierDailyRollup) from the raw Sales/SaleItems/SalePayments rows.
+Use it to backfill after importing historical sales or to repair drift.
+
+Usage:
+    python rebuild_rollups.py [YYYY-MM-DD [YYYY-MM-DD]]
+"""
+
+import sys
+
+from database import initialize_database
+from models.sales_rollup import SalesRollup
+
+def main():
+    start_day = sys.argv[1] if len(sys.argv) > 1 else None
+    end_day = sys.argv[2] if len(sys.argv) > 2 else start_day
+
+    print("\n=== MarocPOS Sales Rollup Rebuild ===\n")
+    initialize_database()
+
+    period = f"du {start_day} au {end_day}" if start_day else "complet"
+    print(f"🔧 Recalcul des agrégats ({period})...")
+    if SalesRollup.rebuild(start_day, end_day):
+        print("✅ Agrégats recalculés avec succès.")
+        return 0
+    print("❌ Échec du recalcul des agrégats.")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 from PyQt5.QtWidgets import (
     QDialog, QVBoxLayout, QLabel, QLineEdit, QHBoxLayout, QPushButton, QMessageBox, QComboBox, QInputDialog
 )
+from models.catalog_cache import CatalogCache
 import sqlite3
 
 
@@ -88,6 +89,7 @@ class AddItemDialog(QDialog):
                 (product_name.strip(), unit_price, stock)
             )
             self.conn.commit()
+            CatalogCache.invalidate([self.cursor.lastrowid])
 
             QMessageBox.information(self, "Success", f"Product '{product_name}' added successfully!")
             self.load_products()  # Reload the dropdown to include the new product
@@ -140,5 +142,6 @@ class AddItemDialog(QDialog):
             "UPDATE Products SET stock = stock - ? WHERE id = ?", (quantity, product_id)
         )
         self.conn.commit()
+        CatalogCache.invalidate([product_id])
 
         self.accept()
\ No newline at end of file
@@ -5,7 +5,6 @@ from PyQt5.QtWidgets import (
     QCheckBox, QGroupBox, QScrollArea, QFrame, QWidget
 )
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap
 from models.category import Category
 from datetime import datetime
 import os
@@ -388,14 +387,12 @@ class AddProductDialog(QDialog):
     def update_image_preview(self):
         """Update the image preview label"""
         if self.image_path and os.path.exists(self.image_path):
-            pixmap = QPixmap(self.image_path)
-            if not pixmap.isNull():
-                pixmap = pixmap.scaled(
-                    self.image_label.width(), 
-                    self.image_label.height(),
-                    Qt.KeepAspectRatio, 
-                    Qt.SmoothTransformation
-                )
+            from ui.thumbnail_service import ThumbnailService
+            pixmap = ThumbnailService.instance().thumbnail_now(
+                self.image_path,
+                min(self.image_label.width(), self.image_label.height())
+            )
+            if pixmap:
                 self.image_label.setPixmap(pixmap)
             else:
                 self.image_label.setText("Image invalide")
@@ -0,0 +1,107 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+from PyQt5.QtGui import QColor
+from models.cart import Cart
+
+
+def format_quantity(quantity):
+    """1.0 -> '1', 1.5 -> '1.5'"""
+    return str(int(quantity)) if float(quantity).is_integer() else str(quantity)
+
+
+class CartTableModel(QAbstractTableModel):
+    """Qt view of a Cart.
+
+    Every change goes through this adapter, which tells the view exactly
+    which row was inserted, changed or removed and emits totals_changed
+    with the running totals of the cart.
+    """
+
+    COLUMNS = ["Produit", "Quantité", "Prix", "Actions"]
+    NAME, QUANTITY, PRICE, REMOVE = range(4)
+
+    # subtotal, tax, discount, total
+    totals_changed = pyqtSignal(float, float, float, float)
+
+    def __init__(self, cart=None, parent=None):
+        super().__init__(parent)
+        self.cart = cart if cart is not None else Cart()
+
+    # Cart operations
+    def add_line(self, line):
+        """Add a line (merged into an existing one when possible); returns its row"""
+        row = self.cart.row_of(line.key)
+        if row is None:
+            row = len(self.cart)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.cart.add(line)
+            self.endInsertRows()
+        else:
+            self.cart.add(line)
+            self._row_changed(row)
+        self._emit_totals()
+        return row
+
+    def set_quantity(self, row, quantity):
+        self.cart.set_quantity(row, quantity)
+        self._row_changed(row)
+        self._emit_totals()
+
+    def remove_line(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self.cart.remove(row)
+        self.endRemoveRows()
+        self._emit_totals()
+
+    def set_tax_rate(self, tax_rate):
+        self.cart.tax_rate = tax_rate
+        self._emit_totals()
+
+    def clear(self):
+        self.beginResetModel()
+        self.cart.clear()
+        self.endResetModel()
+        self._emit_totals()
+
+    def _row_changed(self, row):
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.COLUMNS) - 1))
+
+    def _emit_totals(self):
+        cart = self.cart
+        self.totals_changed.emit(cart.subtotal, cart.tax, cart.discount, cart.total)
+
+    # QAbstractTableModel interface
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.cart)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.cart):
+            return None
+        line = self.cart.line_at(index.row())
+        column = index.column()
+
+        if role == Qt.DisplayRole:
+            if column == self.NAME:
+                return line.name
+            if column == self.QUANTITY:
+                return format_quantity(line.quantity)
+            if column == self.PRICE:
+                return f"{line.unit_price:.2f}"
+            if column == self.REMOVE:
+                return "🗑"
+        elif role == Qt.UserRole:
+            return line
+        elif role == Qt.ToolTipRole and column == self.REMOVE:
+            return "Retirer du panier"
+        elif role == Qt.ForegroundRole and column == self.REMOVE:
+            return QColor("#6c757d")
+        elif role == Qt.TextAlignmentRole and column != self.NAME:
+            return int(Qt.AlignCenter)
+        return None
@@ -67,7 +67,8 @@ class DashboardWindow(QMainWindow):
         
         stats_layout = QHBoxLayout(stats_frame)
         
-        # Add quick stat boxes
+        # Add quick stat boxes (all computed from one metrics snapshot)
+        self.refresh_metrics()
         stats_layout.addWidget(self.create_stat_box("Chiffre d'affaires aujourd'hui", self.get_sales_today(), "#28a745"))
         stats_layout.addWidget(self.create_stat_box("Transactions aujourd'hui", self.get_transactions_today(), "#007bff"))
         stats_layout.addWidget(self.create_stat_box("Panier moyen", self.get_avg_transaction(), "#fd7e14"))
@@ -106,8 +107,26 @@ class DashboardWindow(QMainWindow):
         """)
         logout_button.clicked.connect(self.logout)
         
+        # Background imports, exports and backups
+        jobs_button = QPushButton("Tâches en arrière-plan")
+        jobs_button.setStyleSheet("""
+            QPushButton {
+                background-color: #6c757d;
+                color: white;
+                border: none;
+                border-radius: 5px;
+                padding: 10px 20px;
+                font-size: 14pt;
+            }
+            QPushButton:hover {
+                background-color: #5a6268;
+            }
+        """)
+        jobs_button.clicked.connect(self.open_jobs)
+        
         # Add spacer and logout button
         bottom_layout = QHBoxLayout()
+        bottom_layout.addWidget(jobs_button)
         bottom_layout.addStretch()
         bottom_layout.addWidget(logout_button)
         
@@ -189,71 +208,26 @@ class DashboardWindow(QMainWindow):
         return card
     
     # Methods to retrieve stat values
+    def refresh_metrics(self):
+        """Compute the KPIs once for all the stat boxes"""
+        from models.dashboard_metrics import DashboardMetrics
+        self.metrics = DashboardMetrics.get(refresh=True) or {}
+    
     def get_sales_today(self):
-        try:
-            from models.sales_report import SalesReport
-            import datetime
-            
-            today = datetime.datetime.now().strftime("%Y-%m-%d")
-            report_data = SalesReport.get_daily_sales(today)
-            
-            if report_data and 'summary' in report_data:
-                total_sales = report_data['summary'].get('total_sales', 0) or 0
-                return f"{total_sales:.2f} MAD"
-            else:
-                return "0.00 MAD"
-        except Exception as e:
-            print(f"Error getting today's sales: {e}")
-            return "0.00 MAD"
+        total_sales = self.metrics.get('today_sales') or 0
+        return f"{total_sales:.2f} MAD"
     
     def get_transactions_today(self):
-        try:
-            from models.sales_report import SalesReport
-            import datetime
-            
-            today = datetime.datetime.now().strftime("%Y-%m-%d")
-            report_data = SalesReport.get_daily_sales(today)
-            
-            if report_data and 'summary' in report_data:
-                sale_count = report_data['summary'].get('sale_count', 0) or 0
-                return str(sale_count)
-            else:
-                return "0"
-        except Exception as e:
-            print(f"Error getting transaction count: {e}")
-            return "0"
+        sale_count = self.metrics.get('today_transactions') or 0
+        return str(sale_count)
     
     def get_avg_transaction(self):
-        try:
-            from models.sales_report import SalesReport
-            import datetime
-            
-            today = datetime.datetime.now().strftime("%Y-%m-%d")
-            report_data = SalesReport.get_daily_sales(today)
-            
-            if report_data and 'summary' in report_data:
-                avg_sale = report_data['summary'].get('average_sale', 0) or 0
-                return f"{avg_sale:.2f} MAD"
-            else:
-                return "0.00 MAD"
-        except Exception as e:
-            print(f"Error getting average transaction: {e}")
-            return "0.00 MAD"
+        avg_sale = self.metrics.get('today_avg_sale') or 0
+        return f"{avg_sale:.2f} MAD"
     
     def get_low_stock_count(self):
-        try:
-            from models.sales_report import SalesReport
-            
-            report_data = SalesReport.get_inventory_report()
-            
-            if report_data and 'summary' in report_data:
-                low_stock = report_data['summary'].get('low_stock_products', 0) or 0
-                return str(low_stock)
-            else:
-                return "0"
-        except Exception as e:
-            print(f"Error getting low stock count: {e}")
-            return "0"
+        low_stock = self.metrics.get('low_stock_count') or 0
+        return str(low_stock)
     
     # Menu card callback methods
     def open_sales(self):
@@ -305,6 +279,15 @@ class DashboardWindow(QMainWindow):
         except Exception as e:
             print(f"Error opening settings window: {e}")
     
+    def open_jobs(self):
+        """Open the background jobs panel"""
+        try:
+            from .jobs_panel import JobsPanel
+            self.jobs_panel = JobsPanel()
+            self.jobs_panel.show()
+        except Exception as e:
+            print(f"Error opening jobs panel: {e}")
+    
     def logout(self):
         """Logout and close window"""
         self.close()
@@ -242,9 +242,9 @@ class EditProductDialog(QDialog):
         """Update image preview"""
         try:
             if self.image_path and os.path.exists(self.image_path):
-                pixmap = QPixmap(self.image_path)
-                if not pixmap.isNull():
-                    pixmap = pixmap.scaled(100, 100, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                from ui.thumbnail_service import ThumbnailService
+                pixmap = ThumbnailService.instance().thumbnail_now(self.image_path, 100)
+                if pixmap:
                     self.image_preview.setPixmap(pixmap)
                     return
                     
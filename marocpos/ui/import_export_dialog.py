@@ -6,16 +6,31 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt, QTimer
 from models.product import Product
-from models.category import Category
+from models.product_import import ProductImporter
+from models.product_export import ProductExporter, EXPORT_FORMATS
+from ui.job_manager import JobManager, DONE
 import csv
-import json
 import os
 
 class ImportExportDialog(QDialog):
+    # Export type choices -> ProductExporter export types
+    EXPORT_TYPES = {
+        "Tous les produits": 'all',
+        "Produits sans variantes": 'simple',
+        "Produits avec variantes": 'with_variants',
+        "Variantes uniquement": 'variants_only',
+    }
+    
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.jobs = {}  # job id -> progress bar
         self.init_ui()
         
+        # Imports and exports run in the background
+        manager = JobManager.instance()
+        manager.job_progress.connect(self.on_job_progress)
+        manager.job_finished.connect(self.on_job_finished)
+        
     def init_ui(self):
         self.setWindowTitle("Importation/Exportation de Produits")
         self.resize(800, 600)
@@ -38,8 +53,12 @@ class ImportExportDialog(QDialog):
         
         # Bottom buttons
         button_layout = QHBoxLayout()
+        self.cancel_button = QPushButton("Annuler la tâche en cours")
+        self.cancel_button.clicked.connect(self.cancel_jobs)
+        self.cancel_button.setVisible(False)
         close_button = QPushButton("Fermer")
         close_button.clicked.connect(self.close)
+        button_layout.addWidget(self.cancel_button)
         button_layout.addStretch()
         button_layout.addWidget(close_button)
         
@@ -57,6 +76,12 @@ class ImportExportDialog(QDialog):
         self.export_type.addItems(["Tous les produits", "Produits sans variantes", "Produits avec variantes", "Variantes uniquement"])
         options_layout.addRow("Type d'exportation:", self.export_type)
         
+        # File format
+        self.export_format = QComboBox()
+        for key, writer in EXPORT_FORMATS.items():
+            self.export_format.addItem(writer.label, key)
+        options_layout.addRow("Format:", self.export_format)
+        
         # Include fields
         fields_layout = QHBoxLayout()
         self.include_stock = QCheckBox("Stock")
@@ -215,8 +240,12 @@ class ImportExportDialog(QDialog):
         self.create_categories = QCheckBox("Créer les catégories manquantes")
         self.create_categories.setChecked(True)
         
+        self.dry_run = QCheckBox("Simulation (vérifier sans importer)")
+        self.dry_run.setChecked(False)
+        
         behavior_layout.addWidget(self.update_existing)
         behavior_layout.addWidget(self.create_categories)
+        behavior_layout.addWidget(self.dry_run)
         behavior_layout.addStretch()
         
         options_layout.addRow("Comportement:", behavior_layout)
@@ -261,10 +290,11 @@ class ImportExportDialog(QDialog):
         
     def browse_export_path(self):
         """Browse for export file path"""
-        default_path = os.path.expanduser("~/produits_export.csv")
+        writer = EXPORT_FORMATS[self.export_format.currentData()]
+        default_path = os.path.expanduser(f"~/produits_export{writer.extension}")
         path, _ = QFileDialog.getSaveFileName(
             self, "Sélectionner le fichier d'exportation", 
-            default_path, "Fichiers CSV (*.csv)"
+            default_path, f"Fichiers {writer.label} (*{writer.extension})"
         )
         
         if path:
@@ -380,180 +410,40 @@ class ImportExportDialog(QDialog):
             QMessageBox.warning(self, "Erreur", f"Erreur lors de la lecture du fichier CSV: {str(e)}")
     
     def export_products(self):
-        """Export products to CSV file"""
+        """Export products in the selected format"""
         # Validate path
         path = self.export_path.text()
         if not path:
             QMessageBox.warning(self, "Erreur", "Veuillez sélectionner un fichier de destination.")
             return
             
-        # Get export options
-        export_type = self.export_type.currentText()
-        include_stock = self.include_stock.isChecked()
-        include_prices = self.include_prices.isChecked()
-        include_images = self.include_images.isChecked()
-        
         # Get delimiter
         delimiter = self.delimiter_combo.currentText()
         if delimiter == "Tab":
             delimiter = '\t'
             
-        quotechar = self.enclosure_combo.currentText()
+        exporter = ProductExporter(
+            path, self.export_format.currentData(), self.EXPORT_TYPES[self.export_type.currentText()],
+            include_stock=self.include_stock.isChecked(),
+            include_prices=self.include_prices.isChecked(),
+            include_images=self.include_images.isChecked(),
+            delimiter=delimiter, quotechar=self.enclosure_combo.currentText()
+        )
         
-        try:
-            # Show progress bar
-            self.export_progress.setVisible(True)
-            self.export_progress.setValue(10)
-            
-            # Get products
-            products = Product.get_all_products()
-            
-            # Filter products based on export type
-            if export_type == "Produits sans variantes":
-                products = [p for p in products if not p.get('has_variants')]
-            elif export_type == "Produits avec variantes":
-                products = [p for p in products if p.get('has_variants')]
-            
-            self.export_progress.setValue(30)
-            
-            # Prepare headers
-            headers = ['id', 'name', 'description', 'barcode', 'category_id', 'category_name']
-            
-            if include_prices:
-                headers.extend(['unit_price', 'purchase_price'])
-                
-            if include_stock:
-                headers.extend(['stock', 'min_stock'])
-                
-            headers.append('has_variants')
+        def run_export(job):
+            return exporter.run(progress=job.set_progress, cancelled=lambda: job.cancel_requested)
             
-            if include_images:
-                headers.append('image_path')
-                
-            # Prepare data rows
-            rows = []
-            
-            for product in products:
-                row = [
-                    product.get('id', ''),
-                    product.get('name', ''),
-                    product.get('description', ''),
-                    product.get('barcode', ''),
-                    product.get('category_id', ''),
-                    product.get('category_name', '')
-                ]
-                
-                if include_prices:
-                    row.extend([
-                        product.get('unit_price', 0),
-                        product.get('purchase_price', 0)
-                    ])
-                    
-                if include_stock:
-                    row.extend([
-                        product.get('stock', 0),
-                        product.get('min_stock', 0)
-                    ])
-                    
-                row.append(1 if product.get('has_variants') else 0)
-                
-                if include_images:
-                    row.append(product.get('image_path', ''))
-                    
-                rows.append(row)
-                
-            self.export_progress.setValue(60)
-            
-            # Export variants if requested
-            variants_file = None
-            if export_type in ["Produits avec variantes", "Variantes uniquement"]:
-                variants_path = path.replace('.csv', '_variants.csv')
-                variants_file = open(variants_path, 'w', newline='', encoding='utf-8')
-                variants_writer = csv.writer(variants_file, delimiter=delimiter, quotechar=quotechar, quoting=csv.QUOTE_MINIMAL)
-                
-                # Variant headers
-                variant_headers = ['product_id', 'product_name', 'variant_name', 'sku', 'barcode']
-                
-                if include_prices:
-                    variant_headers.extend(['price_adjustment', 'unit_price', 'purchase_price'])
-                    
-                if include_stock:
-                    variant_headers.append('stock')
-                    
-                variant_headers.append('attribute_values')
-                
-                variants_writer.writerow(variant_headers)
-                
-                # Write variant rows
-                for product in products:
-                    if product.get('has_variants'):
-                        variants = Product.get_variants(product['id'])
-                        for variant in variants:
-                            variant_row = [
-                                product.get('id', ''),
-                                product.get('name', ''),
-                                variant.get('name', ''),
-                                variant.get('sku', ''),
-                                variant.get('barcode', '')
-                            ]
-                            
-                            if include_prices:
-                                # Use total_price_adjustment if available
-                                price_adj = variant.get('total_price_adjustment', variant.get('price_adjustment', 0))
-                                variant_row.extend([
-                                    price_adj,
-                                    variant.get('unit_price', 0),
-                                    variant.get('purchase_price', 0)
-                                ])
-                                
-                            if include_stock:
-                                variant_row.append(variant.get('stock', 0))
-                                
-                            # Convert attribute values to JSON string
-                            attr_values = variant.get('attributes', {})
-                            variant_row.append(json.dumps(attr_values))
-                            
-                            variants_writer.writerow(variant_row)
-            
-            self.export_progress.setValue(80)
-            
-            # Write main products file
-            with open(path, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile, delimiter=delimiter, quotechar=quotechar, quoting=csv.QUOTE_MINIMAL)
-                
-                # Write headers
-                writer.writerow(headers)
-                
-                # Write data rows
-                for row in rows:
-                    writer.writerow(row)
-                    
-            # Close variants file if opened
-            if variants_file:
-                variants_file.close()
-                
-            self.export_progress.setValue(100)
-            
-            # Show success message
-            if variants_file:
-                QMessageBox.information(
-                    self, 
-                    "Exportation réussie", 
-                    f"Les produits ont été exportés avec succès dans:\n{path}\n\nLes variantes ont été exportées dans:\n{variants_path}"
-                )
-            else:
-                QMessageBox.information(
-                    self, 
-                    "Exportation réussie", 
-                    f"Les produits ont été exportés avec succès dans:\n{path}"
-                )
-                
-            # Hide progress after a delay
-            QTimer.singleShot(2000, lambda: self.export_progress.setVisible(False))
-            
-        except Exception as e:
-            self.export_progress.setVisible(False)
-            QMessageBox.warning(self, "Erreur", f"Erreur lors de l'exportation: {str(e)}")
+        self.start_job(
+            "Exportation des produits", run_export,
+            progress_bar=self.export_progress, on_result=self.export_finished
+        )
+        
+    def export_finished(self, paths):
+        QMessageBox.information(
+            self, 
+            "Exportation réussie", 
+            "Les produits ont été exportés avec succès dans:\n" + "\n".join(paths)
+        )
             
     def import_products(self):
         """Import products from CSV file"""
@@ -563,201 +453,83 @@ class ImportExportDialog(QDialog):
             QMessageBox.warning(self, "Erreur", "Veuillez sélectionner un fichier CSV valide.")
             return
             
-        # Get import options
-        update_existing = self.update_existing.isChecked()
-        create_categories = self.create_categories.isChecked()
-        
         # Get delimiter
         delimiter = self.import_delimiter_combo.currentText()
         if delimiter == "Tab":
             delimiter = '\t'
             
-        quotechar = self.import_enclosure_combo.currentText()
+        # Check if a variants file exists
+        variants_path = path.replace('.csv', '_variants.csv')
+        if variants_path == path or not os.path.exists(variants_path):
+            variants_path = None
+            
+        importer = ProductImporter(
+            path,
+            delimiter=delimiter,
+            quotechar=self.import_enclosure_combo.currentText(),
+            update_existing=self.update_existing.isChecked(),
+            create_categories=self.create_categories.isChecked(),
+            variants_path=variants_path
+        )
+        dry_run = self.dry_run.isChecked()
         
-        try:
-            # Show progress bar
-            self.import_progress.setVisible(True)
-            self.import_progress.setValue(10)
-            
-            # Read products CSV
-            products_data = []
-            with open(path, 'r', newline='', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile, delimiter=delimiter, quotechar=quotechar)
-                for row in reader:
-                    products_data.append(row)
-                    
-            self.import_progress.setValue(30)
-            
-            # Check if a variants file exists
-            variants_path = path.replace('.csv', '_variants.csv')
-            variants_data = []
-            
-            if os.path.exists(variants_path):
-                with open(variants_path, 'r', newline='', encoding='utf-8') as csvfile:
-                    reader = csv.DictReader(csvfile, delimiter=delimiter, quotechar=quotechar)
-                    for row in reader:
-                        variants_data.append(row)
-                        
-            self.import_progress.setValue(50)
-            
-            # Create category mapping (name -> id) for newly created categories
-            category_mapping = {}
-            
-            # Import products
-            imported_count = 0
-            updated_count = 0
-            failed_count = 0
-            
-            for product in products_data:
-                try:
-                    # Get category
-                    category_id = product.get('category_id')
-                    category_name = product.get('category_name')
-                    
-                    if not category_id and category_name and create_categories:
-                        # Check if we've already created this category
-                        if category_name in category_mapping:
-                            category_id = category_mapping[category_name]
-                        else:
-                            # Create new category
-                            try:
-                                category_id = Category.add_category(category_name)
-                                if category_id:
-                                    category_mapping[category_name] = category_id
-                            except Exception as e:
-                                print(f"Error creating category {category_name}: {e}")
-                    
-                    # Convert stock and price values
-                    try:
-                        unit_price = float(product.get('unit_price', 0))
-                    except (ValueError, TypeError):
-                        unit_price = 0
-                        
-                    try:
-                        purchase_price = float(product.get('purchase_price', 0))
-                    except (ValueError, TypeError):
-                        purchase_price = 0
-                        
-                    try:
-                        stock = int(product.get('stock', 0))
-                    except (ValueError, TypeError):
-                        stock = 0
-                        
-                    try:
-                        min_stock = int(product.get('min_stock', 0))
-                    except (ValueError, TypeError):
-                        min_stock = 0
-                        
-                    try:
-                        has_variants = bool(int(product.get('has_variants', 0)))
-                    except (ValueError, TypeError):
-                        has_variants = False
-                    
-                    # Prepare product data
-                    product_data = {
-                        'name': product.get('name', ''),
-                        'description': product.get('description', ''),
-                        'barcode': product.get('barcode', ''),
-                        'category_id': category_id,
-                        'unit_price': unit_price,
-                        'purchase_price': purchase_price,
-                        'stock': stock,
-                        'min_stock': min_stock,
-                        'has_variants': has_variants,
-                        'image_path': product.get('image_path', '')
-                    }
-                    
-                    # Check if product exists
-                    existing_id = product.get('id')
-                    product_name = product.get('name', '')
-                    
-                    if existing_id:
-                        existing_product = Product.get_product_by_id(existing_id)
-                    else:
-                        existing_product = None
-                        
-                    if not existing_product and product_name:
-                        # Try to find by name
-                        existing_product = Product.get_product_by_name(product_name)
-                        
-                    # Update or create product
-                    if existing_product and update_existing:
-                        # Update existing product
-                        product_id = existing_product['id']
-                        Product.update_product(product_id, **product_data)
-                        updated_count += 1
-                    else:
-                        # Create new product
-                        product_id = Product.add_product(**product_data)
-                        imported_count += 1
-                    
-                    # Process variants for this product
-                    if has_variants and product_id:
-                        # Filter variants for this product
-                        product_variants = []
-                        for variant in variants_data:
-                            if (variant.get('product_id') == str(existing_id) or 
-                                variant.get('product_name') == product_name):
-                                product_variants.append(variant)
-                                
-                        # Add variants
-                        for variant in product_variants:
-                            try:
-                                # Parse attribute values
-                                attr_values_json = variant.get('attribute_values', '{}')
-                                try:
-                                    attr_values = json.loads(attr_values_json)
-                                except:
-                                    attr_values = {}
-                                    
-                                # Convert numeric values
-                                try:
-                                    price_adj = float(variant.get('price_adjustment', 0))
-                                except (ValueError, TypeError):
-                                    price_adj = 0
-                                    
-                                try:
-                                    stock = int(variant.get('stock', 0))
-                                except (ValueError, TypeError):
-                                    stock = 0
-                                
-                                # Add variant to product
-                                variant_data = {
-                                    'name': variant.get('variant_name', ''),
-                                    'sku': variant.get('sku', ''),
-                                    'barcode': variant.get('barcode', ''),
-                                    'price_adjustment': price_adj,
-                                    'stock': stock,
-                                    'attribute_values': json.dumps(attr_values)
-                                }
-                                
-                                # Add variant
-                                Product.add_variant(product_id, **variant_data)
-                                
-                            except Exception as e:
-                                print(f"Error adding variant {variant.get('variant_name', '')} to product {product_name}: {e}")
-                                failed_count += 1
-                    
-                except Exception as e:
-                    print(f"Error importing product {product.get('name', '')}: {e}")
-                    failed_count += 1
-                    
-            self.import_progress.setValue(100)
-            
-            # Show success message
-            QMessageBox.information(
-                self, 
-                "Importation terminée", 
-                f"Importation terminée avec succès:\n\n"
-                f"{imported_count} produits importés\n"
-                f"{updated_count} produits mis à jour\n"
-                f"{failed_count} erreurs\n\n"
-                f"{len(variants_data)} variantes traitées"
+        def run_import(job):
+            return importer.run(
+                dry_run=dry_run,
+                progress=lambda done, total: job.set_progress(done, total, f"{done} lignes"),
+                cancelled=lambda: job.cancel_requested
             )
             
-            # Hide progress after a delay
-            QTimer.singleShot(2000, lambda: self.import_progress.setVisible(False))
-            
-        except Exception as e:
-            self.import_progress.setVisible(False)
-            QMessageBox.warning(self, "Erreur", f"Erreur lors de l'importation: {str(e)}")
+        self.start_job(
+            "Simulation d'importation" if dry_run else "Importation des produits", run_import,
+            progress_bar=self.import_progress, on_result=self.import_finished
+        )
+        
+    def import_finished(self, report):
+        """Show the report, with the rejected rows in the details"""
+        message = QMessageBox(self)
+        message.setWindowTitle("Simulation terminée" if report.dry_run else "Importation terminée")
+        message.setIcon(QMessageBox.Warning if report.errors or report.cancelled else QMessageBox.Information)
+        message.setText(report.summary())
+        if report.errors:
+            message.setDetailedText(report.error_text(limit=500))
+        message.exec_()
+        
+    # Background jobs
+    def start_job(self, title, function, *args, progress_bar=None, on_result=None):
+        """Run function(job, *args) on the JobManager; the progress bar follows it"""
+        job = JobManager.instance().submit(
+            title, function, *args, on_result=on_result,
+            on_error=lambda error: QMessageBox.warning(self, "Erreur", f"{title}: {error}")
+        )
+        self.jobs[job.id] = progress_bar
+        progress_bar.setRange(0, 100)
+        progress_bar.setValue(0)
+        progress_bar.setVisible(True)
+        self.cancel_button.setVisible(True)
+        return job
+        
+    def on_job_progress(self, job_id, percent, message):
+        progress_bar = self.jobs.get(job_id)
+        if progress_bar is None:
+            return
+        if percent < 0:
+            progress_bar.setRange(0, 0)
+        else:
+            progress_bar.setRange(0, 100)
+            progress_bar.setValue(percent)
+            
+    def on_job_finished(self, job_id, status, message):
+        progress_bar = self.jobs.pop(job_id, None)
+        if progress_bar is None:
+            return
+        progress_bar.setRange(0, 100)
+        progress_bar.setValue(100 if status == DONE else 0)
+        self.cancel_button.setVisible(bool(self.jobs))
+        
+        # Hide progress after a delay
+        QTimer.singleShot(2000, lambda: progress_bar.setVisible(progress_bar in self.jobs.values()))
+        
+    def cancel_jobs(self):
+        for job_id in list(self.jobs):
+            JobManager.instance().cancel(job_id)
@@ -0,0 +1,255 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QCoreApplication, pyqtSignal
+from database import DatabaseManager
+import csv
+import itertools
+import threading
+import time
+
+# Job status
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+STATUS_LABELS = {
+    QUEUED: "En attente",
+    RUNNING: "En cours",
+    DONE: "Terminé",
+    FAILED: "Échec",
+    CANCELLED: "Annulé",
+}
+
+
+class JobCancelled(Exception):
+    """Raised by Job.check_cancelled() once the job was asked to stop"""
+
+
+def snapshot_table(table):
+    """Headers, cell texts and alignments of a QTableWidget.
+
+    Jobs must not touch widgets: read the table on the GUI thread and hand
+    the snapshot to the job.
+    """
+    headers = []
+    for column in range(table.columnCount()):
+        item = table.horizontalHeaderItem(column)
+        headers.append(item.text() if item else "")
+    rows, alignments = [], []
+    for row in range(table.rowCount()):
+        items = [table.item(row, column) for column in range(table.columnCount())]
+        rows.append([item.text() if item else "" for item in items])
+        alignments.append([int(item.textAlignment()) if item else 0 for item in items])
+    return {'headers': headers, 'rows': rows, 'alignments': alignments}
+
+
+def write_csv(job, path, rows):
+    """Job function writing rows (lists of cells) to a CSV file; returns the path"""
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        for done, row in enumerate(rows):
+            if done % 1000 == 0:
+                job.check_cancelled()
+                job.set_progress(done, len(rows))
+            writer.writerow(row)
+    return path
+
+
+class Job:
+    """A unit of work run by the JobManager, passed to the job function as
+    its first argument.
+
+    The function reports with set_progress(done, total, message) and polls
+    cancel_requested (or calls check_cancelled()) at safe points: nothing
+    stops it from the outside.
+    """
+
+    # Minimum delay between two progress signals, in seconds
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, job_id, title, manager):
+        self.id = job_id
+        self.title = title
+        self.status = QUEUED
+        self.percent = 0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self._manager = manager
+        self._cancel = threading.Event()
+        self._last_emit = 0.0
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def set_progress(self, done, total=None, message=None):
+        """Report progress; total None or 0 means an unknown amount of work.
+        Signals are throttled to one per PROGRESS_INTERVAL."""
+        percent = -1 if not total else max(0, min(100, int(done * 100 / total)))
+        if message is not None:
+            self.message = message
+        now = time.monotonic()
+        if percent == self.percent and message is None:
+            return
+        if now - self._last_emit < self.PROGRESS_INTERVAL and percent not in (0, 100):
+            self.percent = percent
+            return
+        self.percent = percent
+        self._last_emit = now
+        self._manager.job_progress.emit(self.id, percent, self.message)
+
+
+class _JobRunnable(QRunnable):
+    def __init__(self, job, function, args, kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.job = job
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        job = self.job
+        if job.cancel_requested:
+            job.status = CANCELLED
+        else:
+            job.status = RUNNING
+            job._manager.job_progress.emit(job.id, job.percent, job.message)
+            try:
+                job.result = self.function(job, *self.args, **self.kwargs)
+                job.status = CANCELLED if job.cancel_requested else DONE
+            except JobCancelled:
+                job.status = CANCELLED
+            except Exception as e:
+                print(f"Error in job '{job.title}': {e}")
+                job.error = str(e) or e.__class__.__name__
+                job.status = FAILED
+            finally:
+                # Pool threads are not Python threads: their connection is
+                # never pruned, so close it before the thread is reused or exits
+                DatabaseManager.release_thread_connection()
+        job._manager._job_done.emit(job.id)
+
+
+class JobManager(QObject):
+    """Runs long data operations (imports, exports, backups) on a thread pool.
+
+    submit(title, function, *args) queues function(job, *args) and returns
+    its Job. Progress is reported through job_progress(job_id, percent,
+    message) (percent -1 when unknown) and the end through
+    job_finished(job_id, status, message); both are delivered on the GUI
+    thread, as are the on_result(result) / on_error(message) callbacks of
+    submit(). A job that returns after being cancelled still hands its
+    (partial) result to on_result. Use the shared instance().
+    """
+
+    MAX_THREADS = 2
+
+    job_added = pyqtSignal(int)
+    job_progress = pyqtSignal(int, int, str)
+    job_finished = pyqtSignal(int, str, str)
+    job_removed = pyqtSignal(int)
+
+    # Worker -> GUI thread hand-off
+    _job_done = pyqtSignal(int)
+
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+            app = QCoreApplication.instance()
+            if app:
+                app.aboutToQuit.connect(cls._instance.shutdown)
+        return cls._instance
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(self.MAX_THREADS)
+        self._ids = itertools.count(1)
+        self._jobs = {}
+        self._runnables = {}
+        self._callbacks = {}
+        self._job_done.connect(self._on_job_done)
+
+    def submit(self, title, function, *args, on_result=None, on_error=None, **kwargs):
+        """Queue function(job, *args, **kwargs); returns the Job"""
+        job = Job(next(self._ids), title, self)
+        runnable = _JobRunnable(job, function, args, kwargs)
+        self._jobs[job.id] = job
+        self._runnables[job.id] = runnable
+        self._callbacks[job.id] = (on_result, on_error)
+        self.job_added.emit(job.id)
+        self.pool.start(runnable)
+        return job
+
+    def job(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self):
+        return list(self._jobs.values())
+
+    def has_running_jobs(self):
+        return any(not job.finished for job in self._jobs.values())
+
+    def cancel(self, job_id):
+        """Ask a job to stop; a job still waiting in the queue never starts"""
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return
+        job.cancel()
+        runnable = self._runnables.get(job_id)
+        if runnable is not None and self.pool.tryTake(runnable):
+            job.status = CANCELLED
+            self._on_job_done(job_id)
+
+    def clear_finished(self):
+        for job in [job for job in self._jobs.values() if job.finished and job.id not in self._runnables]:
+            del self._jobs[job.id]
+            self.job_removed.emit(job.id)
+
+    def shutdown(self, timeout=5000):
+        """Cancel every job and wait (up to timeout ms) for the running ones"""
+        for job in self._jobs.values():
+            if not job.finished:
+                self.cancel(job.id)
+        self.pool.waitForDone(timeout)
+
+    def _on_job_done(self, job_id):
+        job = self._jobs.get(job_id)
+        self._runnables.pop(job_id, None)
+        on_result, on_error = self._callbacks.pop(job_id, (None, None))
+        if job is None:
+            return
+        if job.status == DONE:
+            job.percent = 100
+            message = job.message or "Terminé"
+        elif job.status == FAILED:
+            message = job.error
+        else:
+            message = "Annulé"
+        self.job_finished.emit(job.id, job.status, message)
+
+        try:
+            if job.status == FAILED:
+                if on_error:
+                    on_error(job.error)
+            elif on_result and job.result is not None:
+                on_result(job.result)
+        except Exception as e:
+            # The window that submitted the job may be gone
+            print(f"Error in the callback of job '{job.title}': {e}")
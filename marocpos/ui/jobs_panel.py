@@ -0,0 +1,120 @@
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
+    QHeaderView, QProgressBar, QPushButton, QAbstractItemView
+)
+from PyQt5.QtCore import Qt
+from ui.job_manager import JobManager, STATUS_LABELS, DONE
+
+
+class JobsPanel(QWidget):
+    """Background jobs of the JobManager: progress, status and a cancel button.
+
+    Can be embedded in a window or shown on its own (JobsPanel().show()).
+    """
+
+    COLUMNS = ["Tâche", "Progression", "État", ""]
+    TITLE, PROGRESS, STATUS, ACTION = range(4)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.manager = JobManager.instance()
+        self._rows = {}
+        self.init_ui()
+
+        for job in self.manager.jobs():
+            self.add_job(job.id)
+        self.manager.job_added.connect(self.add_job)
+        self.manager.job_progress.connect(self.update_progress)
+        self.manager.job_finished.connect(self.finish_job)
+        self.manager.job_removed.connect(self.remove_job)
+
+    def init_ui(self):
+        self.setWindowTitle("Tâches en arrière-plan")
+        self.resize(600, 250)
+
+        layout = QVBoxLayout(self)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionMode(QAbstractItemView.NoSelection)
+        self.table.verticalHeader().setVisible(False)
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(self.TITLE, QHeaderView.Stretch)
+        header.setSectionResizeMode(self.PROGRESS, QHeaderView.Stretch)
+        header.setSectionResizeMode(self.STATUS, QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(self.ACTION, QHeaderView.ResizeToContents)
+        layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        clear_button = QPushButton("Effacer les tâches terminées")
+        clear_button.clicked.connect(self.manager.clear_finished)
+        button_layout.addWidget(clear_button)
+        layout.addLayout(button_layout)
+
+    def _row(self, job_id):
+        """Current table row of a job (rows move when others are removed)"""
+        for row in range(self.table.rowCount()):
+            if self.table.item(row, self.TITLE).data(Qt.UserRole) == job_id:
+                return row
+        return None
+
+    def add_job(self, job_id):
+        job = self.manager.job(job_id)
+        if job is None or job_id in self._rows:
+            return
+        row = self.table.rowCount()
+        self.table.insertRow(row)
+
+        title_item = QTableWidgetItem(job.title)
+        title_item.setData(Qt.UserRole, job_id)
+        self.table.setItem(row, self.TITLE, title_item)
+
+        progress = QProgressBar()
+        progress.setRange(0, 100)
+        progress.setValue(max(job.percent, 0))
+        self.table.setCellWidget(row, self.PROGRESS, progress)
+
+        self.table.setItem(row, self.STATUS, QTableWidgetItem(job.message or STATUS_LABELS[job.status]))
+
+        cancel_button = QPushButton("Annuler")
+        cancel_button.clicked.connect(lambda: self.manager.cancel(job_id))
+        self.table.setCellWidget(row, self.ACTION, cancel_button)
+
+        self._rows[job_id] = (progress, cancel_button)
+        if job.finished:
+            self.finish_job(job_id, job.status, job.error or STATUS_LABELS[job.status])
+
+    def update_progress(self, job_id, percent, message):
+        if job_id not in self._rows:
+            return
+        progress, _ = self._rows[job_id]
+        if percent < 0:
+            progress.setRange(0, 0)
+        else:
+            progress.setRange(0, 100)
+            progress.setValue(percent)
+        row = self._row(job_id)
+        if row is not None:
+            job = self.manager.job(job_id)
+            self.table.item(row, self.STATUS).setText(message or STATUS_LABELS[job.status])
+
+    def finish_job(self, job_id, status, message):
+        if job_id not in self._rows:
+            return
+        progress, cancel_button = self._rows[job_id]
+        progress.setRange(0, 100)
+        if status == DONE:
+            progress.setValue(100)
+        cancel_button.setEnabled(False)
+        row = self._row(job_id)
+        if row is not None:
+            label = STATUS_LABELS[status]
+            self.table.item(row, self.STATUS).setText(label if message == label else f"{label} - {message}")
+
+    def remove_job(self, job_id):
+        row = self._row(job_id)
+        self._rows.pop(job_id, None)
+        if row is not None:
+            self.table.removeRow(row)
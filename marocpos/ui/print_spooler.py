@@ -0,0 +1,245 @@
+from PyQt5.QtCore import QObject, QCoreApplication, pyqtSignal
+from database import DatabaseManager
+from models.print_queue import PrintQueue, PENDING, DONE, FAILED
+from models.receipt_renderer import load_receipt, load_receipt_settings, render_thermal, render_pdf
+import os
+import subprocess
+import sys
+import threading
+
+RECEIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'receipts')
+
+# Used when the 'printer_backend' setting is empty (vendor/product of ReceiptPrinter)
+DEFAULT_PRINTER_BACKEND = 'usb:0x0456:0x0808'
+
+
+class PrinterBackend:
+    """Destination of thermal receipts. The spooler keeps one open between jobs."""
+
+    def open(self):
+        pass
+
+    def write(self, data):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class EscposUsbBackend(PrinterBackend):
+    """USB thermal printer through python-escpos"""
+
+    def __init__(self, vendor_id, product_id):
+        self.vendor_id = vendor_id
+        self.product_id = product_id
+        self.printer = None
+
+    def open(self):
+        if self.printer is None:
+            from escpos.printer import Usb
+            self.printer = Usb(self.vendor_id, self.product_id)
+
+    def write(self, data):
+        self.open()
+        self.printer._raw(data)
+
+    def close(self):
+        if self.printer is not None:
+            try:
+                self.printer.close()
+            except Exception as e:
+                print(f"Error closing thermal printer: {e}")
+            self.printer = None
+
+
+class EscposNetworkBackend(EscposUsbBackend):
+    """Network (port 9100) thermal printer through python-escpos"""
+
+    def __init__(self, host, port=9100):
+        self.host = host
+        self.port = port
+        self.printer = None
+
+    def open(self):
+        if self.printer is None:
+            from escpos.printer import Network
+            self.printer = Network(self.host, self.port)
+
+
+class FileBackend(PrinterBackend):
+    """Appends the raw receipts to a file: for tests and tills without a printer"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, data):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'ab') as output:
+            output.write(data)
+
+
+def create_backend(spec):
+    """Backend described by the 'printer_backend' setting.
+
+    usb:<vendor_id>:<product_id>, network:<host>[:<port>] or file:<path>
+    """
+    kind, _, rest = (spec or DEFAULT_PRINTER_BACKEND).partition(':')
+    if kind == 'usb':
+        vendor_id, _, product_id = rest.partition(':')
+        return EscposUsbBackend(int(vendor_id, 0), int(product_id, 0))
+    if kind == 'network':
+        host, _, port = rest.partition(':')
+        return EscposNetworkBackend(host, int(port) if port else 9100)
+    if kind == 'file':
+        return FileBackend(rest)
+    raise ValueError(f"Imprimante inconnue: {spec}")
+
+
+def send_to_system_printer(path):
+    """Print a PDF on the default system printer"""
+    if sys.platform.startswith('win'):
+        os.startfile(path, 'print')
+    else:
+        subprocess.run(['lp', path], check=True, capture_output=True, timeout=30)
+
+
+class PrintSpooler(QObject):
+    """Prints receipts from the PrintJobs queue on a worker thread.
+
+    submit() only inserts the job, so the sale screen is free as soon as
+    the sale is committed. The worker keeps the thermal printer open
+    between receipts, retries failures with exponential backoff and reports
+    every change through job_status(job_id, sale_id, status, message).
+    Use the shared instance(); backend_factory(spec) can be replaced to
+    plug in another printer.
+    """
+
+    MAX_ATTEMPTS = 5
+    RETRY_DELAY = 2         # seconds, doubled after each failure
+    MAX_RETRY_DELAY = 60
+    POLL_INTERVAL = 30      # upper bound on the idle wait
+
+    # job_id, sale_id, status ('pending', 'retry', 'done', 'failed'), message
+    job_status = pyqtSignal(int, int, str, str)
+
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+            cls._instance.start()
+            app = QCoreApplication.instance()
+            if app:
+                app.aboutToQuit.connect(cls._instance.stop)
+        return cls._instance
+
+    def __init__(self, backend_factory=create_backend, parent=None):
+        super().__init__(parent)
+        self.backend_factory = backend_factory
+        self._backend = None
+        self._backend_spec = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        PrintQueue.requeue_interrupted()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="print-spooler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, sale_id, kind, output_path=None):
+        """Queue the receipt of a sale ('thermal', 'a4' or 'pdf'); returns the job id"""
+        job_id = PrintQueue.enqueue(sale_id, kind, output_path)
+        if job_id is None:
+            raise RuntimeError("Impossible d'ajouter le reçu à la file d'impression")
+        self.job_status.emit(job_id, sale_id, PENDING, "Reçu en file d'impression")
+        self._wakeup.set()
+        return job_id
+
+    def retry(self, job_id):
+        PrintQueue.retry(job_id)
+        self._wakeup.set()
+
+    # Worker thread
+    def _run(self):
+        while not self._stopping.is_set():
+            job = PrintQueue.claim_next()
+            if job is None:
+                delay = PrintQueue.seconds_until_next()
+                self._wakeup.wait(self.POLL_INTERVAL if delay is None else min(delay, self.POLL_INTERVAL))
+                self._wakeup.clear()
+                continue
+            self._process(job)
+        self._close_backend()
+        DatabaseManager.release_thread_connection()
+
+    def _process(self, job):
+        try:
+            output_path = self._print(job)
+        except Exception as e:
+            # The printer may be unplugged or off: reopen it on the next attempt
+            self._close_backend()
+            attempts = job['attempts'] + 1
+            error = str(e) or e.__class__.__name__
+            if attempts >= self.MAX_ATTEMPTS:
+                PrintQueue.mark_failed(job['id'], error)
+                self.job_status.emit(job['id'], job['sale_id'], FAILED,
+                                     f"Échec de l'impression du reçu #{job['sale_id']}: {error}")
+            else:
+                delay = min(self.RETRY_DELAY * 2 ** (attempts - 1), self.MAX_RETRY_DELAY)
+                PrintQueue.mark_retry(job['id'], error, delay)
+                self.job_status.emit(job['id'], job['sale_id'], 'retry',
+                                     f"Impression du reçu #{job['sale_id']} en échec, nouvel essai dans {delay} s")
+            return
+
+        PrintQueue.mark_done(job['id'], output_path)
+        if output_path:
+            message = f"Reçu #{job['sale_id']} enregistré: {output_path}"
+        else:
+            message = f"Reçu #{job['sale_id']} imprimé"
+        self.job_status.emit(job['id'], job['sale_id'], DONE, message)
+
+    def _print(self, job):
+        """Render and send one job; returns the PDF path for A4/PDF jobs"""
+        sale, items = load_receipt(job['sale_id'])
+        if not sale:
+            raise ValueError(f"Vente #{job['sale_id']} introuvable")
+        settings = load_receipt_settings()
+
+        if job['kind'] == 'thermal':
+            backend = self._get_backend(settings.get('printer_backend'))
+            backend.write(render_thermal(sale, items, settings))
+            return None
+
+        output_path = job['output_path']
+        if not output_path:
+            os.makedirs(RECEIPTS_DIR, exist_ok=True)
+            output_path = os.path.join(RECEIPTS_DIR, f"receipt_{job['sale_id']}.pdf")
+        render_pdf(output_path, sale, items, settings)
+        if job['kind'] == 'a4':
+            send_to_system_printer(output_path)
+        return output_path
+
+    def _get_backend(self, spec):
+        if self._backend is None or spec != self._backend_spec:
+            self._close_backend()
+            self._backend = self.backend_factory(spec)
+            self._backend_spec = spec
+            self._backend.open()
+        return self._backend
+
+    def _close_backend(self):
+        if self._backend is not None:
+            self._backend.close()
+            self._backend = None
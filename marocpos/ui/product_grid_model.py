@@ -0,0 +1,137 @@
+from PyQt5.QtWidgets import QStyle, QStyledItemDelegate
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QSize
+from PyQt5.QtGui import QColor, QFont, QFontMetrics, QPainter
+from ui.thumbnail_service import ThumbnailService
+
+
+class ProductGridModel(QAbstractListModel):
+    """Products of one category for the sales screen grid.
+
+    The view only asks for the tiles it shows, so thumbnails are requested
+    from ThumbnailService as tiles scroll into view; a tile draws a
+    placeholder until its thumbnail is ready.
+    """
+
+    IMAGE_SIZE = 100
+
+    def __init__(self, products, parent=None):
+        super().__init__(parent)
+        self._products = products
+        self._thumbnails = ThumbnailService.instance()
+        self._thumbnails.thumbnail_ready.connect(self._on_thumbnail_ready)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._products)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._products):
+            return None
+        product = self._products[index.row()]
+        if role == Qt.DisplayRole:
+            return product.get('name')
+        if role == Qt.UserRole:
+            return product
+        if role == Qt.DecorationRole:
+            return self._thumbnails.thumbnail(product.get('image_path'), self.IMAGE_SIZE)
+        if role == Qt.ToolTipRole:
+            return product.get('name')
+        return None
+
+    def _on_thumbnail_ready(self, image_path, size):
+        if size == self.IMAGE_SIZE and self._products:
+            self.dataChanged.emit(self.index(0), self.index(len(self._products) - 1), [Qt.DecorationRole])
+
+
+class ProductTileDelegate(QStyledItemDelegate):
+    """Paints a product tile (image, name, price, stock) instead of one widget per product"""
+
+    TILE_WIDTH = 180
+    TILE_HEIGHT = 230
+    MARGIN = 5
+    PADDING = 10
+
+    BACKGROUND = QColor("white")
+    HOVER_BACKGROUND = QColor("#f8f9fa")
+    PLACEHOLDER = QColor("#e9ecef")
+    NAME_COLOR = QColor("#212529")
+    PRICE_COLOR = QColor("#28a745")
+    STOCK_COLOR = QColor("#6c757d")
+    VARIANT_COLOR = QColor("#0066cc")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # Fonts are built once and shared by every tile
+        self.name_font = QFont()
+        self.name_font.setPixelSize(14)
+        self.name_font.setBold(True)
+        self.price_font = QFont()
+        self.price_font.setPixelSize(13)
+        self.price_font.setBold(True)
+        self.small_font = QFont()
+        self.small_font.setPixelSize(12)
+        self.variant_font = QFont()
+        self.variant_font.setPixelSize(11)
+        self.variant_font.setItalic(True)
+
+    def sizeHint(self, option, index):
+        return QSize(self.TILE_WIDTH, self.TILE_HEIGHT)
+
+    def paint(self, painter, option, index):
+        product = index.data(Qt.UserRole)
+        if not product:
+            return
+
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        tile = option.rect.adjusted(self.MARGIN, self.MARGIN, -self.MARGIN, -self.MARGIN)
+        background = self.HOVER_BACKGROUND if option.state & QStyle.State_MouseOver else self.BACKGROUND
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(background)
+        painter.drawRoundedRect(tile, 10, 10)
+
+        content = tile.adjusted(self.PADDING, self.PADDING, -self.PADDING, -self.PADDING)
+        top = content.top()
+
+        # Product image, or a placeholder while its thumbnail loads
+        if product.get('image_path'):
+            pixmap = index.data(Qt.DecorationRole)
+            size = ProductGridModel.IMAGE_SIZE
+            if pixmap:
+                x = content.left() + (content.width() - pixmap.width()) // 2
+                painter.drawPixmap(x, top + (size - pixmap.height()) // 2, pixmap)
+            else:
+                painter.setBrush(self.PLACEHOLDER)
+                painter.drawRoundedRect(content.left() + (content.width() - size) // 2, top, size, size, 5, 5)
+            top += size + 4
+
+        # Has variants label
+        if product.get('has_variants'):
+            top = self._draw_line(painter, content, top, "(Avec variantes)", self.variant_font, self.VARIANT_COLOR)
+
+        # Product name, at most two lines
+        painter.setFont(self.name_font)
+        painter.setPen(self.NAME_COLOR)
+        metrics = QFontMetrics(self.name_font)
+        name_rect = QRect(content.left(), top, content.width(), metrics.height() * 2)
+        name = product.get('name') or ''
+        if metrics.boundingRect(name_rect, Qt.TextWordWrap, name).height() > name_rect.height():
+            name = metrics.elidedText(name, Qt.ElideRight, content.width() * 2 - metrics.averageCharWidth() * 2)
+        painter.drawText(name_rect, Qt.AlignHCenter | Qt.AlignTop | Qt.TextWordWrap, name)
+        top += name_rect.height()
+
+        # Product price and stock
+        top = self._draw_line(painter, content, top, f"{product.get('unit_price') or 0:.2f} MAD",
+                              self.price_font, self.PRICE_COLOR)
+        self._draw_line(painter, content, top, f"Stock: {product.get('stock') or 0}",
+                        self.small_font, self.STOCK_COLOR)
+
+        painter.restore()
+
+    def _draw_line(self, painter, content, top, text, font, color):
+        """Draw one centered line of text and return the top of the next one"""
+        height = QFontMetrics(font).height()
+        painter.setFont(font)
+        painter.setPen(color)
+        painter.drawText(QRect(content.left(), top, content.width(), height), Qt.AlignCenter, text)
+        return top + height + 2
@@ -1,18 +1,19 @@
 from PyQt5.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, 
+    QWidget, QVBoxLayout, QHBoxLayout, QTableView, QAbstractItemView,
     QPushButton, QLabel, QHeaderView, QMessageBox, QComboBox, QLineEdit,
     QSpinBox, QDoubleSpinBox, QFrame, QCheckBox, QDialog
 )
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap
+from PyQt5.QtCore import Qt, QTimer
 from models.product import Product
 from models.category import Category
+from models.product_filter import ProductFilterIndex
+from ui.product_table_model import ProductTableModel, ProductActionsDelegate
 import json
-import os
 
 class ProductManagementWindow(QWidget):
     def __init__(self):
         super().__init__()
+        self.filter_index = None
         self.init_ui()
         self.load_products()
 
@@ -31,7 +32,12 @@ class ProductManagementWindow(QWidget):
         search_label = QLabel("Rechercher:")
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Nom de produit, code-barres...")
-        self.search_input.textChanged.connect(self.filter_products)
+        # Debounce typing: filter once the user pauses
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(150)
+        self.filter_timer.timeout.connect(self.filter_products)
+        self.search_input.textChanged.connect(self.filter_timer.start)
         
         # Category filter
         category_label = QLabel("Catégorie:")
@@ -81,27 +87,27 @@ class ProductManagementWindow(QWidget):
         
         main_layout.addLayout(top_layout)
 
-        # Products table
-        self.products_table = QTableWidget()
-        self.products_table.setColumnCount(12)
-        self.products_table.setHorizontalHeaderLabels([
-            "ID", "Image", "Code-barres", "Nom", "Prix vente", "Prix achat", 
-            "Stock", "Stock min", "Catégorie", "Variantes", "Marge", "Actions"
-        ])
+        # Products table: model/view, rows fetched in batches and actions painted
+        self.products_model = ProductTableModel(self)
+        self.products_table = QTableView()
+        self.products_table.setModel(self.products_model)
+        self.products_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.products_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.products_table.verticalHeader().setVisible(False)
+        self.products_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.products_table.verticalHeader().setDefaultSectionSize(ProductTableModel.THUMBNAIL_SIZE + 6)
+        self.products_table.setSortingEnabled(True)
+        self.products_table.sortByColumn(ProductTableModel.ID, Qt.DescendingOrder)
+        
+        self.actions_delegate = ProductActionsDelegate(self.products_table)
+        self.actions_delegate.action_triggered.connect(self.on_product_action)
+        self.products_table.setItemDelegateForColumn(ProductTableModel.ACTIONS, self.actions_delegate)
 
         # Set column widths
-        self.products_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Fixed)
-        self.products_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Fixed)
-        self.products_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Fixed)
-        self.products_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
-        self.products_table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Fixed)
-        self.products_table.horizontalHeader().setSectionResizeMode(5, QHeaderView.Fixed)
-        self.products_table.horizontalHeader().setSectionResizeMode(6, QHeaderView.Fixed)
-        self.products_table.horizontalHeader().setSectionResizeMode(7, QHeaderView.Fixed)
-        self.products_table.horizontalHeader().setSectionResizeMode(8, QHeaderView.Fixed)
-        self.products_table.horizontalHeader().setSectionResizeMode(9, QHeaderView.Fixed)
-        self.products_table.horizontalHeader().setSectionResizeMode(10, QHeaderView.Fixed)
-        self.products_table.horizontalHeader().setSectionResizeMode(11, QHeaderView.Fixed)
+        header = self.products_table.horizontalHeader()
+        for column in range(len(ProductTableModel.COLUMNS)):
+            header.setSectionResizeMode(column, QHeaderView.Fixed)
+        header.setSectionResizeMode(ProductTableModel.NAME, QHeaderView.Stretch)
         
         self.products_table.setColumnWidth(0, 50)  # ID
         self.products_table.setColumnWidth(1, 70)  # Image
@@ -114,7 +120,7 @@ class ProductManagementWindow(QWidget):
         self.products_table.setColumnWidth(8, 120) # Category
         self.products_table.setColumnWidth(9, 120) # Variants
         self.products_table.setColumnWidth(10, 80) # Margin
-        self.products_table.setColumnWidth(11, 180) # Actions
+        self.products_table.setColumnWidth(11, 140) # Actions
         
         main_layout.addWidget(self.products_table)
         
@@ -138,182 +144,50 @@ class ProductManagementWindow(QWidget):
         
         # Add each category to combo box
         for category in categories:
-            self.category_filter.addItem(category[1], category[0])
+            self.category_filter.addItem(category['name'], category['id'])
 
     def load_products(self):
-        """Load products into the table"""
+        """Load products into the table model"""
         try:
-            # Get all products
-            products = Product.get_all_products()
-            
-            # Clear table
-            self.products_table.setRowCount(0)
-            
-            # Set row count
-            self.products_table.setRowCount(len(products))
-            
-            # Fill table with products
-            for row, product in enumerate(products):
-                # ID Column
-                id_item = QTableWidgetItem(str(product['id']))
-                id_item.setFlags(id_item.flags() & ~Qt.ItemIsEditable)  # Make read-only
-                self.products_table.setItem(row, 0, id_item)
-                
-                # Image Column
-                image_cell = QTableWidgetItem("")
-                
-                if product.get('image_path') and os.path.exists(product['image_path']):
-                    # Create a small pixmap for the thumbnail
-                    pixmap = QPixmap(product['image_path'])
-                    if not pixmap.isNull():
-                        scaled_pixmap = pixmap.scaled(50, 50, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                        image_cell.setData(Qt.DecorationRole, scaled_pixmap)
-                
-                self.products_table.setItem(row, 1, image_cell)
-                
-                # Barcode Column
-                barcode_item = QTableWidgetItem(str(product.get('barcode', '')))
-                barcode_item.setFlags(barcode_item.flags() & ~Qt.ItemIsEditable)  # Make read-only
-                self.products_table.setItem(row, 2, barcode_item)
-                
-                # Name Column
-                name_item = QTableWidgetItem(product['name'])
-                name_item.setFlags(name_item.flags() & ~Qt.ItemIsEditable)  # Make read-only
-                self.products_table.setItem(row, 3, name_item)
-                
-                # Sell Price Column
-                sell_price = product.get('unit_price', 0)
-                price_item = QTableWidgetItem(f"{sell_price:.2f}")
-                price_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-                price_item.setFlags(price_item.flags() & ~Qt.ItemIsEditable)  # Make read-only
-                self.products_table.setItem(row, 4, price_item)
-                
-                # Purchase Price Column
-                purchase_price = product.get('purchase_price', 0)
-                cost_item = QTableWidgetItem(f"{purchase_price:.2f}")
-                cost_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-                cost_item.setFlags(cost_item.flags() & ~Qt.ItemIsEditable)  # Make read-only
-                self.products_table.setItem(row, 5, cost_item)
-                
-                # Stock Column
-                stock_item = QTableWidgetItem(str(product.get('stock', 0)))
-                stock_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-                stock_item.setFlags(stock_item.flags() & ~Qt.ItemIsEditable)  # Make read-only
-                self.products_table.setItem(row, 6, stock_item)
-                
-                # Min Stock Column
-                min_stock_item = QTableWidgetItem(str(product.get('min_stock', 0)))
-                min_stock_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-                min_stock_item.setFlags(min_stock_item.flags() & ~Qt.ItemIsEditable)  # Make read-only
-                self.products_table.setItem(row, 7, min_stock_item)
-                
-                # Category Column
-                category_name = product.get('category_name', 'Non catégorisé')
-                category_item = QTableWidgetItem(category_name)
-                category_item.setFlags(category_item.flags() & ~Qt.ItemIsEditable)  # Make read-only
-                self.products_table.setItem(row, 8, category_item)
-                
-                # Variants Column
-                has_variants = product.get('has_variants', False)
-                variants_item = QTableWidgetItem("Oui" if has_variants else "Non")
-                variants_item.setFlags(variants_item.flags() & ~Qt.ItemIsEditable)  # Make read-only
-                self.products_table.setItem(row, 9, variants_item)
-                
-                # Margin Column
-                margin = 0
-                if purchase_price and purchase_price > 0:
-                    margin = ((sell_price - purchase_price) / purchase_price) * 100
-                margin_item = QTableWidgetItem(f"{margin:.2f}%")
-                margin_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-                margin_item.setFlags(margin_item.flags() & ~Qt.ItemIsEditable)  # Make read-only
-                
-                # Color code margin
-                if margin < 0:
-                    margin_item.setForeground(Qt.red)
-                elif margin > 50:
-                    margin_item.setForeground(Qt.darkGreen)
-                    
-                self.products_table.setItem(row, 10, margin_item)
-                
-                # Actions Column - create a widget with buttons
-                actions_widget = QWidget()
-                actions_layout = QHBoxLayout(actions_widget)
-                actions_layout.setContentsMargins(0, 0, 0, 0)
-                
-                # Edit button
-                edit_btn = QPushButton("✏️")
-                edit_btn.setToolTip("Modifier")
-                edit_btn.setMaximumWidth(30)
-                edit_btn.clicked.connect(lambda checked, p=product: self.edit_product(p))
-                
-                # Stock button
-                stock_btn = QPushButton("📦")
-                stock_btn.setToolTip("Gérer le stock")
-                stock_btn.setMaximumWidth(30)
-                stock_btn.clicked.connect(lambda checked, p=product: self.manage_stock(p))
-                
-                # Variant button (only for products with variants)
-                variant_btn = QPushButton("🔄")
-                variant_btn.setToolTip("Gérer les variantes")
-                variant_btn.setMaximumWidth(30)
-                variant_btn.setEnabled(has_variants)
-                variant_btn.clicked.connect(lambda checked, p=product: self.manage_variants(p))
-                
-                # Delete button
-                delete_btn = QPushButton("🗑️")
-                delete_btn.setToolTip("Supprimer")
-                delete_btn.setMaximumWidth(30)
-                delete_btn.clicked.connect(lambda checked, id=product['id']: self.delete_product(id))
-                
-                actions_layout.addWidget(edit_btn)
-                actions_layout.addWidget(stock_btn)
-                actions_layout.addWidget(variant_btn)
-                actions_layout.addWidget(delete_btn)
-                actions_layout.addStretch()
-                
-                self.products_table.setCellWidget(row, 11, actions_widget)
-            
-            # Update status label
-            self.status_label.setText(f"Chargement de {len(products)} produits")
-            
+            self.products_model.set_products(Product.get_all_products())
+            # Rebuilt on the next filter, only if the user filters
+            self.filter_index = None
+            self.filter_products()
         except Exception as e:
             print(f"Error loading products: {e}")
             self.status_label.setText(f"Erreur: {str(e)}")
 
     def filter_products(self):
         """Filter products based on search text and category"""
-        search_text = self.search_input.text().lower()
+        self.filter_timer.stop()
+        search_text = self.search_input.text()
         category_id = self.category_filter.currentData()
         
-        for row in range(self.products_table.rowCount()):
-            show_row = True
-            
-            # Get product data
-            name = self.products_table.item(row, 3).text().lower()
-            barcode = self.products_table.item(row, 2).text().lower()
-            category_name = self.products_table.item(row, 8).text().lower()
-            
-            # Check search text
-            if search_text:
-                show_row = search_text in name or search_text in barcode or search_text in category_name
-                
-            # Check category filter (if active)
-            if show_row and category_id is not None:
-                category_item = self.products_table.item(row, 8)
-                if category_item:
-                    # This is a simple check based on category name
-                    # Ideally we would store category ID in the item data
-                    current_category = category_item.text()
-                    selected_category = self.category_filter.currentText()
-                    if selected_category != "Toutes les catégories" and current_category != selected_category:
-                        show_row = False
-                
-            # Show or hide row
-            self.products_table.setRowHidden(row, not show_row)
-            
+        rows = None
+        if search_text.strip() or category_id is not None:
+            if self.filter_index is None:
+                self.filter_index = ProductFilterIndex(self.products_model.products())
+            rows = self.filter_index.search(search_text, category_id)
+        self.products_model.set_visible_rows(rows)
+        
         # Update status label with filtered count
-        visible_count = sum(1 for row in range(self.products_table.rowCount()) if not self.products_table.isRowHidden(row))
-        self.status_label.setText(f"Affichage de {visible_count} produits sur {self.products_table.rowCount()}")
+        self.status_label.setText(
+            f"Affichage de {self.products_model.shown_count()} produits sur {self.products_model.total_count()}"
+        )
+
+    def on_product_action(self, action, row):
+        """Dispatch a click on one of the action buttons of a row"""
+        product = self.products_model.product_at(row)
+        if not product:
+            return
+        if action == 'edit':
+            self.edit_product(product)
+        elif action == 'stock':
+            self.manage_stock(product)
+        elif action == 'variants':
+            self.manage_variants(product)
+        elif action == 'delete':
+            self.delete_product(product['id'])
 
     def add_product(self):
         """Open the add product dialog"""
@@ -387,6 +261,18 @@ class ProductManagementWindow(QWidget):
             dialog = VariantManagementDialog(product['id'], self, variant_attributes)
             
             if dialog.exec_():
+                # Save the new combinations in one transaction
+                existing = {
+                    json.dumps(variant['attributes'], sort_keys=True)
+                    for variant in Product.get_variants(product['id'])
+                }
+                new_variants = [
+                    variant for variant in dialog.get_variants_data()
+                    if json.dumps(json.loads(variant['attribute_values']), sort_keys=True) not in existing
+                ]
+                if new_variants:
+                    Product.add_variants_bulk(product['id'], new_variants)
+                
                 # Refresh the product list after managing variants
                 self.load_products()
         except Exception as e:
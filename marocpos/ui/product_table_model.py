@@ -0,0 +1,250 @@
+from PyQt5.QtWidgets import (
+    QApplication, QStyle, QStyledItemDelegate, QStyleOptionButton, QToolTip
+)
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QEvent, QRect, pyqtSignal
+from PyQt5.QtGui import QColor
+from ui.thumbnail_service import ThumbnailService
+
+
+def product_margin(product):
+    """Markup in percent of the purchase price (0 when there is no cost)"""
+    sell_price = product.get('unit_price') or 0
+    purchase_price = product.get('purchase_price') or 0
+    if purchase_price > 0:
+        return ((sell_price - purchase_price) / purchase_price) * 100
+    return 0
+
+
+class ProductTableModel(QAbstractTableModel):
+    """Product table over the in-memory catalog.
+
+    Rows are handed to the view in batches (canFetchMore/fetchMore) and
+    thumbnails are only requested when a visible row asks for them (loaded
+    in the background by ThumbnailService), so opening the window costs the
+    same for 200 or 20 000 products.
+    """
+
+    COLUMNS = [
+        "ID", "Image", "Code-barres", "Nom", "Prix vente", "Prix achat",
+        "Stock", "Stock min", "Catégorie", "Variantes", "Marge", "Actions"
+    ]
+    ID, IMAGE, BARCODE, NAME, PRICE, COST, STOCK, MIN_STOCK, CATEGORY, VARIANTS, MARGIN, ACTIONS = range(12)
+    NUMERIC_COLUMNS = (PRICE, COST, STOCK, MIN_STOCK, MARGIN)
+
+    BATCH_SIZE = 200
+    THUMBNAIL_SIZE = 50
+
+    SORT_KEYS = {
+        ID: lambda p: p['id'],
+        BARCODE: lambda p: str(p.get('barcode') or ''),
+        NAME: lambda p: (p.get('name') or '').casefold(),
+        PRICE: lambda p: p.get('unit_price') or 0,
+        COST: lambda p: p.get('purchase_price') or 0,
+        STOCK: lambda p: p.get('stock') or 0,
+        MIN_STOCK: lambda p: p.get('min_stock') or 0,
+        CATEGORY: lambda p: (p.get('category_name') or '').casefold(),
+        VARIANTS: lambda p: bool(p.get('has_variants')),
+        MARGIN: product_margin,
+    }
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._products = []   # every product of the catalog
+        self._rows = []       # products passing the filter, in display order
+        self._fetched = 0     # rows already exposed to the view
+        self._visible = None  # positions in _products kept by the filter (None: all)
+        self._sort_column = self.ID
+        self._sort_order = Qt.DescendingOrder
+        self._thumbnails = ThumbnailService.instance()
+        self._thumbnails.thumbnail_ready.connect(self._on_thumbnail_ready)
+
+    # Data management
+    def set_products(self, products):
+        """Replace the products, clearing the filter and keeping the sort order"""
+        self.beginResetModel()
+        self._products = products
+        self._visible = None
+        self._rebuild_rows()
+        self.endResetModel()
+
+    def set_visible_rows(self, rows):
+        """Show only the products at these positions (as returned by ProductFilterIndex)"""
+        self.beginResetModel()
+        self._visible = rows
+        self._rebuild_rows()
+        self.endResetModel()
+
+    def _rebuild_rows(self):
+        if self._visible is None:
+            rows = list(self._products)
+        else:
+            products = self._products
+            rows = [products[i] for i in self._visible]
+        key = self.SORT_KEYS.get(self._sort_column)
+        if key:
+            rows.sort(key=key, reverse=self._sort_order == Qt.DescendingOrder)
+        self._rows = rows
+        self._fetched = min(self.BATCH_SIZE, len(rows))
+
+    def product_at(self, row):
+        if 0 <= row < self._fetched:
+            return self._rows[row]
+        return None
+
+    def products(self):
+        """Every product, in the order the filter rows refer to"""
+        return self._products
+
+    def total_count(self):
+        return len(self._products)
+
+    def shown_count(self):
+        return len(self._rows)
+
+    # Lazy row fetching
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._fetched < len(self._rows)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.BATCH_SIZE, len(self._rows) - self._fetched)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._fetched, self._fetched + count - 1)
+        self._fetched += count
+        self.endInsertRows()
+
+    # QAbstractTableModel interface
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._fetched
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self._fetched:
+            return None
+        product = self._rows[index.row()]
+        column = index.column()
+
+        if role == Qt.DisplayRole:
+            return self._display_text(product, column)
+        if role == Qt.UserRole:
+            return product
+        if role == Qt.DecorationRole and column == self.IMAGE:
+            return self._thumbnails.thumbnail(product.get('image_path'), self.THUMBNAIL_SIZE)
+        if role == Qt.TextAlignmentRole and column in self.NUMERIC_COLUMNS:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        if role == Qt.ForegroundRole and column == self.MARGIN:
+            margin = product_margin(product)
+            if margin < 0:
+                return QColor(Qt.red)
+            if margin > 50:
+                return QColor(Qt.darkGreen)
+        return None
+
+    def _display_text(self, product, column):
+        if column == self.ID:
+            return str(product['id'])
+        if column == self.BARCODE:
+            return str(product.get('barcode') or '')
+        if column == self.NAME:
+            return product.get('name')
+        if column == self.PRICE:
+            return f"{product.get('unit_price') or 0:.2f}"
+        if column == self.COST:
+            return f"{product.get('purchase_price') or 0:.2f}"
+        if column == self.STOCK:
+            return str(product.get('stock') or 0)
+        if column == self.MIN_STOCK:
+            return str(product.get('min_stock') or 0)
+        if column == self.CATEGORY:
+            return product.get('category_name') or 'Non catégorisé'
+        if column == self.VARIANTS:
+            return "Oui" if product.get('has_variants') else "Non"
+        if column == self.MARGIN:
+            return f"{product_margin(product):.2f}%"
+        return None
+
+    def _on_thumbnail_ready(self, image_path, size):
+        # The view only repaints the visible cells of the range
+        if size == self.THUMBNAIL_SIZE and self._fetched:
+            self.dataChanged.emit(self.index(0, self.IMAGE), self.index(self._fetched - 1, self.IMAGE),
+                                  [Qt.DecorationRole])
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """Sort every product (not just the fetched rows) on a column"""
+        if column not in self.SORT_KEYS:
+            return
+        self.beginResetModel()
+        self._sort_column = column
+        self._sort_order = order
+        self._rebuild_rows()
+        self.endResetModel()
+
+
+class ProductActionsDelegate(QStyledItemDelegate):
+    """Paints the action buttons of a product row instead of real widgets.
+
+    A click on a button emits action_triggered(action, row).
+    """
+
+    ACTIONS = [
+        ('edit', "✏️", "Modifier"),
+        ('stock', "📦", "Gérer le stock"),
+        ('variants', "🔄", "Gérer les variantes"),
+        ('delete', "🗑️", "Supprimer"),
+    ]
+    BUTTON_WIDTH = 30
+
+    action_triggered = pyqtSignal(str, int)
+
+    def _buttons(self, option, index):
+        """(action, icon, tooltip, rect, enabled) for each button of a cell"""
+        product = index.data(Qt.UserRole) or {}
+        rect = option.rect
+        buttons = []
+        for i, (action, icon, tooltip) in enumerate(self.ACTIONS):
+            button_rect = QRect(rect.left() + i * (self.BUTTON_WIDTH + 4), rect.top() + 4,
+                                self.BUTTON_WIDTH, rect.height() - 8)
+            enabled = action != 'variants' or bool(product.get('has_variants'))
+            buttons.append((action, icon, tooltip, button_rect, enabled))
+        return buttons
+
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)
+        style = option.widget.style() if option.widget else QApplication.style()
+        for action, icon, tooltip, rect, enabled in self._buttons(option, index):
+            button = QStyleOptionButton()
+            button.rect = rect
+            button.text = icon
+            button.state = QStyle.State_Enabled | QStyle.State_Raised if enabled else QStyle.State_None
+            style.drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            for action, icon, tooltip, rect, enabled in self._buttons(option, index):
+                if rect.contains(event.pos()):
+                    if enabled:
+                        self.action_triggered.emit(action, index.row())
+                    return True
+        return super().editorEvent(event, model, option, index)
+
+    def helpEvent(self, event, view, option, index):
+        if event.type() == QEvent.ToolTip:
+            for action, icon, tooltip, rect, enabled in self._buttons(option, index):
+                if rect.contains(event.pos()):
+                    QToolTip.showText(event.globalPos(), tooltip, view)
+                    return True
+        return super().helpEvent(event, view, option, index)
@@ -2,20 +2,15 @@ from PyQt5.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
     QTabWidget, QScrollArea, QWidget, QMessageBox, QFileDialog
 )
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap, QPainter, QFont
-from PyQt5.QtPrintSupport import QPrintDialog, QPrinter
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QPixmap, QPainter, QFont
+from PyQt5.QtPrintSupport import QPrintDialog, QPrinter
 from models.sales import Sales
 from database import get_connection
 import os
 from datetime import datetime
 import json
 import tempfile
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 
 class ReceiptGenerator:
     def __init__(self, sale_id, parent=None):
@@ -27,17 +22,8 @@ class ReceiptGenerator:
         
     def load_settings(self):
         """Load settings from database"""
-        conn = get_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                cursor.execute("SELECT key, value FROM Settings")
-                self.settings = dict(cursor.fetchall())
-            except Exception as e:
-                print(f"Error loading settings: {e}")
-                self.settings = {}
-            finally:
-                conn.close()
+        from models.receipt_renderer import load_receipt_settings
+        self.settings = load_receipt_settings()
                 
     def load_sale_data(self):
         """Load sale data"""
@@ -144,139 +130,8 @@ class ReceiptGenerator:
                 return None
         
         try:
-            # Create PDF using ReportLab
-            doc = SimpleDocTemplate(
-                output_path,
-                pagesize=A4,
-                rightMargin=20,
-                leftMargin=20,
-                topMargin=20,
-                bottomMargin=20
-            )
-            
-            # Create content
-            styles = getSampleStyleSheet()
-            content = []
-            
-            # Store name (header)
-            store_name_style = ParagraphStyle(
-                'StoreNameStyle',
-                parent=styles['Title'],
-                alignment=1,  # Center alignment
-                fontSize=18
-            )
-            content.append(Paragraph(self.settings.get('store_name', 'My Store'), store_name_style))
-            content.append(Spacer(1, 10))
-            
-            # Store info
-            store_info_style = ParagraphStyle(
-                'StoreInfoStyle',
-                parent=styles['Normal'],
-                alignment=1,  # Center alignment
-                fontSize=10
-            )
-            
-            if self.settings.get('store_address'):
-                content.append(Paragraph(self.settings.get('store_address'), store_info_style))
-                content.append(Spacer(1, 5))
-            
-            contact_parts = []
-            if self.settings.get('store_phone'):
-                contact_parts.append(f"Tél: {self.settings.get('store_phone')}")
-            if self.settings.get('store_email'):
-                contact_parts.append(f"Email: {self.settings.get('store_email')}")
-                
-            if contact_parts:
-                content.append(Paragraph(" | ".join(contact_parts), store_info_style))
-                content.append(Spacer(1, 10))
-            
-            # Receipt details
-            receipt_style = ParagraphStyle(
-                'ReceiptStyle',
-                parent=styles['Normal'],
-                fontSize=10
-            )
-            
-            content.append(Paragraph(f"Reçu #: {self.sale['id']}", receipt_style))
-            content.append(Paragraph(f"Date: {self.sale['created_at']}", receipt_style))
-            content.append(Paragraph(f"Caissier: {self.sale['username']}", receipt_style))
-            content.append(Spacer(1, 15))
-            
-            # Items table
-            data = [['Produit', 'Qté', 'Prix', 'Total']]
-            for item in self.items:
-                data.append([
-                    item['product_name'],
-                    str(item['quantity']),
-                    f"{item['unit_price']:.2f}",
-                    f"{item['subtotal']:.2f}"
-                ])
-            
-            # Add table to content
-            table = Table(data, colWidths=[250, 50, 70, 70])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('ALIGN', (1, 1), (1, -1), 'CENTER'),
-                ('ALIGN', (2, 1), (3, -1), 'RIGHT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ]))
-            content.append(table)
-            content.append(Spacer(1, 15))
-            
-            # Totals
-            currency = self.settings.get('currency', 'MAD')
-            totals_data = []
-            
-            totals_data.append(['Sous-total:', f"{self.sale['total_amount']:.2f} {currency}"])
-            
-            if self.sale['discount'] > 0:
-                totals_data.append(['Remise:', f"{self.sale['discount']:.2f} {currency}"])
-                
-            if self.sale['tax_amount'] > 0:
-                totals_data.append(['TVA:', f"{self.sale['tax_amount']:.2f} {currency}"])
-                
-            totals_data.append(['Total:', f"{self.sale['final_total']:.2f} {currency}"])
-            
-            # Totals table
-            totals_table = Table(totals_data, colWidths=[100, 100])
-            totals_table.setStyle(TableStyle([
-                ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-                ('LINEABOVE', (0, -1), (-1, -1), 1, colors.black),
-                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ]))
-            
-            # Right-align the totals table
-            totals_wrapper = Table([[totals_table]], colWidths=[440])
-            totals_wrapper.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
-            ]))
-            content.append(totals_wrapper)
-            content.append(Spacer(1, 20))
-            
-            # Payment method
-            payment_method = self.sale['payment_method']
-            content.append(Paragraph(f"Mode de paiement: {payment_method}", receipt_style))
-            content.append(Spacer(1, 15))
-            
-            # Footer
-            footer_style = ParagraphStyle(
-                'FooterStyle',
-                parent=styles['Normal'],
-                alignment=1,  # Center alignment
-                fontSize=10
-            )
-            footer_text = self.settings.get('receipt_footer', 'Merci pour votre achat!')
-            content.append(Paragraph(footer_text, footer_style))
-            
-            # Build the document
-            doc.build(content)
-            
-            return output_path
+            from models.receipt_renderer import render_pdf
+            return render_pdf(output_path, self.sale, self.items, self.settings)
         except Exception as e:
             print(f"Error generating PDF receipt: {e}")
             QMessageBox.warning(
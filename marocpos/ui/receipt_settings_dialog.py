@@ -6,7 +6,7 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QPixmap, QFont
-from database import get_connection
+from models.settings import SettingsStore
 import os
 import shutil
 
@@ -161,44 +161,38 @@ class ReceiptSettingsDialog(QDialog):
         self.footer_message.textChanged.connect(self.update_preview)
 
     def load_settings(self):
-        """Load settings from database"""
-        conn = get_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                cursor.execute("SELECT key, value FROM Settings")
-                self.settings = dict(cursor.fetchall())
-                
-                # Fill form with settings
-                self.store_name.setText(self.settings.get('store_name', ''))
-                self.store_address.setText(self.settings.get('store_address', ''))
-                self.store_phone.setText(self.settings.get('store_phone', ''))
-                self.store_email.setText(self.settings.get('store_email', ''))
-                self.currency.setText(self.settings.get('currency', 'MAD'))
-                self.footer_message.setText(self.settings.get('receipt_footer', 'Merci pour votre achat!'))
-                
-                # Set printer type
-                printer_type = self.settings.get('receipt_printer_type', 'thermal_80')
-                index_map = {
-                    'thermal_58': 0,
-                    'thermal_80': 1,
-                    'a4': 2,
-                    'pdf': 3
-                }
-                self.printer_type.setCurrentIndex(index_map.get(printer_type, 1))
-                
-                # Load logo
-                logo_path = self.settings.get('receipt_logo_path', '')
-                if logo_path and os.path.exists(logo_path):
-                    self.logo_path = logo_path
-                    self.update_logo_preview()
-                
-                # Update preview
-                self.update_preview()
-            except Exception as e:
-                print(f"Error loading receipt settings: {e}")
-            finally:
-                conn.close()
+        """Load settings from the settings store"""
+        try:
+            self.settings = SettingsStore.instance().all()
+            
+            # Fill form with settings
+            self.store_name.setText(self.settings.get('store_name', ''))
+            self.store_address.setText(self.settings.get('store_address', ''))
+            self.store_phone.setText(self.settings.get('store_phone', ''))
+            self.store_email.setText(self.settings.get('store_email', ''))
+            self.currency.setText(self.settings.get('currency', 'MAD'))
+            self.footer_message.setText(self.settings.get('receipt_footer', 'Merci pour votre achat!'))
+            
+            # Set printer type
+            printer_type = self.settings.get('receipt_printer_type', 'thermal_80')
+            index_map = {
+                'thermal_58': 0,
+                'thermal_80': 1,
+                'a4': 2,
+                'pdf': 3
+            }
+            self.printer_type.setCurrentIndex(index_map.get(printer_type, 1))
+            
+            # Load logo
+            logo_path = self.settings.get('receipt_logo_path', '')
+            if logo_path and os.path.exists(logo_path):
+                self.logo_path = logo_path
+                self.update_logo_preview()
+            
+            # Update preview
+            self.update_preview()
+        except Exception as e:
+            print(f"Error loading receipt settings: {e}")
 
     def select_logo(self):
         """Open file dialog to select a logo"""
@@ -262,40 +256,26 @@ class ReceiptSettingsDialog(QDialog):
         self.preview_footer.setText(self.footer_message.toPlainText() or "Merci pour votre achat!")
 
     def save_settings(self):
-        """Save settings to database"""
-        conn = get_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                
-                # Map printer type selection to value
-                printer_types = ['thermal_58', 'thermal_80', 'a4', 'pdf']
-                printer_type = printer_types[self.printer_type.currentIndex()]
-                
-                # Settings to save
-                settings_to_save = {
-                    'store_name': self.store_name.text(),
-                    'store_address': self.store_address.toPlainText(),
-                    'store_phone': self.store_phone.text(),
-                    'store_email': self.store_email.text(),
-                    'currency': self.currency.text(),
-                    'receipt_printer_type': printer_type,
-                    'receipt_footer': self.footer_message.toPlainText(),
-                    'receipt_logo_path': self.logo_path or ''
-                }
-                
-                # Update each setting
-                for key, value in settings_to_save.items():
-                    cursor.execute("""
-                        UPDATE Settings 
-                        SET value = ?, updated_at = CURRENT_TIMESTAMP
-                        WHERE key = ?
-                    """, (value, key))
-                
-                conn.commit()
-                QMessageBox.information(self, "Succès", "Paramètres enregistrés avec succès!")
-                self.accept()
-            except Exception as e:
-                QMessageBox.warning(self, "Erreur", f"Impossible de sauvegarder les paramètres: {str(e)}")
-            finally:
-                conn.close()
+        """Save settings through the settings store"""
+        # Map printer type selection to value
+        printer_types = ['thermal_58', 'thermal_80', 'a4', 'pdf']
+        printer_type = printer_types[self.printer_type.currentIndex()]
+        
+        # Settings to save
+        settings_to_save = {
+            'store_name': self.store_name.text(),
+            'store_address': self.store_address.toPlainText(),
+            'store_phone': self.store_phone.text(),
+            'store_email': self.store_email.text(),
+            'currency': self.currency.text(),
+            'receipt_printer_type': printer_type,
+            'receipt_footer': self.footer_message.toPlainText(),
+            'receipt_logo_path': self.logo_path or ''
+        }
+        
+        # Open windows and the receipt template follow the change
+        if SettingsStore.instance().update(settings_to_save):
+            QMessageBox.information(self, "Succès", "Paramètres enregistrés avec succès!")
+            self.accept()
+        else:
+            QMessageBox.warning(self, "Erreur", "Impossible de sauvegarder les paramètres")
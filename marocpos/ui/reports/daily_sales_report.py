@@ -2,20 +2,22 @@ from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QDateEdit,
     QPushButton, QTableWidget, QTableWidgetItem, QHeaderView,
     QFrame, QGroupBox, QFormLayout, QComboBox, QCheckBox,
-    QMessageBox, QFileDialog
+    QMessageBox, QFileDialog, QInputDialog, QAbstractItemView
 )
 from PyQt5.QtCore import Qt, QDate
 from PyQt5.QtGui import QColor, QPainter, QPen
 from PyQt5.QtPrintSupport import QPrinter, QPrintDialog, QPrintPreviewDialog
 from models.sales_report import SalesReport
+from models.sales import Sales
+from ui.job_manager import JobManager, snapshot_table, write_csv
 from datetime import datetime, timedelta
 import os
-import csv
 import json
 
 class DailySalesReport(QWidget):
-    def __init__(self, parent=None):
+    def __init__(self, user=None, parent=None):
         super().__init__(parent)
+        self.user_id = user['id'] if user else None
         self.init_ui()
         
     def init_ui(self):
@@ -137,9 +139,32 @@ class DailySalesReport(QWidget):
         self.sales_table.setColumnWidth(4, 120)
         self.sales_table.setColumnWidth(5, 120)
         self.sales_table.setColumnWidth(6, 120)
+        self.sales_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.sales_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.sales_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         
         details_layout.addWidget(self.sales_table)
         
+        # Void / return of the selected sale
+        void_layout = QHBoxLayout()
+        void_layout.addStretch()
+        void_btn = QPushButton("Annuler la vente (retour)")
+        void_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #6c757d;
+                color: white;
+                border: none;
+                padding: 8px;
+                border-radius: 4px;
+            }
+            QPushButton:hover {
+                background-color: #5a6268;
+            }
+        """)
+        void_btn.clicked.connect(self.void_selected_sale)
+        void_layout.addWidget(void_btn)
+        details_layout.addLayout(void_layout)
+        
         details_group.setLayout(details_layout)
         main_layout.addWidget(details_group)
         
@@ -278,6 +303,39 @@ class DailySalesReport(QWidget):
                 f"Erreur lors du chargement du rapport: {str(e)}"
             )
     
+    def void_selected_sale(self):
+        """Void the selected sale: its stock comes back and it leaves the totals"""
+        row = self.sales_table.currentRow()
+        item = self.sales_table.item(row, 0) if row >= 0 else None
+        if not item:
+            QMessageBox.warning(self, "Aucune vente", "Veuillez sélectionner une vente à annuler.")
+            return
+        sale_id = int(item.text())
+        
+        reason, ok = QInputDialog.getText(
+            self, "Annuler la vente",
+            f"Motif de l'annulation de la vente #{sale_id} (retour client, erreur de caisse...):"
+        )
+        if not ok:
+            return
+        
+        confirm = QMessageBox.question(
+            self, "Confirmer l'annulation",
+            f"La vente #{sale_id} sera annulée et les articles remis en stock. Continuer ?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+        )
+        if confirm != QMessageBox.Yes:
+            return
+        
+        if Sales.void_sale(sale_id, self.user_id, reason.strip() or None):
+            QMessageBox.information(self, "Vente annulée", f"La vente #{sale_id} a été annulée.")
+            self.load_report()
+        else:
+            QMessageBox.warning(
+                self, "Erreur",
+                f"Impossible d'annuler la vente #{sale_id}: elle est introuvable ou déjà annulée."
+            )
+    
     def update_sales_table(self, sales):
         """Update the sales table with data"""
         self.sales_table.setRowCount(len(sales))
@@ -396,6 +454,21 @@ class DailySalesReport(QWidget):
         self.payment_table.setRowCount(0)
         self.products_table.setRowCount(0)
     
+    def report_snapshot(self):
+        """Texts of the report, read from the widgets for a background export"""
+        return {
+            'date': self.date_edit.date().toString("yyyy-MM-dd"),
+            'summary': [
+                self.total_sales_box.value_label.text(),
+                self.num_sales_box.value_label.text(),
+                self.avg_sale_box.value_label.text(),
+                self.discount_box.value_label.text()
+            ],
+            'sales': snapshot_table(self.sales_table),
+            'payments': snapshot_table(self.payment_table),
+            'products': snapshot_table(self.products_table)
+        }
+    
     def export_pdf(self):
         """Export the report to PDF"""
         date_str = self.date_edit.date().toString("yyyy-MM-dd")
@@ -406,25 +479,25 @@ class DailySalesReport(QWidget):
         if not file_name:
             return
             
-        try:
-            printer = QPrinter(QPrinter.HighResolution)
-            printer.setOutputFormat(QPrinter.PdfFormat)
-            printer.setOutputFileName(file_name)
-            printer.setPageSize(QPrinter.A4)
-            
-            # Create the PDF document
-            self.create_report_document(printer)
-            
-            QMessageBox.information(
-                self, "Exportation réussie", 
-                f"Le rapport a été exporté avec succès vers:\n{file_name}"
-            )
-        except Exception as e:
-            print(f"Error exporting PDF: {e}")
-            QMessageBox.warning(
-                self, "Erreur d'exportation", 
-                f"Erreur lors de l'exportation en PDF: {str(e)}"
-            )
+        JobManager.instance().submit(
+            f"Rapport des ventes {date_str} (PDF)",
+            self.write_pdf, file_name, self.report_snapshot(),
+            on_result=self.export_finished,
+            on_error=lambda error: self.export_failed("PDF", error)
+        )
+    
+    @staticmethod
+    def write_pdf(job, file_name, report):
+        """Render the report to a PDF file (runs as a background job)"""
+        job.set_progress(0, None, "Création du PDF")
+        printer = QPrinter(QPrinter.HighResolution)
+        printer.setOutputFormat(QPrinter.PdfFormat)
+        printer.setOutputFileName(file_name)
+        printer.setPageSize(QPrinter.A4)
+        
+        # Create the PDF document
+        DailySalesReport.create_report_document(printer, report)
+        return file_name
     
     def export_csv(self):
         """Export the report to CSV"""
@@ -436,76 +509,56 @@ class DailySalesReport(QWidget):
         if not file_name:
             return
             
-        try:
-            with open(file_name, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                
-                # Write header
-                writer.writerow(["Rapport des ventes quotidiennes"])
-                writer.writerow([f"Date: {date_str}"])
-                writer.writerow([])
-                
-                # Write summary
-                writer.writerow(["Résumé"])
-                writer.writerow(["Total des ventes", self.total_sales_box.value_label.text()])
-                writer.writerow(["Nombre de ventes", self.num_sales_box.value_label.text()])
-                writer.writerow(["Vente moyenne", self.avg_sale_box.value_label.text()])
-                writer.writerow(["Total remises", self.discount_box.value_label.text()])
-                writer.writerow([])
-                
-                # Write sales
-                writer.writerow(["Détails des ventes"])
-                writer.writerow([
-                    "ID", "Heure", "Vendeur", "Articles", "Sous-total", "Remise", "Total"
-                ])
-                
-                for row in range(self.sales_table.rowCount()):
-                    sale_row = []
-                    for col in range(self.sales_table.columnCount()):
-                        item = self.sales_table.item(row, col)
-                        sale_row.append(item.text() if item else "")
-                    writer.writerow(sale_row)
-                
-                writer.writerow([])
-                
-                # Write payment methods
-                writer.writerow(["Méthodes de paiement"])
-                writer.writerow([
-                    "Méthode de paiement", "Nombre de transactions", "Montant"
-                ])
-                
-                for row in range(self.payment_table.rowCount()):
-                    payment_row = []
-                    for col in range(self.payment_table.columnCount()):
-                        item = self.payment_table.item(row, col)
-                        payment_row.append(item.text() if item else "")
-                    writer.writerow(payment_row)
-                
-                writer.writerow([])
-                
-                # Write top products
-                writer.writerow(["Produits les plus vendus"])
-                writer.writerow([
-                    "Produit", "Quantité vendue", "Montant total", "% des ventes"
-                ])
-                
-                for row in range(self.products_table.rowCount()):
-                    product_row = []
-                    for col in range(self.products_table.columnCount()):
-                        item = self.products_table.item(row, col)
-                        product_row.append(item.text() if item else "")
-                    writer.writerow(product_row)
-            
-            QMessageBox.information(
-                self, "Exportation réussie", 
-                f"Le rapport a été exporté avec succès vers:\n{file_name}"
-            )
-        except Exception as e:
-            print(f"Error exporting CSV: {e}")
-            QMessageBox.warning(
-                self, "Erreur d'exportation", 
-                f"Erreur lors de l'exportation en CSV: {str(e)}"
-            )
+        report = self.report_snapshot()
+        
+        # Header and summary
+        rows = [
+            ["Rapport des ventes quotidiennes"],
+            [f"Date: {date_str}"],
+            [],
+            ["Résumé"],
+            ["Total des ventes", report['summary'][0]],
+            ["Nombre de ventes", report['summary'][1]],
+            ["Vente moyenne", report['summary'][2]],
+            ["Total remises", report['summary'][3]],
+            [],
+        ]
+        
+        # Sales
+        rows.append(["Détails des ventes"])
+        rows.append(["ID", "Heure", "Vendeur", "Articles", "Sous-total", "Remise", "Total"])
+        rows.extend(report['sales']['rows'])
+        rows.append([])
+        
+        # Payment methods
+        rows.append(["Méthodes de paiement"])
+        rows.append(["Méthode de paiement", "Nombre de transactions", "Montant"])
+        rows.extend(report['payments']['rows'])
+        rows.append([])
+        
+        # Top products
+        rows.append(["Produits les plus vendus"])
+        rows.append(["Produit", "Quantité vendue", "Montant total", "% des ventes"])
+        rows.extend(report['products']['rows'])
+        
+        JobManager.instance().submit(
+            f"Rapport des ventes {date_str} (CSV)", write_csv, file_name, rows,
+            on_result=self.export_finished,
+            on_error=lambda error: self.export_failed("CSV", error)
+        )
+    
+    def export_finished(self, file_name):
+        QMessageBox.information(
+            self, "Exportation réussie", 
+            f"Le rapport a été exporté avec succès vers:\n{file_name}"
+        )
+    
+    def export_failed(self, file_format, error):
+        print(f"Error exporting {file_format}: {error}")
+        QMessageBox.warning(
+            self, "Erreur d'exportation", 
+            f"Erreur lors de l'exportation en {file_format}: {error}"
+        )
     
     def print_report(self):
         """Print the report"""
@@ -514,7 +567,7 @@ class DailySalesReport(QWidget):
             dialog = QPrintDialog(printer, self)
             
             if dialog.exec_() == QPrintDialog.Accepted:
-                self.create_report_document(printer)
+                self.create_report_document(printer, self.report_snapshot())
         except Exception as e:
             print(f"Error printing report: {e}")
             QMessageBox.warning(
@@ -522,9 +575,13 @@ class DailySalesReport(QWidget):
                 f"Erreur lors de l'impression du rapport: {str(e)}"
             )
     
-    def create_report_document(self, printer):
-        """Create the report document for printing or PDF export"""
-        date_str = self.date_edit.date().toString("yyyy-MM-dd")
+    @staticmethod
+    def create_report_document(printer, report):
+        """Create the report document for printing or PDF export.
+
+        report comes from report_snapshot(), so this also runs off the GUI thread.
+        """
+        date_str = report['date']
         
         painter = QPainter()
         painter.begin(printer)
@@ -579,21 +636,19 @@ class DailySalesReport(QWidget):
         font.setBold(True)
         painter.setFont(font)
         
-        painter.drawText(0, y_pos, box_width, 30, Qt.AlignCenter, self.total_sales_box.value_label.text())
-        painter.drawText(box_width, y_pos, box_width, 30, Qt.AlignCenter, self.num_sales_box.value_label.text())
-        painter.drawText(box_width * 2, y_pos, box_width, 30, Qt.AlignCenter, self.avg_sale_box.value_label.text())
-        painter.drawText(box_width * 3, y_pos, box_width, 30, Qt.AlignCenter, self.discount_box.value_label.text())
+        for index, value in enumerate(report['summary']):
+            painter.drawText(box_width * index, y_pos, box_width, 30, Qt.AlignCenter, value)
         
         y_pos += 60
         
         # Draw sales table
-        self.draw_table(
+        DailySalesReport.draw_table(
             painter, rect, y_pos, "Détails des ventes",
-            self.sales_table, 
+            report['sales'], 
             [80, 120, rect.width() - 680, 80, 120, 120, 120]
         )
         
-        y_pos += 50 + (self.sales_table.rowCount() + 1) * 30
+        y_pos += 50 + (len(report['sales']['rows']) + 1) * 30
         
         # Check if we need a new page for payment methods
         if y_pos > rect.height() - 200:
@@ -601,13 +656,13 @@ class DailySalesReport(QWidget):
             y_pos = 100
         
         # Draw payment methods table
-        self.draw_table(
+        DailySalesReport.draw_table(
             painter, rect, y_pos, "Méthodes de paiement",
-            self.payment_table, 
+            report['payments'], 
             [rect.width() - 400, 150, 200]
         )
         
-        y_pos += 50 + (self.payment_table.rowCount() + 1) * 30
+        y_pos += 50 + (len(report['payments']['rows']) + 1) * 30
         
         # Check if we need a new page for top products
         if y_pos > rect.height() - 200:
@@ -615,16 +670,17 @@ class DailySalesReport(QWidget):
             y_pos = 100
         
         # Draw top products table
-        self.draw_table(
+        DailySalesReport.draw_table(
             painter, rect, y_pos, "Produits les plus vendus",
-            self.products_table, 
+            report['products'], 
             [rect.width() - 450, 120, 150, 120]
         )
         
         painter.end()
     
-    def draw_table(self, painter, rect, y_pos, title, table, column_widths):
-        """Draw a table on the report"""
+    @staticmethod
+    def draw_table(painter, rect, y_pos, title, table, column_widths):
+        """Draw a table (a snapshot_table() dict) on the report"""
         # Draw title
         font = painter.font()
         font.setPointSize(14)
@@ -640,8 +696,7 @@ class DailySalesReport(QWidget):
         painter.setFont(font)
         
         x_pos = 50
-        for col in range(table.columnCount()):
-            header_text = table.horizontalHeaderItem(col).text()
+        for col, header_text in enumerate(table['headers']):
             painter.drawText(x_pos, y_pos, column_widths[col], 30, Qt.AlignCenter, header_text)
             x_pos += column_widths[col] + 10
         
@@ -658,13 +713,10 @@ class DailySalesReport(QWidget):
         font.setBold(False)
         painter.setFont(font)
         
-        for row in range(table.rowCount()):
+        for texts, alignments in zip(table['rows'], table['alignments']):
             x_pos = 50
-            for col in range(table.columnCount()):
-                item = table.item(row, col)
-                if item:
-                    text = item.text()
-                    alignment = item.textAlignment()
-                    painter.drawText(x_pos, y_pos, column_widths[col], 30, alignment, text)
+            for col, text in enumerate(texts):
+                if text:
+                    painter.drawText(x_pos, y_pos, column_widths[col], 30, alignments[col], text)
                 x_pos += column_widths[col] + 10
             y_pos += 30
@@ -8,9 +8,9 @@ from PyQt5.QtCore import Qt, QDate
 from PyQt5.QtGui import QColor, QPainter, QPen, QBrush
 from PyQt5.QtPrintSupport import QPrinter, QPrintDialog, QPrintPreviewDialog
 from models.sales_report import SalesReport
+from ui.job_manager import JobManager, snapshot_table, write_csv
 from datetime import datetime, timedelta
 import os
-import csv
 import json
 
 class ProfitMarginReport(QWidget):
@@ -585,75 +585,66 @@ class ProfitMarginReport(QWidget):
         if not file_name:
             return
             
-        try:
-            with open(file_name, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                
-                # Write header
-                writer.writerow(["Rapport de Marge Bénéficiaire"])
-                writer.writerow([f"Période: {start_date} au {end_date}"])
-                writer.writerow([])
-                
-                # Write summary
-                writer.writerow(["Résumé"])
-                writer.writerow(["Chiffre d'affaires", self.revenue_box.value_label.text()])
-                writer.writerow(["Coût des ventes", self.cost_box.value_label.text()])
-                writer.writerow(["Bénéfice brut", self.profit_box.value_label.text()])
-                writer.writerow(["Marge brute", self.margin_box.value_label.text()])
-                writer.writerow([])
-                
-                # Write products table
-                writer.writerow(["Marge par Produit"])
-                writer.writerow([
-                    "Produit", "Catégorie", "Qté vendue", "CA (MAD)", "Coût (MAD)", 
-                    "Bénéfice (MAD)", "Marge (%)", "% du CA total"
-                ])
-                
-                for row in range(self.products_table.rowCount()):
-                    product_row = []
-                    for col in range(self.products_table.columnCount()):
-                        item = self.products_table.item(row, col)
-                        product_row.append(item.text() if item else "")
-                    writer.writerow(product_row)
-                
-                writer.writerow([])
-                
-                # Write categories table
-                writer.writerow(["Marge par Catégorie"])
-                writer.writerow([
-                    "Catégorie", "Nb produits", "Qté vendue", "CA (MAD)", 
-                    "Coût (MAD)", "Bénéfice (MAD)", "Marge (%)"
-                ])
-                
-                for row in range(self.categories_table.rowCount()):
-                    cat_row = []
-                    for col in range(self.categories_table.columnCount()):
-                        item = self.categories_table.item(row, col)
-                        cat_row.append(item.text() if item else "")
-                    writer.writerow(cat_row)
-                
-                writer.writerow([])
-                
-                # Write monthly table
-                writer.writerow(["Évolution Mensuelle"])
-                writer.writerow([
-                    "Mois", "CA (MAD)", "Coût (MAD)", "Bénéfice (MAD)", "Marge (%)"
-                ])
-                
-                for row in range(self.monthly_table.rowCount()):
-                    month_row = []
-                    for col in range(self.monthly_table.columnCount()):
-                        item = self.monthly_table.item(row, col)
-                        month_row.append(item.text() if item else "")
-                    writer.writerow(month_row)
-            
-            QMessageBox.information(
-                self, "Exportation réussie", 
-                f"Le rapport a été exporté avec succès vers:\n{file_name}"
-            )
-        except Exception as e:
-            print(f"Error exporting CSV: {e}")
-            QMessageBox.warning(
-                self, "Erreur d'exportation", 
-                f"Erreur lors de l'exportation en CSV: {str(e)}"
-            )
+        rows = []
+        
+        # Write header
+        rows.append(["Rapport de Marge Bénéficiaire"])
+        rows.append([f"Période: {start_date} au {end_date}"])
+        rows.append([])
+        
+        # Write summary
+        rows.append(["Résumé"])
+        rows.append(["Chiffre d'affaires", self.revenue_box.value_label.text()])
+        rows.append(["Coût des ventes", self.cost_box.value_label.text()])
+        rows.append(["Bénéfice brut", self.profit_box.value_label.text()])
+        rows.append(["Marge brute", self.margin_box.value_label.text()])
+        rows.append([])
+        
+        # Write products table
+        rows.append(["Marge par Produit"])
+        rows.append([
+            "Produit", "Catégorie", "Qté vendue", "CA (MAD)", "Coût (MAD)", 
+            "Bénéfice (MAD)", "Marge (%)", "% du CA total"
+        ])
+        
+        rows.extend(snapshot_table(self.products_table)['rows'])
+        
+        rows.append([])
+        
+        # Write categories table
+        rows.append(["Marge par Catégorie"])
+        rows.append([
+            "Catégorie", "Nb produits", "Qté vendue", "CA (MAD)", 
+            "Coût (MAD)", "Bénéfice (MAD)", "Marge (%)"
+        ])
+        
+        rows.extend(snapshot_table(self.categories_table)['rows'])
+        
+        rows.append([])
+        
+        # Write monthly table
+        rows.append(["Évolution Mensuelle"])
+        rows.append([
+            "Mois", "CA (MAD)", "Coût (MAD)", "Bénéfice (MAD)", "Marge (%)"
+        ])
+        
+        rows.extend(snapshot_table(self.monthly_table)['rows'])
+        
+        JobManager.instance().submit(
+            f"Rapport de marge {start_date} - {end_date} (CSV)", write_csv, file_name, rows,
+            on_result=self.export_finished,
+            on_error=self.export_failed
+        )
+    
+    def export_finished(self, file_name):
+        QMessageBox.information(
+            self, "Exportation réussie", 
+            f"Le rapport a été exporté avec succès vers:\n{file_name}"
+        )
+    
+    def export_failed(self, error):
+        print(f"Error exporting CSV: {error}")
+        QMessageBox.warning(
+            self, "Erreur d'exportation", 
+            f"Erreur lors de l'exportation en CSV: {error}"
+        )
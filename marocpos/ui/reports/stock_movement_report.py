@@ -8,10 +8,10 @@ from PyQt5.QtCore import Qt, QDate
 from PyQt5.QtGui import QColor, QPainter, QPen
 from PyQt5.QtPrintSupport import QPrinter, QPrintDialog, QPrintPreviewDialog
 from models.sales_report import SalesReport
+from ui.job_manager import JobManager, snapshot_table, write_csv
 from models.product import Product
 from datetime import datetime, timedelta
 import os
-import csv
 import json
 
 class StockMovementReport(QWidget):
@@ -503,60 +503,56 @@ class StockMovementReport(QWidget):
         if not file_name:
             return
             
-        try:
-            with open(file_name, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                
-                # Write header
-                writer.writerow(["Rapport des mouvements de stock"])
-                writer.writerow([f"Période: {start_date} au {end_date}"])
-                writer.writerow([f"Produit: {self.product_combo.currentText()}"])
-                writer.writerow([])
-                
-                # Write summary
-                writer.writerow(["Résumé"])
-                writer.writerow(["Entrées totales", self.total_in_box.value_label.text()])
-                writer.writerow(["Sorties totales", self.total_out_box.value_label.text()])
-                writer.writerow(["Changement net", self.net_change_box.value_label.text()])
-                writer.writerow(["Nombre de mouvements", self.movement_count_box.value_label.text()])
-                writer.writerow([])
-                
-                # Write movement types
-                writer.writerow(["Mouvements par type"])
-                writer.writerow([
-                    "Type de mouvement", "Nombre", "Quantité", "Valeur"
-                ])
-                
-                for row in range(self.types_table.rowCount()):
-                    type_row = []
-                    for col in range(self.types_table.columnCount()):
-                        item = self.types_table.item(row, col)
-                        type_row.append(item.text() if item else "")
-                    writer.writerow(type_row)
-                
-                writer.writerow([])
-                
-                # Write all movements
-                writer.writerow(["Détails des mouvements"])
-                writer.writerow([
-                    "Date", "Produit", "Variante", "Type", "Quantité", 
-                    "Prix unitaire", "Valeur", "Référence", "Utilisateur"
-                ])
-                
-                for row in range(self.movements_table.rowCount()):
-                    movement_row = []
-                    for col in range(self.movements_table.columnCount()):
-                        item = self.movements_table.item(row, col)
-                        movement_row.append(item.text() if item else "")
-                    writer.writerow(movement_row)
-            
-            QMessageBox.information(
-                self, "Exportation réussie", 
-                f"Le rapport a été exporté avec succès vers:\n{file_name}"
-            )
-        except Exception as e:
-            print(f"Error exporting CSV: {e}")
-            QMessageBox.warning(
-                self, "Erreur d'exportation", 
-                f"Erreur lors de l'exportation en CSV: {str(e)}"
-            )
+        rows = []
+        
+        # Write header
+        rows.append(["Rapport des mouvements de stock"])
+        rows.append([f"Période: {start_date} au {end_date}"])
+        rows.append([f"Produit: {self.product_combo.currentText()}"])
+        rows.append([])
+        
+        # Write summary
+        rows.append(["Résumé"])
+        rows.append(["Entrées totales", self.total_in_box.value_label.text()])
+        rows.append(["Sorties totales", self.total_out_box.value_label.text()])
+        rows.append(["Changement net", self.net_change_box.value_label.text()])
+        rows.append(["Nombre de mouvements", self.movement_count_box.value_label.text()])
+        rows.append([])
+        
+        # Write movement types
+        rows.append(["Mouvements par type"])
+        rows.append([
+            "Type de mouvement", "Nombre", "Quantité", "Valeur"
+        ])
+        
+        rows.extend(snapshot_table(self.types_table)['rows'])
+        
+        rows.append([])
+        
+        # Write all movements
+        rows.append(["Détails des mouvements"])
+        rows.append([
+            "Date", "Produit", "Variante", "Type", "Quantité", 
+            "Prix unitaire", "Valeur", "Référence", "Utilisateur"
+        ])
+        
+        rows.extend(snapshot_table(self.movements_table)['rows'])
+        
+        JobManager.instance().submit(
+            f"Mouvements de stock {start_date} - {end_date} (CSV)", write_csv, file_name, rows,
+            on_result=self.export_finished,
+            on_error=self.export_failed
+        )
+    
+    def export_finished(self, file_name):
+        QMessageBox.information(
+            self, "Exportation réussie", 
+            f"Le rapport a été exporté avec succès vers:\n{file_name}"
+        )
+    
+    def export_failed(self, error):
+        print(f"Error exporting CSV: {error}")
+        QMessageBox.warning(
+            self, "Erreur d'exportation", 
+            f"Erreur lors de l'exportation en CSV: {error}"
+        )
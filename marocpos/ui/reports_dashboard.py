@@ -90,6 +90,9 @@ class ReportsDashboard(QMainWindow):
             }
         """)
         
+        # One batch of queries feeds every stat box of the tabs
+        self.refresh_metrics()
+        
         # Add tabs for different report categories
         self.create_sales_tab()
         self.create_inventory_tab()
@@ -585,207 +588,109 @@ class ReportsDashboard(QMainWindow):
             )
     
     # Methods to update statistics boxes with real data
+    def refresh_metrics(self):
+        """Compute the KPIs once for all the stat boxes of this refresh"""
+        from models.dashboard_metrics import DashboardMetrics
+        self.metrics = DashboardMetrics.get(refresh=True)
+    
+    def metric(self, name):
+        """Value of a KPI from the current metrics snapshot"""
+        if self.metrics is None:
+            raise RuntimeError("métriques indisponibles")
+        return self.metrics.get(name) or 0
+    
     def update_day_sales(self, stat_box):
         try:
-            from models.sales_report import SalesReport
-            import datetime
-            
-            today = datetime.datetime.now().strftime("%Y-%m-%d")
-            report_data = SalesReport.get_daily_sales(today)
-            
-            if report_data and 'summary' in report_data:
-                total_sales = report_data['summary'].get('total_sales', 0) or 0
-                stat_box.value_label.setText(f"{total_sales:.2f} MAD")
-            else:
-                stat_box.value_label.setText("0.00 MAD")
+            value = self.metric('today_sales')
+            stat_box.value_label.setText(f"{value:.2f} MAD")
         except Exception as e:
             print(f"Error updating day sales: {e}")
             stat_box.value_label.setText("Erreur")
     
     def update_month_sales(self, stat_box):
         try:
-            from models.sales_report import SalesReport
-            import datetime
-            
-            today = datetime.datetime.now()
-            first_day = datetime.datetime(today.year, today.month, 1).strftime("%Y-%m-%d")
-            last_day = today.strftime("%Y-%m-%d")
-            
-            report_data = SalesReport.get_sales_range(first_day, last_day)
-            
-            if report_data and 'summary' in report_data:
-                total_sales = report_data['summary'].get('total_sales', 0) or 0
-                stat_box.value_label.setText(f"{total_sales:.2f} MAD")
-            else:
-                stat_box.value_label.setText("0.00 MAD")
+            value = self.metric('month_sales')
+            stat_box.value_label.setText(f"{value:.2f} MAD")
         except Exception as e:
             print(f"Error updating month sales: {e}")
             stat_box.value_label.setText("Erreur")
     
     def update_items_sold(self, stat_box):
         try:
-            from models.sales_report import SalesReport
-            import datetime
-            
-            today = datetime.datetime.now().strftime("%Y-%m-%d")
-            report_data = SalesReport.get_daily_sales(today)
-            
-            if report_data and 'top_products' in report_data:
-                total_items = sum(p.get('quantity_sold', 0) or 0 for p in report_data['top_products'])
-                stat_box.value_label.setText(str(total_items))
-            else:
-                stat_box.value_label.setText("0")
+            value = self.metric('today_items_sold')
+            stat_box.value_label.setText(f"{value:g}")
         except Exception as e:
             print(f"Error updating items sold: {e}")
             stat_box.value_label.setText("Erreur")
     
     def update_product_count(self, stat_box):
         try:
-            from models.product import Product
-            
-            products = Product.get_all_products()
-            stat_box.value_label.setText(str(len(products)))
+            value = self.metric('product_count')
+            stat_box.value_label.setText(str(value))
         except Exception as e:
             print(f"Error updating product count: {e}")
             stat_box.value_label.setText("Erreur")
     
     def update_low_stock_count(self, stat_box):
         try:
-            from models.sales_report import SalesReport
-            
-            report_data = SalesReport.get_inventory_report()
-            
-            if report_data and 'summary' in report_data:
-                low_stock = report_data['summary'].get('low_stock_products', 0) or 0
-                stat_box.value_label.setText(str(low_stock))
-            else:
-                stat_box.value_label.setText("0")
+            value = self.metric('low_stock_count')
+            stat_box.value_label.setText(str(value))
         except Exception as e:
             print(f"Error updating low stock count: {e}")
             stat_box.value_label.setText("Erreur")
     
     def update_inventory_value(self, stat_box):
         try:
-            from models.sales_report import SalesReport
-            
-            report_data = SalesReport.get_inventory_report()
-            
-            if report_data and 'summary' in report_data:
-                stock_value = report_data['summary'].get('total_stock_value', 0) or 0
-                stat_box.value_label.setText(f"{stock_value:.2f} MAD")
-            else:
-                stat_box.value_label.setText("0.00 MAD")
+            value = self.metric('inventory_value')
+            stat_box.value_label.setText(f"{value:.2f} MAD")
         except Exception as e:
             print(f"Error updating inventory value: {e}")
             stat_box.value_label.setText("Erreur")
     
     def update_profit_margin(self, stat_box):
         try:
-            from models.sales_report import SalesReport
-            import datetime
-            
-            # Get last 30 days report
-            today = datetime.datetime.now()
-            start_date = (today - datetime.timedelta(days=30)).strftime("%Y-%m-%d")
-            end_date = today.strftime("%Y-%m-%d")
-            
-            report_data = SalesReport.get_profit_margin_report(start_date, end_date)
-            
-            if report_data and 'summary' in report_data:
-                margin = report_data['summary'].get('margin_percentage', 0) or 0
-                stat_box.value_label.setText(f"{margin:.2f}%")
-            else:
-                stat_box.value_label.setText("0.00%")
+            value = self.metric('last_30_margin_percentage')
+            stat_box.value_label.setText(f"{value:.2f}%")
         except Exception as e:
             print(f"Error updating profit margin: {e}")
             stat_box.value_label.setText("Erreur")
     
     def update_monthly_revenue(self, stat_box):
         try:
-            from models.sales_report import SalesReport
-            import datetime
-            
-            today = datetime.datetime.now()
-            first_day = datetime.datetime(today.year, today.month, 1).strftime("%Y-%m-%d")
-            last_day = today.strftime("%Y-%m-%d")
-            
-            report_data = SalesReport.get_sales_range(first_day, last_day)
-            
-            if report_data and 'summary' in report_data:
-                total_sales = report_data['summary'].get('total_sales', 0) or 0
-                stat_box.value_label.setText(f"{total_sales:.2f} MAD")
-            else:
-                stat_box.value_label.setText("0.00 MAD")
+            value = self.metric('month_sales')
+            stat_box.value_label.setText(f"{value:.2f} MAD")
         except Exception as e:
             print(f"Error updating monthly revenue: {e}")
             stat_box.value_label.setText("Erreur")
     
     def update_avg_transaction(self, stat_box):
         try:
-            from models.sales_report import SalesReport
-            import datetime
-            
-            today = datetime.datetime.now()
-            start_date = (today - datetime.timedelta(days=30)).strftime("%Y-%m-%d")
-            end_date = today.strftime("%Y-%m-%d")
-            
-            report_data = SalesReport.get_sales_range(start_date, end_date)
-            
-            if report_data and 'summary' in report_data:
-                avg_sale = report_data['summary'].get('average_sale', 0) or 0
-                stat_box.value_label.setText(f"{avg_sale:.2f} MAD")
-            else:
-                stat_box.value_label.setText("0.00 MAD")
+            value = self.metric('last_30_avg_sale')
+            stat_box.value_label.setText(f"{value:.2f} MAD")
         except Exception as e:
             print(f"Error updating average transaction: {e}")
             stat_box.value_label.setText("Erreur")
     
     def update_customer_count(self, stat_box):
         try:
-            from models.sales_report import SalesReport
-            import datetime
-            
-            today = datetime.datetime.now()
-            report_data = SalesReport.get_customer_sales_report()
-            
-            if report_data and 'summary' in report_data:
-                customer_count = report_data['summary'].get('total_customers', 0) or 0
-                stat_box.value_label.setText(str(customer_count))
-            else:
-                stat_box.value_label.setText("0")
+            value = self.metric('customer_count')
+            stat_box.value_label.setText(str(value))
         except Exception as e:
             print(f"Error updating customer count: {e}")
             stat_box.value_label.setText("Erreur")
     
     def update_avg_customer_value(self, stat_box):
         try:
-            from models.sales_report import SalesReport
-            import datetime
-            
-            report_data = SalesReport.get_customer_sales_report()
-            
-            if report_data and 'summary' in report_data:
-                avg_value = report_data['summary'].get('average_per_customer', 0) or 0
-                stat_box.value_label.setText(f"{avg_value:.2f} MAD")
-            else:
-                stat_box.value_label.setText("0.00 MAD")
+            value = self.metric('average_per_customer')
+            stat_box.value_label.setText(f"{value:.2f} MAD")
         except Exception as e:
             print(f"Error updating average customer value: {e}")
             stat_box.value_label.setText("Erreur")
     
     def update_top_customer_value(self, stat_box):
         try:
-            from models.sales_report import SalesReport
-            
-            report_data = SalesReport.get_customer_sales_report()
-            
-            if report_data and 'customers' in report_data and report_data['customers']:
-                # Sort customers by total_spent and get the highest
-                top_customer = max(report_data['customers'], key=lambda x: x.get('total_spent', 0) or 0)
-                top_value = top_customer.get('total_spent', 0) or 0
-                stat_box.value_label.setText(f"{top_value:.2f} MAD")
-            else:
-                stat_box.value_label.setText("0.00 MAD")
+            value = self.metric('top_customer_value')
+            stat_box.value_label.setText(f"{value:.2f} MAD")
         except Exception as e:
             print(f"Error updating top customer value: {e}")
             stat_box.value_label.setText("Erreur")
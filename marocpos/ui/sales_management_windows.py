@@ -1,82 +1,19 @@
 from PyQt5.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QTableWidget, QTableWidgetItem,
-    QPushButton, QLabel, QFrame, QHeaderView, QScrollArea, QMessageBox, QComboBox
+    QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QTableView,
+    QPushButton, QLabel, QFrame, QHeaderView, QScrollArea, QMessageBox, QComboBox,
+    QLineEdit, QListView, QScroller
 )
 from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QFont, QCursor
 from models.category import Category
 from models.product import Product
-from database import get_connection
+from models.catalog_cache import CatalogCache
+from models.cart import Cart, CartLine
+from models.settings import SettingsStore
+from ui.cart_table_model import CartTableModel, format_quantity
+from ui.product_grid_model import ProductGridModel, ProductTileDelegate
 from datetime import datetime
 import pytz
-import os
-
-class ProductFrame(QFrame):
-    def __init__(self, product, parent=None):
-        super().__init__(parent)
-        self.product = product
-        self.init_ui()
-
-    def init_ui(self):
-        self.setStyleSheet("""
-            ProductFrame {
-                background-color: white;
-                border-radius: 10px;
-                padding: 10px;
-            }
-            ProductFrame:hover {
-                background-color: #f8f9fa;
-            }
-        """)
-        self.setCursor(Qt.PointingHandCursor)
-
-        layout = QVBoxLayout(self)
-        
-        # Product image
-        if self.product.get('image_path'):
-            from PyQt5.QtGui import QPixmap
-            import os
-            
-            image_path = self.product['image_path']
-            if os.path.exists(image_path):
-                image_label = QLabel()
-                pixmap = QPixmap(image_path)
-                if not pixmap.isNull():
-                    scaled_pixmap = pixmap.scaled(
-                        100, 100,
-                        Qt.KeepAspectRatio,
-                        Qt.SmoothTransformation
-                    )
-                    image_label.setPixmap(scaled_pixmap)
-                    image_label.setAlignment(Qt.AlignCenter)
-                    layout.addWidget(image_label)
-        
-        # Product name
-        name_label = QLabel(self.product['name'])
-        name_label.setAlignment(Qt.AlignCenter)
-        name_label.setStyleSheet("font-weight: bold; font-size: 14px;")
-        name_label.setWordWrap(True)
-        
-        # Product price
-        price_label = QLabel(f"{self.product['unit_price']:.2f} MAD")
-        price_label.setAlignment(Qt.AlignCenter)
-        price_label.setStyleSheet("color: #28a745; font-weight: bold;")
-        
-        # Stock info
-        stock_label = QLabel(f"Stock: {self.product['stock']}")
-        stock_label.setAlignment(Qt.AlignCenter)
-        stock_label.setStyleSheet("color: #6c757d; font-size: 12px;")
-        
-        # Has variants label
-        if self.product.get('has_variants'):
-            variant_label = QLabel("(Avec variantes)")
-            variant_label.setAlignment(Qt.AlignCenter)
-            variant_label.setStyleSheet("color: #0066cc; font-style: italic; font-size: 11px;")
-            layout.addWidget(variant_label)
-            
-        layout.addWidget(name_label)
-        layout.addWidget(price_label)
-        layout.addWidget(stock_label)
 
 class SalesManagementWindow(QWidget):
     def __init__(self, user=None):
@@ -86,6 +23,13 @@ class SalesManagementWindow(QWidget):
         self.current_amount = 0.0
         self.selected_row = None
         self.selected_product = None
+        # One grid model per category, dropped when the catalog changes
+        self.product_models = {}
+        self.product_models_version = None
+        self.current_category_id = None
+        # Grid model of the last text search, if any
+        self.search_model = None
+        self.currency = SettingsStore.instance().currency
         self.init_ui()
         self.setup_categories()
         self.load_products()
@@ -104,6 +48,15 @@ class SalesManagementWindow(QWidget):
         # Right section (categories and products)
         right_widget = self.create_right_section()
         main_layout.addWidget(right_widget, 2)  # Right section takes 2/3 of space
+        
+        # Scanner input has the focus by default
+        self.scan_input.setFocus()
+        
+        from .print_spooler import PrintSpooler
+        PrintSpooler.instance().job_status.connect(self.on_print_status)
+        
+        from .settings_notifier import SettingsNotifier
+        SettingsNotifier.instance().settings_changed.connect(self.on_settings_changed)
 
     def create_left_section(self):
         left_widget = QWidget()
@@ -125,10 +78,33 @@ class SalesManagementWindow(QWidget):
         cart_header.setStyleSheet("font-size: 18px; font-weight: bold;")
         cart_layout.addWidget(cart_header)
         
-        # Cart table
-        self.cart_table = QTableWidget()
-        self.cart_table.setColumnCount(4)  # Name, Quantity, Price, Remove
-        self.cart_table.setHorizontalHeaderLabels(["Produit", "Quantité", "Prix", "Actions"])
+        # Scanner input: barcode readers type the code followed by Enter;
+        # text that is not a code searches the catalog
+        self.scan_input = QLineEdit()
+        self.scan_input.setPlaceholderText("Scanner un code-barres, saisir un SKU ou rechercher un produit...")
+        self.scan_input.setStyleSheet("""
+            QLineEdit {
+                padding: 8px;
+                border: 2px solid #24786d;
+                border-radius: 5px;
+                font-size: 14px;
+            }
+        """)
+        self.scan_input.returnPressed.connect(self.scan_barcode)
+        cart_layout.addWidget(self.scan_input)
+        
+        self.scan_status = QLabel("")
+        self.scan_status.setStyleSheet("font-size: 12px;")
+        cart_layout.addWidget(self.scan_status)
+        
+        # Cart table over the Cart model
+        self.cart_model = CartTableModel(Cart(tax_rate=SettingsStore.instance().tax_rate), parent=self)
+        self.cart_model.totals_changed.connect(self.update_total)
+        self.cart_table = QTableView()
+        self.cart_table.setModel(self.cart_model)
+        self.cart_table.setSelectionBehavior(QTableView.SelectRows)
+        self.cart_table.setSelectionMode(QTableView.SingleSelection)
+        self.cart_table.verticalHeader().setVisible(False)
         
         # Set column widths
         self.cart_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
@@ -140,27 +116,27 @@ class SalesManagementWindow(QWidget):
         self.cart_table.setColumnWidth(3, 50)
         
         self.cart_table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 background-color: #f8f9fa;
                 padding: 8px;
                 border: none;
                 font-weight: bold;
                 color: #495057;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #e6f3ff;
                 color: #000;
             }
         """)
         # Connect to item selection event
-        self.cart_table.itemClicked.connect(self.on_cart_item_clicked)
+        self.cart_table.clicked.connect(self.on_cart_item_clicked)
         cart_layout.addWidget(self.cart_table)
 
         # Total section
         total_layout = QHBoxLayout()
         total_label = QLabel("Total à payer:")
         total_label.setStyleSheet("font-weight: bold; font-size: 16px;")
-        self.total_amount = QLabel("0.00 MAD")
+        self.total_amount = QLabel(f"0.00 {self.currency}")
         self.total_amount.setStyleSheet("font-weight: bold; font-size: 18px; color: #28a745;")
         total_layout.addWidget(total_label)
         total_layout.addWidget(self.total_amount, alignment=Qt.AlignRight)
@@ -283,22 +259,30 @@ class SalesManagementWindow(QWidget):
         self.setup_categories()
         right_layout.addWidget(categories_scroll)
 
-        # Products section
-        products_scroll = QScrollArea()
-        products_scroll.setWidgetResizable(True)
-        products_scroll.setStyleSheet("""
-            QScrollArea {
+        # Products section: tiles are painted by a delegate, only the visible ones
+        self.products_view = QListView()
+        self.products_view.setViewMode(QListView.IconMode)
+        self.products_view.setResizeMode(QListView.Adjust)
+        self.products_view.setMovement(QListView.Static)
+        self.products_view.setUniformItemSizes(True)
+        self.products_view.setLayoutMode(QListView.Batched)
+        self.products_view.setBatchSize(100)
+        self.products_view.setVerticalScrollMode(QListView.ScrollPerPixel)
+        self.products_view.setSelectionMode(QListView.NoSelection)
+        self.products_view.setMouseTracking(True)
+        self.products_view.setCursor(Qt.PointingHandCursor)
+        self.products_view.setStyleSheet("""
+            QListView {
                 border: none;
                 background-color: transparent;
             }
         """)
-
-        products_widget = QWidget()
-        self.products_layout = QGridLayout(products_widget)
-        self.products_layout.setSpacing(10)
-        products_scroll.setWidget(products_widget)
+        self.products_view.setItemDelegate(ProductTileDelegate(self.products_view))
+        self.products_view.clicked.connect(self.on_product_clicked)
+        # Kinetic scrolling with a finger on the touchscreen
+        QScroller.grabGesture(self.products_view.viewport(), QScroller.LeftMouseButtonGesture)
         
-        right_layout.addWidget(products_scroll)
+        right_layout.addWidget(self.products_view)
 
         # Add receipt options
         receipt_layout = QHBoxLayout()
@@ -318,35 +302,41 @@ class SalesManagementWindow(QWidget):
         receipt_settings_btn.clicked.connect(self.open_receipt_settings)
         receipt_layout.addWidget(receipt_settings_btn)
         
+        # Progress of the receipts printed in the background
+        self.print_status = QLabel("")
+        self.print_status.setStyleSheet("font-size: 12px;")
+        receipt_layout.addWidget(self.print_status, 1)
+        
         right_layout.addLayout(receipt_layout)
 
         return right_widget
 
-    def on_cart_item_clicked(self, item):
+    def on_cart_item_clicked(self, index):
         """Handle click on cart item"""
-        self.selected_row = item.row()
+        self.selected_row = index.row()
         
+        if index.column() == CartTableModel.REMOVE:
+            self.remove_from_cart(index.row())
         # If clicking on quantity column, select product for keypad
-        if self.cart_table.currentColumn() == 1:
-            self.selected_product = item.row()
+        elif index.column() == CartTableModel.QUANTITY:
+            self.selected_product = index.row()
 
     def keypad_pressed(self, text):
         """Handle keypad button press"""
         try:
-            if self.selected_product is None:
+            if self.selected_product is None or self.selected_product >= self.cart_model.rowCount():
                 return
                 
             # Get current quantity
-            current_qty = self.cart_table.item(self.selected_row, 1).text()
+            current_qty = format_quantity(self.cart_model.cart.line_at(self.selected_product).quantity)
             
             # Handle different keypad buttons
             if text == 'C':
                 # Clear quantity
-                current_qty = ""
+                new_qty = ""
             elif text == '×':
                 # Remove last digit
-                current_qty = current_qty[:-1] if current_qty else ""
-                return
+                new_qty = current_qty[:-1]
             else:
                 # Add the text to the current quantity
                 new_qty = current_qty + text
@@ -355,14 +345,28 @@ class SalesManagementWindow(QWidget):
             try:
                 qty = float(new_qty) if new_qty else 1  # Default to 1 if empty
                 if qty > 0:
-                    self.cart_table.setItem(self.selected_row, 1, QTableWidgetItem(str(qty)))
-                    self.update_total()
+                    self.cart_model.set_quantity(self.selected_product, qty)
             except ValueError:
                 # Invalid number, keep the current value
                 pass
         except Exception as e:
             print(f"Error in keypad_pressed: {e}")
 
+    def on_print_status(self, job_id, sale_id, status, message):
+        """Show the progress of a queued receipt"""
+        colors = {'done': "#28a745", 'failed': "#dc3545", 'retry': "#fd7e14"}
+        self.print_status.setText(message)
+        self.print_status.setStyleSheet(f"color: {colors.get(status, '#6c757d')}; font-size: 12px;")
+
+    def on_settings_changed(self, changed):
+        """Follow tax rate and currency changes saved from any window"""
+        store = SettingsStore.instance()
+        if 'currency' in changed:
+            self.currency = store.currency
+            self.total_amount.setText(f"{self.current_amount:.2f} {self.currency}")
+        if 'tax_rate' in changed:
+            self.cart_model.set_tax_rate(store.tax_rate)
+
     def open_receipt_settings(self):
         """Open receipt settings dialog"""
         try:
@@ -375,7 +379,7 @@ class SalesManagementWindow(QWidget):
     
     def process_sale(self):
         """Process the sale and save to database"""
-        if self.cart_table.rowCount() == 0:
+        if self.cart_model.rowCount() == 0:
             QMessageBox.warning(self, "Erreur", "Le panier est vide!")
             return
 
@@ -395,150 +399,50 @@ class SalesManagementWindow(QWidget):
                 QMessageBox.warning(self, "Erreur", "Aucun paiement n'a été enregistré.")
                 return
                 
-            # Now process the sale with payment information
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # Start transaction
-            cursor.execute("BEGIN TRANSACTION")
-            
+            # Write the whole sale in one transaction
+            from models.checkout_service import CheckoutService
             try:
-                # Create sale record
-                cursor.execute("""
-                    INSERT INTO Sales (
-                        created_at, 
-                        total_amount, 
-                        user_id,
-                        discount,
-                        tax_amount,
-                        final_total,
-                        payment_method,
-                        payment_status
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    self.current_datetime.strftime("%Y-%m-%d %H:%M:%S"),
-                    self.current_amount,
-                    self.user_id,
-                    0.0,  # discount (default to 0)
-                    0.0,  # tax_amount (default to 0)
-                    self.current_amount,  # final_total
-                    "MULTIPLE" if len(payments_data) > 1 else payments_data[0]['method_name'],  # payment_method
-                    "COMPLETED"  # payment_status
-                ))
-                
-                sale_id = cursor.lastrowid
-                
-                # Add payment records
-                from models.payment import Payment
-                for payment in payments_data:
-                    Payment.add_sale_payment(
-                        sale_id=sale_id,
-                        payment_method_id=payment['method_id'],
-                        amount=payment['amount'],
-                        reference_number=payment.get('reference', ''),
-                        notes=payment.get('notes', '')
-                    )
-                
-                # Add sale items
-                for row in range(self.cart_table.rowCount()):
-                    product_name = self.cart_table.item(row, 0).text()
-                    quantity = float(self.cart_table.item(row, 1).text())
-                    price = float(self.cart_table.item(row, 2).text())
-                    
-                    # Get product ID and variant ID from the item
-                    product_id = self.cart_table.item(row, 0).data(Qt.UserRole)
-                    variant_id = self.cart_table.item(row, 0).data(Qt.UserRole + 1)
-                    
-                    if not product_id:
-                        # Fallback to old method if ID not stored in item
-                        cursor.execute("SELECT id FROM Products WHERE name = ?", (product_name,))
-                        product_id = cursor.fetchone()[0]
-                    
-                    # Calculate subtotal
-                    subtotal = quantity * price
-                    
-                    # Add sale item
-                    cursor.execute("""
-                        INSERT INTO SaleItems (
-                            sale_id,
-                            product_id,
-                            variant_id,
-                            quantity,
-                            unit_price,
-                            subtotal
-                        ) VALUES (?, ?, ?, ?, ?, ?)
-                    """, (sale_id, product_id, variant_id, quantity, price, subtotal))
-                    
-                    # Update stock - different approach for variants vs regular products
-                    if variant_id:
-                        # Update variant stock
-                        cursor.execute("""
-                            UPDATE ProductVariants 
-                            SET stock = stock - ? 
-                            WHERE id = ?
-                        """, (quantity, variant_id))
-                    else:
-                        # Update product stock
-                        cursor.execute("""
-                            UPDATE Products 
-                            SET stock = stock - ? 
-                            WHERE id = ?
-                        """, (quantity, product_id))
-                
-                cursor.execute("COMMIT")
-                
-                # Show success message with payment details
-                if len(payments_data) > 1:
-                    payment_details = "\n".join([f"- {p['method_name']}: {p['amount']:.2f} MAD" for p in payments_data])
-                    success_message = f"Vente #{sale_id} enregistrée avec succès!\n\nPaiements:\n{payment_details}"
-                else:
-                    success_message = f"Vente #{sale_id} enregistrée avec succès!\nPaiement par {payments_data[0]['method_name']}: {payments_data[0]['amount']:.2f} MAD"
-                
-                QMessageBox.information(self, "Succès", success_message)
-                
-                # Generate receipt based on selected option
-                receipt_option = self.receipt_options.currentIndex()
-                
-                # Only generate receipt if not "Ne pas imprimer" (index 3)
-                if receipt_option < 3:
-                    try:
-                        # Import the receipt generator
-                        from .receipt_generator import ReceiptGenerator
-                        
-                        # Create receipt generator for this sale
-                        receipt = ReceiptGenerator(sale_id, self)
-                        
-                        # Handle different receipt options
-                        if receipt_option == 0:  # Thermal
-                            receipt.print_thermal()
-                        elif receipt_option == 1:  # A4
-                            receipt.print_a4()
-                        elif receipt_option == 2:  # PDF
-                            receipt.generate_pdf()
-                        else:
-                            # Show the receipt preview dialog with all options
-                            receipt.show_receipt_dialog()
-                            
-                    except Exception as e:
-                        print(f"Error generating receipt: {e}")
-                        QMessageBox.warning(
-                            self, 
-                            "Erreur d'impression", 
-                            f"La vente a été enregistrée mais il y a eu une erreur lors de l'impression du reçu: {str(e)}"
-                        )
-                
-                # Clear the cart
-                self.clear_cart()
-                
+                cart = self.cart_model.cart
+                sale_id, _ = CheckoutService.checkout(
+                    self.user_id, cart.lines(), payments_data,
+                    discount=cart.discount, tax_amount=cart.tax
+                )
             except Exception as e:
-                cursor.execute("ROLLBACK")
                 QMessageBox.warning(self, "Erreur", f"Erreur lors de l'enregistrement de la vente: {str(e)}")
+                return
+            
+            # Queue the receipt first: the spooler prints it while the messages below are shown
+            receipt_kinds = ['thermal', 'a4', 'pdf']  # "Ne pas imprimer" is index 3
+            receipt_option = self.receipt_options.currentIndex()
+            if receipt_option < len(receipt_kinds):
+                try:
+                    from .print_spooler import PrintSpooler
+                    PrintSpooler.instance().submit(sale_id, receipt_kinds[receipt_option])
+                except Exception as e:
+                    print(f"Error queueing receipt: {e}")
+                    QMessageBox.warning(
+                        self, 
+                        "Erreur d'impression", 
+                        f"La vente a été enregistrée mais il y a eu une erreur lors de l'impression du reçu: {str(e)}"
+                    )
+            
+            # Show the new stock of the sold products
+            self.load_products(self.current_category_id)
+            
+            # Show success message with payment details
+            if len(payments_data) > 1:
+                payment_details = "\n".join([f"- {p['method_name']}: {p['amount']:.2f} {self.currency}" for p in payments_data])
+                success_message = f"Vente #{sale_id} enregistrée avec succès!\n\nPaiements:\n{payment_details}"
+            else:
+                success_message = f"Vente #{sale_id} enregistrée avec succès!\nPaiement par {payments_data[0]['method_name']}: {payments_data[0]['amount']:.2f} {self.currency}"
+            
+            QMessageBox.information(self, "Succès", success_message)
+            
+            # Clear the cart
+            self.clear_cart()
                 
         except Exception as e:
             QMessageBox.warning(self, "Erreur", f"Erreur lors du traitement de la vente: {str(e)}")
-        finally:
-            if 'conn' in locals() and conn:
-                conn.close()
 
     def remove_from_cart(self, row):
         """Remove an item from the cart"""
@@ -550,29 +454,21 @@ class SalesManagementWindow(QWidget):
         )
 
         if reply == QMessageBox.Yes:
-            self.cart_table.removeRow(row)
-            self.update_total()
-            if row == getattr(self, 'selected_row', None):
+            self.cart_model.remove_line(row)
+            if row == self.selected_product:
                 self.selected_product = None
+            elif self.selected_product is not None and self.selected_product > row:
+                self.selected_product -= 1
+            self.selected_row = None
 
-    def update_total(self):
-        """Update the total amount in the cart"""
-        total = 0.0
-        for row in range(self.cart_table.rowCount()):
-            try:
-                qty = float(self.cart_table.item(row, 1).text())
-                price = float(self.cart_table.item(row, 2).text())
-                total += qty * price
-            except (ValueError, AttributeError):
-                continue
-        
-        self.total_amount.setText(f"{total:.2f} MAD")
+    def update_total(self, subtotal=0.0, tax=0.0, discount=0.0, total=0.0):
+        """Show the running total of the cart (connected to totals_changed)"""
+        self.total_amount.setText(f"{total:.2f} {self.currency}")
         self.current_amount = total
 
     def clear_cart(self):
         """Clear all items from the cart"""
-        self.cart_table.setRowCount(0)
-        self.update_total()
+        self.cart_model.clear()
         self.selected_product = None
         self.selected_row = None
 
@@ -617,32 +513,83 @@ class SalesManagementWindow(QWidget):
             col += 1
 
     def load_products(self, category_id=None):
-        # Clear existing products
-        while self.products_layout.count():
-            item = self.products_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-
-        # Get products
-        products = Product.get_products_by_category(category_id)
+        """Show the products of a category, reusing its model when the catalog is unchanged"""
+        stale_models = []
+        if self.product_models_version != CatalogCache.version:
+            stale_models = list(self.product_models.values())
+            self.product_models = {}
+            self.product_models_version = CatalogCache.version
+
+        model = self.product_models.get(category_id)
+        if model is None:
+            model = ProductGridModel(Product.get_products_by_category(category_id), self)
+            self.product_models[category_id] = model
+
+        if self.products_view.model() is not model:
+            # Keep the scroll position when the same category is refreshed
+            scroll = self.products_view.verticalScrollBar().value()
+            self.products_view.setModel(model)
+            if category_id == self.current_category_id:
+                self.products_view.verticalScrollBar().setValue(scroll)
+            else:
+                self.products_view.scrollToTop()
+        self.current_category_id = category_id
+        for stale_model in stale_models:
+            stale_model.deleteLater()
 
-        # Add products to grid
-        row = 0
-        col = 0
-        for product in products:
-            product_frame = ProductFrame(product)
-            product_frame.mousePressEvent = lambda e, p=product: self.add_to_cart(p)
-            
-            self.products_layout.addWidget(product_frame, row, col)
-            
-            col += 1
-            if col > 2:  # 3 products per row
-                col = 0
-                row += 1
+    def on_product_clicked(self, index):
+        product = index.data(Qt.UserRole)
+        if product:
+            self.add_to_cart(product)
 
     def filter_by_category(self, category_id):
         self.load_products(category_id)
 
+    def scan_barcode(self):
+        """Add the product or variant matching the scanned code to the cart"""
+        code = self.scan_input.text().strip()
+        self.scan_input.clear()
+        if not code:
+            return
+        
+        # Hash lookup over product barcodes, variant barcodes and SKUs
+        product, variant = CatalogCache.lookup_code(code)
+        if not product:
+            self.show_search_results(code)
+            return
+        
+        if variant:
+            # The code identifies the variant: no selection dialog needed
+            self.add_variant_to_cart(product, variant)
+        else:
+            self.add_to_cart(product)
+        
+        self.scan_status.setText(f"Ajouté : {product['name']}")
+        self.scan_status.setStyleSheet("color: #28a745; font-size: 12px;")
+        self.scan_input.setFocus()
+
+    def show_search_results(self, query):
+        """Show the products matching a full-text search in the grid, best match first"""
+        products = []
+        for row in Product.search_products(query):
+            product = CatalogCache.get_product(row['id'])
+            if product:
+                products.append(CatalogCache.decode_variant_attributes(product))
+        if not products:
+            self.scan_status.setText(f"Aucun produit pour : {query}")
+            self.scan_status.setStyleSheet("color: #dc3545; font-size: 12px;")
+            return
+        
+        previous_model = self.search_model
+        self.search_model = ProductGridModel(products, self)
+        self.products_view.setModel(self.search_model)
+        self.products_view.scrollToTop()
+        if previous_model is not None:
+            previous_model.deleteLater()
+        self.scan_status.setText(f"{len(products)} produits trouvés pour : {query}")
+        self.scan_status.setStyleSheet("color: #6c757d; font-size: 12px;")
+        self.scan_input.setFocus()
+
     def add_to_cart(self, product):
         # Check if product has variants
         if product.get('has_variants'):
@@ -665,134 +612,25 @@ class SalesManagementWindow(QWidget):
                 QMessageBox.warning(self, "Erreur", f"Erreur lors de la sélection de la variante: {str(e)}")
             return
         
-        # Regular product (no variants)
-        # Check if product is already in cart
-        for row in range(self.cart_table.rowCount()):
-            product_id = self.cart_table.item(row, 0).data(Qt.UserRole)
-            variant_id = self.cart_table.item(row, 0).data(Qt.UserRole + 1)
-            
-            # Match if same product and no variant
-            if product_id == product['id'] and variant_id is None:
-                # Update quantity
-                current_qty = int(self.cart_table.item(row, 1).text())
-                self.cart_table.setItem(row, 1, QTableWidgetItem(str(current_qty + 1)))
-                self.update_total()
-                return
-
-        # Add new product to cart
-        row = self.cart_table.rowCount()
-        self.cart_table.insertRow(row)
-        
-        # Product name cell with product ID stored
-        name_item = QTableWidgetItem(product['name'])
-        name_item.setData(Qt.UserRole, product['id'])  # Store product ID
-        name_item.setData(Qt.UserRole + 1, None)      # No variant
-        self.cart_table.setItem(row, 0, name_item)
-        
-        # Quantity and price
-        self.cart_table.setItem(row, 1, QTableWidgetItem("1"))
-        self.cart_table.setItem(row, 2, QTableWidgetItem(f"{product['unit_price']:.2f}"))
-        
-        delete_btn = QPushButton("🗑")
-        delete_btn.setCursor(Qt.PointingHandCursor)
-        delete_btn.setStyleSheet("""
-            QPushButton {
-                border: none;
-                color: #6c757d;
-            }
-            QPushButton:hover {
-                color: #dc3545;
-            }
-        """)
-        delete_btn.clicked.connect(lambda checked, r=row: self.remove_from_cart(r))
-        
-        btn_cell = QWidget()
-        btn_layout = QHBoxLayout(btn_cell)
-        btn_layout.setContentsMargins(0, 0, 0, 0)
-        btn_layout.addWidget(delete_btn)
-        
-        self.cart_table.setCellWidget(row, 3, btn_cell)
-        self.update_total()
+        # Regular product (no variants): merged into its line if already in the cart
+        self.cart_model.add_line(CartLine(
+            product_id=product['id'],
+            name=product['name'],
+            quantity=1,
+            unit_price=float(product['unit_price'])
+        ))
 
     def add_variant_to_cart(self, product, variant):
         """Add a product variant to the cart"""
         try:
-            # Check if the variant is already in the cart
-            for row in range(self.cart_table.rowCount()):
-                product_id = self.cart_table.item(row, 0).data(Qt.UserRole)
-                variant_id = self.cart_table.item(row, 0).data(Qt.UserRole + 1)
-                
-                # Match if same product and same variant
-                if product_id == product['id'] and variant_id == variant['id']:
-                    # Update quantity
-                    current_qty = int(self.cart_table.item(row, 1).text())
-                    self.cart_table.setItem(row, 1, QTableWidgetItem(str(current_qty + 1)))
-                    self.update_total()
-                    return
-            
-            # Create variant name from product name + variant attributes
-            attr_values = {}
-            
-            # Try both possible keys for attributes (for compatibility)
-            for key in ['attributes', 'attribute_values']:
-                if variant.get(key):
-                    try:
-                        # Handle different data structures
-                        if isinstance(variant[key], str):
-                            # Try to parse as JSON
-                            try:
-                                parsed_values = json.loads(variant[key])
-                                attr_values = parsed_values
-                                # Store the parsed result back in the variant for future use
-                                variant[key] = parsed_values
-                                # Also store in the other key for compatibility
-                                other_key = 'attributes' if key == 'attribute_values' else 'attribute_values'
-                                variant[other_key] = parsed_values
-                            except json.JSONDecodeError:
-                                # Not valid JSON, use as a simple string-value dictionary
-                                attr_values = {key: variant[key]}
-                        else:
-                            attr_values = variant[key]
-                            # Copy to other key for compatibility
-                            other_key = 'attributes' if key == 'attribute_values' else 'attribute_values'
-                            if other_key not in variant or not variant[other_key]:
-                                variant[other_key] = attr_values
-                    
-                        # If we got values, no need to check the other key
-                        if attr_values:
-                            print(f"Successfully parsed {key}: {attr_values}")
-                            break
-                    except Exception as e:
-                        print(f"Error parsing variant {key}: {e}")
-                        
-            # Debug output
-            print(f"Variant in cart: {variant}")
-            print(f"Extracted attribute values: {attr_values}")
-            
-            variant_desc = ""
-            if attr_values:
-                try:
-                    # Handle different structures of attr_values
-                    attr_vals = []
-                    
-                    # If attr_values is a dictionary with values
-                    if isinstance(attr_values, dict):
-                        attr_vals = [str(val) for val in attr_values.values() if val]
-                    # If attr_values is a list
-                    elif isinstance(attr_values, list):
-                        attr_vals = [str(val) for val in attr_values if val]
-                    # If it's some other structure, try to convert to string
-                    else:
-                        attr_vals = [str(attr_values)]
-                    
-                    # Join the values to create a description if we have values
-                    if attr_vals:
-                        variant_desc = " (" + " / ".join(attr_vals) + ")"
-                except Exception as e:
-                    print(f"Error creating variant description: {e}")
-                    variant_desc = f" (Variante #{variant.get('id', '')})"
+            # Already in the cart: only the quantity changes
+            if self.cart_model.cart.row_of((product['id'], variant['id'])) is not None:
+                self.cart_model.add_line(CartLine(product['id'], variant['id'], quantity=1))
+                return
             
-            variant_name = product['name'] + variant_desc
+            # Display name materialized on the variant row ("Rouge / L")
+            variant_label = variant.get('display_name') or f"Variante #{variant['id']}"
+            variant_name = f"{product['name']} ({variant_label})"
             
             # Calculate price - base price + all attribute adjustments
             base_price = float(product['unit_price'])
@@ -811,40 +649,13 @@ class SalesManagementWindow(QWidget):
             final_price = base_price + price_adj
             
             # Add to cart
-            row = self.cart_table.rowCount()
-            self.cart_table.insertRow(row)
-            
-            # Product name cell with product and variant IDs stored
-            name_item = QTableWidgetItem(variant_name)
-            name_item.setData(Qt.UserRole, product['id'])   # Store product ID
-            name_item.setData(Qt.UserRole + 1, variant['id'])  # Store variant ID
-            self.cart_table.setItem(row, 0, name_item)
-            
-            # Quantity and price
-            self.cart_table.setItem(row, 1, QTableWidgetItem("1"))
-            self.cart_table.setItem(row, 2, QTableWidgetItem(f"{final_price:.2f}"))
-            
-            # Delete button
-            delete_btn = QPushButton("🗑")
-            delete_btn.setCursor(Qt.PointingHandCursor)
-            delete_btn.setStyleSheet("""
-                QPushButton {
-                    border: none;
-                    color: #6c757d;
-                }
-                QPushButton:hover {
-                    color: #dc3545;
-                }
-            """)
-            delete_btn.clicked.connect(lambda checked, r=row: self.remove_from_cart(r))
-            
-            btn_cell = QWidget()
-            btn_layout = QHBoxLayout(btn_cell)
-            btn_layout.setContentsMargins(0, 0, 0, 0)
-            btn_layout.addWidget(delete_btn)
-            
-            self.cart_table.setCellWidget(row, 3, btn_cell)
-            self.update_total()
+            self.cart_model.add_line(CartLine(
+                product_id=product['id'],
+                variant_id=variant['id'],
+                name=variant_name,
+                quantity=1,
+                unit_price=final_price
+            ))
             
         except Exception as e:
             print(f"Error adding variant to cart: {e}")
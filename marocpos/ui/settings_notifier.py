@@ -0,0 +1,21 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+from models.settings import SettingsStore
+
+
+class SettingsNotifier(QObject):
+    """Qt side of SettingsStore: emits settings_changed({key: value}) after
+    every saved change, so open windows can follow the new tax rate,
+    currency or receipt options. Changes saved from a worker thread are
+    delivered on the GUI thread. Use the shared instance().
+    """
+
+    settings_changed = pyqtSignal(dict)
+
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+            SettingsStore.instance().subscribe(cls._instance.settings_changed.emit)
+        return cls._instance
@@ -2,7 +2,10 @@ from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QFormLayout, QLineEdit, 
     QPushButton, QFileDialog, QLabel, QMessageBox
 )
-from database import get_connection
+from models.settings import SettingsStore
+from database import backup_database
+from ui.job_manager import JobManager
+from datetime import datetime
 
 class SettingsWindow(QWidget):
     def __init__(self):
@@ -46,26 +49,23 @@ class SettingsWindow(QWidget):
         save_button.clicked.connect(self.save_settings)
         layout.addRow(save_button)
 
+        # Database backup, run in the background
+        backup_button = QPushButton("Backup Database...")
+        backup_button.clicked.connect(self.backup_database)
+        layout.addRow(backup_button)
+
         self.setLayout(layout)
 
     def load_settings(self):
-        conn = get_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                cursor.execute("SELECT key, value FROM Settings")
-                settings = dict(cursor.fetchall())
-                
-                self.store_name.setText(settings.get('store_name', ''))
-                self.store_address.setText(settings.get('store_address', ''))
-                self.store_phone.setText(settings.get('store_phone', ''))
-                self.store_email.setText(settings.get('store_email', ''))
-                self.tax_rate.setText(settings.get('tax_rate', '0'))
-                self.currency.setText(settings.get('currency', 'MAD'))
-                self.receipt_footer.setText(settings.get('receipt_footer', ''))
-                self.logo_path.setText(settings.get('receipt_logo', ''))
-            finally:
-                conn.close()
+        settings = SettingsStore.instance().all()
+        self.store_name.setText(settings.get('store_name') or '')
+        self.store_address.setText(settings.get('store_address') or '')
+        self.store_phone.setText(settings.get('store_phone') or '')
+        self.store_email.setText(settings.get('store_email') or '')
+        self.tax_rate.setText(settings.get('tax_rate') or '0')
+        self.currency.setText(settings.get('currency') or 'MAD')
+        self.receipt_footer.setText(settings.get('receipt_footer') or '')
+        self.logo_path.setText(settings.get('receipt_logo') or '')
 
     def browse_logo(self):
         file_name, _ = QFileDialog.getOpenFileName(
@@ -75,30 +75,46 @@ class SettingsWindow(QWidget):
             self.logo_path.setText(file_name)
 
     def save_settings(self):
-        conn = get_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                settings = {
-                    'store_name': self.store_name.text(),
-                    'store_address': self.store_address.text(),
-                    'store_phone': self.store_phone.text(),
-                    'store_email': self.store_email.text(),
-                    'tax_rate': self.tax_rate.text(),
-                    'currency': self.currency.text(),
-                    'receipt_footer': self.receipt_footer.text(),
-                    'receipt_logo': self.logo_path.text()
-                }
+        settings = {
+            'store_name': self.store_name.text(),
+            'store_address': self.store_address.text(),
+            'store_phone': self.store_phone.text(),
+            'store_email': self.store_email.text(),
+            'tax_rate': self.tax_rate.text(),
+            'currency': self.currency.text(),
+            'receipt_footer': self.receipt_footer.text(),
+            'receipt_logo': self.logo_path.text()
+        }
+
+        try:
+            float(settings['tax_rate'] or 0)
+        except ValueError:
+            QMessageBox.warning(self, "Error", "Tax rate must be a number")
+            return
+
+        if SettingsStore.instance().update(settings):
+            QMessageBox.information(self, "Success", "Settings saved successfully!")
+        else:
+            QMessageBox.warning(self, "Error", "Error saving settings")
 
-                for key, value in settings.items():
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO Settings (key, value)
-                        VALUES (?, ?)
-                    """, (key, value))
+    def backup_database(self):
+        default_name = f"pos_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
+        file_name, _ = QFileDialog.getSaveFileName(
+            self, "Backup Database", default_name, "SQLite Database (*.db)"
+        )
+        if not file_name:
+            return
+        JobManager.instance().submit(
+            "Sauvegarde de la base de données", self.write_backup, file_name,
+            on_result=lambda path: QMessageBox.information(self, "Success", f"Database saved to:\n{path}"),
+            on_error=lambda error: QMessageBox.warning(self, "Error", f"Backup failed: {error}")
+        )
 
-                conn.commit()
-                QMessageBox.information(self, "Success", "Settings saved successfully!")
-            except Exception as e:
-                QMessageBox.warning(self, "Error", f"Error saving settings: {str(e)}")
-            finally:
-                conn.close()
\ No newline at end of file
+    @staticmethod
+    def write_backup(job, path):
+        """Copy the database page batch by page batch (runs as a background job)"""
+        def progress(done, total):
+            job.check_cancelled()
+            job.set_progress(done, total, "Sauvegarde")
+        backup_database(path, progress)
+        return path
\ No newline at end of file
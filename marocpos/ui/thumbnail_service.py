@@ -0,0 +1,149 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QSize, Qt, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader, QPixmap, QPixmapCache
+import hashlib
+import os
+
+THUMBNAIL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'thumbnails')
+
+
+def thumbnail_file(image_path, size):
+    """Path of the cached thumbnail of an image; None if the image does not exist.
+
+    The name hashes path, modification time and size, so a replaced image
+    never reuses a stale thumbnail.
+    """
+    try:
+        mtime = os.stat(image_path).st_mtime_ns
+    except OSError:
+        return None
+    key = f"{os.path.abspath(image_path)}|{mtime}|{size}"
+    return os.path.join(THUMBNAIL_DIR, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.png')
+
+
+def load_thumbnail(image_path, size):
+    """QImage thumbnail of an image (null if unreadable), from the disk cache or decoded.
+
+    Uses QImage only, so it can run on a worker thread. The reader decodes
+    straight to the thumbnail size, which for JPEG skips most of the work.
+    """
+    cache_path = thumbnail_file(image_path, size)
+    if cache_path is None:
+        return QImage()
+    if os.path.exists(cache_path):
+        image = QImage(cache_path)
+        if not image.isNull():
+            return image
+
+    reader = QImageReader(image_path)
+    reader.setAutoTransform(True)
+    source_size = reader.size()
+    if source_size.isValid() and (source_size.width() > size or source_size.height() > size):
+        reader.setScaledSize(source_size.scaled(QSize(size, size), Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return image
+    if image.width() > size or image.height() > size:
+        image = image.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+    try:
+        os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+        # Write then rename so a concurrent reader never sees half a file
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        if image.save(temp_path, 'PNG'):
+            os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"Error saving thumbnail of {image_path}: {e}")
+    return image
+
+
+class _ThumbnailSignals(QObject):
+    finished = pyqtSignal(str, int, QImage)
+
+
+class _ThumbnailJob(QRunnable):
+    def __init__(self, image_path, size):
+        super().__init__()
+        self.image_path = image_path
+        self.size = size
+        self.signals = _ThumbnailSignals()
+
+    def run(self):
+        try:
+            image = load_thumbnail(self.image_path, self.size)
+        except Exception as e:
+            print(f"Error loading thumbnail of {self.image_path}: {e}")
+            image = QImage()
+        self.signals.finished.emit(self.image_path, self.size, image)
+
+
+class ThumbnailService(QObject):
+    """Product image thumbnails: memory (QPixmapCache, LRU) -> disk cache -> decode.
+
+    thumbnail() never blocks: when the pixmap is not in memory it returns
+    None, queues the load on a thread pool and emits
+    thumbnail_ready(image_path, size) once it is available, so views draw a
+    placeholder and repaint. Use the shared instance().
+    """
+
+    # Enough for a few thousand 50-100px thumbnails
+    MEMORY_CACHE_KB = 64 * 1024
+
+    thumbnail_ready = pyqtSignal(str, int)
+
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        QPixmapCache.setCacheLimit(max(QPixmapCache.cacheLimit(), self.MEMORY_CACHE_KB))
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(1, min(4, QThreadPool.globalInstance().maxThreadCount() - 1)))
+        self._pending = set()
+        self._failed = set()
+
+    @staticmethod
+    def _key(image_path, size):
+        return f"thumbnail:{size}:{image_path}"
+
+    def thumbnail(self, image_path, size):
+        """Cached thumbnail, or None while it loads (or if the image is unusable)"""
+        if not image_path:
+            return None
+        pixmap = QPixmapCache.find(self._key(image_path, size))
+        if pixmap is not None:
+            return pixmap
+        request = (image_path, size)
+        if request not in self._pending and request not in self._failed:
+            self._pending.add(request)
+            job = _ThumbnailJob(image_path, size)
+            job.signals.finished.connect(self._on_finished)
+            self.pool.start(job)
+        return None
+
+    def thumbnail_now(self, image_path, size):
+        """Blocking variant for single previews (dialogs); None if unusable"""
+        if not image_path:
+            return None
+        pixmap = QPixmapCache.find(self._key(image_path, size))
+        if pixmap is None:
+            image = load_thumbnail(image_path, size)
+            if image.isNull():
+                return None
+            pixmap = QPixmap.fromImage(image)
+            QPixmapCache.insert(self._key(image_path, size), pixmap)
+        return pixmap
+
+    def _on_finished(self, image_path, size, image):
+        self._pending.discard((image_path, size))
+        if image.isNull():
+            self._failed.add((image_path, size))
+            return
+        # QPixmap must be created on the GUI thread
+        QPixmapCache.insert(self._key(image_path, size), QPixmap.fromImage(image))
+        self.thumbnail_ready.emit(image_path, size)
+
@@ -1,22 +1,27 @@
 from PyQt5.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
-    QPushButton, QTableWidget, QTableWidgetItem, QMessageBox,
-    QHeaderView, QWidget, QSplitter, QListWidget, QListWidgetItem,
-    QComboBox, QCheckBox, QDialogButtonBox, QDoubleSpinBox, QSpinBox,
+    QPushButton, QMessageBox,
+    QHeaderView, QWidget, QSplitter, QListWidget, QListWidgetItem, QTableView,
+    QComboBox, QCheckBox, QDialogButtonBox, QSpinBox,
     QFormLayout, QGroupBox, QTabWidget
 )
-from PyQt5.QtCore import Qt
 from models.product_attribute import ProductAttribute
 from models.product import Product
+from models.variant_codes import VariantCodeGenerator
+from ui.variant_matrix_model import VariantMatrixModel
 import json
 
 class VariantManagementDialog(QDialog):
+    # Combinations generated at most for one product
+    MAX_VARIANTS = 10000
+
     def __init__(self, product_id=None, parent=None, variant_attributes=None):
         super().__init__(parent)
         self.product_id = product_id
         self.variant_attributes = variant_attributes or []  # List of attribute names
         self.attribute_values = {}  # Dict of attribute name -> list of values
-        self.variants = []  # List of variant dictionaries
+        self.exclusion_rules = []  # {attribute: value} dicts of combinations not to generate
+        self.variants_model = VariantMatrixModel(parent=self)
         self.init_ui()
         self.load_attributes()
 
@@ -59,6 +64,32 @@ class VariantManagementDialog(QDialog):
         add_attr_btn.clicked.connect(self.add_attribute_row)
         layout.addWidget(add_attr_btn)
         
+        # Combinations to leave out, e.g. Couleur: Rouge + Taille: S
+        rules_group = QGroupBox("Règles d'exclusion")
+        rules_layout = QVBoxLayout(rules_group)
+        rules_layout.addWidget(QLabel("Les combinaisons correspondant à une règle ne seront pas générées."))
+        self.exclusion_list = QListWidget()
+        self.exclusion_list.setMaximumHeight(100)
+        rules_layout.addWidget(self.exclusion_list)
+        rules_buttons = QHBoxLayout()
+        add_rule_btn = QPushButton("Ajouter une règle")
+        add_rule_btn.clicked.connect(self.add_exclusion_rule)
+        remove_rule_btn = QPushButton("Supprimer la règle")
+        remove_rule_btn.clicked.connect(self.remove_exclusion_rule)
+        rules_buttons.addWidget(add_rule_btn)
+        rules_buttons.addWidget(remove_rule_btn)
+        rules_buttons.addStretch()
+        rules_layout.addLayout(rules_buttons)
+        layout.addWidget(rules_group)
+        
+        # Cap on the generated combinations
+        limit_layout = QFormLayout()
+        self.max_variants_spin = QSpinBox()
+        self.max_variants_spin.setRange(1, self.MAX_VARIANTS)
+        self.max_variants_spin.setValue(self.MAX_VARIANTS)
+        limit_layout.addRow("Nombre maximum de variantes:", self.max_variants_spin)
+        layout.addLayout(limit_layout)
+        
         # Button to generate variants
         generate_btn = QPushButton("Générer les variantes")
         generate_btn.clicked.connect(self.generate_variants)
@@ -83,19 +114,20 @@ class VariantManagementDialog(QDialog):
         instruction.setStyleSheet("font-size: 14px; margin-bottom: 10px;")
         layout.addWidget(instruction)
         
-        # Variants table
-        self.variants_table = QTableWidget()
-        self.variants_table.setColumnCount(6)
-        self.variants_table.setHorizontalHeaderLabels([
-            "Actif", "Variante", "SKU", "Prix de vente", "Stock", "Code-barres"
-        ])
-        
+        # Variants table: rows are generated as the table scrolls
+        self.variants_table = QTableView()
+        self.variants_table.setModel(self.variants_model)
+        self.variants_table.verticalHeader().setDefaultSectionSize(28)
         self.variants_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
         self.variants_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Fixed)
         self.variants_table.setColumnWidth(0, 50)
         
         layout.addWidget(self.variants_table)
         
+        self.variants_count = QLabel("")
+        self.variants_count.setStyleSheet("color: #6c757d;")
+        layout.addWidget(self.variants_count)
+        
         # Bulk action buttons
         bulk_layout = QHBoxLayout()
         
@@ -278,6 +310,46 @@ class VariantManagementDialog(QDialog):
         
         return self.attribute_values
 
+    def add_exclusion_rule(self):
+        """Ask for the attribute values of a combination to exclude"""
+        attr_values = self.collect_attribute_values()
+        if not attr_values:
+            QMessageBox.warning(self, "Aucun attribut", "Sélectionnez d'abord des attributs et des valeurs.")
+            return
+        
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Nouvelle règle d'exclusion")
+        form = QFormLayout(dialog)
+        combos = {}
+        for attr_name, values in attr_values.items():
+            combo = QComboBox()
+            combo.addItem("(toutes)", None)
+            for value in values:
+                combo.addItem(value, value)
+            combos[attr_name] = combo
+            form.addRow(f"{attr_name}:", combo)
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        form.addRow(buttons)
+        if not dialog.exec_():
+            return
+        
+        rule = {name: combo.currentData() for name, combo in combos.items() if combo.currentData() is not None}
+        if not rule:
+            QMessageBox.warning(self, "Règle vide", "Choisissez au moins une valeur à exclure.")
+            return
+        self.exclusion_rules.append(rule)
+        self.exclusion_list.addItem(" + ".join(f"{name}: {value}" for name, value in rule.items()))
+
+    def remove_exclusion_rule(self):
+        """Remove the selected exclusion rule"""
+        row = self.exclusion_list.currentRow()
+        if row < 0:
+            return
+        self.exclusion_list.takeItem(row)
+        del self.exclusion_rules[row]
+
     def generate_variants(self):
         """Generate variants based on selected attributes and values"""
         # Collect attribute values
@@ -287,129 +359,51 @@ class VariantManagementDialog(QDialog):
             QMessageBox.warning(self, "Aucune variante", "Aucun attribut ou valeur sélectionné.")
             return
             
-        # Generate combinations with the dict approach
-        combinations = ProductAttribute.generate_variant_combinations_dict(attr_values)
-        
-        # Store as list of variant dictionaries
-        self.variants = []
-        for combo in combinations:
-            # Create variant name from combination (e.g., "Red / L")
-            name_parts = []
-            for attr, value in combo.items():
-                name_parts.append(f"{value}")
-            
-            variant_name = " / ".join(name_parts)
-            
-            # Generate a more unique SKU
-            base_sku = "SKU"  # This would normally come from the product
-            sku_parts = []
-            
-            # Get first 2 letters (or full word if shorter) of each value, with attribute first letter
-            for attr, value in combo.items():
-                # Clean and normalize the value - remove spaces and special characters
-                cleaned_value = ''.join(c for c in value if c.isalnum())
-                # Get attribute first letter + up to 2 chars from value
-                attr_prefix = attr[0].upper()
-                value_part = cleaned_value[:2].upper()
-                sku_parts.append(f"{attr_prefix}{value_part}")
-            
-            # Add a unique timestamp-based suffix to ensure uniqueness
-            import time
-            timestamp_suffix = str(int(time.time() * 1000))[-4:]  # Last 4 digits of current time in ms
-            
-            sku = f"{base_sku}-{''.join(sku_parts)}-{timestamp_suffix}"
-            
-            # Create variant dictionary
-            variant = {
-                'active': True,
-                'name': variant_name,
-                'sku': sku,
-                'price': 0.0,  # Default price from product
-                'stock': 0,
-                'barcode': '',
-                'attributes': combo
-            }
+        limit = self.max_variants_spin.value()
+        total = ProductAttribute.count_combinations(attr_values)
+        if total > limit:
+            QMessageBox.warning(
+                self,
+                "Trop de variantes",
+                f"{total} combinaisons possibles: seules les {limit} premières seront générées."
+            )
+            total = limit
             
-            self.variants.append(variant)
+        # Deterministic SKUs, unique within the matrix (checked against the database on save)
+        self.codes = VariantCodeGenerator(self.product_id)
         
-        # Populate the variants table
-        self.populate_variants_table()
-
-    def populate_variants_table(self):
-        """Populate the variants table with generated variants"""
-        self.variants_table.setRowCount(len(self.variants))
-        
-        for row, variant in enumerate(self.variants):
-            # Active checkbox
-            active_cb = QCheckBox()
-            active_cb.setChecked(variant['active'])
-            active_cb.stateChanged.connect(lambda state, r=row: self.update_variant_active(r, state))
-            active_cell = QWidget()
-            active_layout = QHBoxLayout(active_cell)
-            active_layout.addWidget(active_cb)
-            active_layout.setAlignment(Qt.AlignCenter)
-            active_layout.setContentsMargins(0, 0, 0, 0)
-            
-            # Variant name
-            name_item = QTableWidgetItem(variant['name'])
-            name_item.setFlags(name_item.flags() & ~Qt.ItemIsEditable)  # Make read-only
-            
-            # SKU
-            sku_item = QTableWidgetItem(variant['sku'])
-            
-            # Price widget
-            price_spin = QDoubleSpinBox()
-            price_spin.setMinimum(0)
-            price_spin.setMaximum(999999.99)
-            price_spin.setValue(variant['price'])
-            price_spin.setSuffix(" MAD")
-            price_spin.valueChanged.connect(lambda value, r=row: self.update_variant_price(r, value))
-            
-            # Stock widget
-            stock_spin = QSpinBox()
-            stock_spin.setMinimum(0)
-            stock_spin.setMaximum(999999)
-            stock_spin.setValue(variant['stock'])
-            stock_spin.valueChanged.connect(lambda value, r=row: self.update_variant_stock(r, value))
-            
-            # Barcode
-            barcode_item = QTableWidgetItem(variant['barcode'])
-            barcode_item.setData(Qt.UserRole, variant)
-            
-            # Add to table
-            self.variants_table.setCellWidget(row, 0, active_cell)
-            self.variants_table.setItem(row, 1, name_item)
-            self.variants_table.setItem(row, 2, sku_item)
-            self.variants_table.setCellWidget(row, 3, price_spin)
-            self.variants_table.setCellWidget(row, 4, stock_spin)
-            self.variants_table.setItem(row, 5, barcode_item)
-
-    def update_variant_active(self, row, state):
-        """Update the active state of a variant"""
-        if row < len(self.variants):
-            self.variants[row]['active'] = (state == Qt.Checked)
-
-    def update_variant_price(self, row, value):
-        """Update the price of a variant"""
-        if row < len(self.variants):
-            self.variants[row]['price'] = value
+        # Combinations are generated lazily, page by page, as the table needs them
+        combinations = ProductAttribute.iter_combinations(
+            attr_values, limit=limit, exclude=self.exclusion_rules
+        )
+        previous_model = self.variants_model
+        self.variants_model = VariantMatrixModel(combinations, self.make_variant, total, self)
+        self.variants_table.setModel(self.variants_model)
+        previous_model.deleteLater()
+        if self.exclusion_rules:
+            # Excluded combinations are only known once generated
+            self.variants_count.setText(f"{total} variantes au plus (règles d'exclusion appliquées)")
+        else:
+            self.variants_count.setText(f"{total} variantes")
 
-    def update_variant_stock(self, row, value):
-        """Update the stock of a variant"""
-        if row < len(self.variants):
-            self.variants[row]['stock'] = value
+    def make_variant(self, combo):
+        """Variant dictionary of one combination"""
+        # Create variant name from combination (e.g., "Red / L")
+        variant_name = " / ".join(str(value) for value in combo.values())
+        
+        return {
+            'active': True,
+            'name': variant_name,
+            'sku': self.codes.sku(combo),
+            'price': 0.0,  # Default price from product
+            'stock': 0,
+            'barcode': '',
+            'attributes': combo
+        }
 
     def set_all_active(self, active):
-        """Set all variants active or inactive"""
-        for row in range(self.variants_table.rowCount()):
-            cell_widget = self.variants_table.cellWidget(row, 0)
-            if cell_widget:
-                # Find the checkbox in the cell widget
-                for i in range(cell_widget.layout().count()):
-                    checkbox = cell_widget.layout().itemAt(i).widget()
-                    if isinstance(checkbox, QCheckBox):
-                        checkbox.setChecked(active)
-                        break
+        """Set all variants active or inactive, including the rows not shown yet"""
+        self.variants_model.set_all_active(active)
 
     def open_attribute_management(self):
         """Open the attribute management dialog"""
@@ -437,33 +431,18 @@ class VariantManagementDialog(QDialog):
             )
 
     def get_variants_data(self):
-        """Get the configured variants data"""
+        """Get the configured variants data (active variants only)"""
         result = []
-        
-        # Update SKUs and barcodes from the table
-        for row in range(self.variants_table.rowCount()):
-            variant = self.variants[row]
-            sku_item = self.variants_table.item(row, 2)
-            barcode_item = self.variants_table.item(row, 5)
-            
-            if sku_item:
-                variant['sku'] = sku_item.text()
-            if barcode_item:
-                variant['barcode'] = barcode_item.text()
-            
-            # Add only active variants
+        for variant in self.variants_model.variants():
             if variant['active']:
-                # Convert attribute dict to string format
-                variant_data = {
+                result.append({
                     'name': variant['name'],
                     'sku': variant['sku'],
                     'barcode': variant['barcode'],
                     'price': variant['price'],
                     'stock': variant['stock'],
                     'attribute_values': json.dumps(variant['attributes'])
-                }
-                result.append(variant_data)
-        
+                })
         return result
 
     def get_attribute_names(self):
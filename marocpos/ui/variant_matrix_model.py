@@ -0,0 +1,134 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+
+class VariantMatrixModel(QAbstractTableModel):
+    """Generated variants, pulled from a lazy combination iterator page by page.
+
+    Rows are only built when the view scrolls to them (canFetchMore /
+    fetchMore), so a matrix of many thousand combinations opens instantly.
+    make_variant(combination) turns a combination into the variant dict
+    that the view edits. variants() returns every variant, the rows not yet
+    shown included, for saving.
+    """
+
+    COLUMNS = ["Actif", "Variante", "SKU", "Prix de vente", "Stock", "Code-barres"]
+    ACTIVE, NAME, SKU, PRICE, STOCK, BARCODE = range(6)
+    PAGE_SIZE = 200
+
+    FIELDS = {SKU: 'sku', PRICE: 'price', STOCK: 'stock', BARCODE: 'barcode'}
+
+    def __init__(self, combinations=(), make_variant=dict, total=None, parent=None):
+        super().__init__(parent)
+        self._source = iter(combinations)
+        self._make_variant = make_variant
+        self._variants = []
+        self._exhausted = False
+        self.default_active = True
+        self.total = total
+
+    def _pull(self, count=None):
+        """Build up to `count` more variants from the source (all if None)"""
+        pulled = []
+        while count is None or len(pulled) < count:
+            try:
+                combination = next(self._source)
+            except StopIteration:
+                self._exhausted = True
+                break
+            variant = self._make_variant(combination)
+            variant['active'] = self.default_active
+            pulled.append(variant)
+        return pulled
+
+    def variants(self):
+        """All variants: the rows already shown, then the rest of the source"""
+        yield from self._variants
+        while not self._exhausted:
+            yield from self._pull(self.PAGE_SIZE)
+
+    def set_all_active(self, active):
+        self.default_active = active
+        for variant in self._variants:
+            variant['active'] = active
+        if self._variants:
+            self.dataChanged.emit(self.index(0, self.ACTIVE), self.index(len(self._variants) - 1, self.ACTIVE))
+
+    # Lazy population
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        pulled = self._pull(self.PAGE_SIZE)
+        if pulled:
+            first = len(self._variants)
+            self.beginInsertRows(QModelIndex(), first, first + len(pulled) - 1)
+            self._variants.extend(pulled)
+            self.endInsertRows()
+
+    # QAbstractTableModel interface
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._variants)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() == self.ACTIVE:
+            return flags | Qt.ItemIsUserCheckable
+        if index.column() in self.FIELDS:
+            return flags | Qt.ItemIsEditable
+        return flags
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._variants):
+            return None
+        variant = self._variants[index.row()]
+        column = index.column()
+
+        if role == Qt.CheckStateRole and column == self.ACTIVE:
+            return Qt.Checked if variant['active'] else Qt.Unchecked
+        if role == Qt.DisplayRole:
+            if column == self.NAME:
+                return variant['name']
+            if column == self.PRICE:
+                return f"{variant['price']:.2f} MAD"
+            if column in self.FIELDS:
+                return str(variant[self.FIELDS[column]])
+        elif role == Qt.EditRole and column in self.FIELDS:
+            return variant[self.FIELDS[column]]
+        elif role == Qt.TextAlignmentRole and column in (self.PRICE, self.STOCK):
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid():
+            return False
+        variant = self._variants[index.row()]
+        column = index.column()
+        if role == Qt.CheckStateRole and column == self.ACTIVE:
+            variant['active'] = value == Qt.Checked
+        elif role == Qt.EditRole and column in self.FIELDS:
+            try:
+                if column == self.PRICE:
+                    value = max(0.0, float(value))
+                elif column == self.STOCK:
+                    value = max(0, int(value))
+                else:
+                    value = str(value).strip()
+            except (TypeError, ValueError):
+                return False
+            variant[self.FIELDS[column]] = value
+        else:
+            return False
+        self.dataChanged.emit(index, index)
+        return True
@@ -4,7 +4,6 @@ from PyQt5.QtWidgets import (
     QFrame, QDialogButtonBox
 )
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap
 from models.product import Product
 import json
 import os
@@ -67,14 +66,10 @@ class VariantSelectionDialog(QDialog):
         # Product image if available
         if self.product.get('image_path') and os.path.exists(self.product['image_path']):
             image_label = QLabel()
-            pixmap = QPixmap(self.product['image_path'])
-            if not pixmap.isNull():
-                scaled_pixmap = pixmap.scaled(
-                    80, 80,
-                    Qt.KeepAspectRatio,
-                    Qt.SmoothTransformation
-                )
-                image_label.setPixmap(scaled_pixmap)
+            from ui.thumbnail_service import ThumbnailService
+            pixmap = ThumbnailService.instance().thumbnail_now(self.product['image_path'], 80)
+            if pixmap:
+                image_label.setPixmap(pixmap)
                 image_label.setAlignment(Qt.AlignCenter)
                 header_layout.addWidget(image_label)
                 
@@ -127,31 +122,6 @@ class VariantSelectionDialog(QDialog):
             
         for variant in variants:
             try:
-                # Parse attribute values safely from either 'attributes' or 'attribute_values' key
-                attr_values = {}
-                
-                # Try both possible keys for attributes (for compatibility with different data structures)
-                for key in ['attributes', 'attribute_values']:
-                    if variant.get(key):
-                        try:
-                            # Handle both string JSON and direct dictionary representation
-                            if isinstance(variant[key], str):
-                                parsed_values = json.loads(variant[key])
-                                attr_values = parsed_values
-                                # Add the parsed result back to the variant for later use
-                                variant[key] = parsed_values
-                            else:
-                                attr_values = variant[key]
-                            
-                            # If we successfully parsed values, stop looking
-                            if attr_values:
-                                break
-                        except Exception as e:
-                            print(f"Error parsing {key}: {e}")
-                
-                # Debug output
-                print(f"Variant {variant.get('id')}: Parsed attribute values: {attr_values}")
-                
                 # Create list item
                 item = QListWidgetItem()
                 
@@ -162,76 +132,8 @@ class VariantSelectionDialog(QDialog):
                 # Variant name/description
                 variant_info = QVBoxLayout()
                 
-                # Create variant name from attributes
-                variant_name = variant.get('name', '')
-                if not variant_name and attr_values:
-                    try:
-                        # Ensure we have some kind of name even if we can't extract from attributes
-                        default_name = f"Variante #{variant.get('id', '')}"
-                    
-                        # Try multiple approaches to get a meaningful name
-                        attr_vals = []
-                    
-                        # First try: If we have a direct 'name' field, use it
-                        if variant.get('name'):
-                            variant_name = variant['name']
-                        # Second try: Extract from attribute values dictionary
-                        elif isinstance(attr_values, dict) and attr_values:
-                            attr_vals = []
-                            # Safely extract values from the dictionary
-                            for attr_name, attr_value in attr_values.items():
-                                if attr_value:
-                                    # Handle if attr_value is another dict or a complex object
-                                    if isinstance(attr_value, dict):
-                                        # Try to extract a meaningful value from the dict
-                                        for val in attr_value.values():
-                                            if val:
-                                                attr_vals.append(str(val))
-                                                break
-                                    else:
-                                        attr_vals.append(str(attr_value))
-                        
-                            if attr_vals:
-                                variant_name = " / ".join(attr_vals)
-                            else:
-                                variant_name = default_name
-                        # Third try: If attr_values is a list
-                        elif isinstance(attr_values, list) and attr_values:
-                            attr_vals = [str(val) for val in attr_values if val]
-                            if attr_vals:
-                                variant_name = " / ".join(attr_vals)
-                            else:
-                                variant_name = default_name
-                        # Fourth try: If attr_values is a string
-                        elif isinstance(attr_values, str) and attr_values:
-                            # Try to parse it as JSON, might be a serialized structure
-                            try:
-                                parsed = json.loads(attr_values)
-                                if isinstance(parsed, dict):
-                                    attr_vals = [str(val) for val in parsed.values() if val]
-                                elif isinstance(parsed, list):
-                                    attr_vals = [str(val) for val in parsed if val]
-                                else:
-                                    attr_vals = [str(parsed)]
-                                
-                                if attr_vals:
-                                    variant_name = " / ".join(attr_vals)
-                                else:
-                                    variant_name = default_name
-                            except:
-                                # Not valid JSON, use as direct string
-                                variant_name = attr_values
-                        # Last resort: Use default name
-                        else:
-                            variant_name = default_name
-                        
-                        # Debug the name generation
-                        print(f"Generated variant name: {variant_name} from attr_values: {attr_values}")
-                        
-                    except Exception as e:
-                        print(f"Error creating variant name: {e}")
-                        variant_name = f"Variante #{variant.get('id', '')}"
-                    
+                # Attributes are decoded and the name built by Product.get_variants
+                variant_name = variant['display_name']
                 name_label = QLabel(variant_name)
                 name_label.setStyleSheet("font-weight: bold;")
                 variant_info.addWidget(name_label)